@@ -0,0 +1,87 @@
+"""Benchmark for the isolation of search from indexing by the inference worker scheduling.
+
+Runs a stub model call that sleeps (bulk calls for --bulk-ms, as for a batch of images, interactive ones for
+--interactive-ms, as for a query) on an InferenceExecutor. --bulk-clients threads submit bulk calls back to back,
+like concurrent add documents requests, while --interactive-clients threads submit interactive calls, like searches,
+and the latency of the interactive calls is measured in three modes:
+- fifo: every call is scheduled as interactive, so searches queue behind the bulk calls (the previous behaviour)
+- priority: searches run before waiting bulk calls, with MARQO_INFERENCE_BULK_MIN_SHARE of the dispatches kept for
+  bulk calls
+- priority+slo: as priority, with MARQO_INFERENCE_INTERACTIVE_QUEUE_SLO_MS also limiting the workers bulk calls occupy
+
+The bulk throughput is reported too, to show that indexing keeps making progress.
+
+Usage (from the repository root):
+    PYTHONPATH=src python perf_tests/benchmarks/inference_scheduling.py --workers 4 --bulk-ms 500 --slo-ms 20
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from marqo.s2_inference.inference_executor import InferenceExecutor, workload_class
+from marqo.tensor_search.enums import WorkloadClass
+
+
+def run(args, scheduled: bool, slo_ms):
+    executor = InferenceExecutor(args.workers, bulk_min_share=args.bulk_min_share,
+                                 interactive_queue_slo_seconds=slo_ms / 1000 if slo_ms else None)
+    stop = threading.Event()
+    bulk_completed = 0
+    latencies = []
+    lock = threading.Lock()
+
+    def bulk_client():
+        nonlocal bulk_completed
+        with workload_class(WorkloadClass.Bulk if scheduled else WorkloadClass.Interactive):
+            while not stop.is_set():
+                executor.run(time.sleep, args.bulk_ms / 1000)
+                with lock:
+                    bulk_completed += 1
+
+    def interactive_client():
+        while not stop.is_set():
+            start = time.perf_counter()
+            executor.run(time.sleep, args.interactive_ms / 1000)
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(args.think_ms / 1000)
+
+    threads = [threading.Thread(target=bulk_client) for _ in range(args.bulk_clients)] + \
+              [threading.Thread(target=interactive_client) for _ in range(args.interactive_clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    executor.shutdown()
+    return np.array(latencies), bulk_completed / args.duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--bulk-clients", type=int, default=8)
+    parser.add_argument("--interactive-clients", type=int, default=4)
+    parser.add_argument("--bulk-ms", type=float, default=500)
+    parser.add_argument("--interactive-ms", type=float, default=10)
+    parser.add_argument("--think-ms", type=float, default=20, help="pause between the calls of a search client")
+    parser.add_argument("--bulk-min-share", type=float, default=0.1)
+    parser.add_argument("--slo-ms", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per mode")
+    args = parser.parse_args()
+
+    print(f"workers={args.workers} bulk={args.bulk_clients}x{args.bulk_ms}ms "
+          f"interactive={args.interactive_clients}x{args.interactive_ms}ms duration={args.duration}s")
+    print(f"{'mode':<14}{'searches':>10}{'p50 (ms)':>12}{'p99 (ms)':>12}{'bulk calls/s':>14}")
+    for name, scheduled, slo_ms in [("fifo", False, None), ("priority", True, None),
+                                    ("priority+slo", True, args.slo_ms)]:
+        latencies, bulk_throughput = run(args, scheduled, slo_ms)
+        print(f"{name:<14}{len(latencies):>10}{np.percentile(latencies, 50):>12.1f}"
+              f"{np.percentile(latencies, 99):>12.1f}{bulk_throughput:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
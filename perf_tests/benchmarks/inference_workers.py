@@ -0,0 +1,86 @@
+"""Benchmark for the inference worker pool (MARQO_INFERENCE_WORKER_COUNT x MARQO_INFERENCE_INTRA_OP_THREADS).
+
+Simulates concurrent requests by calling `vectorise` from many client threads at once, as the FastAPI worker
+threads do, and sweeps the number of inference workers and the intra-op thread count. A worker count of 0 runs
+inference on the client threads (the default behaviour) and is included as the baseline.
+
+Usage (from the repository root):
+    PYTHONPATH=src python perf_tests/benchmarks/inference_workers.py --workers 0,1,2,4,8 --threads 1,2,4,8
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from marqo.s2_inference import inference_executor, s2_inference
+from marqo.s2_inference.multimodal_model_load import Modality
+from marqo.tensor_search.enums import EnvVars
+
+WORDS = (
+    "search vector tensor index document model embedding query field image text chunk score filter batch "
+    "marqo cloud latency throughput token device memory shard replica schema product catalogue review price"
+).split()
+
+
+def generate_requests(n_requests: int, docs_per_request: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [[" ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 60))) for _ in range(docs_per_request)]
+            for _ in range(n_requests)]
+
+
+def run(model_name: str, device: str, requests: list, concurrency: int, workers: int, threads: int):
+    os.environ[EnvVars.MARQO_INFERENCE_WORKER_COUNT] = str(workers)
+    os.environ[EnvVars.MARQO_INFERENCE_INTRA_OP_THREADS] = str(threads)
+    inference_executor.shutdown_inference_executor()
+    inference_executor.configure_intra_op_threads()
+
+    def send(content):
+        start = time.perf_counter()
+        s2_inference.vectorise(model_name=model_name, content=content, device=device, modality=Modality.TEXT)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        latencies = list(clients.map(send, requests))
+    elapsed = time.perf_counter() - start
+
+    stats = inference_executor.get_inference_executor_stats()
+    utilisation = np.mean([w["utilisation"] for w in stats["workers"]]) if stats["enabled"] else float("nan")
+    return elapsed, np.array(latencies), utilisation
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="hf/all-MiniLM-L6-v2")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--workers", default="0,1,2,4,8", help="comma separated inference worker counts")
+    parser.add_argument("--threads", default="1,2,4,8", help="comma separated intra-op thread counts")
+    parser.add_argument("--concurrency", type=int, default=32, help="number of concurrent client threads")
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--docs-per-request", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    requests = generate_requests(args.requests, args.docs_per_request, args.seed)
+    # Load the model and warm up before timing
+    s2_inference.vectorise(model_name=args.model, content=requests[0], device=args.device, modality=Modality.TEXT)
+
+    print(f"model={args.model} device={args.device} cpus={os.cpu_count()} concurrency={args.concurrency} "
+          f"requests={args.requests} docs_per_request={args.docs_per_request}")
+    print(f"{'workers':>8}{'threads':>8}{'docs/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'util':>8}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        for threads in (int(t) for t in args.threads.split(",")):
+            elapsed, latencies, utilisation = run(args.model, args.device, requests, args.concurrency,
+                                                  workers, threads)
+            docs_per_second = args.requests * args.docs_per_request / elapsed
+            print(f"{workers:>8}{threads:>8}{docs_per_second:>10.1f}"
+                  f"{np.percentile(latencies, 50) * 1000:>10.1f}{np.percentile(latencies, 99) * 1000:>10.1f}"
+                  f"{utilisation:>8.2f}")
+    inference_executor.shutdown_inference_executor()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark for length bucketed batching of text content in s2_inference.
+
+Encodes a mixed-length corpus (titles, short descriptions and long text chunks, shuffled together as they would be
+in an add documents batch) with and without MARQO_ENABLE_LENGTH_BUCKETED_BATCHING, and reports the time taken and
+the maximum difference between the embeddings produced by the two modes.
+
+Usage (from the repository root):
+    PYTHONPATH=src python perf_tests/benchmarks/length_bucketed_batching.py --model hf/all-MiniLM-L6-v2
+"""
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from marqo.s2_inference import s2_inference
+from marqo.s2_inference.multimodal_model_load import Modality
+from marqo.tensor_search.enums import EnvVars
+
+WORDS = (
+    "search vector tensor index document model embedding query field image text chunk score filter batch "
+    "marqo cloud latency throughput token device memory shard replica schema product catalogue review price "
+    "colour size material shipping return customer order stock warehouse brand category description title"
+).split()
+
+
+def generate_corpus(n_items: int, seed: int) -> list:
+    """A mix of titles (2-10 words), descriptions (20-60 words) and long chunks (150-350 words)."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n_items):
+        kind = rng.random()
+        if kind < 0.4:
+            n_words = rng.randint(2, 10)
+        elif kind < 0.8:
+            n_words = rng.randint(20, 60)
+        else:
+            n_words = rng.randint(150, 350)
+        corpus.append(" ".join(rng.choice(WORDS) for _ in range(n_words)))
+    return corpus
+
+
+def run(model_name: str, corpus: list, device: str, bucketed: bool, repeats: int):
+    os.environ[EnvVars.MARQO_ENABLE_LENGTH_BUCKETED_BATCHING] = "TRUE" if bucketed else "FALSE"
+    timings = []
+    vectors = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        vectors = s2_inference.vectorise(model_name=model_name, content=corpus, device=device,
+                                         modality=Modality.TEXT)
+        timings.append(time.perf_counter() - start)
+    return np.array(vectors), timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="hf/all-MiniLM-L6-v2")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--items", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ[EnvVars.MARQO_MAX_VECTORISE_BATCH_SIZE] = str(args.batch_size)
+    corpus = generate_corpus(args.items, args.seed)
+
+    # Load the model and warm up before timing
+    s2_inference.vectorise(model_name=args.model, content=corpus[:args.batch_size], device=args.device,
+                           modality=Modality.TEXT)
+
+    baseline_vectors, baseline_timings = run(args.model, corpus, args.device, False, args.repeats)
+    bucketed_vectors, bucketed_timings = run(args.model, corpus, args.device, True, args.repeats)
+
+    baseline, bucketed = min(baseline_timings), min(bucketed_timings)
+    print(f"model={args.model} device={args.device} items={args.items} batch_size={args.batch_size}")
+    print(f"{'mode':<12}{'best (s)':>10}{'items/s':>12}")
+    print(f"{'arrival':<12}{baseline:>10.3f}{args.items / baseline:>12.1f}")
+    print(f"{'bucketed':<12}{bucketed:>10.3f}{args.items / bucketed:>12.1f}")
+    print(f"speedup: {baseline / bucketed:.2f}x")
+    print(f"max abs embedding difference: {np.abs(baseline_vectors - bucketed_vectors).max():.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark for recording request timings in RequestMetrics.
+
+Times the same key many times, as the add documents and image download paths do for every document and image of a
+batch, and then reduces the per-thread metrics into one, as add documents does for its download threads. Compares
+`RequestMetrics` against a replica of the previous implementation, which converted a key's float into a list on its
+second time and copied the list on every later one, and reduced by popping and extending lists.
+
+Usage (from the repository root):
+    PYTHONPATH=src python perf_tests/benchmarks/request_metrics.py --times 10000 --threads 8
+"""
+import argparse
+import statistics
+import time
+from collections import defaultdict
+
+from marqo.tensor_search.telemetry import RequestMetrics
+
+
+class LegacyRequestMetrics:
+    """The list based timing of RequestMetrics before timings were accumulated into TimingStats."""
+
+    def __init__(self):
+        self.times = defaultdict(float)
+
+    def add_time(self, k, v):
+        if k not in self.times:
+            self.times[k] = v
+        elif isinstance(self.times[k], list):
+            self.times[k] = self.times[k] + [v]
+        else:
+            self.times[k] = [self.times[k], v]
+
+    @classmethod
+    def reduce_from_list(cls, metrics):
+        reduced = metrics.pop()
+        for m in metrics:
+            for k, v in m.times.items():
+                existing = reduced.times.get(k)
+                if existing is None:
+                    reduced.times[k] = v
+                else:
+                    existing = existing if isinstance(existing, list) else [existing]
+                    reduced.times[k] = existing + (v if isinstance(v, list) else [v])
+        return reduced
+
+
+def time_add(metrics_class, n_times: int, repeats: int):
+    timings = []
+    for _ in range(repeats):
+        metrics = metrics_class()
+        start = time.perf_counter()
+        for i in range(n_times):
+            metrics.add_time("image_download.thread_time", float(i))
+        timings.append((time.perf_counter() - start) * 1e9 / n_times)
+    return timings
+
+
+def time_reduce(metrics_class, n_times: int, n_threads: int, repeats: int):
+    timings = []
+    for _ in range(repeats):
+        thread_metrics = []
+        for _ in range(n_threads):
+            metrics = metrics_class()
+            for i in range(n_times // n_threads):
+                metrics.add_time("image_download.thread_time", float(i))
+            thread_metrics.append(metrics)
+        start = time.perf_counter()
+        metrics_class.reduce_from_list(thread_metrics)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--times", type=int, default=10000, help="Times recorded for the key per request")
+    parser.add_argument("--threads", type=int, default=8, help="Thread metrics reduced into one")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"times={args.times} threads={args.threads} repeats={args.repeats}")
+    print(f"{'implementation':<16}{'add_time (ns/call)':>20}{'reduce (ms)':>14}")
+    medians = {}
+    for name, metrics_class in [("legacy", LegacyRequestMetrics), ("RequestMetrics", RequestMetrics)]:
+        add_timings = time_add(metrics_class, args.times, args.repeats)
+        reduce_timings = time_reduce(metrics_class, args.times, args.threads, args.repeats)
+        medians[name] = statistics.median(add_timings)
+        print(f"{name:<16}{medians[name]:>20.1f}{statistics.median(reduce_timings):>14.3f}")
+    print(f"add_time speedup: {medians['legacy'] / medians['RequestMetrics']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
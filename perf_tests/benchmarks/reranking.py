@@ -0,0 +1,105 @@
+"""Benchmark for cross-encoder reranking of search results.
+
+Reranks synthetic search results with the pandas based `ReRankerText`, constructed per search as
+`rerank_search_results` used to, and with the cached, batched `TextReranker`. Reports the latency of each path and
+whether they produce the same ordering. Use `--model _testing` (a model that returns random scores) to measure
+the overhead outside the model alone.
+
+Usage (from the repository root):
+    PYTHONPATH=src python perf_tests/benchmarks/reranking.py --model cross-encoder/ms-marco-MiniLM-L-6-v2 --hits 50
+"""
+import argparse
+import copy
+import os
+import random
+import statistics
+import time
+
+import numpy as np
+
+from marqo.s2_inference.reranking.cross_encoders import ReRankerText
+from marqo.s2_inference.reranking.text_reranker import get_text_reranker
+from marqo.tensor_search.enums import EnvVars
+
+WORDS = (
+    "search vector tensor index document model embedding query field image text chunk score filter batch "
+    "marqo cloud latency throughput token device memory shard replica schema product catalogue review price "
+    "colour size material shipping return customer order stock warehouse brand category description title"
+).split()
+
+
+def generate_sentences(rng: random.Random, n_sentences: int) -> str:
+    return " ".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 20))) + "."
+                    for _ in range(n_sentences))
+
+
+def generate_results(n_hits: int, seed: int) -> dict:
+    """Hits with a short title and a description of 1-12 sentences, as a lexical or tensor search returns them."""
+    rng = random.Random(seed)
+    return {"hits": [{
+        "_id": f"doc-{i}",
+        "_score": 1.0 - i / n_hits,
+        "_highlights": [],
+        "title": generate_sentences(rng, 1),
+        "description": generate_sentences(rng, rng.randint(1, 12)),
+    } for i in range(n_hits)]}
+
+
+def rerank_legacy(results: dict, query: str, model_name: str, device: str, fields: list) -> None:
+    reranker = ReRankerText(model_name=model_name, device=device, num_highlights=1)
+    reranker.rerank(query=query, results=results, searchable_attributes=fields)
+
+
+def rerank_cached(results: dict, query: str, model_name: str, device: str, fields: list) -> None:
+    get_text_reranker(model_name=model_name, device=device).rerank(
+        query=query, results=results, searchable_attributes=fields, num_highlights=1)
+
+
+def time_rerank(rerank_function, results: dict, args, fields: list):
+    timings = []
+    reranked = None
+    for _ in range(args.repeats):
+        reranked = copy.deepcopy(results)
+        start = time.perf_counter()
+        rerank_function(reranked, args.query, args.model, args.device, fields)
+        timings.append((time.perf_counter() - start) * 1000)
+    return reranked, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--hits", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--query", default="warehouse stock for brand catalogue")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ[EnvVars.MARQO_RERANKER_BATCH_SIZE] = str(args.batch_size)
+    results = generate_results(args.hits, args.seed)
+    fields = ["title", "description"]
+
+    # Load the model and warm up before timing
+    rerank_cached(copy.deepcopy(results), args.query, args.model, args.device, fields)
+
+    legacy, legacy_timings = time_rerank(rerank_legacy, results, args, fields)
+    cached, cached_timings = time_rerank(rerank_cached, results, args, fields)
+
+    print(f"model={args.model} device={args.device} hits={args.hits} batch_size={args.batch_size} "
+          f"repeats={args.repeats}")
+    print(f"{'path':<10}{'median (ms)':>14}{'p90 (ms)':>12}")
+    for name, timings in [("legacy", legacy_timings), ("cached", cached_timings)]:
+        print(f"{name:<10}{statistics.median(timings):>14.2f}{np.percentile(timings, 90):>12.2f}")
+    print(f"speedup: {statistics.median(legacy_timings) / statistics.median(cached_timings):.2f}x")
+    if args.model != "_testing":
+        legacy_scores = np.array([hit["_reranked_score"] for hit in legacy["hits"]])
+        cached_scores = np.array([hit["_reranked_score"] for hit in cached["hits"]])
+        same_order = [hit["_id"] for hit in legacy["hits"]] == [hit["_id"] for hit in cached["hits"]]
+        print(f"same ordering: {same_order}")
+        print(f"max abs score difference: {np.abs(legacy_scores - cached_scores).max():.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark for speculative lexical retrieval in hybrid search.
+
+Runs `HybridSearch.search` against a stub Vespa client and a stub vectorisation, each of which sleeps for a configured
+latency, with `MARQO_ENABLE_SPECULATIVE_HYBRID_SEARCH` off and on. With it off, the query is vectorised and then one
+hybrid query is sent, which the stub answers after max(lexical, tensor) latency, as the HybridSearcher runs the two
+sub-queries in parallel. With it on, the lexical sub-query is sent while the query is vectorised and the tensor
+sub-query after, so the expected latency goes from embed + max(lexical, tensor) to max(embed, lexical) + tensor.
+
+Usage (from the repository root):
+    PYTHONPATH=src python perf_tests/benchmarks/speculative_hybrid_search.py --embed-ms 30 --lexical-ms 20 --tensor-ms 10
+"""
+import argparse
+import os
+import statistics
+import time
+from unittest import mock
+
+import numpy as np
+
+from marqo import version
+from marqo.core.models.hybrid_parameters import HybridParameters
+from marqo.core.models.marqo_index import (Field, FieldFeature, FieldType, HnswConfig, ImagePreProcessing, Model,
+                                           DistanceMetric, StructuredMarqoIndex, TensorField, TextPreProcessing,
+                                           TextSplitMethod, VectorNumericType)
+from marqo.core.search.hybrid_search import HybridSearch
+from marqo.core.structured_vespa_index import common
+from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.telemetry import RequestMetricsStore
+from marqo.vespa.models import QueryResult
+
+
+def make_index() -> StructuredMarqoIndex:
+    return StructuredMarqoIndex(
+        name='bench', schema_name='bench', model=Model(name='hf/all_datasets_v4_MiniLM-L6'),
+        normalize_embeddings=True, distance_metric=DistanceMetric.Angular,
+        vector_numeric_type=VectorNumericType.Float, hnsw_config=HnswConfig(ef_construction=128, m=16),
+        text_preprocessing=TextPreProcessing(split_length=2, split_overlap=0, split_method=TextSplitMethod.Sentence),
+        image_preprocessing=ImagePreProcessing(patch_method=None),
+        fields=[Field(name='title', type=FieldType.Text, features=[FieldFeature.LexicalSearch],
+                      lexical_field_name='lexical_title')],
+        tensor_fields=[TensorField(name='title', embeddings_field_name='embeddings_title',
+                                   chunk_field_name='chunks_title')],
+        marqo_version=version.get_version(), created_at=time.time(), updated_at=time.time()
+    )
+
+
+def query_result(n_hits: int, offset: int) -> QueryResult:
+    return QueryResult(**{'root': {
+        'id': 'toplevel', 'relevance': 1.0, 'fields': {'totalCount': n_hits},
+        'coverage': {'coverage': 100, 'documents': 1000, 'full': True, 'nodes': 1, 'results': 1, 'resultsFull': 1},
+        'children': [{'id': f'index:content_default/0/doc-{i + offset}', 'relevance': 1.0 / (i + 1),
+                      'fields': {common.FIELD_ID: f'doc-{i + offset}', 'lexical_title': 'title'}}
+                     for i in range(n_hits)]
+    }})
+
+
+def make_stub_vespa_client(args):
+    latency_by_ranking = {
+        common.RANK_PROFILE_BM25: args.lexical_ms,
+        common.RANK_PROFILE_EMBEDDING_SIMILARITY: args.tensor_ms,
+        common.RANK_PROFILE_HYBRID_CUSTOM_SEARCHER: max(args.lexical_ms, args.tensor_ms),
+    }
+
+    def query(**kwargs):
+        time.sleep(latency_by_ranking[kwargs['ranking']] / 1000)
+        return query_result(args.limit, offset=0 if kwargs['ranking'] == common.RANK_PROFILE_BM25 else args.limit // 2)
+
+    vespa_client = mock.Mock()
+    vespa_client.query.side_effect = query
+    return vespa_client
+
+
+def time_searches(args, speculative: bool):
+    config = mock.Mock()
+    config.vespa_client = make_stub_vespa_client(args)
+
+    def vectorise(config, queries, device):
+        time.sleep(args.embed_ms / 1000)
+        return {0: [0.1] * 384}
+
+    timings = []
+    with mock.patch.dict(os.environ, {EnvVars.MARQO_ENABLE_SPECULATIVE_HYBRID_SEARCH: str(speculative).upper()}), \
+            mock.patch('marqo.core.search.hybrid_search.run_vectorise_pipeline', side_effect=vectorise):
+        for i in range(args.warmup + args.repeats):
+            start = time.perf_counter()
+            HybridSearch().search(config, 'bench', 'hello world', result_count=args.limit, device='cpu',
+                                  hybrid_parameters=HybridParameters())
+            if i >= args.warmup:
+                timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embed-ms", type=float, default=30)
+    parser.add_argument("--lexical-ms", type=float, default=20)
+    parser.add_argument("--tensor-ms", type=float, default=10)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    args = parser.parse_args()
+
+    # There is no TelemetryMiddleware outside the API, so every search shares one set of request metrics
+    request = mock.Mock()
+    with mock.patch.object(RequestMetricsStore, '_get_request', return_value=request), \
+            mock.patch('marqo.core.search.hybrid_search.index_meta_cache.get_index', return_value=make_index()):
+        RequestMetricsStore.set_in_request(request)
+        results = {name: time_searches(args, speculative) for name, speculative in
+                   [("sequential", False), ("speculative", True)]}
+
+    print(f"embed={args.embed_ms}ms lexical={args.lexical_ms}ms tensor={args.tensor_ms}ms repeats={args.repeats}")
+    print(f"expected: sequential {args.embed_ms + max(args.lexical_ms, args.tensor_ms):.1f}ms, "
+          f"speculative {max(args.embed_ms, args.lexical_ms) + args.tensor_ms:.1f}ms")
+    print(f"{'mode':<14}{'median (ms)':>14}{'p90 (ms)':>12}")
+    for name, timings in results.items():
+        print(f"{name:<14}{statistics.median(timings):>14.2f}{np.percentile(timings, 90):>12.2f}")
+    print(f"speedup: {statistics.median(results['sequential']) / statistics.median(results['speculative']):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
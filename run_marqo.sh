@@ -113,8 +113,8 @@ else
   echo "External vector store configured. Using external vector store"
 fi
 
-# Start up redis
-if [ "$MARQO_ENABLE_THROTTLING" != "FALSE" ]; then
+# Start up redis. It is not needed when throttling is off, or is done in-process (LOCAL)
+if [ "$MARQO_ENABLE_THROTTLING" != "FALSE" ] && [ "$MARQO_ENABLE_THROTTLING" != "LOCAL" ]; then
     echo "Starting Marqo throttling"
     redis-server /etc/redis/redis.conf &
     echo "Called Marqo throttling start command"
@@ -138,6 +138,8 @@ if [ "$MARQO_ENABLE_THROTTLING" != "FALSE" ]; then
     done
     echo "Marqo throttling is now running"
 
+elif [ "$MARQO_ENABLE_THROTTLING" = "LOCAL" ]; then
+    echo "Throttling is done in the Marqo process. Skipping Marqo throttling start"
 else
     echo "Throttling has been disabled. Skipping Marqo throttling start"
 fi
@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import sys
+
+import httpx
+
+CHUNK_SIZE = 1024 * 1024
+
+FORMATS_BY_EXTENSION = {
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.arrows': 'arrow',
+}
+
+
+def read_chunks(path):
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+def import_documents(args):
+    import_format = args.format or FORMATS_BY_EXTENSION.get(os.path.splitext(args.file)[1].lower())
+    if import_format is None:
+        sys.exit(f'Can not infer the format of {args.file}, set it with --format')
+
+    response = httpx.post(
+        f'{args.url.rstrip("/")}/indexes/{args.index}/documents/import',
+        params={'format': import_format},
+        content=read_chunks(args.file),
+        headers={'Content-Type': 'application/octet-stream'},
+        timeout=httpx.Timeout(args.timeout, connect=10),
+    )
+    print(json.dumps(response.json(), indent=2))
+    if response.status_code != 200 or response.json().get('errors'):
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import documents with precomputed vectors to a Marqo index from a newline-delimited JSON, "
+                    "Parquet or Arrow IPC stream file, e.g. one written by the document export endpoint. "
+                    "The file is streamed to Marqo, which feeds the documents as they arrive.")
+    parser.add_argument("index", help="Name of the index to import documents to")
+    parser.add_argument("file", help="File to import")
+    parser.add_argument("--format", choices=sorted(set(FORMATS_BY_EXTENSION.values())),
+                        help="Format of the file. Inferred from the file extension by default")
+    parser.add_argument("--url", default=os.getenv('MARQO_URL', 'http://localhost:8882'), help="URL of Marqo")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Timeout in seconds of the import. No timeout by default")
+    parser.set_defaults(func=import_documents)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
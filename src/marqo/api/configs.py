@@ -27,7 +27,12 @@ def default_env_vars() -> dict:
         EnvVars.MARQO_MAX_CONCURRENT_INDEX: 8,
         EnvVars.MARQO_MAX_CONCURRENT_SEARCH: 8,
         EnvVars.MARQO_THREAD_EXPIRY_TIME: 1800,  # 30 minutes
-        EnvVars.MARQO_ENABLE_THROTTLING: "TRUE",
+        EnvVars.MARQO_ENABLE_THROTTLING: "TRUE",  # "TRUE" throttles with Redis, "LOCAL" in this process
+        # With local throttling, how long a request waits for a slot before it is rejected. 0 rejects it immediately
+        EnvVars.MARQO_THROTTLING_QUEUE_TIMEOUT_MS: 0,
+        # With local throttling, adapt the concurrency limits so that requests complete within this latency. The
+        # MARQO_MAX_CONCURRENT_* limits are the maximum. None keeps the limits fixed
+        EnvVars.MARQO_THROTTLING_TARGET_LATENCY_MS: None,
         EnvVars.MARQO_LOG_LEVEL: "info",
         EnvVars.MARQO_MEDIA_DOWNLOAD_THREAD_COUNT_PER_REQUEST: 5,
         EnvVars.MARQO_IMAGE_DOWNLOAD_THREAD_COUNT_PER_REQUEST: 20,
@@ -36,7 +41,50 @@ def default_env_vars() -> dict:
         EnvVars.MARQO_MAX_CUDA_MODEL_MEMORY: 4,  # For multi-GPU, this is the max memory for each GPU.
         EnvVars.MARQO_EF_CONSTRUCTION_MAX_VALUE: 4096,
         EnvVars.MARQO_MAX_VECTORISE_BATCH_SIZE: 16,
+        EnvVars.MARQO_ENABLE_LENGTH_BUCKETED_BATCHING: "FALSE",
+        EnvVars.MARQO_INFERENCE_WORKER_COUNT: 0,  # 0 runs inference on the request thread
+        EnvVars.MARQO_INFERENCE_INTRA_OP_THREADS: None,  # None defaults to cpu_count // MARQO_INFERENCE_WORKER_COUNT
+        # While both search and indexing model calls wait for an inference worker, the minimum share of indexing ones
+        EnvVars.MARQO_INFERENCE_BULK_MIN_SHARE: 0.1,
+        # If set, fewer inference workers run indexing model calls when a search waits longer than this for a worker
+        EnvVars.MARQO_INFERENCE_INTERACTIVE_QUEUE_SLO_MS: None,
+        EnvVars.MARQO_INFERENCE_PROCESS_COUNT: 0,  # 0 runs inference in the API process
+        EnvVars.MARQO_INFERENCE_PROCESS_HEALTH_CHECK_INTERVAL: 5,  # seconds
+        # seconds a request can run on an inference process, once its model is loaded, before the process is restarted.
+        # 0 disables the timeout
+        EnvVars.MARQO_INFERENCE_PROCESS_TIMEOUT: 300,
+        # seconds an inference process can take to download and load the model of a request. 0 disables the timeout
+        EnvVars.MARQO_INFERENCE_PROCESS_MODEL_LOAD_TIMEOUT: 1800,
+        EnvVars.MARQO_ENABLE_BATCHED_IMAGE_PREPROCESSING: "TRUE",
+        EnvVars.MARQO_ENABLE_IMAGE_DRAFT_DECODE: "FALSE",
+        EnvVars.MARQO_IMAGE_PREPROCESSING_THREAD_COUNT: 4,
+        EnvVars.MARQO_RERANKER_BATCH_SIZE: 32,
+        EnvVars.MARQO_RERANK_CACHE_TTL: 60,  # seconds, 0 disables caching of reranked results
+        EnvVars.MARQO_RERANK_CACHE_SIZE: 256,  # number of cached searches
+        EnvVars.MARQO_PATCH_MODEL_BATCH_SIZE: 16,  # images per forward pass of the image chunking models
+        EnvVars.MARQO_MONITORING_CACHE_MAX_STALENESS: 10,  # seconds, 0 disables caching of index stats and health
+        EnvVars.MARQO_MONITORING_CACHE_REFRESH_INTERVAL: 5,  # seconds
+        # Run the lexical leg of hybrid searches while the query is vectorised, and fuse the results in Marqo
+        EnvVars.MARQO_ENABLE_SPECULATIVE_HYBRID_SEARCH: "FALSE",
+        # How long a request adding fields to a semi-structured index waits for other requests to add theirs in the same
+        # index update. Requests that add fields while the index is being updated are always coalesced
+        EnvVars.MARQO_SCHEMA_UPDATE_BATCH_WINDOW_MS: 50,
+        # How long an index creation or deletion waits for others to be deployed with it. Those that arrive while a
+        # deployment is in progress are always deployed together
+        EnvVars.MARQO_INDEX_OPERATION_BATCH_WINDOW_MS: 100,
         EnvVars.MARQO_MAX_DELETE_DOCS_COUNT: 10000,
+        # The number of slices of an index visited concurrently when deleting documents by filter
+        EnvVars.MARQO_DELETE_BY_FILTER_SLICES: 4,
+        # How long a delete by filter request runs before it returns a continuation to resume the deletion
+        EnvVars.MARQO_DELETE_BY_FILTER_TIME_BUDGET_MS: 30000,
+        # The number of slices of an index visited concurrently when exporting documents
+        EnvVars.MARQO_EXPORT_SLICES: 4,
+        # The number of documents per page of an export. Each slice holds at most two pages in memory
+        EnvVars.MARQO_EXPORT_PAGE_SIZE: 256,
+        # The number of documents an import validates and converts at a time, and reads ahead while feeding
+        EnvVars.MARQO_IMPORT_BATCH_SIZE: 256,
+        # The number of documents an import feeds to Vespa concurrently
+        EnvVars.MARQO_IMPORT_FEED_CONCURRENCY: 32,
         EnvVars.MARQO_MAX_SEARCHABLE_TENSOR_ATTRIBUTES: None,
         EnvVars.MARQO_MAX_NUMBER_OF_REPLICAS: 1,
         EnvVars.MARQO_DEFAULT_EF_SEARCH: 2000,
@@ -0,0 +1,8 @@
+from typing import Optional
+
+from marqo.base_model import ImmutableStrictBaseModel
+
+
+class DeleteDocumentsByFilterBodyParams(ImmutableStrictBaseModel):
+    filter: str
+    continuation: Optional[str] = None
@@ -17,10 +17,12 @@ class HealthResponse(StrictBaseModel):
     status: str
     inference: InferenceHealthResponse
     backend: BackendHealthResponse
+    asOf: Optional[str] = None
 
     @classmethod
-    def from_marqo_health_status(cls, marqo_health_status):
+    def from_marqo_health_status(cls, marqo_health_status, as_of: Optional[str] = None):
         return cls(
+            asOf=as_of,
             status=marqo_health_status.status.value,
             inference=InferenceHealthResponse(
                 status=marqo_health_status.inference.status.value
@@ -7,6 +7,7 @@ from marqo.core.document.document import Document
 from marqo.core.embed.embed import Embed
 from marqo.core.index_management.index_management import IndexManagement
 from marqo.core.monitoring.monitoring import Monitoring
+from marqo.core.monitoring.monitoring_cache import MonitoringCache
 from marqo.core.search.recommender import Recommender
 from marqo.logging import get_logger
 from marqo.tensor_search import enums
@@ -43,9 +44,29 @@ class Config:
             utils.read_env_vars_and_defaults(EnvVars.MARQO_BEST_AVAILABLE_DEVICE))
 
         # Initialize Core layer dependencies
-        self.index_management = IndexManagement(vespa_client, zookeeper_client, enable_index_operations=True)
+        self.index_management = IndexManagement(
+            vespa_client, zookeeper_client, enable_index_operations=True,
+            schema_update_batch_window_seconds=utils.read_env_vars_and_defaults_ints(
+                EnvVars.MARQO_SCHEMA_UPDATE_BATCH_WINDOW_MS) / 1000,
+            index_operation_batch_window_seconds=utils.read_env_vars_and_defaults_ints(
+                EnvVars.MARQO_INDEX_OPERATION_BATCH_WINDOW_MS) / 1000
+        )
         self.monitoring = Monitoring(vespa_client, self.index_management)
-        self.document = Document(vespa_client, self.index_management)
+        self.monitoring_cache = MonitoringCache(
+            self.monitoring,
+            max_staleness=utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_MONITORING_CACHE_MAX_STALENESS),
+            refresh_interval=utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_MONITORING_CACHE_REFRESH_INTERVAL)
+        )
+        self.document = Document(
+            vespa_client, self.index_management,
+            delete_by_filter_slices=utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_DELETE_BY_FILTER_SLICES),
+            delete_by_filter_time_budget_seconds=utils.read_env_vars_and_defaults_ints(
+                EnvVars.MARQO_DELETE_BY_FILTER_TIME_BUDGET_MS) / 1000,
+            export_slices=utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_EXPORT_SLICES),
+            export_page_size=utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_EXPORT_PAGE_SIZE),
+            import_batch_size=utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_IMPORT_BATCH_SIZE),
+            import_feed_concurrency=utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_IMPORT_FEED_CONCURRENCY)
+        )
         self.recommender = Recommender(vespa_client, self.index_management)
         self.embed = Embed(vespa_client, self.index_management, self.default_device)
 
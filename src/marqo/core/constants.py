@@ -5,6 +5,7 @@ MARQO_DOC_TENSORS = 'marqo__tensors'  # doc-level so must not clash with index f
 MARQO_DOC_HIGHLIGHTS = '_highlights'  # doc-level so must not clash with index field names
 MARQO_DOC_CHUNKS = 'chunks'
 MARQO_DOC_EMBEDDINGS = 'embeddings'
+MARQO_DOC_CENTROID = 'centroid'  # only set when the index stores centroids
 MARQO_DOC_ID = '_id'
 
 MARQO_SEARCH_METHOD_TENSOR = 'tensor'
@@ -1,23 +1,38 @@
+import base64
+import binascii
+import hashlib
+import json
+import math
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from timeit import default_timer as timer
-from typing import Dict, List, Tuple, Optional
+from typing import Any, BinaryIO, Dict, Iterator, List, Tuple, Optional
+
+import numpy as np
 
 import marqo.api.exceptions as api_exceptions
-from marqo.core.constants import MARQO_DOC_ID
+from marqo.core.constants import MARQO_DOC_CHUNKS, MARQO_DOC_EMBEDDINGS, MARQO_DOC_ID, MARQO_DOC_TENSORS
+from marqo.core.document.document_import import DocumentImporter, read_records
 from marqo.core.models.add_docs_params import AddDocsParams
-from marqo.core.exceptions import UnsupportedFeatureError, ParsingError, InternalError
+from marqo.core.exceptions import UnsupportedFeatureError, ParsingError, InternalError, InvalidArgumentError
 from marqo.core.index_management.index_management import IndexManagement
 from marqo.core.models.marqo_add_documents_response import MarqoAddDocumentsResponse, MarqoAddDocumentsItem
+from marqo.core.models.marqo_delete_documents_by_filter_response import MarqoDeleteDocumentsByFilterResponse
+from marqo.core.models.marqo_import_documents_response import MarqoImportDocumentsResponse
 from marqo.core.models.marqo_index import IndexType, SemiStructuredMarqoIndex, StructuredMarqoIndex, \
     UnstructuredMarqoIndex
 from marqo.core.models.marqo_update_documents_response import MarqoUpdateDocumentsResponse, MarqoUpdateDocumentsItem
+from marqo.core.search.search_filter import MarqoFilterStringParser
 from marqo.core.semi_structured_vespa_index.semi_structured_add_document_handler import \
     SemiStructuredAddDocumentsHandler, SemiStructuredFieldCountConfig
 from marqo.core.structured_vespa_index.structured_add_document_handler import StructuredAddDocumentsHandler
+from marqo.core.unstructured_vespa_index import common as unstructured_common
 from marqo.core.unstructured_vespa_index.unstructured_add_document_handler import UnstructuredAddDocumentsHandler
 from marqo.core.vespa_index.vespa_index import for_marqo_index as vespa_index_factory
 from marqo.logging import get_logger
+from marqo.tensor_search.enums import ImportFormat, TensorField, VectorFormat
+from marqo.vespa.exceptions import VespaDeleteBySelectionError
 from marqo.vespa.models import UpdateDocumentsBatchResponse, VespaDocument
-from marqo.vespa.models.delete_document_response import DeleteAllDocumentsResponse
+from marqo.vespa.models.delete_document_response import DeleteDocumentsBySelectionResponse
 from marqo.vespa.models.feed_response import FeedBatchResponse
 from marqo.vespa.vespa_client import VespaClient
 
@@ -27,9 +42,33 @@ logger = get_logger(__name__)
 class Document:
     """A class that handles the document API in Marqo"""
 
-    def __init__(self, vespa_client: VespaClient, index_management: IndexManagement):
+    _VISIT_TIMEOUT_MARGIN_SECONDS = 10
+    _EXPORT_TIME_CHUNK_SECONDS = 10
+
+    def __init__(self, vespa_client: VespaClient, index_management: IndexManagement,
+                 delete_by_filter_slices: int = 4, delete_by_filter_time_budget_seconds: float = 30,
+                 export_slices: int = 4, export_page_size: int = 256,
+                 import_batch_size: int = 256, import_feed_concurrency: int = 32):
+        """
+        Args:
+            vespa_client: The Vespa client
+            index_management: The index management
+            delete_by_filter_slices: The number of slices of an index visited concurrently to delete documents by filter
+            delete_by_filter_time_budget_seconds: How long a request deleting documents by filter runs before it
+                returns a continuation to resume it
+            export_slices: The number of slices of an index visited concurrently to export its documents
+            export_page_size: The number of documents Vespa returns per page of an export
+            import_batch_size: The number of documents an import validates and converts at a time
+            import_feed_concurrency: The number of documents an import feeds to Vespa concurrently
+        """
         self.vespa_client = vespa_client
         self.index_management = index_management
+        self.delete_by_filter_slices = delete_by_filter_slices
+        self.delete_by_filter_time_budget_seconds = delete_by_filter_time_budget_seconds
+        self.export_slices = export_slices
+        self.export_page_size = export_page_size
+        self.import_batch_size = import_batch_size
+        self.import_feed_concurrency = import_feed_concurrency
 
     def add_documents(self, add_docs_params: AddDocsParams,
                       field_count_config=SemiStructuredFieldCountConfig()) -> MarqoAddDocumentsResponse:
@@ -61,8 +100,267 @@ class Document:
 
         Args:
             marqo_index: The index object to delete documents from"""
-        res: DeleteAllDocumentsResponse = self.vespa_client.delete_all_docs(marqo_index.schema_name)
-        return res.document_count
+        deleted_count = 0
+        pending = {0: None}
+        # Vespa returns a continuation if it did not visit all documents within a time chunk
+        while pending:
+            try:
+                count, pending = self._delete_documents_by_selection(marqo_index.schema_name, 'true', 1, pending,
+                                                                     self.delete_by_filter_time_budget_seconds)
+            except VespaDeleteBySelectionError as e:
+                # There is only one slice, so nothing else was deleted in this round
+                raise e.cause
+            deleted_count += count
+
+        return deleted_count
+
+    def delete_documents_by_filter_by_index_name(self, index_name: str, filter_string: str,
+                                                 continuation: Optional[str] = None) \
+            -> MarqoDeleteDocumentsByFilterResponse:
+        """Delete the documents matching a filter in the given index by index name.
+
+        Args:
+            index_name: The name of the index to delete documents from
+            filter_string: The filter, in the syntax of search filters
+            continuation: The continuation returned by a previous request for the same filter, to resume it
+
+        Raises:
+            IndexNotFoundError: If the index does not exist
+        """
+        marqo_index = self.index_management.get_index(index_name)
+        return self.delete_documents_by_filter(marqo_index, filter_string, continuation)
+
+    def delete_documents_by_filter(self, marqo_index, filter_string: str, continuation: Optional[str] = None) \
+            -> MarqoDeleteDocumentsByFilterResponse:
+        """Delete the documents matching a filter in the given index by marqo_index object.
+
+        The index is split into slices that are visited concurrently. If the documents are not all visited within
+        the time budget, the response has a continuation to pass back to resume the deletion. The filter is matched
+        as a Vespa document selection, so unlike in a search, string values match exactly and case-sensitively.
+
+        Args:
+            marqo_index: The index object to delete documents from
+            filter_string: The filter, in the syntax of search filters
+            continuation: The continuation returned by a previous request for the same filter, to resume it
+
+        Raises:
+            InvalidArgumentError: If the filter is invalid, or the continuation is not one for this filter
+        """
+        marqo_filter = MarqoFilterStringParser().parse(filter_string)
+        selection = vespa_index_factory(marqo_index).to_vespa_document_selection(marqo_filter)
+        selection_hash = hashlib.sha256(f'{marqo_index.schema_name}/{selection}'.encode()).hexdigest()[:16]
+
+        if continuation is not None:
+            slices, pending = self._decode_delete_continuation(continuation, selection_hash)
+        else:
+            slices = self.delete_by_filter_slices
+            pending = {slice_id: None for slice_id in range(slices)}
+
+        deleted_count = 0
+        deadline = timer() + self.delete_by_filter_time_budget_seconds
+        while pending:
+            remaining = deadline - timer()
+            if remaining <= 0:
+                break
+            try:
+                count, pending = self._delete_documents_by_selection(marqo_index.schema_name, selection, slices,
+                                                                     pending, remaining)
+            except VespaDeleteBySelectionError as e:
+                if not deleted_count and not e.responses:
+                    raise e.cause
+                # Return the progress made so far, with a continuation that also resumes the slices that failed
+                logger.warning(f'Returning partial progress of deleting documents by filter: {e}')
+                count, pending = self._delete_progress(
+                    e.responses, {slice_id: pending[slice_id] for slice_id in e.errors}
+                )
+                deleted_count += count
+                break
+            deleted_count += count
+
+        return MarqoDeleteDocumentsByFilterResponse(
+            deleted_count=deleted_count,
+            continuation=self._encode_delete_continuation(slices, pending, selection_hash) if pending else None,
+            done=not pending
+        )
+
+    def _delete_documents_by_selection(self, schema: str, selection: str, slices: int,
+                                       pending: Dict[int, Optional[str]],
+                                       time_chunk: float) -> Tuple[int, Dict[int, Optional[str]]]:
+        """
+        Run one round of deletion on the pending slices.
+
+        Returns:
+            The number of documents deleted, and the continuation of each slice that is not done yet
+
+        Raises:
+            VespaDeleteBySelectionError: If any slice fails
+        """
+        responses = self.vespa_client.delete_documents_by_selection(
+            schema, selection, pending, slices=slices, time_chunk=time_chunk,
+            timeout=math.ceil(time_chunk) + self._VISIT_TIMEOUT_MARGIN_SECONDS
+        )
+        return self._delete_progress(responses, dict())
+
+    @staticmethod
+    def _delete_progress(responses: Dict[int, DeleteDocumentsBySelectionResponse],
+                         failed: Dict[int, Optional[str]]) -> Tuple[int, Dict[int, Optional[str]]]:
+        """
+        The number of documents deleted in the responses of a round of deletion, and the continuation of each slice
+        that is not done yet, including the slices that failed, which are resumed from their previous continuation.
+        """
+        deleted_count = sum(response.document_count for response in responses.values())
+        pending = {slice_id: response.continuation for slice_id, response in responses.items()
+                   if response.continuation}
+        pending.update(failed)
+        return deleted_count, pending
+
+    @staticmethod
+    def _encode_delete_continuation(slices: int, pending: Dict[int, Optional[str]], selection_hash: str) -> str:
+        token = {'slices': slices, 'pending': {str(k): v for k, v in pending.items()}, 'selection': selection_hash}
+        return base64.urlsafe_b64encode(json.dumps(token, separators=(',', ':')).encode()).decode()
+
+    @staticmethod
+    def _decode_delete_continuation(continuation: str,
+                                    selection_hash: str) -> Tuple[int, Dict[int, Optional[str]]]:
+        try:
+            token = json.loads(base64.urlsafe_b64decode(continuation.encode()))
+            slices = int(token['slices'])
+            pending = {int(slice_id): slice_continuation for slice_id, slice_continuation in token['pending'].items()}
+            token_selection_hash = token['selection']
+        except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+            raise InvalidArgumentError(f'Invalid continuation: {continuation}')
+
+        if token_selection_hash != selection_hash:
+            raise InvalidArgumentError('The continuation was returned for a different index or filter. '
+                                       'Resume a deletion with the same index and filter it was started with')
+        if slices < 1 or any(not 0 <= slice_id < slices for slice_id in pending):
+            raise InvalidArgumentError(f'Invalid continuation: {continuation}')
+
+        return slices, pending
+
+    def export_documents_by_index_name(self, index_name: str, include_vectors: bool = False,
+                                       vector_format: VectorFormat = VectorFormat.Json,
+                                       filter_string: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Export the documents in the given index by index name. See `export_documents`.
+
+        Raises:
+            IndexNotFoundError: If the index does not exist
+        """
+        marqo_index = self.index_management.get_index(index_name)
+        return self.export_documents(marqo_index, include_vectors, vector_format, filter_string)
+
+    def export_documents(self, marqo_index, include_vectors: bool = False,
+                         vector_format: VectorFormat = VectorFormat.Json,
+                         filter_string: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Export the documents in the given index by marqo_index object.
+
+        The index is visited in slices concurrently, one page at a time per slice. The next page of a slice is only
+        requested once the previous one has been handed to the caller, so at most two pages per slice are held in
+        memory however large the index is, and a slow consumer slows down the visit rather than buffering documents.
+
+        The filter and arguments are validated before this method returns. Errors while visiting are raised by the
+        returned iterator.
+
+        Args:
+            marqo_index: The index object to export documents from
+            include_vectors: Whether to include the chunks and vectors of each tensor field, under `_tensors`
+            vector_format: How vectors are encoded. `binary` encodes the vectors of each tensor field as the base64 of
+                their little-endian float32 values, concatenated
+            filter_string: Only export the documents matching this filter. String values match exactly and
+                case-sensitively, as for `delete_documents_by_filter`
+
+        Returns:
+            An iterator of pages of Marqo documents. Pages are in no particular order
+        """
+        vespa_index = vespa_index_factory(marqo_index)
+        selection = None
+        if filter_string is not None:
+            selection = vespa_index.to_vespa_document_selection(MarqoFilterStringParser().parse(filter_string))
+
+        def to_export_document(vespa_document: Dict[str, Any]) -> Dict[str, Any]:
+            marqo_document = vespa_index.to_marqo_document(vespa_document)
+            tensors = marqo_document.pop(MARQO_DOC_TENSORS, None)
+            if not include_vectors:
+                marqo_document.pop(unstructured_common.MARQO_DOC_MULTIMODAL_PARAMS, None)
+            elif tensors:
+                if vector_format == VectorFormat.Binary:
+                    for tensor_field in tensors.values():
+                        tensor_field[MARQO_DOC_EMBEDDINGS] = base64.b64encode(
+                            np.asarray(tensor_field[MARQO_DOC_EMBEDDINGS], dtype='<f4').tobytes()).decode()
+                marqo_document[TensorField.tensors] = tensors
+            return marqo_document
+
+        def export() -> Iterator[List[Dict[str, Any]]]:
+            for page in self._visit_documents(marqo_index.schema_name, selection):
+                yield [to_export_document(vespa_document.dict()) for vespa_document in page]
+
+        return export()
+
+    def _visit_documents(self, schema: str, selection: Optional[str]) -> Iterator[list]:
+        """
+        Visit the documents of a schema in `export_slices` concurrent slices, yielding each page of documents.
+
+        A slice has at most one page request in flight, which is sent as soon as the previous page of the slice is
+        received, so that the next page is fetched while the caller processes the current one.
+        """
+        slices = self.export_slices
+
+        def visit(slice_id: int, continuation: Optional[str]):
+            return slice_id, self.vespa_client.visit_documents(
+                schema, continuation=continuation, wanted_document_count=self.export_page_size, selection=selection,
+                slices=slices, slice_id=slice_id, time_chunk=self._EXPORT_TIME_CHUNK_SECONDS,
+                timeout=self._EXPORT_TIME_CHUNK_SECONDS + self._VISIT_TIMEOUT_MARGIN_SECONDS
+            )
+
+        with ThreadPoolExecutor(max_workers=slices, thread_name_prefix='export') as executor:
+            pending = {executor.submit(visit, slice_id, None) for slice_id in range(slices)}
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        slice_id, response = future.result()
+                        if response.continuation:
+                            pending.add(executor.submit(visit, slice_id, response.continuation))
+                        if response.documents:
+                            yield response.documents
+            finally:
+                # Stop visiting if the caller stops consuming, e.g. when the client disconnects
+                for future in pending:
+                    future.cancel()
+
+    def import_documents_by_index_name(self, index_name: str, file: BinaryIO, import_format: ImportFormat,
+                                       field_count_config=SemiStructuredFieldCountConfig()) \
+            -> MarqoImportDocumentsResponse:
+        """Import documents with precomputed vectors to the given index by index name. See `import_documents`.
+
+        Raises:
+            IndexNotFoundError: If the index does not exist
+        """
+        marqo_index = self.index_management.get_index(index_name)
+        return self.import_documents(marqo_index, file, import_format, field_count_config)
+
+    def import_documents(self, marqo_index, file: BinaryIO, import_format: ImportFormat,
+                         field_count_config=SemiStructuredFieldCountConfig()) -> MarqoImportDocumentsResponse:
+        """Import documents with precomputed vectors to the given index by marqo_index object.
+
+        Records are in the format of `export_documents` with vectors, and are fed to Vespa without being vectorised.
+        The file is read a batch at a time while the previous batch is fed, so any number of documents can be imported
+        in one request. See `marqo.core.document.document_import` for the record format.
+
+        Args:
+            marqo_index: The index object to import documents to
+            file: The file to import. Parquet files must be seekable
+            import_format: The format of the file
+            field_count_config: The field limits of a semi-structured index
+
+        Returns:
+            The number of documents received, imported and failed, and the first failures
+        """
+        importer = DocumentImporter(marqo_index, self.vespa_client, self.index_management,
+                                    batch_size=self.import_batch_size,
+                                    feed_concurrency=self.import_feed_concurrency,
+                                    field_count_config=field_count_config)
+        return importer.import_records(read_records(file, import_format, self.import_batch_size))
 
     def partial_update_documents_by_index_name(self, index_name,
                                                partial_documents: List[Dict]) \
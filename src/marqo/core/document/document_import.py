@@ -0,0 +1,389 @@
+"""
+Import of documents with precomputed vectors, used by `Document.import_documents`.
+
+Records are Marqo documents in the format of a document export with vectors: the fields of the document, its `_id`,
+and the chunks and embeddings of its tensor fields under `_tensors`, e.g.
+`{"_id": "1", "title": "A title", "_tensors": {"title": {"chunks": ["A title"], "embeddings": [[0.1, ...]]}}}`.
+The embeddings of a tensor field can be a list of vectors, a flat list of their values, or the little-endian float32
+values of the vectors concatenated, as bytes or base64 (the `binary` vector format of an export). A tensor field with
+a single chunk can give it as a string.
+
+Records are read, validated and converted to Vespa documents one batch at a time, while the previous batch is fed, so
+an import holds a bounded number of documents in memory however large the file is. Documents are not vectorised, so
+the model of the index is never called.
+"""
+import base64
+import binascii
+import json
+import threading
+from timeit import default_timer as timer
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from marqo.api import exceptions as api_errors
+from marqo.core import constants
+from marqo.core.constants import MARQO_CUSTOM_VECTOR_NORMALIZATION_MINIMUM_VERSION, MARQO_DOC_ID
+from marqo.core.exceptions import AddDocumentsError, MarqoDocumentParsingError, TooManyFieldsError, \
+    UnsupportedFeatureError, VespaDocumentParsingError
+from marqo.core.index_management.index_management import IndexManagement
+from marqo.core.models.marqo_import_documents_response import MarqoImportDocumentsFailure, \
+    MarqoImportDocumentsResponse
+from marqo.core.models.marqo_index import MarqoIndex, SemiStructuredMarqoIndex, StructuredMarqoIndex
+from marqo.core.semi_structured_vespa_index.semi_structured_add_document_handler import \
+    SemiStructuredFieldCountConfig, add_lexical_field, add_tensor_field
+from marqo.core.unstructured_vespa_index.common import MARQO_DOC_MULTIMODAL_PARAMS
+from marqo.core.unstructured_vespa_index.unstructured_validation import validate_field_name
+from marqo.core.vespa_index.add_documents_handler import get_centroid
+from marqo.core.vespa_index.vespa_index import for_marqo_index as vespa_index_factory
+from marqo.logging import get_logger
+from marqo.tensor_search import validation
+from marqo.tensor_search.constants import ALLOWED_UNSTRUCTURED_FIELD_TYPES
+from marqo.tensor_search.enums import ImportFormat, TensorField
+from marqo.vespa.models import VespaDocument
+from marqo.vespa.models.feed_response import FeedBatchDocumentResponse
+from marqo.vespa.vespa_client import VespaClient
+
+logger = get_logger(__name__)
+
+
+def read_ndjson(file: BinaryIO) -> Iterator[Any]:
+    """
+    Read the records of a newline-delimited JSON file, one per non-empty line. A line that is not valid JSON is
+    returned as an AddDocumentsError, so that the import reports it and carries on.
+    """
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            yield AddDocumentsError(f'Record is not valid JSON: {e}')
+
+
+def read_parquet(file: BinaryIO, batch_size: int) -> Iterator[Dict[str, Any]]:
+    """Read the rows of a Parquet file, `batch_size` rows at a time. The file must be seekable."""
+    parquet = _import_pyarrow('parquet')
+    for record_batch in parquet.ParquetFile(file).iter_batches(batch_size=batch_size):
+        for row in record_batch.to_pylist():
+            yield _drop_nulls(row)
+
+
+def read_arrow(file: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """Read the rows of an Arrow IPC stream, one record batch at a time."""
+    ipc = _import_pyarrow('ipc')
+    with ipc.open_stream(file) as reader:
+        for record_batch in reader:
+            for row in record_batch.to_pylist():
+                yield _drop_nulls(row)
+
+
+def _import_pyarrow(module: str):
+    try:
+        return __import__(f'pyarrow.{module}', fromlist=[module])
+    except ImportError as e:
+        raise UnsupportedFeatureError(f'Importing Parquet and Arrow files requires the pyarrow package, which could '
+                                      f'not be imported: {e}') from e
+
+
+def _drop_nulls(row: Dict[str, Any]) -> Dict[str, Any]:
+    # Columnar formats have a value for every column of every row. Fields a document does not have are null
+    return {key: value for key, value in row.items() if value is not None}
+
+
+def read_records(file: BinaryIO, import_format: ImportFormat, batch_size: int) -> Iterator[Any]:
+    if import_format == ImportFormat.Ndjson:
+        return read_ndjson(file)
+    elif import_format == ImportFormat.Parquet:
+        return read_parquet(file, batch_size)
+    elif import_format == ImportFormat.Arrow:
+        return read_arrow(file)
+    else:
+        raise UnsupportedFeatureError(f'Unsupported import format: {import_format}')
+
+
+class DocumentImporter:
+    """
+    Imports a stream of records with precomputed vectors into an index, and collects the failure of each record.
+
+    A record that fails validation or conversion is reported as a failure and does not stop the import. Records with
+    the same `_id` replace each other, but since documents are fed concurrently, which one is kept is undefined.
+    """
+
+    MAX_REPORTED_FAILURES = 100
+
+    def __init__(self, marqo_index: MarqoIndex, vespa_client: VespaClient, index_management: IndexManagement,
+                 batch_size: int = 256, feed_concurrency: Optional[int] = None,
+                 field_count_config=SemiStructuredFieldCountConfig()):
+        """
+        Args:
+            marqo_index: The index to import documents to
+            vespa_client: The Vespa client
+            index_management: The index management, used to add the new fields of a semi-structured index
+            batch_size: The number of records validated and converted at a time
+            feed_concurrency: The number of documents fed to Vespa concurrently
+            field_count_config: The field limits of a semi-structured index
+        """
+        self.marqo_index = marqo_index
+        self.vespa_client = vespa_client
+        self.index_management = index_management
+        self.batch_size = batch_size
+        self.feed_concurrency = feed_concurrency
+        self.field_count_config = field_count_config
+        self.vespa_index = vespa_index_factory(marqo_index)
+        self.dimension = marqo_index.model.get_dimension()
+        # Only normalise vectors in new indexes, as for custom vectors in add_documents
+        self.should_normalise = (marqo_index.normalize_embeddings and marqo_index.parsed_marqo_version()
+                                 >= MARQO_CUSTOM_VECTOR_NORMALIZATION_MINIMUM_VERSION)
+
+        self._lock = threading.Lock()
+        self._received_count = 0
+        self._imported_count = 0
+        self._failed_count = 0
+        self._failures: List[MarqoImportDocumentsFailure] = []
+        # The record number of each document in flight, keyed by the identity of its VespaDocument since ids can
+        # repeat in an import, to report feed failures against it
+        self._in_flight_records: Dict[int, int] = dict()
+
+    def import_records(self, records: Iterator[Any]) -> MarqoImportDocumentsResponse:
+        start_time = timer()
+
+        self.vespa_client.feed_batches_pipelined(self._vespa_batches(records), self.marqo_index.schema_name,
+                                                 self._collect_feed_response, concurrency=self.feed_concurrency)
+
+        return MarqoImportDocumentsResponse(
+            errors=self._failed_count > 0,
+            received_count=self._received_count,
+            imported_count=self._imported_count,
+            failed_count=self._failed_count,
+            failures=self._failures,
+            processing_time_ms=(timer() - start_time) * 1000
+        )
+
+    def _vespa_batches(self, records: Iterator[Any]) -> Iterator[List[VespaDocument]]:
+        batch: List[Tuple[int, Dict[str, Any]]] = []
+        for record in records:
+            self._received_count += 1
+            record_number = self._received_count
+            try:
+                if isinstance(record, AddDocumentsError):
+                    raise record
+                batch.append((record_number, self._to_marqo_document(record)))
+            except AddDocumentsError as err:
+                self._collect_failure(record_number, self._record_id(record), err)
+
+            if len(batch) >= self.batch_size:
+                yield self._to_vespa_documents(batch)
+                batch = []
+
+        if batch:
+            yield self._to_vespa_documents(batch)
+
+    def _to_vespa_documents(self, batch: List[Tuple[int, Dict[str, Any]]]) -> List[VespaDocument]:
+        if isinstance(self.marqo_index, SemiStructuredMarqoIndex):
+            batch = self._add_new_fields(batch)
+
+        vespa_documents = []
+        for record_number, marqo_document in batch:
+            try:
+                vespa_document = VespaDocument(**self.vespa_index.to_vespa_document(marqo_document))
+            except (MarqoDocumentParsingError, VespaDocumentParsingError) as e:
+                self._collect_failure(record_number, marqo_document[MARQO_DOC_ID], AddDocumentsError(e.message))
+                continue
+            vespa_documents.append(vespa_document)
+            with self._lock:
+                self._in_flight_records[id(vespa_document)] = record_number
+
+        return vespa_documents
+
+    def _add_new_fields(self, batch: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Add the string and tensor fields of a batch that a semi-structured index does not have yet, and persist them
+        before the batch is fed. Documents that would take the index over its field limits fail.
+        """
+        accepted = []
+        new_lexical_fields = []
+        new_tensor_fields = []
+        for record_number, marqo_document in batch:
+            try:
+                for field_name, field_content in marqo_document.items():
+                    if isinstance(field_content, str) and field_name != MARQO_DOC_ID:
+                        field = add_lexical_field(self.marqo_index, field_name,
+                                                  self.field_count_config.max_lexical_field_count)
+                        if field is not None:
+                            new_lexical_fields.append(field)
+                for field_name in marqo_document.get(constants.MARQO_DOC_TENSORS, dict()):
+                    tensor_field = add_tensor_field(self.marqo_index, field_name,
+                                                    self.field_count_config.max_tensor_field_count)
+                    if tensor_field is not None:
+                        new_tensor_fields.append(tensor_field)
+                accepted.append((record_number, marqo_document))
+            except TooManyFieldsError as e:
+                self._collect_failure(record_number, marqo_document[MARQO_DOC_ID], AddDocumentsError(e.message))
+
+        if new_lexical_fields or new_tensor_fields:
+            self.index_management.add_fields_to_index(
+                self.marqo_index.name, new_lexical_fields, new_tensor_fields,
+                self.field_count_config.max_lexical_field_count, self.field_count_config.max_tensor_field_count
+            )
+            from marqo.tensor_search import index_meta_cache
+            index_meta_cache.get_index(self.index_management, self.marqo_index.name, force_refresh=True)
+
+        return accepted
+
+    def _to_marqo_document(self, record: Any) -> Dict[str, Any]:
+        """
+        Validate a record and convert it to the Marqo document format that the Vespa index of the index type converts
+        to a Vespa document.
+
+        Raises:
+            AddDocumentsError: If the record is not valid
+        """
+        if not isinstance(record, dict):
+            raise AddDocumentsError('Docs must be dicts')
+
+        marqo_document = dict(record)
+        tensors = marqo_document.pop(TensorField.tensors, None) or dict()
+        try:
+            # Vectors are not counted against the document size limit
+            validation.validate_doc(marqo_document)
+            if MARQO_DOC_ID not in marqo_document:
+                raise api_errors.InvalidDocumentIdError('Imported documents must have an _id')
+            validation.validate_id(marqo_document[MARQO_DOC_ID])
+
+            multimodal_params = marqo_document.pop(MARQO_DOC_MULTIMODAL_PARAMS, None)
+            if not isinstance(self.marqo_index, StructuredMarqoIndex):
+                self._validate_fields(marqo_document)
+                if multimodal_params:
+                    marqo_document[MARQO_DOC_MULTIMODAL_PARAMS] = {
+                        field_name: params if isinstance(params, str) else json.dumps(params)
+                        for field_name, params in multimodal_params.items()
+                    }
+        except (api_errors.InvalidArgError, api_errors.DocTooLargeError, api_errors.InvalidDocumentIdError,
+                api_errors.InvalidFieldNameError) as err:
+            raise AddDocumentsError(err.message, error_code=err.code, status_code=err.status_code) from err
+
+        if not isinstance(tensors, dict):
+            raise AddDocumentsError(f'{TensorField.tensors} must be an object of tensor field names to chunks and '
+                                    f'embeddings')
+        marqo_tensors = dict()
+        for field_name, tensor in tensors.items():
+            if tensor is not None:
+                marqo_tensors[field_name] = self._to_marqo_tensor(field_name, tensor)
+
+        if isinstance(self.marqo_index, (StructuredMarqoIndex, SemiStructuredMarqoIndex)):
+            if marqo_tensors:
+                marqo_document[constants.MARQO_DOC_TENSORS] = marqo_tensors
+        else:
+            all_chunks = []
+            all_embeddings = []
+            for field_name, marqo_tensor in marqo_tensors.items():
+                all_chunks.extend([f'{field_name}::{chunk}' for chunk in marqo_tensor[constants.MARQO_DOC_CHUNKS]])
+                all_embeddings.extend(marqo_tensor[constants.MARQO_DOC_EMBEDDINGS])
+            marqo_document[constants.MARQO_DOC_CHUNKS] = all_chunks
+            marqo_document[constants.MARQO_DOC_EMBEDDINGS] = dict(enumerate(all_embeddings))
+
+        return marqo_document
+
+    def _validate_fields(self, marqo_document: Dict[str, Any]) -> None:
+        for field_name, field_content in marqo_document.items():
+            if field_name == MARQO_DOC_ID:
+                continue
+            validate_field_name(field_name)
+            if type(field_content) not in ALLOWED_UNSTRUCTURED_FIELD_TYPES:
+                raise api_errors.InvalidArgError(
+                    f'Field {field_name} of type `{type(field_content).__name__}` is not of valid content type! '
+                    f'Allowed content types: {[ty.__name__ for ty in ALLOWED_UNSTRUCTURED_FIELD_TYPES]}')
+            if isinstance(field_content, list) and not validation.list_types_valid(field_content):
+                raise api_errors.InvalidArgError(
+                    f'Field {field_name} is not of valid content type! All list elements must be of the same type '
+                    f'and that type must be int, float or string')
+            if isinstance(field_content, dict):
+                validation.validate_map_numeric_field(field_content)
+
+    def _to_marqo_tensor(self, field_name: str, tensor: Any) -> Dict[str, Any]:
+        if not isinstance(tensor, dict) or constants.MARQO_DOC_CHUNKS not in tensor \
+                or constants.MARQO_DOC_EMBEDDINGS not in tensor:
+            raise AddDocumentsError(f'Tensor field {field_name} must have {constants.MARQO_DOC_CHUNKS} and '
+                                    f'{constants.MARQO_DOC_EMBEDDINGS}')
+        if not isinstance(self.marqo_index, StructuredMarqoIndex):
+            try:
+                validate_field_name(field_name)
+            except api_errors.InvalidFieldNameError as err:
+                raise AddDocumentsError(err.message, error_code=err.code, status_code=err.status_code) from err
+
+        chunks = tensor[constants.MARQO_DOC_CHUNKS]
+        if isinstance(chunks, str):
+            chunks = [chunks]
+        if not isinstance(chunks, list) or not all(isinstance(chunk, str) for chunk in chunks):
+            raise AddDocumentsError(f'The chunks of tensor field {field_name} must be a list of strings')
+
+        embeddings = self._to_embeddings(field_name, tensor[constants.MARQO_DOC_EMBEDDINGS], len(chunks))
+        marqo_tensor = {
+            constants.MARQO_DOC_CHUNKS: chunks,
+            constants.MARQO_DOC_EMBEDDINGS: embeddings.tolist(),
+        }
+        if self.marqo_index.store_centroids and len(chunks) > 0:
+            marqo_tensor[constants.MARQO_DOC_CENTROID] = get_centroid(embeddings)
+        return marqo_tensor
+
+    def _to_embeddings(self, field_name: str, embeddings: Any, chunk_count: int) -> np.ndarray:
+        """
+        Returns the embeddings of a tensor field as a (chunk_count, dimension) float32 array, normalised if the index
+        normalises embeddings.
+        """
+        try:
+            if isinstance(embeddings, str):
+                embeddings = base64.b64decode(embeddings, validate=True)
+            if isinstance(embeddings, (bytes, bytearray, memoryview)):
+                vectors = np.frombuffer(embeddings, dtype='<f4')
+            else:
+                vectors = np.asarray(embeddings, dtype=np.float32)
+            vectors = vectors.reshape(chunk_count, -1) if chunk_count > 0 else vectors.reshape(0, self.dimension)
+        except (binascii.Error, TypeError, ValueError):
+            raise AddDocumentsError(f'The embeddings of tensor field {field_name} must be {chunk_count} vectors of '
+                                    f'{self.dimension} numbers, one per chunk')
+
+        if vectors.shape[1] != self.dimension:
+            raise AddDocumentsError(f'The embeddings of tensor field {field_name} must be {chunk_count} vectors of '
+                                    f'{self.dimension} numbers, one per chunk. Got {vectors.size} numbers')
+        if not np.isfinite(vectors).all():
+            raise AddDocumentsError(f'The embeddings of tensor field {field_name} must be finite numbers')
+
+        if self.should_normalise and chunk_count > 0:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            if not norms.all():
+                raise AddDocumentsError(f'The embeddings of tensor field {field_name} can not be normalised since '
+                                        f'one of them has zero magnitude')
+            vectors = vectors / norms
+
+        return vectors
+
+    def _collect_feed_response(self, vespa_document: VespaDocument, response: FeedBatchDocumentResponse) -> None:
+        with self._lock:
+            record_number = self._in_flight_records.pop(id(vespa_document))
+        status, message = self.vespa_client.translate_vespa_document_response(response.status, message=response.message)
+        if status == 200:
+            with self._lock:
+                self._imported_count += 1
+        else:
+            self._collect_failure(record_number, vespa_document.id, AddDocumentsError(
+                error_message=message, status_code=status, error_code='vespa_error'))
+
+    def _collect_failure(self, record_number: Optional[int], doc_id: Any, error: AddDocumentsError) -> None:
+        logger.warning(f'Encountered error when importing doc {doc_id}: {error.error_message}')
+        with self._lock:
+            self._failed_count += 1
+            if len(self._failures) < self.MAX_REPORTED_FAILURES:
+                self._failures.append(MarqoImportDocumentsFailure(
+                    record=record_number,
+                    id=doc_id if doc_id is not None else '',
+                    status=error.status_code,
+                    message=error.error_message,
+                    code=error.error_code
+                ))
+
+    @staticmethod
+    def _record_id(record: Any) -> Any:
+        return record.get(MARQO_DOC_ID) if isinstance(record, dict) else None
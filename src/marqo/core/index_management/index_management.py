@@ -1,5 +1,5 @@
 from contextlib import contextmanager
-from typing import List, Tuple
+from typing import Any, Dict, List, NamedTuple, Tuple
 from typing import Optional
 
 import semver
@@ -9,14 +9,16 @@ import marqo.vespa.vespa_client
 from marqo import version, marqo_docs
 from marqo.core import constants
 from marqo.core.distributed_lock.zookeeper_distributed_lock import get_deployment_lock
-from marqo.core.exceptions import IndexNotFoundError, ApplicationNotInitializedError
+from marqo.core.exceptions import IndexNotFoundError, ApplicationNotInitializedError, IndexExistsError
 from marqo.core.exceptions import OperationConflictError
 from marqo.core.exceptions import ZookeeperLockNotAcquiredError, InternalError
+from marqo.core.index_management.operation_coalescer import OperationCoalescer, PendingOperation
 from marqo.core.index_management.vespa_application_package import VespaApplicationPackage, VespaApplicationFileStore, \
-    ApplicationPackageDeploymentSessionStore
+    ApplicationPackageDeploymentSessionStore, ApplicationContentCache
 from marqo.core.models import MarqoIndex
-from marqo.core.models.marqo_index import SemiStructuredMarqoIndex
+from marqo.core.models.marqo_index import SemiStructuredMarqoIndex, Field, TensorField
 from marqo.core.models.marqo_index_request import MarqoIndexRequest
+from marqo.core.semi_structured_vespa_index.schema_evolution import SchemaEvolutionCoordinator
 from marqo.core.semi_structured_vespa_index.semi_structured_vespa_schema import SemiStructuredVespaSchema
 from marqo.core.vespa_index.vespa_schema import for_marqo_index_request as vespa_schema_factory
 from marqo.tensor_search.models.index_settings import IndexSettings
@@ -26,6 +28,15 @@ from marqo.vespa.zookeeper_client import ZookeeperClient
 logger = marqo.logging.get_logger(__name__)
 
 
+class _CreateIndex(NamedTuple):
+    schema: str
+    marqo_index: MarqoIndex
+
+
+class _DeleteIndex(NamedTuple):
+    index_name: str
+
+
 class IndexManagement:
     _MINIMUM_VESPA_VERSION_TO_SUPPORT_UPLOAD_BINARY_FILES = semver.VersionInfo.parse('8.382.22')
     _MINIMUM_VESPA_VERSION_TO_SUPPORT_FAST_FILE_DISTRIBUTION = semver.VersionInfo.parse('8.396.18')
@@ -39,6 +50,8 @@ class IndexManagement:
                  deployment_timeout_seconds: int = 60,
                  convergence_timeout_seconds: int = 120,
                  deployment_lock_timeout: int = 0,
+                 schema_update_batch_window_seconds: float = 0,
+                 index_operation_batch_window_seconds: float = 0,
                  ):
         """Instantiate an IndexManagement object.
 
@@ -47,6 +60,10 @@ class IndexManagement:
             zookeeper_client: ZookeeperClient object
             enable_index_operations: A flag to enable index operations. If set to True,
                 the object can create/delete indexes, otherwise, it raises an InternalError during index operations.
+            schema_update_batch_window_seconds: How long a request adding fields to a semi-structured index waits
+                for concurrent requests to add theirs, so that one index update adds all of them
+            index_operation_batch_window_seconds: How long an index creation or deletion waits for concurrent ones,
+                so that one deployment applies all of them
         """
         self.vespa_client = vespa_client
         self._zookeeper_deployment_lock = get_deployment_lock(zookeeper_client, deployment_lock_timeout) \
@@ -54,6 +71,10 @@ class IndexManagement:
         self._enable_index_operations = enable_index_operations
         self._deployment_timeout_seconds = deployment_timeout_seconds
         self._convergence_timeout_seconds = convergence_timeout_seconds
+        self._schema_evolution = SchemaEvolutionCoordinator(self.get_index, self.update_index,
+                                                            schema_update_batch_window_seconds)
+        self._index_operations = OperationCoalescer(self._apply_index_operations, index_operation_batch_window_seconds)
+        self._application_content_cache = ApplicationContentCache()
 
     @classmethod
     def validate_index_settings(cls, index_name: str, settings_dict: dict) -> None:
@@ -109,6 +130,10 @@ class IndexManagement:
         """
         Create a Marqo index in a thread-safe manner.
 
+        Index creations and deletions that run concurrently on this instance are applied in a single Vespa deployment,
+        except that an index deleted and created again is created in a later deployment.
+        Each of them still fails or succeeds on its own, except when the deployment fails.
+
         Args:
             marqo_index_request: Marqo index to create
 
@@ -122,7 +147,8 @@ class IndexManagement:
             OperationConflictError: If another index creation/deletion operation is
                 in progress and the lock cannot be acquired
         """
-        return self.batch_create_indexes([marqo_index_request])[0]
+        schema, marqo_index = self._generate_schema(marqo_index_request)
+        return self._index_operations.submit(_CreateIndex(schema, marqo_index))
 
     def batch_create_indexes(self, marqo_index_requests: List[MarqoIndexRequest]) -> List[MarqoIndex]:
         """
@@ -143,25 +169,31 @@ class IndexManagement:
             OperationConflictError: If another index creation/deletion operation is
                 in progress and the lock cannot be acquired
         """
-        index_to_create: List[Tuple[str, MarqoIndex]] = []
-        for request in marqo_index_requests:
-            # set the default prefixes if not provided
-            if request.model.text_query_prefix is None:
-                request.model.text_query_prefix = request.model.get_default_text_query_prefix()
-            if request.model.text_chunk_prefix is None:
-                request.model.text_chunk_prefix = request.model.get_default_text_chunk_prefix()
-
-            index_to_create.append(vespa_schema_factory(request).generate_schema())
+        index_to_create: List[Tuple[str, MarqoIndex]] = [
+            self._generate_schema(request) for request in marqo_index_requests
+        ]
 
         with self._vespa_deployment_lock():
             self._get_vespa_application().batch_add_index_setting_and_schema(index_to_create)
 
         return [index for _, index in index_to_create]
 
+    def _generate_schema(self, marqo_index_request: MarqoIndexRequest) -> Tuple[str, MarqoIndex]:
+        # set the default prefixes if not provided
+        if marqo_index_request.model.text_query_prefix is None:
+            marqo_index_request.model.text_query_prefix = marqo_index_request.model.get_default_text_query_prefix()
+        if marqo_index_request.model.text_chunk_prefix is None:
+            marqo_index_request.model.text_chunk_prefix = marqo_index_request.model.get_default_text_chunk_prefix()
+
+        return vespa_schema_factory(marqo_index_request).generate_schema()
+
     def delete_index_by_name(self, index_name: str) -> None:
         """
         Delete a Marqo index by name, in a thread-safe manner.
 
+        Index creations and deletions that run concurrently on this instance are applied in a single Vespa deployment,
+        except that an index deleted and created again is created in a later deployment.
+
         Args:
             index_name: Name of Marqo index to delete
         Raises:
@@ -170,7 +202,7 @@ class IndexManagement:
             OperationConflictError: If another index creation/deletion operation is
                 in progress and the lock cannot be acquired
         """
-        self.batch_delete_indexes_by_name([index_name])
+        self._index_operations.submit(_DeleteIndex(index_name))
 
     def batch_delete_indexes_by_name(self, index_names: List[str]) -> None:
         """
@@ -186,6 +218,58 @@ class IndexManagement:
         with self._vespa_deployment_lock():
             self._get_vespa_application().batch_delete_index_setting_and_schema(index_names)
 
+    def _apply_index_operations(self, pending_operations: List[PendingOperation]) -> None:
+        """
+        Apply a batch of index creations and deletions, in the order they were submitted, in as few Vespa deployments
+        as possible. An operation that cannot be applied, e.g. the creation of an index that exists, fails without
+        affecting the others.
+        """
+        with self._vespa_deployment_lock():
+            while pending_operations:
+                pending_operations = self._deploy_index_operations(pending_operations)
+
+    def _deploy_index_operations(self, pending_operations: List[PendingOperation]) -> List[PendingOperation]:
+        """
+        Apply index creations and deletions, in order, in one Vespa deployment. Stops at the creation of an index
+        deleted earlier in the same deployment, since the deployed application would still contain the schema of the
+        deleted index and its documents would be kept for the new one.
+
+        Returns:
+            The operations that were not applied, starting with the creation that ended the deployment
+        """
+        vespa_app = self._get_vespa_application()
+
+        applied = []
+        deleted_index_names = set()
+        remaining = []
+        for i, pending_operation in enumerate(pending_operations):
+            operation = pending_operation.operation
+            if isinstance(operation, _CreateIndex) and operation.marqo_index.name in deleted_index_names:
+                remaining = pending_operations[i:]
+                break
+            try:
+                if isinstance(operation, _CreateIndex):
+                    vespa_app.add_index_setting_and_schema(operation.schema, operation.marqo_index)
+                else:
+                    vespa_app.delete_index_setting_and_schema(operation.index_name)
+                    deleted_index_names.add(operation.index_name)
+            except (IndexExistsError, IndexNotFoundError, OperationConflictError) as e:
+                pending_operation.future.set_exception(e)
+            else:
+                applied.append(pending_operation)
+
+        if applied:
+            logger.info(f'Deploying {len(applied)} index creations and deletions')
+            vespa_app.deploy_index_changes(has_deletions=bool(deleted_index_names))
+
+        for pending_operation in applied:
+            operation = pending_operation.operation
+            pending_operation.future.set_result(
+                operation.marqo_index if isinstance(operation, _CreateIndex) else None
+            )
+
+        return remaining
+
     def update_index(self, marqo_index: SemiStructuredMarqoIndex) -> None:
         """
         Update index settings and schema
@@ -206,6 +290,27 @@ class IndexManagement:
             schema = SemiStructuredVespaSchema.generate_vespa_schema(marqo_index)
             self._get_vespa_application().update_index_setting_and_schema(marqo_index, schema)
 
+    def add_fields_to_index(self, index_name: str, lexical_fields: List[Field], tensor_fields: List[TensorField],
+                            max_lexical_field_count: int, max_tensor_field_count: int) -> None:
+        """
+        Add fields to a semi-structured index. Fields added by concurrent calls on this instance are coalesced into
+        one index update, see SchemaEvolutionCoordinator.
+
+        Args:
+            index_name: Name of the index to update
+            lexical_fields: Lexical fields to add. Fields the index already has are skipped
+            tensor_fields: Tensor fields to add. Fields the index already has are skipped
+            max_lexical_field_count: Maximum number of lexical fields the index can have
+            max_tensor_field_count: Maximum number of tensor fields the index can have
+        Raises:
+            IndexNotFoundError: If the index does not exist
+            TooManyFieldsError: If the index would have more fields than allowed
+            InternalError: If the index is not a SemiStructuredMarqoIndex
+            OperationConflictError: If the deployment lock cannot be acquired, or another instance updated the index
+        """
+        self._schema_evolution.add_fields(index_name, lexical_fields, tensor_fields,
+                                          max_lexical_field_count, max_tensor_field_count)
+
     def _get_existing_indexes(self) -> List[MarqoIndex]:
         """
         Get all Marqo indexes storing in _MARQO_SETTINGS_SCHEMA_NAME schema (used prior to Marqo v2.13.0).
@@ -249,6 +354,67 @@ class IndexManagement:
             raise IndexNotFoundError(f"Index {index_name} not found")
         return index
 
+    def get_index_if_modified(self, index_name: str, etag: Optional[str]) -> Tuple[Optional[MarqoIndex], Optional[str]]:
+        """
+        Get a Marqo index by name, unless its settings have not changed since they were fetched with the given ETag.
+
+        Args:
+            index_name: Name of Marqo index to get
+            etag: ETag returned with the settings the caller already has, or None to always get the index
+
+        Returns:
+            A tuple of the index, or None if its settings have not changed, and the ETag of its current settings. The
+            ETag is None if the Vespa application does not support conditional requests
+
+        Raises:
+            IndexNotFoundError: If the index does not exist
+        """
+        response = self.vespa_client.get_index_setting_json_by_name(index_name, etag)
+        if response.not_modified:
+            return None, response.etag
+        if response.settings is None:
+            raise IndexNotFoundError(f"Index {index_name} not found")
+        return MarqoIndex.parse_obj(response.settings), response.etag
+
+    def get_all_indexes_if_modified(self, etag: Optional[str], known_indexes: Optional[Dict[str, MarqoIndex]] = None
+                                    ) -> Tuple[Optional[List[MarqoIndex]], Optional[str]]:
+        """
+        Get all Marqo indexes, unless no index settings have changed since they were fetched with the given ETag.
+
+        Settings of an index in `known_indexes` with the same creation time and version are not parsed again, the
+        known index is returned instead. Every settings update increments the version of an index.
+
+        Args:
+            etag: ETag returned with the settings the caller already has, or None to always get the indexes
+            known_indexes: Indexes the caller already has, by name
+
+        Returns:
+            A tuple of the indexes, or None if no settings have changed, and the ETag of the current settings
+        """
+        response = self.vespa_client.get_all_index_settings_json(etag)
+        if response.not_modified:
+            return None, response.etag
+
+        known_indexes = known_indexes or dict()
+        indexes = []
+        for settings in response.settings:
+            known_index = known_indexes.get(settings.get('name'))
+            if known_index is not None and self._is_same_index_version(known_index, settings):
+                indexes.append(known_index)
+            else:
+                indexes.append(MarqoIndex.parse_obj(settings))
+
+        return indexes, response.etag
+
+    @staticmethod
+    def _is_same_index_version(index: MarqoIndex, settings: Dict[str, Any]) -> bool:
+        # Settings saved by older Marqo versions have no version, so changes to them cannot be detected
+        return (
+                index.version is not None and
+                index.version == settings.get('version') and
+                index.created_at == settings.get('created_at')
+        )
+
     def get_marqo_version(self) -> str:
         """
         This method is only used during legacy upgrade and rollback process. Please note that this will create a
@@ -306,7 +472,8 @@ class IndexManagement:
             application_package_store = ApplicationPackageDeploymentSessionStore(
                 vespa_client=self.vespa_client,
                 deploy_timeout=self._deployment_timeout_seconds,
-                wait_for_convergence_timeout=self._convergence_timeout_seconds
+                wait_for_convergence_timeout=self._convergence_timeout_seconds,
+                content_cache=self._application_content_cache
             )
 
         application = VespaApplicationPackage(application_package_store)
@@ -0,0 +1,114 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class PendingOperation:
+    """An operation waiting to be processed, and the future its caller waits on."""
+    __slots__ = ('operation', 'future')
+
+    def __init__(self, operation: Any):
+        self.operation = operation
+        self.future = Future()
+
+
+class _Batches:
+    """The batch being collected for a key, and the lock held while a batch of the key is processed."""
+    __slots__ = ('pending', 'process_lock', 'leaders')
+
+    def __init__(self):
+        self.pending: Optional[List[PendingOperation]] = None
+        self.process_lock = threading.Lock()
+        # Threads that started a batch of the key that is not processed yet. At most two: one processing a batch and
+        # one waiting for it to finish
+        self.leaders = 0
+
+
+class OperationCoalescer:
+    """
+    Batches operations submitted concurrently from different threads, so that they are processed together.
+
+    Operations are batched per key, and batches of different keys are processed independently. The first operation
+    submitted for a key starts a batch. Its thread waits until no batch of the key is being processed, then for
+    `batch_window_seconds` so that more operations can join, and then processes the batch with `process`, which must
+    resolve the future of every operation. Operations submitted while a batch is being processed join the next batch.
+    Each caller gets the result or the error of its own operation.
+
+    The state of a key is dropped once it has no batch pending or being processed, so keys that are no longer used,
+    e.g. the names of deleted indexes, do not accumulate.
+    """
+
+    def __init__(self, process: Callable[[List[PendingOperation]], None], batch_window_seconds: float = 0,
+                 on_coalesced: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            process: Processes a batch of operations of one key, setting the result or exception of each operation's
+                future. If it raises, the error is set on every operation it did not resolve
+            batch_window_seconds: How long the first operation of a batch waits for others to join it
+            on_coalesced: Called in the thread of every operation that joins a batch started by another operation
+        """
+        self._process = process
+        self.batch_window_seconds = batch_window_seconds
+        self._on_coalesced = on_coalesced
+
+        self._lock = threading.Lock()
+        self._batches: Dict[Hashable, _Batches] = dict()
+
+    def submit(self, operation: Any, key: Hashable = None) -> Any:
+        """
+        Submit an operation and wait until it is processed.
+
+        Args:
+            operation: The operation
+            key: Only operations with the same key are batched together
+
+        Returns:
+            The result of the operation
+
+        Raises:
+            The error of the operation, or of processing its batch
+        """
+        pending_operation = PendingOperation(operation)
+
+        with self._lock:
+            batches = self._batches.get(key)
+            if batches is None:
+                batches = self._batches[key] = _Batches()
+            is_leader = batches.pending is None
+            if is_leader:
+                batches.pending = []
+                batches.leaders += 1
+            batches.pending.append(pending_operation)
+
+        if is_leader:
+            try:
+                with batches.process_lock:
+                    if self.batch_window_seconds > 0:
+                        time.sleep(self.batch_window_seconds)
+                    with self._lock:
+                        batch, batches.pending = batches.pending, None
+                    self._process_batch(batch)
+            finally:
+                with self._lock:
+                    batches.leaders -= 1
+                    if batches.leaders == 0:
+                        del self._batches[key]
+        elif self._on_coalesced is not None:
+            self._on_coalesced()
+
+        return pending_operation.future.result()
+
+    def pending_count(self, key: Hashable = None) -> int:
+        """The number of operations of a key waiting for a batch to start processing."""
+        with self._lock:
+            batches = self._batches.get(key)
+            return len(batches.pending) if batches is not None and batches.pending is not None else 0
+
+    def _process_batch(self, batch: List[PendingOperation]) -> None:
+        try:
+            self._process(batch)
+        except Exception as e:
+            for pending_operation in batch:
+                if not pending_operation.future.done():
+                    pending_operation.future.set_exception(e)
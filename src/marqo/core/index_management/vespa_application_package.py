@@ -1,11 +1,13 @@
+import hashlib
 import json
 import os
 import io
 import tarfile
 import tempfile
 import textwrap
+import threading
 from abc import ABC, abstractmethod
-from typing import Optional, List, Union, Tuple, Generator, Dict
+from typing import Optional, List, Union, Tuple, Generator, Dict, Set
 
 import semver
 from datetime import datetime
@@ -476,31 +478,119 @@ class VespaApplicationFileStore(VespaApplicationStore):
         self._vespa_client.wait_for_application_convergence(timeout=self._wait_for_convergence_timeout)
 
 
+class ApplicationContentCache:
+    """
+    A content-addressed mirror of the files of the active Vespa application package, kept between deployment sessions.
+
+    Every index operation creates a deployment session, which starts as a copy of the active application package.
+    Rather than reading the same files from each new session, a session reads them from the cache if the active
+    application is still at the generation the cache was taken at. Files are kept with their SHA-256 digest, so that
+    saving a file with the same content as the active one does not upload it again. The cache is only advanced to a
+    new generation once a session that went through it is activated, so a failed deployment leaves it untouched.
+
+    Files larger than `max_file_size` are tracked by digest only, and are read from the session when needed.
+    """
+    _DEFAULT_MAX_FILE_SIZE = 16 * 1024 * 1024
+
+    def __init__(self, max_file_size: int = _DEFAULT_MAX_FILE_SIZE):
+        self._max_file_size = max_file_size
+        self._lock = threading.Lock()
+        self._generation: Optional[int] = None
+        self._contents: Set[str] = set()
+        self._files: Dict[str, Tuple[str, Optional[bytes]]] = dict()
+
+    @staticmethod
+    def digest(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    def snapshot(self, generation: int) -> Optional[Tuple[Set[str], Dict[str, Tuple[str, Optional[bytes]]]]]:
+        """
+        Returns:
+            A copy of the content listing and files of the application at `generation`, or None if the cache is not at
+            that generation
+        """
+        with self._lock:
+            if self._generation is None or self._generation != generation:
+                return None
+            return set(self._contents), dict(self._files)
+
+    def update(self, generation: int, contents: Set[str], files: Dict[str, Tuple[str, Optional[bytes]]]) -> None:
+        """
+        Replace the cache with the content listing and files of the application at `generation`.
+        """
+        files = {
+            path: (digest, content if content is not None and len(content) <= self._max_file_size else None)
+            for path, (digest, content) in files.items()
+        }
+        with self._lock:
+            self._generation = generation
+            self._contents = set(contents)
+            self._files = files
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation = None
+            self._contents = set()
+            self._files = dict()
+
+
 class ApplicationPackageDeploymentSessionStore(VespaApplicationStore):
     """
     This implementation handles the deployment of a Vespa application package in the same deployment session.
     This is a preferred solution since it leverages the optimistic locking mechanism to avoid race conditions.
     See https://docs.vespa.ai/en/reference/deploy-rest-api-v2.html#create-session for more details.
     However, this approach does not support binary files for Vespa version prior to 8.382.22.
+
+    If a content cache is provided, files of the active application are read from it rather than from the session, and
+    files saved with unchanged content are not uploaded. The cache is used only if the active application generation is
+    the same before and after the session is created, so the session is known to be a copy of the cached generation.
     """
-    def __init__(self, vespa_client: VespaClient, deploy_timeout: int, wait_for_convergence_timeout: int):
+    def __init__(self, vespa_client: VespaClient, deploy_timeout: int, wait_for_convergence_timeout: int,
+                 content_cache: Optional[ApplicationContentCache] = None):
         super().__init__(vespa_client, deploy_timeout, wait_for_convergence_timeout)
-        self._content_base_url, self._prepare_url = vespa_client.create_deployment_session()
-        self._all_contents = vespa_client.list_contents(self._content_base_url)
+        self._content_cache = content_cache
+
+        generation = vespa_client.get_application_wanted_generation() if content_cache is not None else None
+        self._session_id, self._content_base_url, self._prepare_url = \
+            vespa_client.create_deployment_session_with_id()
+
+        snapshot = None
+        if content_cache is not None and vespa_client.get_application_wanted_generation() == generation:
+            snapshot = content_cache.snapshot(generation)
+
+        # Relative paths of the contents of this session, and the digest and content of the files known to be in it
+        self._files: Dict[str, Tuple[str, Optional[bytes]]]
+        if snapshot is not None:
+            self._all_contents, self._files = snapshot
+        else:
+            self._all_contents = {
+                content_url[len(self._content_base_url):]
+                for content_url in vespa_client.list_contents(self._content_base_url)
+                if content_url.startswith(self._content_base_url)
+            }
+            self._files = dict()
+
+    @staticmethod
+    def _relative_path(*paths: str) -> str:
+        return '/'.join(paths)
 
     def file_exists(self, *paths: str) -> bool:
-        content_url = self._vespa_client.get_content_url(self._content_base_url, *paths)
-        return content_url in self._all_contents
+        return self._relative_path(*paths) in self._all_contents
 
     def read_text_file(self, *paths: str) -> Optional[str]:
-        if not self.file_exists(*paths):
-            return None
-        return self._vespa_client.get_text_content(self._content_base_url, *paths)
+        content = self.read_binary_file(*paths)
+        return content.decode('utf-8') if content is not None else None
 
     def read_binary_file(self, *paths: str) -> Optional[bytes]:
         if not self.file_exists(*paths):
             return None
-        return self._vespa_client.get_binary_content(self._content_base_url, *paths)
+
+        path = self._relative_path(*paths)
+        _, content = self._files.get(path, (None, None))
+        if content is None:
+            content = self._vespa_client.get_binary_content(self._content_base_url, *paths)
+            self._files[path] = (ApplicationContentCache.digest(content), content)
+        return content
 
     def save_file(self, content: Union[str, bytes], *paths: str, backup: Optional[VespaAppBackup] = None) -> None:
         if backup is not None:
@@ -509,7 +599,16 @@ class ApplicationPackageDeploymentSessionStore(VespaApplicationStore):
             else:
                 backup.mark_for_removal(*paths)
 
+        path = self._relative_path(*paths)
+        binary_content = content.encode('utf-8') if isinstance(content, str) else content
+        digest = ApplicationContentCache.digest(binary_content)
+        if self.file_exists(*paths) and path in self._files and self._files[path][0] == digest:
+            logger.debug(f'{path} is unchanged in application package, skipping upload')
+            return
+
         self._vespa_client.put_content(self._content_base_url, content, *paths)
+        self._all_contents.add(path)
+        self._files[path] = (digest, binary_content)
 
     def remove_file(self, *paths: str, backup: Optional[VespaAppBackup] = None) -> None:
         if self.file_exists(*paths):
@@ -517,11 +616,26 @@ class ApplicationPackageDeploymentSessionStore(VespaApplicationStore):
                 backup.backup_file(self.read_binary_file(*paths), *paths)
             self._vespa_client.delete_content(self._content_base_url, *paths)
 
+            path = self._relative_path(*paths)
+            self._all_contents.discard(path)
+            self._files.pop(path, None)
+
     def deploy_application(self) -> None:
-        prepare_response = self._vespa_client.prepare(self._prepare_url, timeout=self._deploy_timeout)
-        # TODO handle prepare configChangeActions
-        # https://docs.vespa.ai/en/reference/deploy-rest-api-v2.html#prepare-session
-        self._vespa_client.activate(prepare_response['activate'], timeout=self._deploy_timeout)
+        try:
+            prepare_response = self._vespa_client.prepare(self._prepare_url, timeout=self._deploy_timeout)
+            # TODO handle prepare configChangeActions
+            # https://docs.vespa.ai/en/reference/deploy-rest-api-v2.html#prepare-session
+            self._vespa_client.activate(prepare_response['activate'], timeout=self._deploy_timeout)
+        except Exception:
+            # Whether the session was activated is unknown, so the cache can no longer be trusted
+            if self._content_cache is not None:
+                self._content_cache.invalidate()
+            raise
+
+        if self._content_cache is not None:
+            # The activated session becomes the application generation
+            self._content_cache.update(self._session_id, self._all_contents, self._files)
+
         self._vespa_client.wait_for_application_convergence(timeout=self._wait_for_convergence_timeout)
 
 
@@ -655,27 +769,53 @@ class VespaApplicationPackage:
 
     def batch_add_index_setting_and_schema(self, indexes: List[Tuple[str, MarqoIndex]]) -> None:
         for schema, index in indexes:
-            if self.has_index(index.name):
-                raise IndexExistsError(f"Index {index.name} already exists")
+            self.add_index_setting_and_schema(schema, index)
 
-            self._index_setting_store.save_index_setting(index)
-            self._store.save_file(schema, 'schemas', f'{index.schema_name}.sd')
-            self._service_xml.add_schema(index.schema_name)
-
-        self._persist_index_settings()
-        self._store.save_file(self._service_xml.to_xml(), self._SERVICES_XML_FILE)
-        self._deploy()
+        self.deploy_index_changes(has_deletions=False)
 
     def batch_delete_index_setting_and_schema(self, index_names: List[str]) -> None:
         for name in index_names:
-            index = self._index_setting_store.get_index(name)
-            if index is None:
-                raise IndexNotFoundError(f"Index {name} not found")
-            self._index_setting_store.delete_index_setting(index.name)
-            self._store.remove_file('schemas', f'{index.schema_name}.sd')
-            self._service_xml.remove_schema(index.schema_name)
-
-        self._add_schema_removal_override()
+            self.delete_index_setting_and_schema(name)
+
+        self.deploy_index_changes(has_deletions=True)
+
+    def add_index_setting_and_schema(self, schema: str, index: MarqoIndex) -> None:
+        """
+        Add an index to the application package, without deploying it. See deploy_index_changes.
+
+        Raises:
+            IndexExistsError: If the index already exists. The application package is not changed then
+        """
+        if self.has_index(index.name):
+            raise IndexExistsError(f"Index {index.name} already exists")
+
+        self._index_setting_store.save_index_setting(index)
+        self._store.save_file(schema, 'schemas', f'{index.schema_name}.sd')
+        self._service_xml.add_schema(index.schema_name)
+
+    def delete_index_setting_and_schema(self, name: str) -> None:
+        """
+        Remove an index from the application package, without deploying it. See deploy_index_changes.
+
+        Raises:
+            IndexNotFoundError: If the index does not exist. The application package is not changed then
+        """
+        index = self._index_setting_store.get_index(name)
+        if index is None:
+            raise IndexNotFoundError(f"Index {name} not found")
+        self._index_setting_store.delete_index_setting(index.name)
+        self._store.remove_file('schemas', f'{index.schema_name}.sd')
+        self._service_xml.remove_schema(index.schema_name)
+
+    def deploy_index_changes(self, has_deletions: bool) -> None:
+        """
+        Deploy the indexes added and deleted with add_index_setting_and_schema and delete_index_setting_and_schema.
+
+        Args:
+            has_deletions: Whether any index was deleted, in which case schema removal is allowed
+        """
+        if has_deletions:
+            self._add_schema_removal_override()
         self._persist_index_settings()
         self._store.save_file(self._service_xml.to_xml(), self._SERVICES_XML_FILE)
         self._deploy()
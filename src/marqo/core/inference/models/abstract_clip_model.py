@@ -6,6 +6,7 @@ from marqo.core.inference.models.abstract_embedding_model import AbstractEmbeddi
 from marqo.s2_inference.types import *
 from marqo.core.inference.image_download import (_is_image, format_and_load_CLIP_images,
                                                  format_and_load_CLIP_image)
+from marqo.s2_inference.image_preprocessing import preprocess_images
 from marqo.s2_inference.logger import get_logger
 import torch
 
@@ -104,7 +105,5 @@ class AbstractCLIPModel(AbstractEmbeddingModel):
         else:
             image_input: List[Union[ImageType, Tensor]] = [format_and_load_CLIP_image(images, image_download_headers)]
 
-        image_input_processed: Tensor = torch.stack([self.preprocess(_img).to(self.device) \
-                                                         if not isinstance(_img, torch.Tensor) else _img \
-                                                     for _img in image_input])
+        image_input_processed: Tensor = preprocess_images(image_input, self.preprocess, self.device)
         return image_input_processed
\ No newline at end of file
@@ -5,6 +5,7 @@ from typing import Optional, List
 from pydantic import Field
 
 from marqo.base_model import MarqoBaseModel
+from marqo.s2_inference.models.model_runtime import ModelRuntime
 from marqo.tensor_search.models.private_models import ModelLocation, ModelAuth
 
 
@@ -45,6 +46,8 @@ class OpenCLIPModelProperties(MarqoBaseModel):
         size: The size of the image. It is optional. If provided, it will override the default size of the image.
         note: A note about the model. It is optional.
         pretrained: The name of the pretrained model. It is optional.
+        runtime: The runtime used for inference. It should be one of the values in the ModelRuntime enum. If it
+            is an ONNX runtime, the text and image towers are exported to ONNX after the model is loaded.
     """
     name: str
     type: str
@@ -59,4 +62,5 @@ class OpenCLIPModelProperties(MarqoBaseModel):
     std: Optional[List[float]] = None
     size: Optional[int] = None
     note: Optional[str] = None
-    pretrained: Optional[str] = None
\ No newline at end of file
+    pretrained: Optional[str] = None
+    runtime: ModelRuntime = ModelRuntime.Torch
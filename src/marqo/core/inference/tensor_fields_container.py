@@ -73,10 +73,18 @@ class TextChunker(Chunker):
 
 
 class ImageChunker(Chunker):
-    def __init__(self, media_repo, image_preprocessing: ImagePreProcessing, device: Optional[str]):
+    def __init__(self, media_repo, image_preprocessing: ImagePreProcessing, device: Optional[str],
+                 urls_to_chunk: Optional[List[str]] = None):
+        """
+        Arguments:
+            urls_to_chunk: the urls of the images that are going to be chunked. If a patch method is set, these are
+                chunked together in batches the first time an image is chunked, instead of one image at a time
+        """
         self.image_preprocessing = image_preprocessing
         self.device = device
         self.media_repo = media_repo
+        self._urls_to_chunk = list(dict.fromkeys(urls_to_chunk or []))
+        self._chunks_by_url: Dict[str, Tuple[List[Any], List[Any]]] = dict()
 
     def chunk(self, field_content: str, single_chunk: bool = False):
         image_method = self.image_preprocessing.patch_method
@@ -85,6 +93,12 @@ class ImageChunker(Chunker):
         if single_chunk or image_method is None:
             return [url], [image_data]
 
+        if self._urls_to_chunk:
+            self._chunk_in_batch()
+        if url in self._chunks_by_url:
+            content_chunks, text_chunks = self._chunks_by_url[url]
+            return list(text_chunks), list(content_chunks)
+
         try:
             content_chunks, text_chunks = image_processor.chunk_image(
                 image_data, device=self.device, method=image_method.value)
@@ -92,6 +106,21 @@ class ImageChunker(Chunker):
         except s2_inference_errors.S2InferenceError as e:
             raise AddDocumentsError(e.message) from e
 
+    def _chunk_in_batch(self) -> None:
+        urls = [url for url in self._urls_to_chunk
+                if url in self.media_repo and not isinstance(self.media_repo[url], Exception)]
+        self._urls_to_chunk = []
+        if not urls:
+            return
+
+        try:
+            chunks = image_processor.chunk_images([self.media_repo[url] for url in urls], device=self.device,
+                                                  method=self.image_preprocessing.patch_method.value)
+        except s2_inference_errors.S2InferenceError:
+            # Chunk the images one at a time instead, so that the error is reported for the documents it belongs to
+            return
+        self._chunks_by_url.update(zip(urls, chunks))
+
 
 class AudioVideoChunker(Chunker):
     def __init__(self, media_repo):
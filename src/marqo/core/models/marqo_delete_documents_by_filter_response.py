@@ -0,0 +1,12 @@
+from typing import Optional
+
+from pydantic import Field
+
+from marqo.base_model import MarqoBaseModel
+
+
+class MarqoDeleteDocumentsByFilterResponse(MarqoBaseModel):
+    deleted_count: int = Field(alias='deletedCount')
+    # Resumes the deletion in another request if it did not finish within the time budget
+    continuation: Optional[str] = None
+    done: bool
@@ -0,0 +1,26 @@
+from typing import Any, List, Optional
+
+from pydantic import Field
+
+from marqo.base_model import MarqoBaseModel
+
+
+class MarqoImportDocumentsFailure(MarqoBaseModel):
+    """A document that could not be imported."""
+    # 1-based position of the record in the imported file
+    record: Optional[int] = None
+    # This id can be any type as it might be used to hold an invalid id
+    id: Any = Field(alias='_id', default=None)
+    status: int
+    message: str
+    code: Optional[str] = None
+
+
+class MarqoImportDocumentsResponse(MarqoBaseModel):
+    errors: bool
+    received_count: int = Field(alias='receivedCount')
+    imported_count: int = Field(alias='importedCount')
+    failed_count: int = Field(alias='failedCount')
+    # The first failures, up to a limit, since an import can have millions of records
+    failures: List[MarqoImportDocumentsFailure]
+    processing_time_ms: float = Field(alias='processingTimeMs')
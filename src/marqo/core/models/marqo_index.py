@@ -265,6 +265,7 @@ class MarqoIndex(ImmutableBaseModel, ABC):
     distance_metric: DistanceMetric
     vector_numeric_type: VectorNumericType
     hnsw_config: HnswConfig
+    store_centroids: bool = False  # store a centroid vector per document and tensor field
     marqo_version: str
     created_at: int = pydantic.Field(gt=0)
     updated_at: int = pydantic.Field(gt=0)
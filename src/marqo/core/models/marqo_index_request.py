@@ -29,6 +29,7 @@ class MarqoIndexRequest(ImmutableStrictBaseModel, ABC):
     distance_metric: marqo_index.DistanceMetric
     vector_numeric_type: marqo_index.VectorNumericType
     hnsw_config: marqo_index.HnswConfig
+    store_centroids: bool = False
     marqo_version: str
     created_at: int
     updated_at: int
@@ -0,0 +1,116 @@
+"""A sampling CPU profiler of the Python threads of this process.
+
+Every interval seconds, the current frame of every thread is read with sys._current_frames() and its stack is
+counted. Nothing is installed in the profiled threads, so the overhead stays on the sampling thread and is the same
+whether or not the sampled code is hot. The result is in the collapsed stack format read by flamegraph.pl, speedscope
+and most other flame graph tools: one line per distinct stack, root frame first, followed by its sample count.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Dict
+
+from marqo.core.exceptions import OperationConflictError
+from marqo.exceptions import InvalidArgumentError
+
+MAX_DURATION_SECONDS = 60
+MIN_INTERVAL_SECONDS = 0.001
+
+# Leaf frames of threads that are blocked waiting for work, e.g. idle request threadpool threads. Excluded unless
+# include_idle is set, as they would otherwise dominate the profile
+_IDLE_LEAF_FRAMES = frozenset([
+    ('threading.py', 'wait'),
+    ('queue.py', 'get'),
+    ('selectors.py', 'select'),
+    ('connection.py', 'wait'),
+    ('thread.py', '_worker'),
+])
+
+_profile_lock = threading.Lock()
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def _is_idle(frame: FrameType) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_LEAF_FRAMES
+
+
+def _collapse(frame: FrameType, thread_name: str, cache: Dict[CodeType, str]) -> str:
+    labels = []
+    while frame is not None:
+        label = cache.get(frame.f_code)
+        if label is None:
+            label = _frame_label(frame)
+            cache[frame.f_code] = label
+        labels.append(label)
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ';'.join(reversed(labels))
+
+
+def sample_stacks(duration: float, interval: float = 0.01, include_idle: bool = False) -> Counter:
+    """
+    Sample the stacks of all other threads of this process for duration seconds.
+
+    Args:
+        duration: Seconds to sample for, at most MAX_DURATION_SECONDS
+        interval: Seconds between samples, at least MIN_INTERVAL_SECONDS
+        include_idle: Whether to count threads blocked waiting for work
+
+    Returns:
+        A Counter of collapsed stacks (thread name, then frames from the root, separated by ';') to sample counts
+
+    Raises:
+        InvalidArgumentError: If duration or interval is out of range
+        OperationConflictError: If a profile is already running
+    """
+    if not 0 < duration <= MAX_DURATION_SECONDS:
+        raise InvalidArgumentError(f'Profile duration must be greater than 0 and at most {MAX_DURATION_SECONDS} '
+                                   f'seconds. Got {duration}')
+    if interval < MIN_INTERVAL_SECONDS or interval > duration:
+        raise InvalidArgumentError(f'Profile sampling interval must be at least {MIN_INTERVAL_SECONDS} seconds and '
+                                   f'at most the duration. Got {interval}')
+
+    if not _profile_lock.acquire(blocking=False):
+        raise OperationConflictError('A profile is already running. Try again once it completes')
+
+    try:
+        own_thread_id = threading.get_ident()
+        stacks = Counter()
+        label_cache: Dict[CodeType, str] = dict()
+        deadline = time.monotonic() + duration
+        next_sample = time.monotonic()
+        while next_sample < deadline:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread_id or (not include_idle and _is_idle(frame)):
+                    continue
+                thread_name = thread_names.get(thread_id, f'thread-{thread_id}')
+                stacks[_collapse(frame, thread_name, label_cache)] += 1
+
+            next_sample += interval
+            sleep_time = next_sample - time.monotonic()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                # Sampling is slower than the interval. Skip the missed samples rather than catching up
+                next_sample = time.monotonic()
+        return stacks
+    finally:
+        _profile_lock.release()
+
+
+def to_collapsed(stacks: Counter) -> str:
+    """Format stacks as collapsed stack lines, most sampled first."""
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+def get_cpu_profile(duration: float, interval: float = 0.01, include_idle: bool = False) -> str:
+    """Sample the stacks of all threads for duration seconds and return them in the collapsed stack format."""
+    return to_collapsed(sample_stacks(duration, interval=interval, include_idle=include_idle))
@@ -1,15 +1,47 @@
+import threading
+import time
 import tracemalloc
+from typing import Optional
 
 from memory_profiler import memory_usage
 
+from marqo.core.exceptions import OperationConflictError
 from marqo.core.models.memory_profile import MemoryProfile
+from marqo.exceptions import InvalidArgumentError
 
+MAX_DIFF_SECONDS = 300
 
-def get_memory_profile() -> MemoryProfile:
-    tracemalloc.start()
+_diff_lock = threading.Lock()
 
-    snapshot = tracemalloc.take_snapshot()
-    stats = snapshot.statistics('lineno')
+
+def get_memory_profile(diff_seconds: Optional[float] = None, limit: Optional[int] = None) -> MemoryProfile:
+    """
+    Get the memory used by this process and its allocations by line.
+
+    Without diff_seconds, the stats are of a snapshot of the allocations traced so far, which are only those made
+    since tracing started (with this call, unless PYTHONTRACEMALLOC is set). With diff_seconds, tracing is started if
+    needed and the stats are the difference between snapshots taken diff_seconds apart, largest change first, which
+    shows the lines allocating memory that is not freed within the window.
+
+    Args:
+        diff_seconds: Window, in seconds, to compare allocations across
+        limit: Maximum number of stats to return
+
+    Raises:
+        InvalidArgumentError: If diff_seconds or limit is out of range
+        OperationConflictError: If a diff is already running
+    """
+    if limit is not None and limit < 1:
+        raise InvalidArgumentError(f'limit must be at least 1. Got {limit}')
+
+    if diff_seconds is None:
+        tracemalloc.start()
+        stats = tracemalloc.take_snapshot().statistics('lineno')
+    else:
+        stats = _get_allocation_diff(diff_seconds)
+
+    if limit is not None:
+        stats = stats[:limit]
 
     # Get mem used
     mem_used = memory_usage(-1, interval=0.1, timeout=1)
@@ -18,3 +50,30 @@ def get_memory_profile() -> MemoryProfile:
         memory_used=mem_used[0],
         stats=[str(s) for s in stats]
     )
+
+
+def _get_allocation_diff(diff_seconds: float):
+    if not 0 < diff_seconds <= MAX_DIFF_SECONDS:
+        raise InvalidArgumentError(f'Memory diff window must be greater than 0 and at most {MAX_DIFF_SECONDS} '
+                                   f'seconds. Got {diff_seconds}')
+
+    if not _diff_lock.acquire(blocking=False):
+        raise OperationConflictError('A memory diff is already running. Try again once it completes')
+
+    # Tracing slows down every allocation, so it is stopped again if this call started it
+    started_tracing = not tracemalloc.is_tracing()
+    try:
+        if started_tracing:
+            tracemalloc.start()
+        # Allocations made by tracemalloc itself are not of interest
+        snapshot_filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+        before = tracemalloc.take_snapshot().filter_traces(snapshot_filters)
+        time.sleep(diff_seconds)
+        after = tracemalloc.take_snapshot().filter_traces(snapshot_filters)
+
+        return after.compare_to(before, 'lineno')
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _diff_lock.release()
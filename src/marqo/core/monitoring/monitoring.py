@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Tuple
 
 import torch
 
@@ -13,6 +13,7 @@ from marqo.core.models.marqo_index_stats import MarqoIndexStats, VespaStats
 from marqo.core.vespa_index.vespa_index import for_marqo_index as vespa_index_factory
 from marqo.exceptions import InternalError
 from marqo.vespa.exceptions import VespaError
+from marqo.vespa.models.application_metrics import ApplicationMetrics
 from marqo.vespa.vespa_client import VespaClient
 
 logger = marqo.logging.get_logger(__name__)
@@ -33,6 +34,24 @@ class Monitoring:
         Returns:
             Marqo index statistics
         """
+        number_of_documents, number_of_vectors = self.get_index_counts(marqo_index)
+
+        return MarqoIndexStats(
+            number_of_documents=number_of_documents,
+            number_of_vectors=number_of_vectors,
+            backend=self.get_backend_stats(self.vespa_client.get_metrics())
+        )
+
+    def get_index_counts(self, marqo_index: MarqoIndex) -> Tuple[int, int]:
+        """
+        Get the number of documents and the number of vectors in a Marqo index.
+
+        Args:
+            marqo_index: Marqo index to get the counts for
+
+        Returns:
+            A tuple of the number of documents and the number of vectors
+        """
         vespa_index = vespa_index_factory(marqo_index)
 
         doc_count_query_result = self.vespa_client.query(
@@ -53,8 +72,18 @@ class Monitoring:
         except (TypeError, AttributeError, IndexError) as e:
             raise InternalError(f"Failed to get the number of vectors for index {marqo_index.name}: {e}") from e
 
-        metrics = self.vespa_client.get_metrics()
+        return doc_count_query_result.total_count, number_of_vectors
+
+    def get_backend_stats(self, metrics: ApplicationMetrics) -> VespaStats:
+        """
+        Get the backend statistics from Vespa metrics.
+
+        Args:
+            metrics: Vespa metrics, as returned by VespaClient.get_metrics
 
+        Returns:
+            Vespa statistics
+        """
         memory_utilization = metrics.clusterController_resourceUsage_maxMemoryUtilization_max
         disk_utilization = metrics.clusterController_resourceUsage_maxDiskUtilization_max
 
@@ -64,13 +93,9 @@ class Monitoring:
         if disk_utilization is None:
             logger.warn(f'Vespa did not return a value for disk utilization metrics')
 
-        return MarqoIndexStats(
-            number_of_documents=doc_count_query_result.total_count,
-            number_of_vectors=number_of_vectors,
-            backend=VespaStats(
-                memory_used_percentage=memory_utilization * 100 if memory_utilization is not None else None,
-                storage_used_percentage=disk_utilization * 100 if disk_utilization is not None else None
-            )
+        return VespaStats(
+            memory_used_percentage=memory_utilization * 100 if memory_utilization is not None else None,
+            storage_used_percentage=disk_utilization * 100 if disk_utilization is not None else None
         )
 
     def get_index_stats_by_name(self, index_name: str) -> MarqoIndexStats:
@@ -99,8 +124,30 @@ class Monitoring:
             Marqo index health status
         """
         # TODO - Check index specific metrics such as memory and disk usage
+        try:
+            metrics = self.vespa_client.get_metrics()
+        except VespaError as e:
+            logger.error(f"Failed to get Vespa metrics: {e}")
+            metrics = None
+
+        return self.get_health_from_metrics(metrics, hostname_filter=hostname_filter)
+
+    def get_health_from_metrics(self, metrics: Optional[ApplicationMetrics],
+                                hostname_filter: Optional[str] = None) -> MarqoHealthStatus:
+        """
+        Get health status from Vespa metrics.
+
+        Args:
+            metrics: Vespa metrics, as returned by VespaClient.get_metrics. None if the metrics could not be retrieved,
+            in which case the backend is unhealthy
+            hostname_filter: Optional hostname filter. If provided, only Vespa nodes with this value in their hostname
+            will be considered in the health check
+
+        Returns:
+            Marqo health status
+        """
         inference_status = self._get_inference_health()
-        vespa_status = self._get_vespa_health(hostname_filter=hostname_filter)
+        vespa_status = self._get_vespa_health(metrics, hostname_filter=hostname_filter)
 
         aggregated_status = max(inference_status.status, vespa_status.status)
 
@@ -113,11 +160,9 @@ class Monitoring:
     def _get_inference_health(self) -> InferenceHealthStatus:
         return InferenceHealthStatus(status=HealthStatus.Green)
 
-    def _get_vespa_health(self, hostname_filter: Optional[str]) -> VespaHealthStatus:
-        try:
-            metrics = self.vespa_client.get_metrics()
-        except VespaError as e:
-            logger.error(f"Failed to get Vespa metrics: {e}")
+    def _get_vespa_health(self, metrics: Optional[ApplicationMetrics],
+                          hostname_filter: Optional[str]) -> VespaHealthStatus:
+        if metrics is None:
             return VespaHealthStatus(status=HealthStatus.Red)
 
         # Check service status
@@ -0,0 +1,232 @@
+"""A cache of the Vespa metrics and per-index counts behind the index stats and health endpoints.
+
+Load balancers and dashboards poll these endpoints every few seconds on every Marqo instance. Without caching, each
+stats call runs a document count query, a grouping query over all the vectors of the index and a full metrics fetch,
+and each health call a full metrics fetch. With caching, a background thread refreshes the metrics and the counts of
+recently requested indexes every refresh_interval seconds, and calls are answered from the cache.
+
+A cached value is never returned once it is older than max_staleness seconds; it is fetched synchronously instead, so
+a dead refresh thread or an unreachable Vespa cannot hide behind a stale value for longer than that.
+"""
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+import marqo.logging
+from marqo.core.models import MarqoIndex
+from marqo.core.models.marqo_index_health import MarqoHealthStatus
+from marqo.core.models.marqo_index_stats import MarqoIndexStats
+from marqo.core.monitoring.monitoring import Monitoring
+from marqo.vespa.exceptions import VespaError
+
+logger = marqo.logging.get_logger(__name__)
+
+
+class CachedValue(NamedTuple):
+    value: Any
+    as_of: float  # seconds since the epoch at which the value was read from Vespa
+
+
+class _IndexCountsEntry:
+    def __init__(self, marqo_index: MarqoIndex, counts: CachedValue, last_requested: float):
+        self.marqo_index = marqo_index
+        self.counts = counts
+        self.last_requested = last_requested
+
+
+class MonitoringCache:
+    """
+    Serves index stats and health from cached Vespa metrics and index counts, refreshed in the background.
+
+    Args:
+        monitoring: Monitoring object used to read metrics and counts from Vespa
+        max_staleness: Maximum age, in seconds, of a returned value. 0 disables caching
+        refresh_interval: Interval, in seconds, between background refreshes
+        idle_timeout: Values not requested for this many seconds are no longer refreshed in the background
+    """
+
+    def __init__(self, monitoring: Monitoring, max_staleness: float, refresh_interval: float,
+                 idle_timeout: float = 300):
+        self.monitoring = monitoring
+        self.max_staleness = max_staleness
+        self.refresh_interval = refresh_interval
+        self.idle_timeout = idle_timeout
+
+        self._metrics: Optional[CachedValue] = None
+        self._metrics_last_requested: float = 0
+        self._index_counts: Dict[str, _IndexCountsEntry] = dict()
+        self._lock = threading.Lock()
+
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._refresh_thread_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_staleness > 0
+
+    def get_index_stats_by_name(self, index_name: str, force_refresh: bool = False) -> CachedValue:
+        """
+        Get statistics for a Marqo index.
+
+        Args:
+            index_name: Name of Marqo index to get statistics for
+            force_refresh: Read the statistics from Vespa even if cached values are fresh enough
+
+        Returns:
+            A CachedValue of MarqoIndexStats, as of the time its oldest component was read from Vespa
+        """
+        marqo_index = self.monitoring.index_management.get_index(index_name)
+        return self.get_index_stats(marqo_index, force_refresh=force_refresh)
+
+    def get_index_stats(self, marqo_index: MarqoIndex, force_refresh: bool = False) -> CachedValue:
+        """
+        Get statistics for a Marqo index.
+
+        Args:
+            marqo_index: Marqo index to get statistics for
+            force_refresh: Read the statistics from Vespa even if cached values are fresh enough
+
+        Returns:
+            A CachedValue of MarqoIndexStats, as of the time its oldest component was read from Vespa
+        """
+        counts = self._get_index_counts(marqo_index, force_refresh)
+        metrics = self._get_metrics(force_refresh)
+        number_of_documents, number_of_vectors = counts.value
+
+        stats = MarqoIndexStats(
+            number_of_documents=number_of_documents,
+            number_of_vectors=number_of_vectors,
+            backend=self.monitoring.get_backend_stats(metrics.value)
+        )
+        return CachedValue(stats, min(counts.as_of, metrics.as_of))
+
+    def get_health(self, hostname_filter: Optional[str] = None, force_refresh: bool = False) -> CachedValue:
+        """
+        Get health status.
+
+        Args:
+            hostname_filter: Optional hostname filter. If provided, only Vespa nodes with this value in their hostname
+            will be considered in the health check
+            force_refresh: Read the metrics from Vespa even if cached metrics are fresh enough
+
+        Returns:
+            A CachedValue of MarqoHealthStatus
+        """
+        try:
+            metrics = self._get_metrics(force_refresh)
+        except VespaError as e:
+            logger.error(f"Failed to get Vespa metrics: {e}")
+            return CachedValue(self.monitoring.get_health_from_metrics(None, hostname_filter), time.time())
+
+        health: MarqoHealthStatus = self.monitoring.get_health_from_metrics(metrics.value, hostname_filter)
+        return CachedValue(health, metrics.as_of)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._metrics = None
+            self._index_counts = dict()
+
+    def stop(self) -> None:
+        """Stop the background refresh thread, if running. It is started again on next use."""
+        with self._refresh_thread_lock:
+            if self._refresh_thread is not None:
+                self._stop_event.set()
+                self._refresh_thread.join()
+                self._refresh_thread = None
+                self._stop_event.clear()
+
+    def _is_fresh(self, cached: Optional[CachedValue], now: float) -> bool:
+        return self.enabled and cached is not None and now - cached.as_of <= self.max_staleness
+
+    def _get_metrics(self, force_refresh: bool) -> CachedValue:
+        now = time.time()
+        with self._lock:
+            self._metrics_last_requested = now
+            metrics = self._metrics
+
+        if force_refresh or not self._is_fresh(metrics, now):
+            metrics = self._refresh_metrics()
+
+        self._check_refresh_thread()
+        return metrics
+
+    def _get_index_counts(self, marqo_index: MarqoIndex, force_refresh: bool) -> CachedValue:
+        now = time.time()
+        with self._lock:
+            entry = self._index_counts.get(marqo_index.name)
+            if entry is not None:
+                entry.last_requested = now
+
+        # A changed index (e.g. deleted and created again) must not be served the counts of its previous version
+        if force_refresh or entry is None or entry.marqo_index != marqo_index or not self._is_fresh(entry.counts, now):
+            counts = self._refresh_index_counts(marqo_index, last_requested=now)
+        else:
+            counts = entry.counts
+
+        self._check_refresh_thread()
+        return counts
+
+    def _refresh_metrics(self) -> CachedValue:
+        as_of = time.time()
+        metrics = CachedValue(self.monitoring.vespa_client.get_metrics(), as_of)
+        if self.enabled:
+            with self._lock:
+                if self._metrics is None or self._metrics.as_of < as_of:
+                    self._metrics = metrics
+        return metrics
+
+    def _refresh_index_counts(self, marqo_index: MarqoIndex, last_requested: Optional[float] = None) -> CachedValue:
+        as_of = time.time()
+        counts = CachedValue(self.monitoring.get_index_counts(marqo_index), as_of)
+        if self.enabled:
+            with self._lock:
+                entry = self._index_counts.get(marqo_index.name)
+                if entry is None or entry.marqo_index != marqo_index:
+                    self._index_counts[marqo_index.name] = _IndexCountsEntry(
+                        marqo_index, counts, last_requested if last_requested is not None else as_of
+                    )
+                elif entry.counts.as_of < as_of:
+                    entry.counts = counts
+        return counts
+
+    def _refresh(self) -> None:
+        """Refresh the metrics and the counts of every index requested within idle_timeout seconds."""
+        now = time.time()
+        with self._lock:
+            refresh_metrics = now - self._metrics_last_requested < self.idle_timeout
+            for index_name in [name for name, entry in self._index_counts.items()
+                               if now - entry.last_requested >= self.idle_timeout]:
+                del self._index_counts[index_name]
+            indexes = [entry.marqo_index for entry in self._index_counts.values()]
+
+        if refresh_metrics:
+            try:
+                self._refresh_metrics()
+            except Exception as e:
+                logger.warn(f'Failed to refresh cached Vespa metrics: {e}')
+
+        for marqo_index in indexes:
+            try:
+                self._refresh_index_counts(marqo_index)
+            except Exception as e:
+                # The index may have been deleted. It is cached again on its next request if it still exists
+                logger.warn(f'Failed to refresh cached counts for index {marqo_index.name}: {e}')
+                with self._lock:
+                    self._index_counts.pop(marqo_index.name, None)
+
+    def _check_refresh_thread(self) -> None:
+        if not self.enabled or self._refresh_thread_lock.locked():
+            return
+
+        with self._refresh_thread_lock:
+            if self._refresh_thread is None or not self._refresh_thread.is_alive():
+                if self._refresh_thread is not None:
+                    logger.warn('Dead monitoring cache refresh thread detected. Will start a new one')
+
+                def refresh():
+                    while not self._stop_event.wait(self.refresh_interval):
+                        self._refresh()
+
+                self._refresh_thread = threading.Thread(target=refresh, daemon=True)
+                self._refresh_thread.start()
@@ -0,0 +1,128 @@
+"""Runs the sub-queries of a hybrid search from Marqo rather than from the Vespa HybridSearcher.
+
+A hybrid Vespa query is sent to the `marqo` search chain, where the HybridSearcher (vespa/src/main/java/ai/marqo/search/
+HybridSearcher.java) splits it into a lexical and a tensor sub-query and, for the disjunction retrieval method, fuses
+their results with RRF. The functions here do the same from the hybrid Vespa query dict, so that a sub-query that does
+not depend on the query vector can be sent to Vespa before the query is vectorised. They must be kept in line with the
+HybridSearcher.
+"""
+import re
+from typing import Any, Dict, Optional
+
+from marqo.core.models.hybrid_parameters import HybridParameters, RankingMethod, RetrievalMethod
+from marqo.core.structured_vespa_index import common
+from marqo.vespa.models import QueryResult
+from marqo.vespa.models.query_result import Coverage, Root, RootFields
+
+_DOC_ID_PATTERN = re.compile(r'^index:[^\s/]+/\d+/(.+)$')
+
+_FIELDS_TO_RANK_QUERY_INPUTS = {
+    RetrievalMethod.Lexical: common.QUERY_INPUT_HYBRID_FIELDS_TO_RANK_LEXICAL,
+    RetrievalMethod.Tensor: common.QUERY_INPUT_HYBRID_FIELDS_TO_RANK_TENSOR,
+}
+
+
+def lexical_leg_is_independent(hybrid_parameters: HybridParameters) -> bool:
+    """
+    Whether the lexical sub-query of a hybrid search can run without the query vector, i.e. it retrieves and ranks
+    lexically, and it is all or half of the search.
+    """
+    return (
+            (hybrid_parameters.retrievalMethod == RetrievalMethod.Disjunction and
+             hybrid_parameters.rankingMethod == RankingMethod.RRF) or
+            (hybrid_parameters.retrievalMethod == RetrievalMethod.Lexical and
+             hybrid_parameters.rankingMethod == RankingMethod.Lexical)
+    )
+
+
+def to_vespa_sub_query(hybrid_query: Dict[str, Any], retrieval_method: str, ranking_method: str) -> Dict[str, Any]:
+    """
+    Create the sub-query the HybridSearcher would run for a retrieval and ranking method from a hybrid Vespa query.
+
+    Args:
+        hybrid_query: A hybrid query, as returned by VespaIndex.to_vespa_query for a MarqoHybridQuery
+        retrieval_method: 'lexical' or 'tensor'
+        ranking_method: 'lexical' or 'tensor'
+
+    Returns:
+        Keyword arguments for VespaClient.query
+    """
+    retrieval_method, ranking_method = RetrievalMethod(retrieval_method).value, RankingMethod(ranking_method).value
+
+    sub_query = {k: v for k, v in hybrid_query.items() if k != 'searchChain' and not k.startswith('marqo__')}
+    sub_query['yql'] = hybrid_query[f'marqo__yql.{retrieval_method}']
+    sub_query['ranking'] = hybrid_query[f'marqo__ranking.{retrieval_method}.{ranking_method}']
+
+    query_features = dict(hybrid_query.get('query_features') or {})
+    fields_to_rank = {}
+    for method in {retrieval_method, ranking_method}:
+        fields_to_rank.update(query_features.get(_FIELDS_TO_RANK_QUERY_INPUTS[method]) or {})
+    if ranking_method == retrieval_method == RetrievalMethod.Lexical:
+        # The lexical rank profiles do not use the query vector. It is not sent so that the sub-query can be created
+        # before the query is vectorised
+        query_features.pop(common.QUERY_INPUT_EMBEDDING, None)
+    query_features.update(fields_to_rank)
+    sub_query['query_features'] = query_features
+
+    return sub_query
+
+
+def _extract_doc_id(hit_id: Optional[str]) -> Optional[str]:
+    # Hit IDs include the content node the hit came from, which can differ between the two sub-queries
+    match = _DOC_ID_PATTERN.match(hit_id or '')
+    return match.group(1) if match else hit_id
+
+
+def _worst_coverage(*coverages: Optional[Coverage]) -> Optional[Coverage]:
+    coverages = [c for c in coverages if c is not None]
+    if not coverages:
+        return None
+    return min(coverages, key=lambda c: (c.degraded is None, c.coverage))
+
+
+def rrf(tensor_result: QueryResult, lexical_result: QueryResult, k: int, alpha: float) -> QueryResult:
+    """
+    Fuse the results of the tensor and lexical sub-queries of a hybrid search with reciprocal rank fusion, as the
+    HybridSearcher does.
+
+    Each hit scores alpha / (rank + k) for its tensor rank plus (1 - alpha) / (rank + k) for its lexical rank, and
+    keeps its raw score from each sub-query. The fused result has as many hits as the larger of the two results.
+    """
+    fused = []
+    hits_by_doc_id = dict()
+
+    if alpha > 0.0:
+        for rank, hit in enumerate(tensor_result.hits, start=1):
+            reciprocal_rank = alpha * (1.0 / (rank + k))
+            hit.fields = dict(hit.fields or {})
+            hit.fields[common.VESPA_DOC_HYBRID_RAW_TENSOR_SCORE] = hit.relevance
+            hit.relevance = reciprocal_rank
+            hits_by_doc_id[_extract_doc_id(hit.id)] = hit
+            fused.append(hit)
+
+    if alpha < 1.0:
+        for rank, hit in enumerate(lexical_result.hits, start=1):
+            reciprocal_rank = (1.0 - alpha) * (1.0 / (rank + k))
+            doc_id = _extract_doc_id(hit.id)
+            existing_hit = hits_by_doc_id.get(doc_id)
+            if existing_hit is None:
+                hit.fields = dict(hit.fields or {})
+                hit.fields[common.VESPA_DOC_HYBRID_RAW_LEXICAL_SCORE] = hit.relevance
+                hit.relevance = reciprocal_rank
+                hits_by_doc_id[doc_id] = hit
+                fused.append(hit)
+            else:
+                existing_hit.fields[common.VESPA_DOC_HYBRID_RAW_LEXICAL_SCORE] = hit.relevance
+                existing_hit.relevance += reciprocal_rank
+
+    # Stable, so hits with equal scores stay in the order they were added
+    fused.sort(key=lambda hit: hit.relevance, reverse=True)
+    fused = fused[:max(len(tensor_result.hits), len(lexical_result.hits))]
+
+    return QueryResult(root=Root(
+        id='toplevel',
+        relevance=1.0,
+        fields=RootFields(totalCount=len(fused)),
+        coverage=_worst_coverage(tensor_result.root.coverage, lexical_result.root.coverage),
+        children=fused
+    ))
@@ -1,3 +1,6 @@
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import List, Optional, Union, Iterable, Dict
 
 from marqo.api import exceptions as api_exceptions
@@ -7,15 +10,15 @@ from marqo.api import exceptions as errors
 from marqo.config import Config
 from marqo.core import constants
 from marqo.core import exceptions as core_exceptions
-from marqo.core.models.hybrid_parameters import HybridParameters
+from marqo.core.models.hybrid_parameters import HybridParameters, RankingMethod, RetrievalMethod
 from marqo.core.models.marqo_index import UnstructuredMarqoIndex, StructuredMarqoIndex, SemiStructuredMarqoIndex
 from marqo.core.models.marqo_query import MarqoHybridQuery
+from marqo.core.search import hybrid_fusion
 from marqo.core.vespa_index.vespa_index import for_marqo_index as vespa_index_factory
-from marqo.core.structured_vespa_index.common import RANK_PROFILE_HYBRID_CUSTOM_SEARCHER
 from marqo.tensor_search import index_meta_cache
 from marqo.tensor_search import utils
 from marqo.tensor_search.enums import (
-    SearchMethod
+    EnvVars, SearchMethod
 )
 from marqo.tensor_search.models.api_models import BulkSearchQueryEntity, ScoreModifierLists, CustomVectorQuery
 from marqo.tensor_search.models.private_models import ModelAuth
@@ -23,6 +26,7 @@ from marqo.tensor_search.models.search import Qidx, SearchContext, SearchContext
 from marqo.tensor_search.telemetry import RequestMetricsStore
 from marqo.tensor_search.tensor_search import run_vectorise_pipeline, gather_documents_from_response, logger
 from marqo.vespa.exceptions import VespaStatusError
+from marqo.vespa.models import QueryResult
 import semver
 
 
@@ -156,10 +160,6 @@ class HybridSearch:
             hybridParameters=hybrid_parameters
         )]
 
-        with RequestMetricsStore.for_request().time(f"search.hybrid.vector_inference_full_pipeline"):
-            qidx_to_vectors: Dict[Qidx, List[float]] = run_vectorise_pipeline(config, queries, device)
-        vectorised_text = list(qidx_to_vectors.values())[0]
-
         # Parse text into required and optional terms.
         if query_text_search:
             (required_terms, optional_terms) = utils.parse_lexical_query(query_text_search)
@@ -167,9 +167,8 @@ class HybridSearch:
             required_terms = []
             optional_terms = []
 
-        marqo_query = MarqoHybridQuery(
+        marqo_query_params = dict(
             index_name=index_name,
-            vector_query=vectorised_text,
             filter=filter_string,
             limit=result_count,
             ef_search=ef_search,
@@ -187,8 +186,31 @@ class HybridSearch:
             if hybrid_parameters.scoreModifiersTensor is not None else None,
             hybrid_parameters=hybrid_parameters
         )
-
         vespa_index = vespa_index_factory(marqo_index)
+
+        # The lexical sub-query does not depend on the query vector, so it can run while the query is vectorised
+        lexical_future: Optional[Future] = None
+        if hybrid_fusion.lexical_leg_is_independent(hybrid_parameters) and \
+                utils.read_env_vars_and_defaults(EnvVars.MARQO_ENABLE_SPECULATIVE_HYBRID_SEARCH).lower() == 'true':
+            lexical_query = hybrid_fusion.to_vespa_sub_query(
+                vespa_index.to_vespa_query(MarqoHybridQuery(vector_query=[], **marqo_query_params)),
+                RetrievalMethod.Lexical, RankingMethod.Lexical
+            )
+            lexical_future = _get_sub_query_executor().submit(
+                contextvars.copy_context().run, self._timed_sub_query, config, index_name, lexical_query,
+                "search.hybrid.vespa.lexical"
+            )
+
+        try:
+            with RequestMetricsStore.for_request().time(f"search.hybrid.vector_inference_full_pipeline"):
+                qidx_to_vectors: Dict[Qidx, List[float]] = run_vectorise_pipeline(config, queries, device)
+        except Exception:
+            if lexical_future is not None:
+                lexical_future.cancel()
+            raise
+        vectorised_text = list(qidx_to_vectors.values())[0]
+
+        marqo_query = MarqoHybridQuery(vector_query=vectorised_text, **marqo_query_params)
         vespa_query = vespa_index.to_vespa_query(marqo_query)
 
         total_preprocess_time = RequestMetricsStore.for_request().stop("search.hybrid.processing_before_vespa")
@@ -199,17 +221,18 @@ class HybridSearch:
         with RequestMetricsStore.for_request().time("search.hybrid.vespa",
                                                     lambda t: logger.debug(f"Vespa search: took {t:.3f}ms")
                                                     ):
-            try:
-                responses = config.vespa_client.query(**vespa_query)
-            except VespaStatusError as e:
-                # The index will not have the embedding_similarity rank profile if there are no tensor fields
-                if f"No profile named '{RANK_PROFILE_HYBRID_CUSTOM_SEARCHER}'" in e.message:
-                    raise core_exceptions.InvalidArgumentError(
-                        f"Index {index_name} either has no tensor fields or no lexically searchable fields, "
-                        f"thus hybrid search cannot be performed. "
-                        f"Please create an index with both tensor and lexical fields, or try a different search method."
-                    )
-                raise e
+            if lexical_future is None:
+                responses = self._query(config, index_name, vespa_query)
+            elif hybrid_parameters.retrievalMethod == RetrievalMethod.Lexical:
+                responses = lexical_future.result()
+            else:
+                tensor_query = hybrid_fusion.to_vespa_sub_query(
+                    vespa_query, RetrievalMethod.Tensor, RankingMethod.Tensor
+                )
+                tensor_responses = self._timed_sub_query(config, index_name, tensor_query,
+                                                         "search.hybrid.vespa.tensor")
+                responses = hybrid_fusion.rrf(tensor_responses, lexical_future.result(),
+                                              k=hybrid_parameters.rrfK, alpha=hybrid_parameters.alpha)
 
         if not approximate and (responses.root.coverage.coverage < 100 or responses.root.coverage.degraded is not None):
             raise errors.InternalError(
@@ -229,3 +252,37 @@ class HybridSearch:
         )
 
         return gathered_docs
+
+    def _timed_sub_query(self, config: Config, index_name: str, vespa_query: Dict, metric_key: str) -> QueryResult:
+        with RequestMetricsStore.for_request().time(metric_key):
+            return self._query(config, index_name, vespa_query)
+
+    def _query(self, config: Config, index_name: str, vespa_query: Dict) -> QueryResult:
+        try:
+            return config.vespa_client.query(**vespa_query)
+        except VespaStatusError as e:
+            # The index will not have the hybrid or sub-query rank profiles if there are no tensor fields
+            if f"No profile named '{vespa_query['ranking']}'" in e.message:
+                raise core_exceptions.InvalidArgumentError(
+                    f"Index {index_name} either has no tensor fields or no lexically searchable fields, "
+                    f"thus hybrid search cannot be performed. "
+                    f"Please create an index with both tensor and lexical fields, or try a different search method."
+                )
+            raise e
+
+
+_sub_query_executor: Optional[ThreadPoolExecutor] = None
+_sub_query_executor_lock = threading.Lock()
+
+
+def _get_sub_query_executor() -> ThreadPoolExecutor:
+    """The threads that run speculative lexical sub-queries, one per search that can run at once."""
+    global _sub_query_executor
+    if _sub_query_executor is None:
+        with _sub_query_executor_lock:
+            if _sub_query_executor is None:
+                _sub_query_executor = ThreadPoolExecutor(
+                    max_workers=utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_MAX_CONCURRENT_SEARCH),
+                    thread_name_prefix='hybrid-lexical'
+                )
+    return _sub_query_executor
@@ -8,7 +8,9 @@ from marqo.core.models.interpolation_method import InterpolationMethod
 from marqo.core.models.marqo_index import IndexType
 from marqo.core.utils.vector_interpolation import from_interpolation_method, ZeroSumWeightsError, \
     ZeroMagnitudeVectorError
+from marqo.core.vespa_index.vespa_index import for_marqo_index as vespa_index_factory
 from marqo.exceptions import InvalidArgumentError
+from marqo.tensor_search import validation
 from marqo.tensor_search.models.score_modifiers_object import ScoreModifierLists
 from marqo.tensor_search.models.search import SearchContext, SearchContextTensor
 from marqo.vespa.vespa_client import VespaClient
@@ -98,34 +100,9 @@ class Recommender:
 
         t0 = timer()
 
-        marqo_documents = tensor_search.get_documents_by_ids(
-            config.Config(self.vespa_client),
-            index_name, document_ids, show_vectors=True
-        ).dict(exclude_none=True, by_alias=True)
-
-        # Make sure all documents were found
-        not_found = []
-        for document in marqo_documents['results']:
-            if not document['_found']:
-                not_found.append(document['_id'])
-
-        if len(not_found) > 0:
-            raise InvalidArgumentError(f'The following document IDs were not found: {", ".join(not_found)}')
-
-        doc_vectors: Dict[str, List[List[float]]] = {}
-        docs_without_vectors = []
-        for document in marqo_documents['results']:
-            vectors: List[List[float]] = []
-            for tensor_facet in document['_tensor_facets']:
-                field = list(tensor_facet.keys())[0]
-                if tensor_fields is None or field in tensor_fields:
-                    vectors.append(tensor_facet['_embedding'])
-
-            doc_vectors[document['_id']] = vectors
-
-            if len(vectors) == 0:
-                docs_without_vectors.append(document['_id'])
+        doc_vectors = self._get_document_vectors(index_name, marqo_index, document_ids, tensor_fields)
 
+        docs_without_vectors = [document_id for document_id, vectors in doc_vectors.items() if len(vectors) == 0]
         if len(docs_without_vectors) > 0:
             raise InvalidArgumentError(
                 f'The following documents do not have embeddings: {", ".join(docs_without_vectors)}'
@@ -196,6 +173,49 @@ class Recommender:
 
         return results
 
+    def _get_document_vectors(self, index_name: str, marqo_index: MarqoIndex, document_ids: List[str],
+                              tensor_fields: Optional[List[str]]) -> Dict[str, List[List[float]]]:
+        """
+        Get the stored vectors of the given documents, restricted to `tensor_fields` if provided.
+
+        Only the document ID and the vector fields are retrieved from Vespa, rather than whole documents. If the index
+        stores centroids, a single centroid is retrieved for each tensor field of a document instead of the vectors of
+        all its chunks.
+
+        Returns:
+            A dictionary of document ID to the list of vectors of that document, in the order of `document_ids`
+        """
+        validated_ids, invalid_ids = validation.validate_ids_to_get(document_ids)
+        not_found = [str(document_id) for _, document_id, _ in invalid_ids]
+
+        if marqo_index.type == IndexType.SemiStructured:
+            # Tensor fields can be added to a semi-structured index at any time, so bypass the index cache
+            marqo_index = self.index_management.get_index(index_name=index_name)
+        vespa_index = vespa_index_factory(marqo_index)
+
+        use_centroids = marqo_index.store_centroids
+        batch_get = self.vespa_client.get_batch(validated_ids, marqo_index.schema_name,
+                                                field_set=vespa_index.get_vector_field_set(centroids=use_centroids))
+
+        doc_vectors: Dict[str, List[List[float]]] = {}
+        # Responses are in the same order as the requested IDs
+        for document_id, response in zip(validated_ids, batch_get.responses):
+            if response.status != 200:
+                not_found.append(document_id)
+                continue
+
+            field_vectors = vespa_index.to_tensor_field_vectors(response.document.dict(), centroids=use_centroids)
+            doc_vectors[document_id] = [
+                vector
+                for field, vectors in field_vectors.items() if tensor_fields is None or field in tensor_fields
+                for vector in vectors
+            ]
+
+        if len(not_found) > 0:
+            raise InvalidArgumentError(f'The following document IDs were not found: {", ".join(not_found)}')
+
+        return doc_vectors
+
     def _get_default_interpolation_method(self, marqo_index: MarqoIndex) -> InterpolationMethod:
         if marqo_index.normalize_embeddings:
             return InterpolationMethod.SLERP
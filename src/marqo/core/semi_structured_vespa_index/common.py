@@ -5,6 +5,7 @@ LONGS_STRINGS_FIELDS = "marqo__long_string_fields"
 STRING_ARRAY = "marqo__string_array"
 
 FIELD_VECTOR_COUNT = 'marqo__vector_count'
+FIELD_CENTROIDS = 'marqo__centroids'
 
 INT_FIELDS = "marqo__int_fields"
 FLOAT_FIELDS = "marqo__float_fields"
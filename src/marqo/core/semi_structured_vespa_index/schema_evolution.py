@@ -0,0 +1,141 @@
+from typing import Callable, List
+
+import marqo.logging
+from marqo.core.exceptions import TooManyFieldsError, InternalError
+from marqo.core.index_management.operation_coalescer import OperationCoalescer, PendingOperation
+from marqo.core.models.marqo_index import SemiStructuredMarqoIndex, Field, TensorField, MarqoIndex
+from marqo.tensor_search.telemetry import RequestMetricsStore
+
+logger = marqo.logging.get_logger(__name__)
+
+
+def _increment_request_counter(name: str) -> None:
+    # Indexes can be updated outside a request, e.g. in a thread without the request's context, which has no metrics
+    try:
+        RequestMetricsStore.for_request().increment_counter(name)
+    except LookupError:
+        pass
+
+
+class _FieldAddition:
+    __slots__ = ('index_name', 'lexical_fields', 'tensor_fields', 'max_lexical_field_count', 'max_tensor_field_count')
+
+    def __init__(self, index_name: str, lexical_fields: List[Field], tensor_fields: List[TensorField],
+                 max_lexical_field_count: int, max_tensor_field_count: int):
+        self.index_name = index_name
+        self.lexical_fields = lexical_fields
+        self.tensor_fields = tensor_fields
+        self.max_lexical_field_count = max_lexical_field_count
+        self.max_tensor_field_count = max_tensor_field_count
+
+
+class SchemaEvolutionCoordinator:
+    """
+    Coalesces the fields that concurrent add documents requests add to a semi-structured index into one index update.
+
+    Updating a semi-structured index regenerates its schema and redeploys the Vespa application, which takes seconds
+    and holds the deployment lock. Rather than each request updating the index in turn, requests queue their new fields
+    per index in an OperationCoalescer. The first request of a queue waits for any update of the index in progress to
+    complete, and then for `batch_window_seconds` so that more requests can join, before it applies the whole queue to
+    the latest index in a single update. Every request in the queue returns once that update completes.
+
+    Only requests served by this Marqo instance are coalesced. Updates from other instances are serialised by the
+    deployment lock and the index version check, as before.
+    """
+
+    def __init__(self, get_index: Callable[[str], MarqoIndex],
+                 update_index: Callable[[SemiStructuredMarqoIndex], None],
+                 batch_window_seconds: float = 0):
+        """
+        Args:
+            get_index: Returns the latest settings of an index
+            update_index: Updates the settings and schema of a semi-structured index
+            batch_window_seconds: How long the first request of a queue waits for other requests to join it
+        """
+        self._get_index = get_index
+        self._update_index = update_index
+        self._coalescer = OperationCoalescer(
+            self._apply, batch_window_seconds,
+            on_coalesced=lambda: _increment_request_counter('add_documents.update_index.coalesced')
+        )
+
+    def add_fields(self, index_name: str, lexical_fields: List[Field], tensor_fields: List[TensorField],
+                   max_lexical_field_count: int, max_tensor_field_count: int) -> None:
+        """
+        Add fields to a semi-structured index, together with the fields that concurrent requests add to it. Fields the
+        index already has are skipped.
+
+        Args:
+            index_name: Name of the index to update
+            lexical_fields: Lexical fields to add
+            tensor_fields: Tensor fields to add
+            max_lexical_field_count: Maximum number of lexical fields the index can have
+            max_tensor_field_count: Maximum number of tensor fields the index can have
+
+        Raises:
+            TooManyFieldsError: If the index would have too many fields once the fields of earlier requests are added.
+                The fields of other requests are still added
+            Any error raised when updating the index, in every request whose fields were to be added
+        """
+        addition = _FieldAddition(index_name, lexical_fields, tensor_fields, max_lexical_field_count,
+                                  max_tensor_field_count)
+        self._coalescer.submit(addition, key=index_name)
+
+    def _apply(self, queue: List[PendingOperation]) -> None:
+        """Apply the field additions of a queue, which all belong to the same index, in one index update."""
+        index_name = queue[0].operation.index_name
+        marqo_index = self._get_index(index_name)
+        if not isinstance(marqo_index, SemiStructuredMarqoIndex):
+            raise InternalError(f'Index {index_name} can not be updated.')
+
+        accepted = []
+        changed = False
+        for pending_operation in queue:
+            try:
+                changed = self._add_to_index(marqo_index, pending_operation.operation) or changed
+            except TooManyFieldsError as e:
+                pending_operation.future.set_exception(e)
+            else:
+                accepted.append(pending_operation)
+
+        if changed:
+            logger.info(f'Updating index {index_name} with the new fields of {len(accepted)} requests')
+            self._update_index(marqo_index)
+            _increment_request_counter('add_documents.update_index.deployments')
+
+        for pending_operation in accepted:
+            pending_operation.future.set_result(None)
+
+    @staticmethod
+    def _add_to_index(marqo_index: SemiStructuredMarqoIndex, addition: _FieldAddition) -> bool:
+        """
+        Add the fields of a request that the index does not have yet to the index. Returns whether any were added.
+
+        Raises:
+            TooManyFieldsError: If the index would have too many fields. No fields are added then
+        """
+        lexical_fields = [field for field in addition.lexical_fields if field.name not in marqo_index.field_map]
+        tensor_fields = [field for field in addition.tensor_fields
+                         if field.name not in marqo_index.tensor_field_map]
+
+        if lexical_fields and len(marqo_index.lexical_fields) + len(lexical_fields) > addition.max_lexical_field_count:
+            raise TooManyFieldsError(
+                f'Index {marqo_index.name} has {len(marqo_index.lexical_fields)} lexical fields. Your request to add '
+                f'{", ".join(field.name for field in lexical_fields)} as lexical fields is rejected since it exceeds '
+                f'the limit of {addition.max_lexical_field_count}. Please set a larger limit in '
+                f'MARQO_MAX_LEXICAL_FIELD_COUNT_UNSTRUCTURED environment variable.')
+
+        if tensor_fields and len(marqo_index.tensor_fields) + len(tensor_fields) > addition.max_tensor_field_count:
+            raise TooManyFieldsError(
+                f'Index {marqo_index.name} has {len(marqo_index.tensor_fields)} tensor fields. Your request to add '
+                f'{", ".join(field.name for field in tensor_fields)} as tensor fields is rejected since it exceeds '
+                f'the limit of {addition.max_tensor_field_count}. Please set a larger limit in '
+                f'MARQO_MAX_TENSOR_FIELD_COUNT_UNSTRUCTURED environment variable.')
+
+        if not lexical_fields and not tensor_fields:
+            return False
+
+        marqo_index.lexical_fields.extend(lexical_fields)
+        marqo_index.tensor_fields.extend(tensor_fields)
+        marqo_index.clear_cache()
+        return True
@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 import pydantic
 
@@ -35,7 +35,8 @@ class SemiStructuredAddDocumentsHandler(UnstructuredAddDocumentsHandler):
         self.index_management = index_management
         self.marqo_index = marqo_index
         self.vespa_index = SemiStructuredVespaIndex(marqo_index)
-        self.should_update_index = False
+        self.new_lexical_fields = []
+        self.new_tensor_fields = []
         self.field_count_config = field_count_config
 
     def _handle_field(self, marqo_doc, field_name, field_content):
@@ -52,10 +53,7 @@ class SemiStructuredAddDocumentsHandler(UnstructuredAddDocumentsHandler):
         doc_tensor_fields = self.tensor_fields_container.get_tensor_field_content(doc[MARQO_DOC_ID])
         processed_tensor_fields = dict()
         for field_name, tensor_field_content in doc_tensor_fields.items():
-            processed_tensor_fields[field_name] = {
-                constants.MARQO_DOC_CHUNKS: tensor_field_content.tensor_field_chunks,
-                constants.MARQO_DOC_EMBEDDINGS: tensor_field_content.tensor_field_embeddings,
-            }
+            processed_tensor_fields[field_name] = self._to_marqo_tensor(tensor_field_content)
             self._add_tensor_field_to_index(field_name)
         if processed_tensor_fields:
             doc[constants.MARQO_DOC_TENSORS] = processed_tensor_fields
@@ -63,9 +61,12 @@ class SemiStructuredAddDocumentsHandler(UnstructuredAddDocumentsHandler):
         return VespaDocument(**self.vespa_index.to_vespa_document(marqo_document=doc))
 
     def _pre_persist_to_vespa(self):
-        if self.should_update_index:
+        if self.new_lexical_fields or self.new_tensor_fields:
             with RequestMetricsStore.for_request().time("add_documents.update_index"):
-                self.index_management.update_index(self.marqo_index)
+                self.index_management.add_fields_to_index(
+                    self.marqo_index.name, self.new_lexical_fields, self.new_tensor_fields,
+                    self.field_count_config.max_lexical_field_count, self.field_count_config.max_tensor_field_count
+                )
             # Force fresh this index in the index cache to make sure the following search requests get the latest index
             # TODO this is a temporary solution to fix the consistency issue for single instance Marqo (used extensively
             #   in api-tests and integration tests). Find a better way to solve consistency issue for Marqo clusters
@@ -73,43 +74,73 @@ class SemiStructuredAddDocumentsHandler(UnstructuredAddDocumentsHandler):
             index_meta_cache.get_index(self.index_management, self.marqo_index.name, force_refresh=True)
 
     def _add_lexical_field_to_index(self, field_name):
-        if field_name in self.marqo_index.field_map:
-            return
-
-        max_lexical_field_count = self.field_count_config.max_lexical_field_count
-        if len(self.marqo_index.lexical_fields) >= max_lexical_field_count:
-            raise TooManyFieldsError(f'Index {self.marqo_index.name} has {len(self.marqo_index.lexical_fields)} '
-                                     f'lexical fields. Your request to add {field_name} as a lexical field is rejected '
-                                     f'since it exceeds the limit of {max_lexical_field_count}. Please set a larger '
-                                     f'limit in MARQO_MAX_LEXICAL_FIELD_COUNT_UNSTRUCTURED environment variable.')
-
-        # Add missing lexical fields to marqo index
-        self.marqo_index.lexical_fields.append(
-            Field(name=field_name, type=FieldType.Text,
-                  features=[FieldFeature.LexicalSearch],
-                  lexical_field_name=f'{SemiStructuredVespaSchema.FIELD_INDEX_PREFIX}{field_name}')
-        )
-        self.marqo_index.clear_cache()
-        self.should_update_index = True
+        field = add_lexical_field(self.marqo_index, field_name, self.field_count_config.max_lexical_field_count)
+        if field is not None:
+            self.new_lexical_fields.append(field)
 
     def _add_tensor_field_to_index(self, field_name):
-        if field_name in self.marqo_index.tensor_field_map:
-            return
-
-        max_tensor_field_count = self.field_count_config.max_tensor_field_count
-        if len(self.marqo_index.tensor_fields) >= max_tensor_field_count:
-            raise TooManyFieldsError(f'Index {self.marqo_index.name} has {len(self.marqo_index.tensor_fields)} '
-                                     f'tensor fields. Your request to add {field_name} as a tensor field is rejected '
-                                     f'since it exceeds the limit of {max_tensor_field_count}. Please set a larger '
-                                     f'limit in MARQO_MAX_TENSOR_FIELD_COUNT_UNSTRUCTURED environment variable.')
-
-        # Add missing tensor fields to marqo index
-        if field_name not in self.marqo_index.tensor_field_map:
-            self.marqo_index.tensor_fields.append(TensorField(
-                name=field_name,
-                chunk_field_name=f'{SemiStructuredVespaSchema.FIELD_CHUNKS_PREFIX}{field_name}',
-                embeddings_field_name=f'{SemiStructuredVespaSchema.FIELD_EMBEDDING_PREFIX}{field_name}',
-            ))
-            self.marqo_index.clear_cache()
-            self.should_update_index = True
-
+        tensor_field = add_tensor_field(self.marqo_index, field_name, self.field_count_config.max_tensor_field_count)
+        if tensor_field is not None:
+            self.new_tensor_fields.append(tensor_field)
+
+
+def add_lexical_field(marqo_index: SemiStructuredMarqoIndex, field_name: str,
+                      max_lexical_field_count: int) -> Optional[Field]:
+    """
+    Add a lexical field to the in-memory index if it does not have it yet. The caller must persist the new field with
+    IndexManagement.add_fields_to_index before feeding documents that have it.
+
+    Returns:
+        The new field, or None if the index already has it
+
+    Raises:
+        TooManyFieldsError: If the index already has `max_lexical_field_count` lexical fields
+    """
+    if field_name in marqo_index.field_map:
+        return None
+
+    if len(marqo_index.lexical_fields) >= max_lexical_field_count:
+        raise TooManyFieldsError(f'Index {marqo_index.name} has {len(marqo_index.lexical_fields)} '
+                                 f'lexical fields. Your request to add {field_name} as a lexical field is rejected '
+                                 f'since it exceeds the limit of {max_lexical_field_count}. Please set a larger '
+                                 f'limit in MARQO_MAX_LEXICAL_FIELD_COUNT_UNSTRUCTURED environment variable.')
+
+    # Add missing lexical fields to marqo index
+    field = Field(name=field_name, type=FieldType.Text,
+                  features=[FieldFeature.LexicalSearch],
+                  lexical_field_name=f'{SemiStructuredVespaSchema.FIELD_INDEX_PREFIX}{field_name}')
+    marqo_index.lexical_fields.append(field)
+    marqo_index.clear_cache()
+    return field
+
+
+def add_tensor_field(marqo_index: SemiStructuredMarqoIndex, field_name: str,
+                     max_tensor_field_count: int) -> Optional[TensorField]:
+    """
+    Add a tensor field to the in-memory index if it does not have it yet. The caller must persist the new field with
+    IndexManagement.add_fields_to_index before feeding documents that have it.
+
+    Returns:
+        The new tensor field, or None if the index already has it
+
+    Raises:
+        TooManyFieldsError: If the index already has `max_tensor_field_count` tensor fields
+    """
+    if field_name in marqo_index.tensor_field_map:
+        return None
+
+    if len(marqo_index.tensor_fields) >= max_tensor_field_count:
+        raise TooManyFieldsError(f'Index {marqo_index.name} has {len(marqo_index.tensor_fields)} '
+                                 f'tensor fields. Your request to add {field_name} as a tensor field is rejected '
+                                 f'since it exceeds the limit of {max_tensor_field_count}. Please set a larger '
+                                 f'limit in MARQO_MAX_TENSOR_FIELD_COUNT_UNSTRUCTURED environment variable.')
+
+    # Add missing tensor fields to marqo index
+    tensor_field = TensorField(
+        name=field_name,
+        chunk_field_name=f'{SemiStructuredVespaSchema.FIELD_CHUNKS_PREFIX}{field_name}',
+        embeddings_field_name=f'{SemiStructuredVespaSchema.FIELD_EMBEDDING_PREFIX}{field_name}',
+    )
+    marqo_index.tensor_fields.append(tensor_field)
+    marqo_index.clear_cache()
+    return tensor_field
@@ -34,6 +34,7 @@ class SemiStructuredVespaDocument(MarqoBaseModel):
     text_fields: dict = Field(default_factory=dict)
     tensor_fields: dict = Field(default_factory=dict)
     vector_counts: int = Field(default=0, alias=common.FIELD_VECTOR_COUNT)
+    centroids: Dict[str, List[float]] = Field(default_factory=dict, alias=common.FIELD_CENTROIDS)
     match_features: Dict[str, Any] = Field(default_factory=dict, alias=common.VESPA_DOC_MATCH_FEATURES)
 
     # For hybrid search
@@ -140,6 +141,9 @@ class SemiStructuredVespaDocument(MarqoBaseModel):
                     instance.tensor_fields[index_tensor_field.embeddings_field_name] = \
                         {f'{i}': embeddings[i] for i in range(len(embeddings))}
 
+                    if constants.MARQO_DOC_CENTROID in marqo_tensor_value:
+                        instance.centroids[marqo_tensor_field] = marqo_tensor_value[constants.MARQO_DOC_CENTROID]
+
             instance.vector_counts = vector_count
 
             instance.fixed_fields.vespa_multimodal_params = document.get(common.MARQO_DOC_MULTIMODAL_PARAMS, {})
@@ -155,6 +159,8 @@ class SemiStructuredVespaDocument(MarqoBaseModel):
             **self.tensor_fields,
             common.FIELD_VECTOR_COUNT: self.vector_counts,
         }
+        if self.centroids:
+            vespa_fields[common.FIELD_CENTROIDS] = self.centroids
 
         return {self._VESPA_DOC_ID: self.id, self._VESPA_DOC_FIELDS: vespa_fields}
 
@@ -220,7 +226,8 @@ class SemiStructuredVespaDocument(MarqoBaseModel):
 
     @classmethod
     def _verify_marqo_tensor_field(cls, field_name: str, field_value: Dict[str, Any]):
-        if not set(field_value.keys()) == {constants.MARQO_DOC_CHUNKS, constants.MARQO_DOC_EMBEDDINGS}:
+        if not set(field_value.keys()) - {constants.MARQO_DOC_CENTROID} == {constants.MARQO_DOC_CHUNKS,
+                                                                             constants.MARQO_DOC_EMBEDDINGS}:
             raise InvalidTensorFieldError(f'Invalid tensor field {field_name}. '
                                           f'Expected keys {constants.MARQO_DOC_CHUNKS}, {constants.MARQO_DOC_EMBEDDINGS} '
                                           f'but found {", ".join(field_value.keys())}')
\ No newline at end of file
@@ -4,6 +4,7 @@ from marqo.core.constants import MARQO_DOC_HIGHLIGHTS
 from marqo.core.models import MarqoQuery
 from marqo.core.models.marqo_index import SemiStructuredMarqoIndex
 from marqo.core.models.marqo_query import MarqoTensorQuery, MarqoLexicalQuery, MarqoHybridQuery
+from marqo.core.search.search_filter import SearchFilter
 from marqo.core.semi_structured_vespa_index import common
 from marqo.core.semi_structured_vespa_index.semi_structured_document import SemiStructuredVespaDocument
 from marqo.core.structured_vespa_index.structured_vespa_index import StructuredVespaIndex
@@ -67,3 +68,7 @@ class SemiStructuredVespaIndex(StructuredVespaIndex, UnstructuredVespaIndex):
     def _get_filter_term(cls, marqo_query: MarqoQuery) -> Optional[str]:
         # Reuse logic in UnstructuredVespaIndex to create filter term
         return UnstructuredVespaIndex._get_filter_term(marqo_query)
+
+    def to_vespa_document_selection(self, marqo_filter: SearchFilter) -> str:
+        # Filter values are stored in the same fields as in unstructured indexes
+        return UnstructuredVespaIndex.to_vespa_document_selection(self, marqo_filter)
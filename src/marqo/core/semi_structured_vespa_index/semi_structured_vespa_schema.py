@@ -41,6 +41,7 @@ class SemiStructuredVespaSchema(VespaSchema):
             distance_metric=self._index_request.distance_metric,
             vector_numeric_type=self._index_request.vector_numeric_type,
             hnsw_config=self._index_request.hnsw_config,
+            store_centroids=self._index_request.store_centroids,
             marqo_version=self._index_request.marqo_version,
             created_at=self._index_request.created_at,
             updated_at=self._index_request.updated_at,
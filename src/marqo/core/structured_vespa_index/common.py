@@ -4,6 +4,7 @@ FIELD_SCORE_MODIFIERS_2_8 = 'marqo__score_modifiers' # retain for backwards comp
 FIELD_SCORE_MODIFIERS_FLOAT = 'marqo__score_modifiers_float'
 FIELD_SCORE_MODIFIERS_DOUBLE_LONG = 'marqo__score_modifiers_double_long'
 FIELD_VECTOR_COUNT = 'marqo__vector_count'
+FIELD_CENTROIDS = 'marqo__centroids'
 
 RANK_PROFILE_BASE = 'base_rank_profile'
 RANK_PROFILE_BM25 = 'bm25'
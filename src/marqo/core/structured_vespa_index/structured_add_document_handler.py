@@ -120,10 +120,7 @@ class StructuredAddDocumentsHandler(AddDocumentsHandler):
         doc_tensor_fields = self.tensor_fields_container.get_tensor_field_content(doc[MARQO_DOC_ID])
         processed_tensor_fields = dict()
         for field_name, tensor_field_content in doc_tensor_fields.items():
-            processed_tensor_fields[field_name] = {
-                constants.MARQO_DOC_CHUNKS: tensor_field_content.tensor_field_chunks,
-                constants.MARQO_DOC_EMBEDDINGS: tensor_field_content.tensor_field_embeddings,
-            }
+            processed_tensor_fields[field_name] = self._to_marqo_tensor(tensor_field_content)
         if processed_tensor_fields:
             doc[constants.MARQO_DOC_TENSORS] = processed_tensor_fields
 
@@ -231,6 +231,7 @@ class StructuredVespaIndex(VespaIndex):
 
         # Tensors
         vector_count = 0
+        centroids: Dict[str, List[float]] = dict()
         if constants.MARQO_DOC_TENSORS in marqo_document:
             for marqo_tensor_field in marqo_document[constants.MARQO_DOC_TENSORS]:
                 marqo_tensor_value = marqo_document[constants.MARQO_DOC_TENSORS][marqo_tensor_field]
@@ -249,8 +250,14 @@ class StructuredVespaIndex(VespaIndex):
                 vespa_fields[index_tensor_field.embeddings_field_name] = \
                     {f'{i}': embeddings[i] for i in range(len(embeddings))}
 
+                if constants.MARQO_DOC_CENTROID in marqo_tensor_value:
+                    centroids[marqo_tensor_field] = marqo_tensor_value[constants.MARQO_DOC_CENTROID]
+
         vespa_fields[common.FIELD_VECTOR_COUNT] = vector_count
 
+        if len(centroids) > 0:
+            vespa_fields[common.FIELD_CENTROIDS] = centroids
+
         if len(score_modifiers_double_long) > 0:
             vespa_fields[common.FIELD_SCORE_MODIFIERS_DOUBLE_LONG] = score_modifiers_double_long
         if len(score_modifiers_float) > 0:
@@ -334,6 +341,7 @@ class StructuredVespaIndex(VespaIndex):
                                                               common.FIELD_SCORE_MODIFIERS_FLOAT,
                                                               common.FIELD_SCORE_MODIFIERS_DOUBLE_LONG,
                                                               common.FIELD_VECTOR_COUNT,
+                                                              common.FIELD_CENTROIDS,
                                                               self._VESPA_DOC_MATCH_FEATURES}:
                 continue
             else:
@@ -401,6 +409,45 @@ class StructuredVespaIndex(VespaIndex):
             'timeout': '5s'
         }
 
+    def get_vector_field_set(self, centroids: bool = False) -> str:
+        if centroids:
+            fields = [common.FIELD_ID, common.FIELD_CENTROIDS]
+        else:
+            fields = [common.FIELD_ID] + [tensor_field.embeddings_field_name
+                                          for tensor_field in self._marqo_index.tensor_fields]
+        return f'{self._marqo_index.schema_name}:{",".join(fields)}'
+
+    def to_tensor_field_vectors(self, vespa_document: Dict[str, Any],
+                                centroids: bool = False) -> Dict[str, List[List[float]]]:
+        fields = vespa_document.get('fields', {})
+        if centroids:
+            return self._to_tensor_field_centroids(fields.get(common.FIELD_CENTROIDS))
+
+        vectors = dict()
+        for tensor_field in self._marqo_index.tensor_fields:
+            value = fields.get(tensor_field.embeddings_field_name)
+            if value is None:
+                continue
+            try:
+                vectors[tensor_field.name] = list(value['blocks'].values())
+            except (KeyError, AttributeError, TypeError) as e:
+                raise VespaDocumentParsingError(
+                    f'Cannot parse embeddings field {tensor_field.embeddings_field_name} with value {value}'
+                ) from e
+        return vectors
+
+    def _to_tensor_field_centroids(self, value: Optional[Dict[str, Any]]) -> Dict[str, List[List[float]]]:
+        if value is None:
+            return dict()
+        try:
+            centroids = value['blocks']
+        except (KeyError, TypeError) as e:
+            raise VespaDocumentParsingError(f'Cannot parse centroids field {common.FIELD_CENTROIDS} '
+                                            f'with value {value}') from e
+        # Keep the order of the tensor fields in the index
+        return {tensor_field.name: [centroids[tensor_field.name]]
+                for tensor_field in self._marqo_index.tensor_fields if tensor_field.name in centroids}
+
     def _to_vespa_tensor_query(self, marqo_query: MarqoTensorQuery) -> Dict[str, Any]:
         fields_to_search = self._get_tensor_fields_to_search(marqo_query)
 
@@ -794,6 +841,91 @@ class StructuredVespaIndex(VespaIndex):
         if marqo_query.filter is not None:
             return tree_to_filter_string(marqo_query.filter.root)
 
+    def to_vespa_document_selection(self, marqo_filter: search_filter.SearchFilter) -> str:
+        schema = self._marqo_index.schema_name
+        str_field_types = [FieldType.Text, FieldType.ArrayText, FieldType.CustomVector]
+
+        def escape(s: str) -> str:
+            return s.replace('\\', '\\\\').replace('"', '\\"')
+
+        def to_value(value: str, marqo_field_name: str, marqo_field_type: FieldType) -> str:
+            if marqo_field_type in str_field_types:
+                return f'"{escape(value)}"'
+            try:
+                return str(int(value))
+            except ValueError:
+                try:
+                    return str(float(value))
+                except ValueError:
+                    raise InvalidDataTypeError(
+                        f"Attempting to filter on field '{marqo_field_name}' of type '{marqo_field_type.value}' "
+                        f"with value '{value}', which is not a number."
+                    )
+
+        def tree_to_selection(node: search_filter.Node) -> str:
+            if isinstance(node, search_filter.Operator):
+                if isinstance(node, search_filter.And):
+                    operator = 'and'
+                elif isinstance(node, search_filter.Or):
+                    operator = 'or'
+                else:
+                    raise InternalError(f'Unknown operator type {type(node)}')
+
+                return f'({tree_to_selection(node.left)} {operator} {tree_to_selection(node.right)})'
+            elif isinstance(node, search_filter.Modifier):
+                if isinstance(node, search_filter.Not):
+                    return f'(not {tree_to_selection(node.modified)})'
+                else:
+                    raise InternalError(f'Unknown modifier type {type(node)}')
+            elif isinstance(node, search_filter.Term):
+                if node.field not in self._marqo_index.filterable_fields_names:
+                    raise InvalidFieldNameError(
+                        f"Index '{self._marqo_index.name}' has no filterable field '{node.field}'. "
+                        f'Available filterable fields are: \'{", ".join(self._marqo_index.filterable_fields_names)}\''
+                    )
+
+                if node.field == constants.MARQO_DOC_ID:
+                    field = f'{schema}.{common.FIELD_ID}'
+                    marqo_field_type = FieldType.Text
+                else:
+                    marqo_field = self._marqo_index.all_field_map[node.field]
+                    field = f'{schema}.{marqo_field.filter_field_name}'
+                    marqo_field_type = marqo_field.type
+
+                if isinstance(node, search_filter.EqualityTerm):
+                    if marqo_field_type == FieldType.Bool:
+                        if node.value.lower() not in ('true', 'false'):
+                            return 'false'
+                        return f'{field} == {1 if node.value.lower() == "true" else 0}'
+                    return f'{field} == {to_value(node.value, node.field, marqo_field_type)}'
+                elif isinstance(node, search_filter.RangeTerm):
+                    lower = f'{field} >= {node.lower}' if node.lower is not None else None
+                    upper = f'{field} <= {node.upper}' if node.upper is not None else None
+                    if lower and upper:
+                        return f'({lower} and {upper})'
+                    elif lower:
+                        return lower
+                    elif upper:
+                        return upper
+                    else:
+                        raise InternalError('RangeTerm has no lower or upper bound')
+                elif isinstance(node, search_filter.InTerm):
+                    int_field_types = [FieldType.Int, FieldType.Long, FieldType.ArrayInt, FieldType.ArrayLong]
+                    if marqo_field_type not in str_field_types + int_field_types:
+                        raise InvalidDataTypeError(
+                            f"The IN filter operator is only supported for the following field types: "
+                            f"{[t.value for t in str_field_types + int_field_types]}. However, '{node.field}' "
+                            f"is of unsupported type: '{marqo_field_type}'."
+                        )
+                    if not node.value_list:
+                        return 'false'
+                    return '(' + ' or '.join(f'{field} == {to_value(value, node.field, marqo_field_type)}'
+                                             for value in node.value_list) + ')'
+
+            raise InternalError(f'Unknown node type {type(node)}')
+
+        return tree_to_selection(marqo_filter.root)
+
     def _get_select_attributes(self, marqo_query: MarqoQuery) -> str:
         if marqo_query.attributes_to_retrieve is not None:
             return ', '.join(marqo_query.attributes_to_retrieve)
@@ -864,7 +996,8 @@ class StructuredVespaIndex(VespaIndex):
                                         f'Valid tensor field names are {", ".join(tensor_field_map.keys())}')
 
     def _verify_marqo_tensor_field(self, field_name: str, field_value: Dict[str, Any]):
-        if not set(field_value.keys()) == {constants.MARQO_DOC_CHUNKS, constants.MARQO_DOC_EMBEDDINGS}:
+        if not set(field_value.keys()) - {constants.MARQO_DOC_CENTROID} == {constants.MARQO_DOC_CHUNKS,
+                                                                             constants.MARQO_DOC_EMBEDDINGS}:
             # TODO should this be InvalidTensorFieldError?
             raise InternalError(f'Invalid tensor field {field_name}. '
                                 f'Expected keys {constants.MARQO_DOC_CHUNKS}, {constants.MARQO_DOC_EMBEDDINGS} '
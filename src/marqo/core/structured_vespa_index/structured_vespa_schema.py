@@ -155,6 +155,11 @@ class StructuredVespaSchema(VespaSchema):
                 )
             )
 
+        if self._index_request.store_centroids:
+            # one centroid per tensor field, only retrieved by document ID so it is neither an attribute nor indexed
+            document.append(f'field {common.FIELD_CENTROIDS} type tensor<float>(p{{}}, x[{model_dim}]) {{ '
+                            f'indexing: summary }}')
+
         # vector count field
         document.append(f'field {common.FIELD_VECTOR_COUNT} type int {{ indexing: attribute | summary }}')
 
@@ -172,6 +177,7 @@ class StructuredVespaSchema(VespaSchema):
             distance_metric=self._index_request.distance_metric,
             vector_numeric_type=self._index_request.vector_numeric_type,
             hnsw_config=self._index_request.hnsw_config,
+            store_centroids=self._index_request.store_centroids,
             marqo_version=self._index_request.marqo_version,
             created_at=self._index_request.created_at,
             updated_at=self._index_request.updated_at,
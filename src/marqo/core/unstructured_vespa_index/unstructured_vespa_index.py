@@ -1,8 +1,9 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 
 import marqo.core.constants as index_constants
 import marqo.core.search.search_filter as search_filter
 from marqo.api import exceptions as errors
+from marqo.core.exceptions import VespaDocumentParsingError
 from marqo.core.models import MarqoQuery
 from marqo.core.models.marqo_query import (MarqoTensorQuery, MarqoLexicalQuery, MarqoHybridQuery)
 from marqo.core.models.hybrid_parameters import RankingMethod, RetrievalMethod
@@ -223,6 +224,84 @@ class UnstructuredVespaIndex(VespaIndex):
         if marqo_query.filter is not None:
             return tree_to_filter_string(marqo_query.filter.root)
 
+    def to_vespa_document_selection(self, marqo_filter: search_filter.SearchFilter) -> str:
+        schema = self._marqo_index.schema_name
+
+        def escape(s: str) -> str:
+            return s.replace('\\', '\\\\').replace('"', '\\"')
+
+        def map_value(map_field: str, key: str) -> str:
+            return f'{schema}.{map_field}{{"{escape(key)}"}}'
+
+        def generate_equality_selection(node: search_filter.EqualityTerm) -> str:
+            if node.field == index_constants.MARQO_DOC_ID:
+                return f'{schema}.{unstructured_common.VESPA_FIELD_ID} == "{escape(node.value)}"'
+
+            selection_parts = []
+            if node.value.lower() in self._FILTER_STRING_BOOL_VALUES:
+                filter_value = int(node.value.lower() == "true")
+                selection_parts.append(f'{map_value(unstructured_common.BOOL_FIELDS, node.field)} == {filter_value}')
+
+            selection_parts.append(
+                f'{map_value(unstructured_common.SHORT_STRINGS_FIELDS, node.field)} == "{escape(node.value)}"')
+            selection_parts.append(
+                f'{schema}.{unstructured_common.STRING_ARRAY} == "{escape(node.field)}::{escape(node.value)}"')
+
+            try:
+                numeric_value = int(node.value)
+                selection_parts.append(f'{map_value(unstructured_common.INT_FIELDS, node.field)} == {numeric_value}')
+                selection_parts.append(f'{map_value(unstructured_common.FLOAT_FIELDS, node.field)} == {numeric_value}')
+            except ValueError:
+                try:
+                    numeric_value = float(node.value)
+                    selection_parts.append(
+                        f'{map_value(unstructured_common.FLOAT_FIELDS, node.field)} == {numeric_value}')
+                except ValueError:
+                    pass
+
+            return f"({' or '.join(selection_parts)})"
+
+        def generate_range_selection(node: search_filter.RangeTerm) -> str:
+            if node.lower is None and node.upper is None:
+                raise InternalError('RangeTerm has no lower or upper bound')
+
+            selection_parts = []
+            for map_field in [unstructured_common.FLOAT_FIELDS, unstructured_common.INT_FIELDS]:
+                value = map_value(map_field, node.field)
+                bounds = []
+                if node.lower is not None:
+                    bounds.append(f'{value} >= {node.lower}')
+                if node.upper is not None:
+                    bounds.append(f'{value} <= {node.upper}')
+                selection_parts.append(f"({' and '.join(bounds)})")
+
+            return f"({' or '.join(selection_parts)})"
+
+        def tree_to_selection(node: search_filter.Node) -> str:
+            if isinstance(node, search_filter.Operator):
+                if isinstance(node, search_filter.And):
+                    operator = 'and'
+                elif isinstance(node, search_filter.Or):
+                    operator = 'or'
+                else:
+                    raise InternalError(f'Unknown operator type {type(node)}')
+                return f'({tree_to_selection(node.left)} {operator} {tree_to_selection(node.right)})'
+            elif isinstance(node, search_filter.Modifier):
+                if isinstance(node, search_filter.Not):
+                    return f'(not {tree_to_selection(node.modified)})'
+                else:
+                    raise InternalError(f'Unknown modifier type {type(node)}')
+            elif isinstance(node, search_filter.Term):
+                if isinstance(node, search_filter.EqualityTerm):
+                    return generate_equality_selection(node)
+                elif isinstance(node, search_filter.RangeTerm):
+                    return generate_range_selection(node)
+                elif isinstance(node, search_filter.InTerm):
+                    raise InvalidArgumentError("The 'IN' filter keyword is not yet supported for unstructured indexes")
+            raise InternalError(f'Unknown node type {type(node)}')
+
+        return tree_to_selection(marqo_filter.root)
+
     def _get_lexical_search_term(self, marqo_query: MarqoLexicalQuery) -> str:
         if isinstance(marqo_query, MarqoHybridQuery):
             score_modifiers = marqo_query.hybrid_parameters.scoreModifiersLexical
@@ -393,6 +472,40 @@ class UnstructuredVespaIndex(VespaIndex):
             'timeout': '5s'
         }
 
+    def get_vector_field_set(self, centroids: bool = False) -> str:
+        if centroids:
+            raise InternalError('Centroids are not stored in legacy unstructured indexes')
+        fields = [unstructured_common.VESPA_FIELD_ID, unstructured_common.VESPA_DOC_CHUNKS,
+                  unstructured_common.VESPA_DOC_EMBEDDINGS]
+        return f'{self._marqo_index.schema_name}:{",".join(fields)}'
+
+    def to_tensor_field_vectors(self, vespa_document: Dict[str, Any],
+                                centroids: bool = False) -> Dict[str, List[List[float]]]:
+        if centroids:
+            raise InternalError('Centroids are not stored in legacy unstructured indexes')
+        fields = vespa_document.get('fields', {})
+        chunks = fields.get(unstructured_common.VESPA_DOC_CHUNKS, [])
+        embeddings = fields.get(unstructured_common.VESPA_DOC_EMBEDDINGS, {})
+        if not chunks or not embeddings:
+            return dict()
+
+        try:
+            embeddings_list = list(embeddings['blocks'].values())
+        except (KeyError, AttributeError, TypeError) as e:
+            raise VespaDocumentParsingError(f'Cannot parse embeddings for document '
+                                            f'_id={fields.get(unstructured_common.VESPA_FIELD_ID)}') from e
+        if len(chunks) != len(embeddings_list):
+            raise VespaDocumentParsingError(f'Number of chunks and embeddings do not match for document '
+                                            f'_id={fields.get(unstructured_common.VESPA_FIELD_ID)}')
+
+        vectors = dict()
+        for chunk, embedding in zip(chunks, embeddings_list):
+            if self._RESERVED_FIELD_SUBSTRING not in chunk:
+                raise VespaDocumentParsingError(f'Chunk {chunk} does not have a field_name::content format')
+            field_name = chunk.split(self._RESERVED_FIELD_SUBSTRING, 1)[0]
+            vectors.setdefault(field_name, []).append(embedding)
+        return vectors
+
     @classmethod
     def validate_field_content(cls, field_content: Any, is_tensor_field: bool) -> Any:
         """
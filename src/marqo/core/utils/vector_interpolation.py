@@ -1,7 +1,7 @@
 import abc
 import math
 from enum import Enum
-from typing import List
+from typing import List, Union
 
 import numpy as np
 
@@ -69,23 +69,15 @@ class Lerp(VectorInterpolation):
         if len(vectors) != len(weights):
             raise ValueError('Vectors and weights must have the same length')
 
-        weight_sum = sum(weights)
+        weights = np.asarray(weights, dtype=float)
+        weight_sum = weights.sum()
 
         if weight_sum == 0:
             raise ZeroSumWeightsError(
                 'Sum of weights is zero. LERP cannot interpolate vectors with zero sum of weights'
             )
 
-        result = [0] * len(vectors[0])
-        current_length = len(vectors[0])
-        for vector, weight in zip(vectors, weights):
-            if len(vector) != current_length:
-                raise ValueError('Vectors must have the same length')
-            current_length = len(vector)
-
-            for i, value in enumerate(vector):
-                result[i] += (weight / weight_sum) * value
-        return result
+        return ((weights / weight_sum) @ _as_matrix(vectors)).tolist()
 
 
 class Nlerp(Lerp):
@@ -107,15 +99,15 @@ class Nlerp(Lerp):
             ZeroSumWeightsError: If the sum of the weights is zero
             ZeroMagnitudeVectorError: If the interpolated vector has zero magnitude
         """
-        lerp_result = super().interpolate(vectors, weights)
-        length = math.sqrt(sum(x ** 2 for x in lerp_result))
+        lerp_result = np.array(super().interpolate(vectors, weights))
+        length = np.linalg.norm(lerp_result)
 
         if length == 0:
             raise ZeroMagnitudeVectorError(
                 'Interpolated vector has zero magnitude. Cannot normalize a vector with zero magnitude'
             )
 
-        return [x / length for x in lerp_result]
+        return (lerp_result / length).tolist()
 
 
 class Slerp(VectorInterpolation):
@@ -209,29 +201,65 @@ class Slerp(VectorInterpolation):
         return result
 
     def _interpolate_hierarchical(self, vectors: List[List[float]], weights: List[float]) -> List[float]:
-        while len(vectors) > 1:
-            result = []
-            new_weights = []
-            for i in range(0, len(vectors), 2):
-                if i + 1 == len(vectors):
-                    # if there is an odd number of vectors, just append the last one
-                    result.append(vectors[i])
-                    new_weights.append(weights[i])
-                    continue
-
-                w0 = weights[i]
-                w1 = weights[i + 1]
-                sum = w0 + w1
-
-                if sum == 0:
+        """
+        Interpolates adjacent pairs of vectors, level by level, until a single vector is left. All pairs of a level
+        are interpolated at once. If a level has an odd number of vectors, the last one is carried to the next level.
+        """
+        matrix = _as_matrix(vectors)
+        weights = np.asarray(weights, dtype=float)
+
+        while len(matrix) > 1:
+            pair_count = len(matrix) // 2
+            v0, v1 = matrix[0:2 * pair_count:2], matrix[1:2 * pair_count:2]
+            w0, w1 = weights[0:2 * pair_count:2], weights[1:2 * pair_count:2]
+            weight_sums = w0 + w1
+            norms_v0, norms_v1 = np.linalg.norm(v0, axis=1), np.linalg.norm(v1, axis=1)
+
+            zero_sum = weight_sums == 0
+            zero_length = (norms_v0 == 0) | (norms_v1 == 0)
+            if zero_sum.any() or zero_length.any():
+                # Raise the error of the first failing pair, as interpolating the pairs in order would
+                i = int(np.argmax(zero_sum | zero_length))
+                if zero_sum[i]:
                     raise ZeroSumWeightsError('Sum of weights {} and {} is zero. SLERP cannot interpolate '
-                                              'vectors with a sum weight of zero'.format(w0, w1))
+                                              'vectors with a sum weight of zero'.format(w0[i], w1[i]))
+                raise ValueError('One or more vectors had zero length. '
+                                 'SLERP cannot interpolate vectors with zero length')
+
+            t = (w1 / weight_sums)[:, np.newaxis]
+            cos = np.clip(np.einsum('ij,ij->i', v0, v1) / (norms_v0 * norms_v1), -1.0, 1.0)
+            theta = np.arccos(cos)[:, np.newaxis]
+            sin_theta = np.sin(theta)
+
+            linear = (1 - t) * v0 + t * v1
+            with np.errstate(divide='ignore', invalid='ignore'):
+                slerped = np.sin((1 - t) * theta) / sin_theta * v0 + np.sin(t * theta) / sin_theta * v1
+            # Co-linear vectors get a linear interpolation
+            interpolated = np.where(sin_theta == 0, linear, slerped)
+
+            if len(matrix) % 2 == 1:
+                interpolated = np.vstack([interpolated, matrix[-1:]])
+                weight_sums = np.append(weight_sums * 0.5, weights[-1])
+            else:
+                weight_sums = weight_sums * 0.5
+
+            matrix, weights = interpolated, weight_sums
+
+        return matrix[0].tolist()
+
+
+def _as_matrix(vectors: Union[List[List[float]], np.ndarray]) -> np.ndarray:
+    """
+    Stacks the vectors into a 2D float array, one vector per row.
+
+    Raises:
+        ValueError: If the vectors do not all have the same length
+    """
+    if isinstance(vectors, np.ndarray):
+        return vectors.astype(float, copy=False)
 
-                result.append(
-                    self._slerp(vectors[i], vectors[i + 1], w1 / sum)
-                )
-                new_weights.append(sum / 2)
-            vectors = result
-            weights = new_weights
+    length = len(vectors[0])
+    if any(len(vector) != length for vector in vectors):
+        raise ValueError('Vectors must have the same length')
 
-        return vectors[0]
+    return np.array(vectors, dtype=float)
@@ -4,7 +4,10 @@ from contextlib import ExitStack
 from timeit import default_timer as timer
 from typing import List, Dict, Optional, Any, Tuple, Set
 
+import numpy as np
+
 from marqo.api import exceptions as api_errors
+from marqo.core import constants
 from marqo.core.constants import MARQO_DOC_ID, MARQO_CUSTOM_VECTOR_NORMALIZATION_MINIMUM_VERSION
 from marqo.core.models.add_docs_params import AddDocsParams, BatchVectorisationMode
 from marqo.core.inference.tensor_fields_container import Chunker, TensorFieldsContainer, TensorFieldContent, \
@@ -224,6 +227,19 @@ class AddDocumentsHandler(ABC):
         """
         pass
 
+    def _to_marqo_tensor(self, tensor_field_content: TensorFieldContent) -> Dict[str, Any]:
+        """
+        Convert the chunks and embeddings of a tensor field to the tensor format of a Marqo doc. If the index stores
+        centroids, the normalised centroid of the field's embeddings is added as well.
+        """
+        marqo_tensor = {
+            constants.MARQO_DOC_CHUNKS: tensor_field_content.tensor_field_chunks,
+            constants.MARQO_DOC_EMBEDDINGS: tensor_field_content.tensor_field_embeddings,
+        }
+        if self.marqo_index.store_centroids and tensor_field_content.tensor_field_embeddings:
+            marqo_tensor[constants.MARQO_DOC_CENTROID] = get_centroid(tensor_field_content.tensor_field_embeddings)
+        return marqo_tensor
+
     def _convert_to_vespa_docs(self) -> List[VespaDocument]:
         vespa_docs = []
         for doc_id, doc in self.add_docs_response_collector.marqo_docs.copy().items():
@@ -403,6 +419,12 @@ class AddDocumentsHandler(ABC):
 
         return media_repo
 
+    def _image_urls_to_chunk(self) -> List[str]:
+        """Urls of the top-level image tensor fields, which are chunked with the patch method if the index has one"""
+        return [tensor_field_content.field_content for _, _, tensor_field_content in
+                self.tensor_fields_container.tensor_fields_to_vectorise(FieldType.ImagePointer)
+                if tensor_field_content.is_tensor_field and not tensor_field_content.chunks]
+
     def _field_type_chunker_map(self, media_repo):
         chunkers: Dict[FieldType, Chunker] = {
             FieldType.Text: TextChunker(text_preprocessing=self.marqo_index.text_preprocessing,
@@ -410,9 +432,20 @@ class AddDocumentsHandler(ABC):
                                             self.add_docs_params.text_chunk_prefix)),
             FieldType.ImagePointer: ImageChunker(media_repo=media_repo,
                                                  image_preprocessing=self.marqo_index.image_preprocessing,
-                                                 device=self.add_docs_params.device),
+                                                 device=self.add_docs_params.device,
+                                                 urls_to_chunk=self._image_urls_to_chunk()),
             FieldType.AudioPointer: AudioVideoChunker(media_repo=media_repo),
             FieldType.VideoPointer: AudioVideoChunker(media_repo=media_repo),
         }
         return chunkers
 
+
+def get_centroid(embeddings: List[List[float]]) -> List[float]:
+    """
+    Returns the mean of the embeddings, normalised to unit length. The mean is returned as is if it has zero length.
+    """
+    centroid = np.mean(np.asarray(embeddings, dtype=np.float64), axis=0)
+    norm = np.linalg.norm(centroid)
+    if norm > 0:
+        centroid = centroid / norm
+    return centroid.tolist()
@@ -5,6 +5,7 @@ from marqo.core import constants
 from marqo.core.models import MarqoQuery, MarqoHybridQuery, MarqoTensorQuery, MarqoLexicalQuery, MarqoIndex
 from marqo.core.models.marqo_index import StructuredMarqoIndex, UnstructuredMarqoIndex
 from marqo.core.models.score_modifier import ScoreModifier, ScoreModifierType
+from marqo.core.search.search_filter import SearchFilter
 from marqo.core.models.marqo_index import *
 from marqo.exceptions import InternalError
 
@@ -97,12 +98,58 @@ class VespaIndex(ABC):
         """
         pass
 
+    @abstractmethod
+    def to_vespa_document_selection(self, marqo_filter: SearchFilter) -> str:
+        """
+        Convert a filter to a Vespa document selection, to visit or delete the documents the filter matches.
+
+        Unlike filtering in a search, comparisons in a document selection are exact, so string values match
+        case-sensitively.
+
+        Args:
+            marqo_filter: The filter to convert
+
+        Returns:
+            A document selection expression, see https://docs.vespa.ai/en/reference/document-select-language.html
+        """
+        pass
+
     @abstractmethod
     def get_vespa_id_field(self) -> str:
         """
         Get the name of the id field in Vespa documents, inside the 'fields' dictionary."""
         pass
 
+    @abstractmethod
+    def get_vector_field_set(self, centroids: bool = False) -> str:
+        """
+        Get the Vespa field set that retrieves only the id and the stored vectors of a document.
+
+        The returned value can be passed as the `fieldSet` of a Vespa document GET request, so that the text, metadata
+        and other fields of the document are not read and returned.
+
+        Args:
+            centroids: If True, retrieve the centroid of each tensor field instead of the vectors of all its chunks.
+                Only valid for indexes with `store_centroids`
+        """
+        pass
+
+    @abstractmethod
+    def to_tensor_field_vectors(self, vespa_document: Dict[str, Any],
+                                centroids: bool = False) -> Dict[str, List[List[float]]]:
+        """
+        Extract the vectors of each tensor field from a Vespa document retrieved with the field set returned by
+        `get_vector_field_set`.
+
+        Args:
+            vespa_document: The Vespa document, with a 'fields' dictionary
+            centroids: If True, extract the centroid of each tensor field, as a list of one vector
+
+        Returns:
+            A dictionary of tensor field name to the list of vectors of that field's chunks
+        """
+        pass
+
     def _convert_score_modifiers_to_tensors(self, score_modifiers: List[ScoreModifier]) -> Dict[
         str, Dict[str, float]]:
         """
@@ -12,6 +12,9 @@ class MarqoInferenceCache:
 
     The key is a string consisting of model_cache_key and content to identify the cache.
     The value is a list of floats representing the embeddings.
+
+    The hits and misses of `get` are counted for monitoring. The counts are not locked, so concurrent lookups may
+    very occasionally be missed.
     """
 
     _CACHE_TYPES_MAPPING = {
@@ -21,6 +24,8 @@ class MarqoInferenceCache:
 
     def __init__(self, cache_size: int = 0, cache_type: Union[None, str, MarqoCacheType] = MarqoCacheType.LRU):
         self._cache = self._build_cache(cache_size, cache_type)
+        self.hits = 0
+        self.misses = 0
 
     def _build_cache(self, cache_size: int, cache_type: MarqoCacheType) -> Optional[MarqoAbstractCache]:
         """Return a cache instance based on the cache type and size.
@@ -54,7 +59,12 @@ class MarqoInferenceCache:
 
     def get(self, model_cache_key: str, content: str, default=None) -> Optional[List[float]]:
         key = self._generate_key(model_cache_key, content)
-        return self._cache.get(key, default)
+        value = self._cache.get(key, default)
+        if value is default:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
 
     def set(self, model_cache_key: str, content: str, value: List[float]) -> None:
         self.__setitem__(model_cache_key, content, value)
@@ -84,9 +94,11 @@ class MarqoInferenceCache:
         return f"{model_cache_key}||{content}"
 
     def clear(self) -> None:
-        """Clear the cache."""
+        """Clear the cache and its hit and miss counts."""
         if self._cache is not None:
             self._cache.clear()
+        self.hits = 0
+        self.misses = 0
 
     def is_enabled(self) -> bool:
         """Return True if the cache is enabled, else False."""
@@ -0,0 +1,58 @@
+"""Helpers for arranging content into batches before it is passed to a model's encode function."""
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.utils import read_env_vars_and_defaults
+
+
+def is_length_bucketed_batching_enabled() -> bool:
+    """Returns True if MARQO_ENABLE_LENGTH_BUCKETED_BATCHING is set to 'true' (case-insensitive)."""
+    flag = read_env_vars_and_defaults(EnvVars.MARQO_ENABLE_LENGTH_BUCKETED_BATCHING)
+    return flag is not None and str(flag).lower() == 'true'
+
+
+def get_length_bucketed_order(content: Sequence) -> Optional[List[int]]:
+    """Returns the order in which the content should be encoded so that items of similar length share a batch.
+
+    Batches are padded to their longest item, so a 5-token chunk batched with a 500-token chunk costs as much as
+    a 500-token chunk. Sorting the whole input by length before it is cut into batches means each batch only pads
+    to the longest item of its own bucket. Character length is used as a proxy for token length so the content
+    does not have to be tokenised twice.
+
+    Args:
+        content: The content to be encoded
+
+    Returns:
+        The indices of the content, longest first, or None if the content cannot be bucketed
+        (e.g. it is not all text) or is already in bucketed order.
+    """
+    if len(content) < 2 or not all(isinstance(item, str) for item in content):
+        return None
+
+    # Longest first, so that a batch that does not fit in memory fails on the first batch. sorted is stable,
+    # so items of the same length keep their original relative order
+    order = sorted(range(len(content)), key=lambda i: len(content[i]), reverse=True)
+
+    if order == list(range(len(content))):
+        return None
+    return order
+
+
+def restore_original_order(vectors: np.ndarray, order: List[int]) -> np.ndarray:
+    """Scatters vectors encoded in `order` back to the original order of the content.
+
+    Args:
+        vectors: Vectors where vectors[i] is the embedding of content[order[i]]
+        order: The order returned by get_length_bucketed_order
+
+    Returns:
+        Vectors where row i is the embedding of content[i]
+    """
+    if len(vectors) != len(order):
+        raise ValueError(f"Expected {len(order)} vectors to reorder but received {len(vectors)}")
+
+    restored = np.empty_like(vectors)
+    restored[order] = vectors
+    return restored
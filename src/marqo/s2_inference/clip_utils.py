@@ -22,10 +22,16 @@ from torchvision.transforms import InterpolationMode
 from marqo import marqo_docs
 from marqo.api.exceptions import InternalError
 from marqo.core.inference.models.abstract_clip_model import AbstractCLIPModel
-from marqo.core.inference.models.open_clip_model_properties import OpenCLIPModelProperties, ImagePreprocessor
+from marqo.core.inference.models.open_clip_model_properties import OpenCLIPModelProperties, ImagePreprocessor, \
+    Precision
 from marqo.s2_inference.configs import ModelCache
 from marqo.s2_inference.errors import InvalidModelPropertiesError, ImageDownloadError
+from marqo.s2_inference.image_preprocessing import preprocess_images
 from marqo.s2_inference.logger import get_logger
+from marqo.s2_inference.models.model_runtime import ModelRuntime
+from marqo.s2_inference.onnx_runtime_utils import (ONNXExportedModule, OpenCLIPTextExportWrapper,
+                                                   OpenCLIPImageExportWrapper, validate_runtime_for_device,
+                                                   get_export_dir)
 from marqo.s2_inference.processing.custom_clip_utils import HFTokenizer, download_model
 from marqo.s2_inference.types import *
 from marqo.tensor_search.enums import ModelProperties, InferenceParams
@@ -445,9 +451,7 @@ class CLIP:
         else:
             image_input: List[Union[ImageType, Tensor]] = [format_and_load_CLIP_image(images, image_download_headers)]
 
-        image_input_processed: Tensor = torch.stack([self.preprocess(_img).to(self.device) \
-                                                         if not isinstance(_img, torch.Tensor) else _img \
-                                                     for _img in image_input])
+        image_input_processed: Tensor = preprocess_images(image_input, self.preprocess, self.device)
         return image_input_processed
 
     def encode_image(self, images: Union[str, ImageType, List[Union[str, ImageType, Tensor]], Tensor],
@@ -535,6 +539,8 @@ class OPEN_CLIP(AbstractCLIPModel):
 
         # model_auth gets passed through add_docs and search requests:
         self.preprocess_config = None
+        self.onnx_text_module: Optional[ONNXExportedModule] = None
+        self.onnx_image_module: Optional[ONNXExportedModule] = None
 
     def _build_model_properties(self, model_properties: dict):
         return OpenCLIPModelProperties(**model_properties)
@@ -559,6 +565,43 @@ class OPEN_CLIP(AbstractCLIPModel):
         self.model = self.model.to(self.device)
         self.model.eval()
 
+        if self.model_properties.runtime != ModelRuntime.Torch:
+            self._load_onnx_modules()
+
+    def _load_onnx_modules(self) -> None:
+        """Export the text and image towers to ONNX for the requested runtime. A tower whose export or parity
+        check fails keeps running with torch."""
+        validate_runtime_for_device(self.model_properties.runtime, self.device)
+        if self.model_properties.precision != Precision.FP32:
+            raise InvalidModelPropertiesError(
+                f"The runtime '{self.model_properties.runtime.value}' only supports precision "
+                f"'{Precision.FP32.value}', but received precision '{self.model_properties.precision.value}'.")
+
+        export_dir = get_export_dir(self.model_properties.name, self.model_properties.dict(exclude_none=True))
+
+        image_size = getattr(self.model.visual, "image_size", 224)
+        if isinstance(image_size, int):
+            image_size = (image_size, image_size)
+        generator = torch.Generator().manual_seed(0)
+        sample_images = torch.randn(2, 3, *image_size, generator=generator)
+        sample_text = self.tokenizer(["a photo of a hippo", "a diagram of the marqo architecture"])
+
+        for component, wrapper, sample_inputs in [
+            ("text", OpenCLIPTextExportWrapper, {"text": sample_text}),
+            ("image", OpenCLIPImageExportWrapper, {"image": sample_images})
+        ]:
+            onnx_module = ONNXExportedModule(
+                module=wrapper(self.model).eval(),
+                sample_inputs=sample_inputs,
+                dynamic_axes={name: {0: "batch_size"} for name in sample_inputs},
+                export_dir=export_dir,
+                component=component,
+                runtime=self.model_properties.runtime,
+                device=self.device
+            )
+            if onnx_module.load():
+                setattr(self, f"onnx_{component}_module", onnx_module)
+
     def _check_loaded_components(self):
         """Check if the open_clip model, tokenizer, and image preprocessor are loaded.
 
@@ -740,12 +783,16 @@ class OPEN_CLIP(AbstractCLIPModel):
 
         self.image_input_processed: Tensor = self._preprocess_images(images, image_download_headers)
 
-        with torch.no_grad():
-            if self.device.startswith("cuda"):
-                with torch.cuda.amp.autocast():
+        if self.onnx_image_module is not None:
+            outputs = torch.from_numpy(
+                self.onnx_image_module.run({"image": self.image_input_processed.cpu().numpy()}))
+        else:
+            with torch.no_grad():
+                if self.device.startswith("cuda"):
+                    with torch.cuda.amp.autocast():
+                        outputs = self.model.encode_image(self.image_input_processed).to(torch.float32)
+                else:
                     outputs = self.model.encode_image(self.image_input_processed).to(torch.float32)
-            else:
-                outputs = self.model.encode_image(self.image_input_processed).to(torch.float32)
 
         if normalize:
             _shape_before = outputs.shape
@@ -757,14 +804,18 @@ class OPEN_CLIP(AbstractCLIPModel):
         if self.model is None:
             self.load()
 
-        text = self.tokenizer(sentence).to(self.device)
+        text = self.tokenizer(sentence)
 
-        with torch.no_grad():
-            if self.device.startswith("cuda"):
-                with torch.cuda.amp.autocast():
+        if self.onnx_text_module is not None:
+            outputs = torch.from_numpy(self.onnx_text_module.run({"text": text.numpy()}))
+        else:
+            text = text.to(self.device)
+            with torch.no_grad():
+                if self.device.startswith("cuda"):
+                    with torch.cuda.amp.autocast():
+                        outputs = self.model.encode_text(text).to(torch.float32)
+                else:
                     outputs = self.model.encode_text(text).to(torch.float32)
-            else:
-                outputs = self.model.encode_text(text).to(torch.float32)
 
         if normalize:
             _shape_before = outputs.shape
@@ -840,7 +891,7 @@ class MULTILINGUAL_CLIP(CLIP):
         else:
             image_input = [format_and_load_CLIP_image(images, {})]
 
-        self.image_input_processed = torch.stack([self.preprocess(_img).to(self.device) for _img in image_input])
+        self.image_input_processed = preprocess_images(image_input, self.preprocess, self.device)
 
         with torch.no_grad():
             outputs = self.visual_model.forward(self.image_input_processed)
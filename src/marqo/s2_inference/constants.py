@@ -28,4 +28,12 @@ PATCH_MODELS = {
     'simple', 'overlap', 'fastercnn', 'frcnn', 'marqo-yolo', 'yolox', 'dino-v1', 'dino-v2', 'dino/v1', 'dino/v2'
 }
 
+PATCH_MODEL_SIZES = {
+    # The sizes of the models used by the image chunking (patch) methods, for the memory threshold accounting.
+    "faster_rcnn": 0.5,
+    "yolox": 0.1,
+    "vit_small": 0.1,
+    "vit_base": 0.35,
+}
+
 PREPROCESS_IMAGE_MODEL_LIST = [ModelType.CLIP, ModelType.OpenCLIP]
@@ -15,6 +15,10 @@ from marqo.tensor_search.enums import ModelProperties
 from marqo.s2_inference.errors import InvalidModelPropertiesError, ModelDownloadError
 from marqo.s2_inference.processing.custom_clip_utils import download_model
 from marqo.s2_inference.configs import ModelCache
+from marqo.s2_inference.models.model_runtime import ModelRuntime
+from marqo.s2_inference.onnx_runtime_utils import (
+    ONNXExportedModule, SentenceEmbeddingExportWrapper, get_model_runtime, validate_runtime_for_device,
+    get_export_dir)
 
 
 
@@ -31,8 +35,15 @@ class HF_MODEL(Model):
         self.model_properties = kwargs.get("model_properties", dict())
         self.model_name = self.model_properties.get("name", None)
         self.model_auth = kwargs.get(InferenceParams.model_auth, None)
+        self.runtime = get_model_runtime(self.model_properties)
+        self.onnx_module = None
 
     def load(self) -> None:
+        self._load_torch_model()
+        if self.runtime != ModelRuntime.Torch:
+            self._load_onnx_module()
+
+    def _load_torch_model(self) -> None:
 
         model_location_presence = ModelProperties.model_location in self.model_properties
         path = self.model_properties.get("localpath", None) or self.model_properties.get("url", None)
@@ -74,6 +85,27 @@ class HF_MODEL(Model):
                 f"This is likely to be caused by an internet issue. Please check Marqo's internet connection to Hugging Face and retry. \n"
                 f" Original error message = {e}")
 
+    def _load_onnx_module(self) -> None:
+        """Export the loaded model to ONNX for the requested runtime. If the export or the parity check fails,
+        the model keeps running with torch."""
+        validate_runtime_for_device(self.runtime, self.device)
+        sample_inputs = self.tokenizer(
+            ["Marqo exports this model to ONNX.", "hello",
+             "A longer sample sentence makes sure that the exported graph handles padding in the attention mask."],
+            padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="pt")
+        sample_inputs = {name: tensor for name, tensor in sample_inputs.items()}
+        onnx_module = ONNXExportedModule(
+            module=SentenceEmbeddingExportWrapper(self.model, sample_inputs.keys()).eval(),
+            sample_inputs=sample_inputs,
+            dynamic_axes={name: {0: "batch_size", 1: "sequence_length"} for name in sample_inputs},
+            export_dir=get_export_dir(self.model_path, self.model_properties),
+            component="text",
+            runtime=self.runtime,
+            device=self.device
+        )
+        if onnx_module.load():
+            self.onnx_module = onnx_module
+
     def _load_from_private_hf_repo(self) -> None:
         """
         Load a private model from a huggingface repo directly using the `repo_id` attribute in `model_properties`
@@ -134,6 +166,9 @@ class HF_MODEL(Model):
         if self.model is None:
             self.load()
 
+        if self.onnx_module is not None:
+            return self._encode_with_onnx(sentence, normalize)
+
         self.model.normalize = normalize
         inputs = self.tokenizer(sentence, padding=True, truncation=True, max_length=self.max_seq_length,
                                 return_tensors="pt").to(self.device)
@@ -141,6 +176,14 @@ class HF_MODEL(Model):
         with torch.no_grad():
             return self._convert_output(self.model.forward(**inputs))
 
+    def _encode_with_onnx(self, sentence: List[str], normalize: bool) -> np.ndarray:
+        inputs = self.tokenizer(sentence, padding=True, truncation=True, max_length=self.max_seq_length,
+                                return_tensors="np")
+        embeddings = self.onnx_module.run(inputs)
+        if normalize:
+            embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
     def _convert_output(self, output):
         if self.device == 'cpu':
             return output.numpy()
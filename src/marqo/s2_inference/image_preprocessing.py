@@ -0,0 +1,181 @@
+"""Batched preprocessing of images for CLIP-style models.
+
+The image preprocessors of CLIP and open_clip models (including the ones `image_transform_v2` builds from a
+`PreprocessCfg`) are a torchvision `Compose` of PIL transforms (resize, crop, RGB conversion) followed by
+`ToTensor` and `Normalize`. Applying the whole `Compose` to one image at a time converts and normalises every image
+separately and copies each one to the device on its own.
+
+`BatchImagePreprocessor` splits the `Compose` at `ToTensor`. The PIL transforms still run per image, as images
+have different sizes until they are resized, but they run on a thread pool (PIL releases the GIL while decoding and
+resizing). The resulting uint8 arrays are stacked, copied to the device once, and converted to float and
+normalised as one tensor op. This gives the same values as applying the `Compose` to each image.
+
+Optionally (MARQO_ENABLE_IMAGE_DRAFT_DECODE), JPEGs are decoded with PIL's draft mode, which lets the decoder
+downscale large images by a power of two while decoding. This is much faster for large photos but changes the
+pixel values slightly, so it is disabled by default. A Pillow-SIMD install speeds up the PIL transforms
+transparently.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+from PIL import Image
+from torchvision.transforms import Normalize, ToTensor
+
+from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.utils import read_env_vars_and_defaults, read_env_vars_and_defaults_ints
+
+
+def is_batched_image_preprocessing_enabled() -> bool:
+    """Returns True if MARQO_ENABLE_BATCHED_IMAGE_PREPROCESSING is set to 'true' (the default)."""
+    flag = read_env_vars_and_defaults(EnvVars.MARQO_ENABLE_BATCHED_IMAGE_PREPROCESSING)
+    return flag is not None and str(flag).lower() == 'true'
+
+
+def is_image_draft_decode_enabled() -> bool:
+    """Returns True if MARQO_ENABLE_IMAGE_DRAFT_DECODE is set to 'true' (case-insensitive)."""
+    flag = read_env_vars_and_defaults(EnvVars.MARQO_ENABLE_IMAGE_DRAFT_DECODE)
+    return flag is not None and str(flag).lower() == 'true'
+
+
+class BatchImagePreprocessor:
+    """Applies an image preprocessor to a batch of images, converting and normalising them as one tensor.
+
+    Args:
+        preprocess: The model's image preprocessor. If it is not a `Compose` ending in `ToTensor` and an optional
+            `Normalize`, `supports_batching` is False and images are preprocessed one at a time.
+    """
+
+    def __init__(self, preprocess: Callable):
+        self.preprocess = preprocess
+        self._image_transforms: Optional[List[Callable]] = None
+        self._mean: Optional[torch.Tensor] = None
+        self._std: Optional[torch.Tensor] = None
+        self._split_preprocess(preprocess)
+        self._draft_size = self._get_draft_size() if is_image_draft_decode_enabled() else None
+
+    @property
+    def supports_batching(self) -> bool:
+        return self._image_transforms is not None
+
+    def prepare(self, image: Union[Image.Image, torch.Tensor]) -> Union[np.ndarray, torch.Tensor]:
+        """Runs the per-image part of the preprocessing.
+
+        Returns:
+            An (H, W, 3) uint8 array to be converted by `to_tensor`, or a tensor if the image is already a tensor,
+            could not be prepared as an RGB array, or the preprocessor does not support batching
+        """
+        if isinstance(image, torch.Tensor):
+            return image
+        if not self.supports_batching:
+            return self.preprocess(image)
+
+        if self._draft_size is not None and getattr(image, "format", None) == "JPEG":
+            image.draft("RGB", self._draft_size)
+        for transform in self._image_transforms:
+            image = transform(image)
+
+        if isinstance(image, Image.Image) and image.mode == "RGB":
+            return np.asarray(image)
+        # Anything unusual is finished one image at a time, exactly as the full preprocessor would
+        return self._finish_single(image)
+
+    def to_tensor(self, prepared: Sequence[Union[np.ndarray, torch.Tensor]], device: str) -> torch.Tensor:
+        """Stacks prepared images into a (batch_size, 3, H, W) float tensor on the device.
+
+        The uint8 arrays are copied to the device in one transfer, then converted and normalised together.
+        """
+        array_positions = [i for i, item in enumerate(prepared) if isinstance(item, np.ndarray)]
+        if len(array_positions) == len(prepared):
+            return self._normalise(np.stack(prepared), device)
+
+        outputs: List[Optional[torch.Tensor]] = [None] * len(prepared)
+        if array_positions:
+            normalised = self._normalise(np.stack([prepared[i] for i in array_positions]), device)
+            for position, tensor in zip(array_positions, normalised):
+                outputs[position] = tensor
+        for position, item in enumerate(prepared):
+            if outputs[position] is None:
+                outputs[position] = item.to(device)
+        return torch.stack(outputs)
+
+    def __call__(self, images: Sequence[Union[Image.Image, torch.Tensor]], device: str,
+                 thread_count: Optional[int] = None) -> torch.Tensor:
+        """Preprocesses the images into a (batch_size, 3, H, W) tensor on the device.
+
+        Args:
+            images: PIL images or already preprocessed image tensors
+            device: The device to move the tensor to
+            thread_count: The number of threads used for the per-image transforms. Defaults to
+                MARQO_IMAGE_PREPROCESSING_THREAD_COUNT
+        """
+        if thread_count is None:
+            thread_count = read_env_vars_and_defaults_ints(EnvVars.MARQO_IMAGE_PREPROCESSING_THREAD_COUNT) or 1
+        thread_count = min(thread_count, len(images))
+        if thread_count > 1:
+            with ThreadPoolExecutor(max_workers=thread_count) as executor:
+                prepared = list(executor.map(self.prepare, images))
+        else:
+            prepared = [self.prepare(image) for image in images]
+        return self.to_tensor(prepared, device)
+
+    def _split_preprocess(self, preprocess: Callable) -> None:
+        transforms = getattr(preprocess, "transforms", None)
+        if not isinstance(transforms, (list, tuple)):
+            return
+        to_tensor_positions = [i for i, transform in enumerate(transforms) if type(transform) is ToTensor]
+        if len(to_tensor_positions) != 1:
+            return
+        position = to_tensor_positions[0]
+        tail = list(transforms[position + 1:])
+        if len(tail) > 1 or (tail and type(tail[0]) is not Normalize):
+            return
+        if tail:
+            self._mean = torch.as_tensor(tail[0].mean, dtype=torch.float32)
+            self._std = torch.as_tensor(tail[0].std, dtype=torch.float32)
+        self._image_transforms = list(transforms[:position])
+
+    def _get_draft_size(self) -> Optional[Tuple[int, int]]:
+        """The smallest (width, height) the image can be decoded at without losing detail in the first resize.
+
+        Draft mode decodes to a size at least as large as the requested one in both dimensions.
+        """
+        for transform in self._image_transforms or []:
+            size = getattr(transform, "size", None)
+            if isinstance(size, int):
+                return size, size
+            if isinstance(size, (list, tuple)) and size:
+                if len(size) == 1:
+                    return size[0], size[0]
+                # torchvision sizes are (height, width)
+                return size[1], size[0]
+        return None
+
+    def _finish_single(self, image) -> torch.Tensor:
+        tensor = ToTensor()(image)
+        if self._mean is not None:
+            tensor = Normalize(self._mean, self._std)(tensor)
+        return tensor
+
+    def _normalise(self, arrays: np.ndarray, device: str) -> torch.Tensor:
+        # Same operations, in the same order and precision, as ToTensor followed by Normalize
+        batch = torch.from_numpy(arrays).to(device).permute(0, 3, 1, 2).to(torch.float32).div(255)
+        if self._mean is not None:
+            mean = self._mean.to(device).view(1, -1, 1, 1)
+            std = self._std.to(device).view(1, -1, 1, 1)
+            batch = batch.sub(mean).div(std)
+        return batch.contiguous()
+
+
+def preprocess_images(images: Sequence[Union[Image.Image, torch.Tensor]], preprocess: Callable,
+                      device: str) -> torch.Tensor:
+    """Preprocesses images into a (batch_size, 3, H, W) tensor on the device.
+
+    Uses `BatchImagePreprocessor` unless MARQO_ENABLE_BATCHED_IMAGE_PREPROCESSING is disabled, in which case the
+    preprocessor is applied to each image and each image is moved to the device separately.
+    """
+    if is_batched_image_preprocessing_enabled():
+        return BatchImagePreprocessor(preprocess)(images, device)
+    return torch.stack([preprocess(image).to(device) if not isinstance(image, torch.Tensor) else image
+                        for image in images])
@@ -0,0 +1,356 @@
+"""Runs model calls on a fixed pool of inference workers with a bounded intra-op thread count.
+
+FastAPI serves requests from many threads at once. Without a limit, each of them runs inference with a BLAS/torch
+thread pool sized to all cores, so N concurrent requests oversubscribe the CPU N times over and throughput collapses.
+
+When MARQO_INFERENCE_WORKER_COUNT is set, `vectorise` submits model calls to an `InferenceExecutor` with that many
+worker threads, so at most that many model calls run at once. The intra-op thread count
+(MARQO_INFERENCE_INTRA_OP_THREADS, defaulting to cpu_count // workers) is applied to torch and to the ONNX Runtime
+sessions Marqo creates, so workers x intra-op threads roughly matches the number of cores.
+
+Note that `torch.set_num_threads` is process-wide: all torch workers share one intra-op pool of that size, while
+each ONNX Runtime session gets its own pool.
+
+Model calls are scheduled by workload class. Interactive calls (search, recommend, embed) run before bulk calls
+(adding and updating documents) that are waiting, except that while both are waiting, at least
+MARQO_INFERENCE_BULK_MIN_SHARE of the calls dispatched are bulk ones, so indexing keeps making progress. If
+MARQO_INFERENCE_INTERACTIVE_QUEUE_SLO_MS is set, the number of workers bulk calls may occupy at once is also adapted:
+it shrinks (down to one) when an interactive call waits longer than the SLO, and grows back while no interactive
+call is waiting, so that a long bulk call does not hold every worker while searches queue behind it.
+"""
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import onnxruntime
+import torch
+
+from marqo.s2_inference.logger import get_logger
+from marqo.tensor_search.enums import EnvVars, WorkloadClass
+from marqo.tensor_search.utils import read_env_vars_and_defaults_ints, read_env_vars_and_defaults
+
+logger = get_logger(__name__)
+
+_executor: Optional["InferenceExecutor"] = None
+_executor_lock = threading.Lock()
+
+_workload_class: contextvars.ContextVar[WorkloadClass] = contextvars.ContextVar(
+    "workload_class", default=WorkloadClass.Interactive)
+
+
+def get_workload_class() -> WorkloadClass:
+    """Returns the workload class of the model calls made in the current context."""
+    return _workload_class.get()
+
+
+@contextmanager
+def workload_class(value: WorkloadClass):
+    """Schedules the model calls made in this block as `value`."""
+    token = _workload_class.set(value)
+    try:
+        yield
+    finally:
+        _workload_class.reset(token)
+
+
+class _WorkloadScheduler:
+    """The queue of the calls submitted to an InferenceExecutor, which decides which call a free worker runs next.
+
+    Args:
+        num_workers: The number of workers taking calls from the queue
+        bulk_min_share: While both interactive and bulk calls are waiting, the minimum share of dispatched calls
+            that are bulk ones
+        interactive_queue_slo_seconds: If set, how long an interactive call may wait before the number of workers
+            bulk calls may occupy is reduced
+    """
+
+    BULK_LIMIT_DECREASE_FACTOR = 0.5
+
+    def __init__(self, num_workers: int, bulk_min_share: float = 0.0,
+                 interactive_queue_slo_seconds: Optional[float] = None):
+        self._condition = threading.Condition()
+        self._queues: Dict[WorkloadClass, deque] = {WorkloadClass.Interactive: deque(), WorkloadClass.Bulk: deque()}
+        self._closed = False
+        self._num_workers = num_workers
+        # How many interactive calls may be dispatched in a row before a waiting bulk call goes next
+        self._interactive_per_bulk = math.inf if bulk_min_share <= 0 else max(round(1 / bulk_min_share) - 1, 0)
+        self._interactive_streak = 0
+        self._interactive_queue_slo_seconds = interactive_queue_slo_seconds
+        self._bulk_limit = float(num_workers)
+        self._bulk_running = 0
+
+    @property
+    def bulk_worker_limit(self) -> int:
+        return max(1, math.floor(self._bulk_limit))
+
+    def put(self, workload: WorkloadClass, task: Any) -> None:
+        with self._condition:
+            self._queues[workload].append((time.monotonic(), task))
+            self._condition.notify()
+
+    def get(self) -> Optional[Tuple[WorkloadClass, Any]]:
+        """Blocks until a call can run, and returns its workload class and the call. Returns None once closed."""
+        with self._condition:
+            while True:
+                workload = self._next_workload()
+                if workload is not None:
+                    break
+                if self._closed and not self._queues[WorkloadClass.Interactive] \
+                        and not self._queues[WorkloadClass.Bulk]:
+                    return None
+                self._condition.wait()
+
+            enqueued_at, task = self._queues[workload].popleft()
+            if workload == WorkloadClass.Interactive:
+                self._interactive_streak += 1
+                if self._interactive_queue_slo_seconds is not None and \
+                        time.monotonic() - enqueued_at > self._interactive_queue_slo_seconds:
+                    self._bulk_limit = max(1.0, self._bulk_limit * self.BULK_LIMIT_DECREASE_FACTOR)
+            else:
+                self._interactive_streak = 0
+                self._bulk_running += 1
+            return workload, task
+
+    def _next_workload(self) -> Optional[WorkloadClass]:
+        interactive_waiting = bool(self._queues[WorkloadClass.Interactive])
+        bulk_ready = bool(self._queues[WorkloadClass.Bulk]) and self._bulk_running < self.bulk_worker_limit
+        if interactive_waiting and bulk_ready:
+            return WorkloadClass.Bulk if self._interactive_streak >= self._interactive_per_bulk \
+                else WorkloadClass.Interactive
+        if interactive_waiting:
+            return WorkloadClass.Interactive
+        if bulk_ready:
+            return WorkloadClass.Bulk
+        return None
+
+    def task_done(self, workload: WorkloadClass) -> None:
+        with self._condition:
+            if workload == WorkloadClass.Bulk:
+                self._bulk_running -= 1
+                if not self._queues[WorkloadClass.Interactive]:
+                    self._bulk_limit = min(float(self._num_workers), self._bulk_limit + 1 / self.bulk_worker_limit)
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                "queue_depth": len(self._queues[WorkloadClass.Interactive]) + len(self._queues[WorkloadClass.Bulk]),
+                "interactive_queue_depth": len(self._queues[WorkloadClass.Interactive]),
+                "bulk_queue_depth": len(self._queues[WorkloadClass.Bulk]),
+                "bulk_running": self._bulk_running,
+                "bulk_worker_limit": self.bulk_worker_limit,
+            }
+
+
+class _InferenceWorker(threading.Thread):
+    """A worker thread that runs the calls submitted to an InferenceExecutor, one at a time."""
+
+    def __init__(self, worker_id: int, tasks: _WorkloadScheduler):
+        super().__init__(name=f"inference-worker-{worker_id}", daemon=True)
+        self.worker_id = worker_id
+        self._tasks = tasks
+        self._started_at = time.monotonic()
+        self._busy_since: Optional[float] = None
+        self.tasks_completed = 0
+        self.tasks_failed = 0
+        self.busy_seconds = 0.0
+
+    def run(self) -> None:
+        while True:
+            scheduled = self._tasks.get()
+            if scheduled is None:
+                break
+            workload, (future, context, func, args, kwargs) = scheduled
+            if not future.set_running_or_notify_cancel():
+                self._tasks.task_done(workload)
+                continue
+            self._busy_since = time.monotonic()
+            try:
+                future.set_result(context.run(func, *args, **kwargs))
+            except BaseException as e:
+                self.tasks_failed += 1
+                future.set_exception(e)
+            finally:
+                self.busy_seconds += time.monotonic() - self._busy_since
+                self._busy_since = None
+                self.tasks_completed += 1
+                self._tasks.task_done(workload)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        busy_since = self._busy_since
+        busy_seconds = self.busy_seconds + (now - busy_since if busy_since is not None else 0.0)
+        uptime = max(now - self._started_at, 1e-9)
+        return {
+            "worker_id": self.worker_id,
+            "busy": busy_since is not None,
+            "tasks_completed": self.tasks_completed,
+            "tasks_failed": self.tasks_failed,
+            "busy_seconds": round(busy_seconds, 3),
+            "utilisation": round(min(busy_seconds / uptime, 1.0), 4),
+        }
+
+
+class InferenceExecutor:
+    """A fixed pool of inference worker threads.
+
+    Args:
+        num_workers: The number of model calls that can run at once
+        intra_op_threads: The intra-op thread count the workers' model calls are expected to use.
+            Reported in the stats; it is applied by `configure_intra_op_threads`
+        bulk_min_share: While both interactive and bulk calls are waiting, the minimum share of the calls dispatched
+            that are bulk ones. 0 runs bulk calls only when no interactive call is waiting
+        interactive_queue_slo_seconds: If set, the number of workers bulk calls may occupy is adapted so that
+            interactive calls wait at most this long
+    """
+
+    def __init__(self, num_workers: int, intra_op_threads: Optional[int] = None, bulk_min_share: float = 0.0,
+                 interactive_queue_slo_seconds: Optional[float] = None):
+        if num_workers < 1:
+            raise ValueError(f"InferenceExecutor requires at least 1 worker, but received {num_workers}")
+        self.num_workers = num_workers
+        self.intra_op_threads = intra_op_threads
+        self._tasks = _WorkloadScheduler(num_workers, bulk_min_share, interactive_queue_slo_seconds)
+        self._shutdown = False
+        self._workers: List[_InferenceWorker] = [_InferenceWorker(i, self._tasks) for i in range(num_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """Queues func(*args, **kwargs) to run on the next free worker, scheduled by the caller's workload class.
+
+        The caller's context variables (e.g. the request telemetry) are visible to the call.
+        """
+        if self._shutdown:
+            raise RuntimeError("Cannot submit to an InferenceExecutor that has been shut down")
+        future = Future()
+        self._tasks.put(get_workload_class(), (future, contextvars.copy_context(), func, args, kwargs))
+        return future
+
+    def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Runs func(*args, **kwargs) on a worker and blocks until it returns, re-raising any exception."""
+        return self.submit(func, *args, **kwargs).result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "num_workers": self.num_workers,
+            "intra_op_threads": self.intra_op_threads,
+            **self._tasks.stats(),
+            "workers": [worker.stats() for worker in self._workers],
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stops the workers once the calls already queued have run."""
+        self._shutdown = True
+        self._tasks.close()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+
+def get_inference_worker_count() -> int:
+    """Returns MARQO_INFERENCE_WORKER_COUNT, where 0 means model calls run on the request thread."""
+    worker_count = read_env_vars_and_defaults_ints(EnvVars.MARQO_INFERENCE_WORKER_COUNT)
+    return max(worker_count or 0, 0)
+
+
+def get_intra_op_threads() -> Optional[int]:
+    """Returns the intra-op thread count for model calls.
+
+    This is MARQO_INFERENCE_INTRA_OP_THREADS if it is set. Otherwise, if inference workers are enabled, the CPU
+    count is split evenly between the workers. Returns None if neither is set, in which case the torch and
+    ONNX Runtime defaults are left alone.
+    """
+    intra_op_threads = read_env_vars_and_defaults_ints(EnvVars.MARQO_INFERENCE_INTRA_OP_THREADS)
+    if intra_op_threads is not None and intra_op_threads > 0:
+        return intra_op_threads
+    worker_count = get_inference_worker_count()
+    if worker_count > 0:
+        return max((os.cpu_count() or 1) // worker_count, 1)
+    return None
+
+
+def configure_intra_op_threads() -> Optional[int]:
+    """Applies the intra-op thread count to torch. Returns the thread count, or None if it is not configured."""
+    intra_op_threads = get_intra_op_threads()
+    if intra_op_threads is not None and torch.get_num_threads() != intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+        logger.info(f"Set torch intra-op threads to {intra_op_threads}")
+    return intra_op_threads
+
+
+def get_onnx_session_options(session_options: Optional[onnxruntime.SessionOptions] = None) \
+        -> onnxruntime.SessionOptions:
+    """Returns ONNX Runtime session options with the configured intra-op thread count.
+
+    Args:
+        session_options: Existing session options to update. New options are created if this is None
+    """
+    if session_options is None:
+        session_options = onnxruntime.SessionOptions()
+    intra_op_threads = get_intra_op_threads()
+    if intra_op_threads is not None:
+        session_options.intra_op_num_threads = intra_op_threads
+        # Parallelism across requests comes from the inference workers, not from running graph branches in parallel
+        session_options.inter_op_num_threads = 1
+    return session_options
+
+
+def get_inference_executor() -> Optional[InferenceExecutor]:
+    """Returns the process-wide InferenceExecutor, creating it on first use.
+
+    Returns None if MARQO_INFERENCE_WORKER_COUNT is 0, in which case model calls run on the request thread.
+    """
+    global _executor
+    if _executor is not None:
+        return _executor
+    with _executor_lock:
+        if _executor is None:
+            worker_count = get_inference_worker_count()
+            if worker_count == 0:
+                return None
+            intra_op_threads = configure_intra_op_threads()
+            interactive_queue_slo_ms = read_env_vars_and_defaults_ints(EnvVars.MARQO_INFERENCE_INTERACTIVE_QUEUE_SLO_MS)
+            _executor = InferenceExecutor(
+                worker_count, intra_op_threads,
+                bulk_min_share=float(read_env_vars_and_defaults(EnvVars.MARQO_INFERENCE_BULK_MIN_SHARE) or 0),
+                interactive_queue_slo_seconds=interactive_queue_slo_ms / 1000 if interactive_queue_slo_ms else None
+            )
+            logger.info(f"Started {worker_count} inference workers with {intra_op_threads} intra-op threads each")
+    return _executor
+
+
+def run_inference(func: Callable, *args, **kwargs) -> Any:
+    """Runs a model call on the inference workers if they are enabled, otherwise on the calling thread."""
+    executor = get_inference_executor()
+    if executor is None:
+        return func(*args, **kwargs)
+    return executor.run(func, *args, **kwargs)
+
+
+def get_inference_executor_stats() -> Dict[str, Any]:
+    """Returns the per-worker utilisation of the inference workers, or {"enabled": False} if they are disabled."""
+    executor = get_inference_executor()
+    if executor is None:
+        return {"enabled": False, "intra_op_threads": get_intra_op_threads()}
+    return {"enabled": True, **executor.stats()}
+
+
+def shutdown_inference_executor() -> None:
+    """Stops the process-wide InferenceExecutor. A new one is created on the next model call."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
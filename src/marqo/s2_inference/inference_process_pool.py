@@ -0,0 +1,482 @@
+"""An optional tier of inference worker processes behind `s2_inference.vectorise`.
+
+Preprocessing (image decoding, resizing, normalisation) and tokenisation are GIL-bound Python. When they run on the
+API process they compete with request handling for one interpreter, so image-heavy ingest saturates one core.
+
+When MARQO_INFERENCE_PROCESS_COUNT is set, `vectorise` forwards its arguments to one of that many worker processes.
+Each worker loads and owns its own copy of the models it is asked for, runs `vectorise` in its own interpreter and
+writes the embeddings to a `multiprocessing.shared_memory` block, so only the block's name travels back over the
+result queue. The API process gets the preprocessors of a model from a worker too, rather than loading the model.
+
+A request runs in the worker with the caller's workload class, and the telemetry recorded while it runs is added to
+the metrics of the caller's request. A monitor thread restarts workers that exit, workers that stop answering health
+checks, workers that take longer than MARQO_INFERENCE_PROCESS_MODEL_LOAD_TIMEOUT to load the model of a request and
+workers with a request running for longer than MARQO_INFERENCE_PROCESS_TIMEOUT once its model is loaded, failing the
+requests they had in flight.
+"""
+import atexit
+import contextvars
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from marqo.s2_inference.errors import VectoriseError
+from marqo.s2_inference.inference_executor import get_workload_class, workload_class
+from marqo.s2_inference.logger import get_logger
+from marqo.tensor_search.enums import EnvVars, WorkloadClass
+from marqo.tensor_search.telemetry import RequestMetrics, RequestMetricsStore
+from marqo.tensor_search.utils import read_env_vars_and_defaults_ints
+
+logger = get_logger(__name__)
+
+# A worker that has not answered a health check within this time is considered hung and is restarted. This
+# includes the time a new worker takes to import Marqo, so it should be well above the import time
+HEALTH_CHECK_TIMEOUT_SECONDS = 120
+
+_PING = "ping"
+_VECTORISE = "vectorise"
+_PREPROCESSORS = "preprocessors"
+_OK = "ok"
+_ERROR = "error"
+# Sent by a worker once the model of a vectorise request is loaded, so that the request timeout starts
+_LOADED = "loaded"
+
+_pool: Optional["InferenceProcessPool"] = None
+_pool_lock = threading.Lock()
+
+
+def _vectorise_in_worker(**kwargs) -> List[List[float]]:
+    from marqo.s2_inference.s2_inference import vectorise
+    return vectorise(**kwargs)
+
+
+def _load_model_in_worker(model_name: str, model_properties: Optional[dict] = None, device: Optional[str] = None,
+                          normalize_embeddings: bool = True, model_auth=None, **kwargs) -> None:
+    from marqo.s2_inference.s2_inference import load_model_into_cache
+    load_model_into_cache(model_name, model_properties, device, normalize_embeddings, model_auth=model_auth)
+
+
+def _get_preprocessors_in_worker(**kwargs) -> Dict[str, Any]:
+    from marqo.s2_inference.s2_inference import load_multimodal_model_and_get_preprocessors
+    _, preprocessors = load_multimodal_model_and_get_preprocessors(**kwargs)
+    return preprocessors
+
+
+def _picklable_exception(e: BaseException) -> BaseException:
+    """Returns the exception if it survives pickling, otherwise a VectoriseError with its message."""
+    try:
+        pickle.loads(pickle.dumps(e))
+        return e
+    except Exception:
+        return VectoriseError(f"{type(e).__name__}: {e}")
+
+
+def _worker_main(worker_id: int, requests: "multiprocessing.Queue", results: "multiprocessing.Queue",
+                 vectorise_function: Callable[..., List[List[float]]], load_function: Optional[Callable[..., None]],
+                 preprocessors_function: Callable[..., Dict[str, Any]]) -> None:
+    """The main loop of a worker process."""
+    # vectorise must run in this process, rather than being forwarded to another pool
+    os.environ[EnvVars.MARQO_INFERENCE_PROCESS_COUNT] = "0"
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        request_id, kind, kwargs, request_workload_class = message
+        if kind == _PING:
+            results.put((worker_id, request_id, _OK, None, None))
+            continue
+        metrics = RequestMetrics()
+        # Each request runs in a context of its own, with its own metrics
+        status, payload = contextvars.Context().run(
+            _run_in_worker, worker_id, request_id, kind, kwargs, request_workload_class, metrics, results,
+            vectorise_function, load_function, preprocessors_function)
+        results.put((worker_id, request_id, status, payload, metrics))
+
+
+def _run_in_worker(worker_id: int, request_id: int, kind: str, kwargs: Dict[str, Any],
+                   request_workload_class: WorkloadClass, metrics: RequestMetrics, results: "multiprocessing.Queue",
+                   vectorise_function: Callable[..., List[List[float]]], load_function: Optional[Callable[..., None]],
+                   preprocessors_function: Callable[..., Dict[str, Any]]) -> Tuple[str, Any]:
+    """Runs a request in a worker process. Returns the status and the payload of its result."""
+    RequestMetricsStore.set_in_request(request_id, metrics)
+    try:
+        with workload_class(request_workload_class):
+            if kind == _PREPROCESSORS:
+                with metrics.time("inference_process.model_load"):
+                    preprocessors = preprocessors_function(**kwargs)
+                # Pickled here, as an error pickling them on the result queue's feeder thread would be lost
+                try:
+                    return _OK, pickle.dumps(preprocessors)
+                except Exception as e:
+                    raise VectoriseError(f"The preprocessors of the model cannot be sent to the API process: {e}") \
+                        from e
+
+            if load_function is not None:
+                with metrics.time("inference_process.model_load"):
+                    load_function(**kwargs)
+                results.put((worker_id, request_id, _LOADED, None, None))
+            with metrics.time("inference_process.vectorise"):
+                vectors = np.asarray(vectorise_function(**kwargs))
+            block = shared_memory.SharedMemory(create=True, size=max(vectors.nbytes, 1))
+            np.ndarray(vectors.shape, dtype=vectors.dtype, buffer=block.buf)[...] = vectors
+            # The parent process unlinks the block once it has copied the vectors out
+            payload = (block.name, vectors.shape, vectors.dtype.str)
+            block.close()
+            return _OK, payload
+    except BaseException as e:
+        return _ERROR, _picklable_exception(e)
+    finally:
+        RequestMetricsStore.clear_metrics_for(request_id)
+
+
+def _read_shared_vectors(name: str, shape: tuple, dtype: str) -> np.ndarray:
+    """Copies the vectors out of a shared memory block and unlinks the block."""
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf).copy()
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _record_worker_metrics(metrics: Optional[RequestMetrics]) -> None:
+    """Adds the telemetry recorded by a worker to the metrics of the request the caller is serving, if any."""
+    if metrics is None:
+        return
+    try:
+        RequestMetricsStore.for_request().merge(metrics)
+    except LookupError:
+        pass
+
+
+class _InFlightRequest:
+    """A request sent to a worker, and the future its caller waits on."""
+    __slots__ = ('future', 'submitted_at', 'loaded_at')
+
+    def __init__(self, future: Future, submitted_at: float, loaded_at: Optional[float]):
+        self.future = future
+        self.submitted_at = submitted_at
+        # When the worker finished loading the model of the request, or None while it is loading it
+        self.loaded_at = loaded_at
+
+
+class _WorkerHandle:
+    """The parent process' view of a worker process."""
+
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.requests: Optional["multiprocessing.Queue"] = None
+        # In submission order, so the first request is the oldest
+        self.in_flight: Dict[int, _InFlightRequest] = {}
+        self.started_at: float = 0.0
+        self.ping_id: Optional[int] = None
+        self.ping_sent_at: Optional[float] = None
+        self.last_healthy_at: Optional[float] = None
+        self.requests_completed = 0
+        self.restarts = 0
+
+
+class InferenceProcessPool:
+    """A fixed number of inference worker processes with health checks and restart-on-crash.
+
+    Args:
+        num_processes: The number of worker processes
+        health_check_interval: Seconds between liveness checks of the workers
+        vectorise_function: A picklable module-level function the workers call with the vectorise arguments
+        request_timeout: Seconds after which a worker with a request still in flight, once its model is loaded, is
+            considered hung, and is restarted. None disables the timeout
+        load_function: A picklable module-level function the workers call with the vectorise arguments to load the
+            model before vectorising, so that loading is timed by model_load_timeout rather than request_timeout.
+            None counts loading towards request_timeout
+        model_load_timeout: Seconds after which a worker still loading the model of a request is restarted. None
+            disables the timeout
+        preprocessors_function: A picklable module-level function the workers call with the arguments of
+            `get_preprocessors`
+    """
+
+    def __init__(self, num_processes: int, health_check_interval: float = 5,
+                 vectorise_function: Callable[..., List[List[float]]] = _vectorise_in_worker,
+                 request_timeout: Optional[float] = None, load_function: Optional[Callable[..., None]] = None,
+                 model_load_timeout: Optional[float] = None,
+                 preprocessors_function: Callable[..., Dict[str, Any]] = _get_preprocessors_in_worker):
+        if num_processes < 1:
+            raise ValueError(f"InferenceProcessPool requires at least 1 process, but received {num_processes}")
+        # Workers are spawned rather than forked, as forking a process that has initialised CUDA or holds
+        # locks in other threads is unsafe
+        self._context = multiprocessing.get_context("spawn")
+        self._vectorise_function = vectorise_function
+        self._load_function = load_function
+        self._preprocessors_function = preprocessors_function
+        self._health_check_interval = health_check_interval
+        self._request_timeout = request_timeout
+        self._model_load_timeout = model_load_timeout
+        self._results = self._context.Queue()
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._shutdown = threading.Event()
+        self._workers = [_WorkerHandle(worker_id) for worker_id in range(num_processes)]
+        for handle in self._workers:
+            self._start_worker(handle)
+
+        self._result_reader = threading.Thread(target=self._read_results, name="inference-process-results",
+                                               daemon=True)
+        self._result_reader.start()
+        self._monitor = threading.Thread(target=self._monitor_workers, name="inference-process-monitor",
+                                         daemon=True)
+        self._monitor.start()
+
+    def vectorise(self, **kwargs) -> List[List[float]]:
+        """Runs `vectorise(**kwargs)` on the least busy worker process and blocks until it returns.
+
+        Raises:
+            VectoriseError: If the worker exits, or is restarted because the request exceeded the request timeout
+        """
+        return self._run(_VECTORISE, kwargs).tolist()
+
+    def get_preprocessors(self, **kwargs) -> Dict[str, Any]:
+        """Returns the preprocessors of `load_multimodal_model_and_get_preprocessors(**kwargs)`, loading the model
+        on the least busy worker process rather than in this process.
+
+        Raises:
+            VectoriseError: If the worker exits, or is restarted because loading exceeded the model load timeout
+        """
+        return self._run(_PREPROCESSORS, kwargs)
+
+    def _run(self, kind: str, kwargs: Dict[str, Any]) -> Any:
+        if self._shutdown.is_set():
+            raise RuntimeError("Cannot vectorise on an InferenceProcessPool that has been shut down")
+        future = Future()
+        with self._lock:
+            handle = min(self._workers, key=lambda h: len(h.in_flight))
+            request_id = next(self._request_ids)
+            now = time.monotonic()
+            # Without a load function the worker does not report when the model is loaded, so the request timeout
+            # starts when the request is submitted
+            handle.in_flight[request_id] = _InFlightRequest(
+                future, now, loaded_at=now if self._load_function is None and kind == _VECTORISE else None)
+            handle.requests.put((request_id, kind, kwargs, get_workload_class()))
+        result, metrics = future.result()
+        _record_worker_metrics(metrics)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "num_processes": len(self._workers),
+                "processes": [{
+                    "worker_id": handle.worker_id,
+                    "pid": handle.process.pid,
+                    "alive": handle.process.is_alive(),
+                    "in_flight": len(handle.in_flight),
+                    "requests_completed": handle.requests_completed,
+                    "restarts": handle.restarts,
+                    "uptime_seconds": round(now - handle.started_at, 1),
+                    "seconds_since_healthy": None if handle.last_healthy_at is None
+                    else round(now - handle.last_healthy_at, 1),
+                } for handle in self._workers]
+            }
+
+    def shutdown(self, timeout: float = 10) -> None:
+        """Stops the workers after their queued requests and fails anything still in flight."""
+        if self._shutdown.is_set():
+            return
+        self._shutdown.set()
+        with self._lock:
+            for handle in self._workers:
+                handle.requests.put(None)
+        for handle in self._workers:
+            handle.process.join(timeout)
+            if handle.process.is_alive():
+                handle.process.terminate()
+        with self._lock:
+            in_flight = [(handle, handle.in_flight) for handle in self._workers]
+            for handle in self._workers:
+                handle.in_flight = {}
+        for handle, requests in in_flight:
+            self._fail_in_flight(handle.worker_id, requests, "the inference process pool was shut down")
+        self._results.put(None)
+        self._result_reader.join(timeout)
+
+    def _start_worker(self, handle: _WorkerHandle) -> None:
+        handle.requests = self._context.Queue()
+        handle.process = self._context.Process(
+            target=_worker_main, args=(handle.worker_id, handle.requests, self._results, self._vectorise_function,
+                                       self._load_function, self._preprocessors_function),
+            name=f"inference-process-{handle.worker_id}", daemon=True)
+        handle.process.start()
+        handle.started_at = time.monotonic()
+        handle.ping_id = None
+        handle.ping_sent_at = None
+        handle.last_healthy_at = None
+
+    def _replace_worker(self, handle: _WorkerHandle, reason: str) \
+            -> Tuple[multiprocessing.process.BaseProcess, Dict[int, _InFlightRequest]]:
+        """
+        Start a new worker process in place of the handle's current one. Must be called with self._lock held.
+
+        Returns:
+            The replaced process and its in-flight requests, for `_stop_replaced_worker` to kill and fail outside
+            the lock
+        """
+        logger.warning(f"Restarting inference process {handle.worker_id} (pid {handle.process.pid}): {reason}")
+        replaced = handle.process, handle.in_flight
+        handle.in_flight = {}
+        handle.restarts += 1
+        self._start_worker(handle)
+        return replaced
+
+    def _stop_replaced_worker(self, worker_id: int, process: multiprocessing.process.BaseProcess,
+                              in_flight: Dict[int, _InFlightRequest], reason: str) -> None:
+        if process.is_alive():
+            process.kill()
+        process.join(5)
+        self._fail_in_flight(worker_id, in_flight, reason)
+
+    @staticmethod
+    def _fail_in_flight(worker_id: int, in_flight: Dict[int, _InFlightRequest], reason: str) -> None:
+        for request in in_flight.values():
+            request.future.set_exception(VectoriseError(f"Inference process {worker_id} failed to vectorise the "
+                                                        f"content because {reason}. Please retry the request"))
+
+    def _read_results(self) -> None:
+        while True:
+            message = self._results.get()
+            if message is None:
+                break
+            worker_id, request_id, status, payload, metrics = message
+            handle = self._workers[worker_id]
+            with self._lock:
+                if request_id == handle.ping_id:
+                    handle.ping_id = None
+                    handle.ping_sent_at = None
+                    handle.last_healthy_at = time.monotonic()
+                    continue
+                if status == _LOADED:
+                    request = handle.in_flight.get(request_id)
+                    if request is not None:
+                        request.loaded_at = time.monotonic()
+                    continue
+                request = handle.in_flight.pop(request_id, None)
+                future = request.future if request is not None else None
+                if request is not None:
+                    handle.requests_completed += 1
+                    handle.last_healthy_at = time.monotonic()
+
+            if status == _ERROR:
+                if future is not None:
+                    future.set_exception(payload)
+                continue
+            if isinstance(payload, bytes):
+                # The pickled preprocessors of a get_preprocessors request
+                if future is not None:
+                    try:
+                        future.set_result((pickle.loads(payload), metrics))
+                    except Exception as e:
+                        future.set_exception(VectoriseError(f"Could not read the preprocessors returned by "
+                                                            f"inference process {worker_id}: {e}"))
+                continue
+            try:
+                # The block is unlinked even if the request has already been failed, so it does not leak
+                vectors = _read_shared_vectors(*payload)
+            except Exception as e:
+                if future is not None:
+                    future.set_exception(VectoriseError(f"Could not read the vectors returned by inference "
+                                                        f"process {worker_id}: {e}"))
+                continue
+            if future is not None:
+                future.set_result((vectors, metrics))
+
+    def _monitor_workers(self) -> None:
+        while not self._shutdown.wait(self._health_check_interval):
+            now = time.monotonic()
+            replaced = []
+            with self._lock:
+                if self._shutdown.is_set():
+                    break
+                for handle in self._workers:
+                    reason = self._restart_reason(handle, now)
+                    if reason is not None:
+                        replaced.append((handle.worker_id, *self._replace_worker(handle, reason), reason))
+                    elif handle.ping_sent_at is None and not handle.in_flight:
+                        # Busy workers answer pings only after their current request, so only idle workers are
+                        # pinged. Busy workers are checked for liveness and for the request timeout instead
+                        handle.ping_id = next(self._request_ids)
+                        handle.ping_sent_at = now
+                        handle.requests.put((handle.ping_id, _PING, None, None))
+            # Killing and joining a process can take seconds, so it is done without holding the lock
+            for worker_id, process, in_flight, reason in replaced:
+                self._stop_replaced_worker(worker_id, process, in_flight, reason)
+
+    def _restart_reason(self, handle: _WorkerHandle, now: float) -> Optional[str]:
+        """Returns why the worker must be restarted, or None if it is healthy. Must be called with self._lock held."""
+        if not handle.process.is_alive():
+            return f"it exited with code {handle.process.exitcode}"
+        if handle.ping_sent_at is not None and now - handle.ping_sent_at > HEALTH_CHECK_TIMEOUT_SECONDS:
+            return f"it did not answer a health check within {HEALTH_CHECK_TIMEOUT_SECONDS}s"
+        if handle.in_flight:
+            oldest_request = next(iter(handle.in_flight.values()))
+            if oldest_request.loaded_at is None:
+                if self._model_load_timeout and now - oldest_request.submitted_at > self._model_load_timeout:
+                    return f"the model of a request did not load within {self._model_load_timeout}s"
+            elif self._request_timeout and now - oldest_request.loaded_at > self._request_timeout:
+                return f"a request did not complete within {self._request_timeout}s"
+        return None
+
+
+def get_inference_process_count() -> int:
+    """Returns MARQO_INFERENCE_PROCESS_COUNT, where 0 means vectorise runs in the API process."""
+    process_count = read_env_vars_and_defaults_ints(EnvVars.MARQO_INFERENCE_PROCESS_COUNT)
+    return max(process_count or 0, 0)
+
+
+def get_inference_process_pool() -> Optional[InferenceProcessPool]:
+    """Returns the process-wide InferenceProcessPool, starting it on first use.
+
+    Returns None if MARQO_INFERENCE_PROCESS_COUNT is 0, which is always the case inside a worker process.
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            process_count = get_inference_process_count()
+            if process_count == 0:
+                return None
+            health_check_interval = read_env_vars_and_defaults_ints(
+                EnvVars.MARQO_INFERENCE_PROCESS_HEALTH_CHECK_INTERVAL)
+            request_timeout = read_env_vars_and_defaults_ints(EnvVars.MARQO_INFERENCE_PROCESS_TIMEOUT)
+            model_load_timeout = read_env_vars_and_defaults_ints(EnvVars.MARQO_INFERENCE_PROCESS_MODEL_LOAD_TIMEOUT)
+            _pool = InferenceProcessPool(process_count, health_check_interval=health_check_interval,
+                                         request_timeout=request_timeout or None, load_function=_load_model_in_worker,
+                                         model_load_timeout=model_load_timeout or None)
+            atexit.register(_pool.shutdown)
+            logger.info(f"Started {process_count} inference processes")
+    return _pool
+
+
+def get_inference_process_pool_stats() -> Dict[str, Any]:
+    """Returns the status of the inference processes, or {"enabled": False} if they are disabled."""
+    pool = get_inference_process_pool()
+    if pool is None:
+        return {"enabled": False}
+    return {"enabled": True, **pool.stats()}
+
+
+def shutdown_inference_process_pool() -> None:
+    """Stops the process-wide InferenceProcessPool. A new one is started on the next vectorise call."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class ModelRuntime(str, Enum):
+    """Enums for the runtimes that can execute an `hf` or `open_clip` model, set with the `runtime` model property."""
+    Torch = "torch"
+    ONNX = "onnx"
+    ONNX_INT8 = "onnx-int8"
@@ -18,6 +18,7 @@ import marqo.s2_inference.model_registry as model_registry
 from zipfile import ZipFile
 from huggingface_hub.utils import RevisionNotFoundError,RepositoryNotFoundError, EntryNotFoundError, LocalEntryNotFoundError
 from marqo.s2_inference.errors import ModelDownloadError
+from marqo.s2_inference.inference_executor import get_onnx_session_options
 from marqo.api.exceptions import InternalError
 
 # Loading shared functions from clip_utils.py. This part should be decoupled from models in the future
@@ -178,8 +179,10 @@ class CLIP_ONNX(object):
 
         self.visual_file = self.download_model(self.model_info["repo_id"], self.model_info["visual_file"])
         self.textual_file = self.download_model(self.model_info["repo_id"], self.model_info["textual_file"])
-        self.visual_session = ort.InferenceSession(self.visual_file, providers=self.provider)
-        self.textual_session = ort.InferenceSession(self.textual_file, providers=self.provider)
+        self.visual_session = ort.InferenceSession(self.visual_file, get_onnx_session_options(),
+                                                   providers=self.provider)
+        self.textual_session = ort.InferenceSession(self.textual_file, get_onnx_session_options(),
+                                                    providers=self.provider)
 
 
     @staticmethod
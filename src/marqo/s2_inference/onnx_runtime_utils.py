@@ -0,0 +1,258 @@
+"""Export-and-cache path that runs a loaded torch model through ONNX Runtime.
+
+`hf` and `open_clip` models are loaded with torch as usual. If their model properties set `runtime` to `onnx` or
+`onnx-int8`, the relevant torch modules are exported to ONNX (and optionally dynamically quantised to int8), cached
+under `ModelCache.onnx_cache_path`, and checked for embedding parity against the torch module before being used.
+"""
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import onnxruntime
+import torch
+
+from marqo.s2_inference.configs import ModelCache
+from marqo.s2_inference.errors import InvalidModelPropertiesError
+from marqo.s2_inference.inference_executor import get_onnx_session_options
+from marqo.s2_inference.logger import get_logger
+from marqo.s2_inference.models.model_runtime import ModelRuntime
+
+logger = get_logger(__name__)
+
+ONNX_OPSET_VERSION = 14
+
+# The minimum cosine similarity between the torch and ONNX embeddings of the parity samples
+PARITY_MIN_COSINE_SIMILARITY = {
+    ModelRuntime.ONNX: 0.9999,
+    ModelRuntime.ONNX_INT8: 0.98,
+}
+
+# Model properties that do not change the exported graph
+_EXPORT_ID_EXCLUDED_PROPERTIES = {"runtime", "model_auth", "modelAuth", "note", "model_size"}
+
+
+def get_model_runtime(model_properties: Optional[dict]) -> ModelRuntime:
+    """Returns the runtime requested in the model properties, defaulting to torch.
+
+    Raises:
+        InvalidModelPropertiesError: If the runtime is not a valid ModelRuntime
+    """
+    if not model_properties or model_properties.get("runtime") is None:
+        return ModelRuntime.Torch
+    try:
+        return ModelRuntime(model_properties["runtime"])
+    except ValueError:
+        raise InvalidModelPropertiesError(
+            f"Invalid runtime '{model_properties['runtime']}' in model_properties. "
+            f"Supported runtimes are {[runtime.value for runtime in ModelRuntime]}")
+
+
+def validate_runtime_for_device(runtime: ModelRuntime, device: str) -> None:
+    """Dynamically quantised int8 models are only supported by the CPU execution provider.
+
+    Raises:
+        InvalidModelPropertiesError: If the runtime cannot run on the device
+    """
+    if runtime == ModelRuntime.ONNX_INT8 and not device.startswith("cpu"):
+        raise InvalidModelPropertiesError(
+            f"The runtime '{ModelRuntime.ONNX_INT8.value}' is only supported on device 'cpu', but the model is being "
+            f"loaded on device '{device}'. Use runtime '{ModelRuntime.ONNX.value}' for cuda devices.")
+
+
+def get_export_dir(model_name: str, model_properties: dict) -> str:
+    """Returns the directory the ONNX files of a model are cached in.
+
+    The directory name contains a hash of the model properties, so models with the same name but different
+    properties (e.g. a different checkpoint url) do not share exported files.
+    """
+    properties = {k: v for k, v in model_properties.items() if k not in _EXPORT_ID_EXCLUDED_PROPERTIES}
+    properties_hash = hashlib.sha256(json.dumps(properties, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in (model_name or "model"))
+    return os.path.join(ModelCache.onnx_cache_path, "exported", f"{safe_name}_{properties_hash[:16]}")
+
+
+def check_embedding_parity(torch_embeddings: np.ndarray, onnx_embeddings: np.ndarray) -> float:
+    """Returns the minimum cosine similarity between the rows of the torch and ONNX embeddings.
+
+    Raises:
+        ValueError: If the embeddings have different shapes
+    """
+    if torch_embeddings.shape != onnx_embeddings.shape:
+        raise ValueError(f"Expected ONNX embeddings of shape {torch_embeddings.shape} "
+                         f"but received {onnx_embeddings.shape}")
+    torch_norms = np.linalg.norm(torch_embeddings, axis=1)
+    onnx_norms = np.linalg.norm(onnx_embeddings, axis=1)
+    cosine = (torch_embeddings * onnx_embeddings).sum(axis=1) / np.clip(torch_norms * onnx_norms, 1e-12, None)
+    return float(cosine.min())
+
+
+class ONNXExportedModule:
+    """An ONNX Runtime session for a torch module, exported and cached on first load.
+
+    Args:
+        module: The torch module to export. Its forward takes `input_names` as positional arguments and
+            returns a single (batch_size, dimensions) tensor
+        sample_inputs: Inputs used for tracing the export and for the parity check, keyed by input name
+        dynamic_axes: The dynamic axes of each input, e.g. {"input_ids": {0: "batch_size", 1: "sequence_length"}}
+        export_dir: The directory the ONNX files are cached in
+        component: The name of the exported component (e.g. 'text'), used as the file name
+        runtime: ModelRuntime.ONNX or ModelRuntime.ONNX_INT8
+        device: The device the session runs on
+    """
+    output_name = "embeddings"
+
+    def __init__(self, module: torch.nn.Module, sample_inputs: Dict[str, torch.Tensor],
+                 dynamic_axes: Dict[str, Dict[int, str]], export_dir: str, component: str,
+                 runtime: ModelRuntime, device: str):
+        if runtime == ModelRuntime.Torch:
+            raise ValueError("ONNXExportedModule requires an ONNX runtime")
+        self.module = module
+        self.sample_inputs = sample_inputs
+        self.input_names: List[str] = list(sample_inputs.keys())
+        self.dynamic_axes = dynamic_axes
+        self.runtime = runtime
+        self.device = device
+        self.fp32_path = os.path.join(export_dir, f"{component}.onnx")
+        self.int8_path = os.path.join(export_dir, f"{component}.int8.onnx")
+        self.session: Optional[onnxruntime.InferenceSession] = None
+
+    @property
+    def model_path(self) -> str:
+        return self.int8_path if self.runtime == ModelRuntime.ONNX_INT8 else self.fp32_path
+
+    def load(self) -> bool:
+        """Exports the module if it is not cached, creates the session and checks parity with the torch module.
+
+        Returns:
+            True if the ONNX session is ready to use, False if the export or the parity check failed, in which
+            case the caller should keep using the torch module.
+        """
+        try:
+            if not os.path.isfile(self.fp32_path):
+                self._export()
+            if self.runtime == ModelRuntime.ONNX_INT8 and not os.path.isfile(self.int8_path):
+                self._quantize()
+            self.session = onnxruntime.InferenceSession(self.model_path, get_onnx_session_options(),
+                                                        providers=self._providers())
+        except Exception as e:
+            logger.warning(f"Marqo could not export `{self.model_path}` for runtime '{self.runtime.value}'. "
+                           f"Falling back to the torch runtime. Original error: {e}")
+            self.session = None
+            return False
+
+        min_similarity = self._parity_min_similarity()
+        if min_similarity < PARITY_MIN_COSINE_SIMILARITY[self.runtime]:
+            logger.warning(f"The embeddings of `{self.model_path}` do not match the torch embeddings "
+                           f"(minimum cosine similarity {min_similarity:.5f} < "
+                           f"{PARITY_MIN_COSINE_SIMILARITY[self.runtime]}). Falling back to the torch runtime.")
+            self.session = None
+            return False
+
+        logger.info(f"Loaded `{self.model_path}` with runtime '{self.runtime.value}' "
+                    f"(minimum parity cosine similarity {min_similarity:.5f})")
+        return True
+
+    def run(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        if self.session is None:
+            raise RuntimeError(f"The ONNX session for `{self.model_path}` is not loaded")
+        ort_inputs = {name: np.ascontiguousarray(inputs[name]) for name in self.input_names}
+        return self.session.run([self.output_name], ort_inputs)[0]
+
+    def _providers(self) -> List[str]:
+        if self.device.startswith("cuda") and "CUDAExecutionProvider" in onnxruntime.get_available_providers():
+            return ["CUDAExecutionProvider", "CPUExecutionProvider"]
+        return ["CPUExecutionProvider"]
+
+    def _export(self) -> None:
+        os.makedirs(os.path.dirname(self.fp32_path), exist_ok=True)
+        module_device = next(self.module.parameters()).device
+        args = tuple(self.sample_inputs[name].to(module_device) for name in self.input_names)
+        dynamic_axes = dict(self.dynamic_axes)
+        dynamic_axes[self.output_name] = {0: "batch_size"}
+        export_kwargs = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            # Newer torch versions default to the dynamo exporter, which does not support opset 14
+            export_kwargs["dynamo"] = False
+        # Export to a temporary file first so a crashed or concurrent export never leaves a partial file behind
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(self.fp32_path)) as temp_dir:
+            temp_path = os.path.join(temp_dir, os.path.basename(self.fp32_path))
+            with torch.no_grad():
+                torch.onnx.export(
+                    self.module, args=args, f=temp_path,
+                    opset_version=ONNX_OPSET_VERSION,
+                    do_constant_folding=True,
+                    input_names=self.input_names,
+                    output_names=[self.output_name],
+                    dynamic_axes=dynamic_axes,
+                    **export_kwargs
+                )
+            # Models over 2GB are exported with their weights in external data files next to the model file,
+            # which are referenced by relative path. The model file is moved last, as it marks a complete export
+            for file_name in os.listdir(temp_dir):
+                if file_name != os.path.basename(self.fp32_path):
+                    os.replace(os.path.join(temp_dir, file_name),
+                               os.path.join(os.path.dirname(self.fp32_path), file_name))
+            os.replace(temp_path, self.fp32_path)
+        logger.info(f"Model exported at: {self.fp32_path}")
+
+    def _quantize(self) -> None:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(self.int8_path)) as temp_dir:
+            temp_path = os.path.join(temp_dir, os.path.basename(self.int8_path))
+            # Only the matrix multiplications are quantised. Quantising embedding lookups (Gather) costs
+            # noticeably more accuracy for little speed-up
+            quantize_dynamic(self.fp32_path, temp_path, op_types_to_quantize=["MatMul", "Attention"],
+                             weight_type=QuantType.QInt8)
+            os.replace(temp_path, self.int8_path)
+        logger.info(f"Quantised model saved at: {self.int8_path}")
+
+    def _parity_min_similarity(self) -> float:
+        module_device = next(self.module.parameters()).device
+        with torch.no_grad():
+            torch_embeddings = self.module(
+                *(self.sample_inputs[name].to(module_device) for name in self.input_names)
+            ).float().cpu().numpy()
+        onnx_embeddings = self.run({name: tensor.cpu().numpy() for name, tensor in self.sample_inputs.items()})
+        return check_embedding_parity(torch_embeddings, onnx_embeddings)
+
+
+class SentenceEmbeddingExportWrapper(torch.nn.Module):
+    """Exposes the pooled (un-normalised) output of an `AutoModelForSentenceEmbedding` with positional inputs,
+    as required by torch.onnx.export."""
+
+    def __init__(self, sentence_embedding_model: torch.nn.Module, input_names: Sequence[str]):
+        super().__init__()
+        self.sentence_embedding_model = sentence_embedding_model
+        self.input_names = list(input_names)
+
+    def forward(self, *inputs):
+        kwargs = dict(zip(self.input_names, inputs))
+        model_output = self.sentence_embedding_model.model(**kwargs)
+        return self.sentence_embedding_model._pool_func(model_output, kwargs["attention_mask"])
+
+
+class OpenCLIPTextExportWrapper(torch.nn.Module):
+    """Exposes the (un-normalised) text tower of an open_clip model."""
+
+    def __init__(self, clip_model: torch.nn.Module):
+        super().__init__()
+        self.clip_model = clip_model
+
+    def forward(self, text):
+        return self.clip_model.encode_text(text)
+
+
+class OpenCLIPImageExportWrapper(torch.nn.Module):
+    """Exposes the (un-normalised) image tower of an open_clip model."""
+
+    def __init__(self, clip_model: torch.nn.Module):
+        super().__init__()
+        self.clip_model = clip_model
+
+    def forward(self, image):
+        return self.clip_model.encode_image(image)
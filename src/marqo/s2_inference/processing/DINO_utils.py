@@ -97,30 +97,58 @@ def DINO_inference(model: Any, transform: Any, img: ImageType = None,
         FloatTensor: returns N x w x h tensor
     """
     
+    return DINO_inference_batch(model, transform, [img], patch_size=patch_size, device=device)[0]
+
+def DINO_inference_batch(model: Any, transform: Any, imgs: List[ImageType],
+                        patch_size: int = None, device: str = None) -> List[ndarray]:
+    """runs batched inference for a model, transform and images.
+    images that have the same size after the transform go through the model together
+
+    Args:
+        model (Any): ('vit_small', 'vit_base')
+        transform (Any): _get_DINO_transform
+        imgs (List[ImageType]): the images to infer on
+        patch_size (int, optional): the patch size the model architecture uses. Defaults to None.
+        device (str): device for the model to run on. Required to be set
+
+    Returns:
+        List[ndarray]: an N x w x h array for each image
+    """
+
     if not device:
         raise InternalError("`device` is required for DINO inference!")
 
-    img = transform(img)
+    # make the images divisible by the patch size
+    transformed = []
+    for img in imgs:
+        img = transform(img)
+        w, h = img.shape[1] - img.shape[1] % patch_size, img.shape[2] - img.shape[2] % patch_size
+        transformed.append(img[:, :w, :h])
+
+    indices_by_shape = {}
+    for i, img in enumerate(transformed):
+        indices_by_shape.setdefault(tuple(img.shape), []).append(i)
 
-    # make the image divisible by the patch size
-    w, h = img.shape[1] - img.shape[1] % patch_size, img.shape[2] - img.shape[2] % patch_size
-    img = img[:, :w, :h].unsqueeze(0)
+    results = [None] * len(transformed)
+    for shape, indices in indices_by_shape.items():
+        batch = torch.stack([transformed[i] for i in indices])
 
-    w_featmap = img.shape[-2] // patch_size
-    h_featmap = img.shape[-1] // patch_size
+        w_featmap = batch.shape[-2] // patch_size
+        h_featmap = batch.shape[-1] // patch_size
 
-    with torch.no_grad():
-        attentions = model.get_last_selfattention(img.to(device))
+        with torch.no_grad():
+            attentions = model.get_last_selfattention(batch.to(device))
 
-    nh = attentions.shape[1] # number of head
+        nh = attentions.shape[1] # number of head
 
-    # we keep only the output patch attention
-    attentions = attentions[0, :, 0, 1:].reshape(nh, -1)
+        # we keep only the output patch attention
+        attentions = attentions[:, :, 0, 1:].reshape(len(indices), nh, w_featmap, h_featmap)
+        attentions = nn.functional.interpolate(attentions, scale_factor=patch_size, mode="nearest").cpu().numpy()
 
-    attentions = attentions.reshape(nh, w_featmap, h_featmap)
-    attentions = nn.functional.interpolate(attentions.unsqueeze(0), scale_factor=patch_size, mode="nearest")[0].cpu().numpy()
+        for position, i in enumerate(indices):
+            results[i] = attentions[position]
 
-    return attentions
+    return results
 
 def _rescale_image(image: Union[ndarray, ImageType]) -> ndarray:
     """rescales the image to be between 0-255
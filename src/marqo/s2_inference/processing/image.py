@@ -1,21 +1,22 @@
-import datetime
+import copy
 from functools import partial
 
 import PIL
 import numpy as np
 import torch
 import torchvision
-import threading
-from marqo.s2_inference.s2_inference import get_available_models, _create_model_cache_key, get_logger
+from marqo.s2_inference import constants
+from marqo.s2_inference.s2_inference import get_or_load_cached_model, _create_model_cache_key, get_logger
 from marqo.s2_inference.types import Dict, List, Union, ImageType, Tuple, ndarray, Literal
 from marqo.s2_inference.clip_utils import format_and_load_CLIP_image
-from marqo.s2_inference.errors import ChunkerError, ModelLoadError
-from marqo.tensor_search.enums import AvailableModelsKey
-from marqo.s2_inference.processing.DINO_utils import _load_DINO_model,attention_to_bboxs,DINO_inference
+from marqo.s2_inference.errors import ChunkerError
+from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.utils import read_env_vars_and_defaults_ints
+from marqo.s2_inference.processing.DINO_utils import _load_DINO_model,attention_to_bboxs,DINO_inference_batch
 from marqo.s2_inference.processing.pytorch_utils import load_pytorch
 from marqo.s2_inference.processing.yolox_utils import (
    _process_yolox,
-    _infer_yolox, 
+    _infer_yolox_batch,
     load_yolox_onnx,
     get_default_yolox_model,
     _download_yolox
@@ -41,7 +42,11 @@ from marqo.api.exceptions import InternalError
 
 logger = get_logger(__name__)
 
-_load_model_lock = threading.Lock()
+
+def get_patch_model_batch_size() -> int:
+    """Returns MARQO_PATCH_MODEL_BATCH_SIZE, the maximum number of images that go through a patch model at once."""
+    return max(read_env_vars_and_defaults_ints(EnvVars.MARQO_PATCH_MODEL_BATCH_SIZE) or 1, 1)
+
 
 def chunk_image(image: Union[str, ImageType], device: str, 
                         method: Literal[ 'simple', 'overlap',  'frcnn', 'marqo-yolo', 'yolox', 'dino-v1', 'dino-v2'],
@@ -65,9 +70,6 @@ def chunk_image(image: Union[str, ImageType], device: str,
         Tuple[List[ImageType], List[float]]: list of PIL images and the corresponding bounding boxes
     """
 
-    HN = 3
-    WN = 3
-
     if method in [None, 'none', '', "None", ' ']:
         if isinstance(image, str):
             return [image],[image]      
@@ -80,6 +82,60 @@ def chunk_image(image: Union[str, ImageType], device: str,
     method, params = _process_patch_method(method)
     logger.debug(f"found method={method} and params={params}")
 
+    patch = _get_patcher(method, device, size, params)
+    try:
+        patch.infer(image)
+        patch.process()
+    except PIL.UnidentifiedImageError as e:
+        raise ChunkerError from e
+
+    return patch.patches, patch.bboxes_orig
+
+
+def chunk_images(images: List[Union[str, ImageType]], device: str,
+                        method: Literal[ 'simple', 'overlap',  'frcnn', 'marqo-yolo', 'yolox', 'dino-v1', 'dino-v2'],
+                        size=get_default_size()) -> List[Tuple[List[ImageType], List[float]]]:
+    """batched version of chunk_image. for the model based methods the patch model is loaded once
+    and the images go through it in batches (see PatchifyModel.infer_batch) and the boxes of the
+    whole batch are suppressed with a single nms call. the patches and bounding boxes are the same
+    as chunk_image returns for each image
+
+    Args:
+        images (List[Union[str, ImageType]]): images to process
+        device (str): device to load models onto
+        method (str, optional): the method to use.
+        size (_type_, optional): size the images should be loaded in as. Defaults to get_default_size().
+
+    Raises:
+        ChunkerError: Raises ChunkerError, if the chunker can't work for some reason
+
+    Returns:
+        List[Tuple[List[ImageType], List[float]]]: for each image, the list of PIL images and the corresponding
+            bounding boxes
+    """
+    if method in [None, 'none', '', "None", ' '] or len(images) == 0:
+        return [chunk_image(image, device=device, method=method, size=size) for image in images]
+
+    method_name, params = _process_patch_method(method)
+    patch = _get_patcher(method_name, device, size, params)
+    if not isinstance(patch, PatchifyModel):
+        return [chunk_image(image, device=device, method=method, size=size) for image in images]
+
+    try:
+        patchers = patch.infer_batch(images)
+        PatchifyModel.process_batch(patchers)
+    except PIL.UnidentifiedImageError as e:
+        raise ChunkerError from e
+
+    return [(patcher.patches, patcher.bboxes_orig) for patcher in patchers]
+
+
+def _get_patcher(method: str, device: str, size: Tuple, params: Dict) -> Union["PatchifySimple", "PatchifyModel"]:
+    """creates the patcher for a chunking method and its parameters, as parsed by _process_patch_method
+    """
+    HN = 3
+    WN = 3
+
     # format the paramters to pass through
     hn = int(params.get('hn', HN))
     wn = int(params.get('wn', WN))
@@ -108,13 +164,8 @@ def chunk_image(image: Union[str, ImageType], device: str,
                         attention_method='pos', nms=True, replace_small=True)
     else:
         raise ValueError(f"unexpected image chunking type. found {method}")
-    try:
-        patch.infer(image)
-        patch.process()
-    except PIL.UnidentifiedImageError as e:
-        raise ChunkerError from e
 
-    return patch.patches, patch.bboxes_orig
+    return patch
 
 
 class PatchifySimple:
@@ -201,45 +252,76 @@ class PatchifyModel:
     def _get_model_specific_parameters(self):
         # fill in with specifics
         self.model_name = None
+        self.model_size = constants.DEFAULT_MODEL_SIZE
         self.model_load_function = lambda x:x
         self.allowed_model_types = ()
 
     def _load_and_cache_model(self):
+        """gets the model from the model cache, loading it if required. the model counts towards the
+        memory threshold of the device with self.model_size and is ejected like the embedding models.
+        concurrent requests for a model that is loading wait for it instead of failing
+        """
         model_type = (self.model_name, self.device)
-        model_cache_key = _create_model_cache_key(self.model_name, self.device)
+        if model_type[0] not in self.allowed_model_types:
+            raise TypeError(f"wrong model for {model_type}")
 
-        if _load_model_lock.locked():
-            raise ModelLoadError(
-                "Request rejected, as this request attempted to load and cache the model, "
-                "but the lock is already held by another operation. "
-                "Please wait for a few seconds and send the request again.\n"
-                "Marqo's documentation can be found here: `https://docs.marqo.ai/latest/`"
-            )
+        model_cache_key = _create_model_cache_key(self.model_name, self.device)
+        self.model, self.preprocess = get_or_load_cached_model(
+            model_cache_key, self.model_name, self.device, self.model_size,
+            lambda: self.model_load_function(self.model_name, self.device)
+        )
 
-        with _load_model_lock:
-            if model_cache_key not in get_available_models():
-                logger.info(f"loading model {model_type}")
-                if model_type[0] in self.allowed_model_types:
-                    func = self.model_load_function
-                else:
-                    raise TypeError(f"wrong model for {model_type}")
+    def _load_image(self, image):
+        self.image, self.image_pt, self.original_size = load_rcnn_image(image, size=self.size)
 
-                self.model, self.preprocess = func(self.model_name, self.device)
+    def _forward(self, patchers: List["PatchifyModel"]) -> List:
+        """runs the model over the loaded images of the patchers in a single pass
 
-                get_available_models()[model_cache_key] = {AvailableModelsKey.model: (self.model, self.preprocess),
-                                                    AvailableModelsKey.most_recently_used_time : datetime.datetime.now()}
+        Args:
+            patchers (List[PatchifyModel]): patchers that have loaded their image
 
-            else:
-                self.model, self.preprocess = get_available_models()[model_cache_key][AvailableModelsKey.model]
+        Returns:
+            List: the raw model output for each patcher
+        """
+        # fill in with specifics
+        return [None] * len(patchers)
 
-    def _load_image(self, image):
-        self.image, self.image_pt, self.original_size = load_rcnn_image(image, size=self.size)
+    def _set_model_output(self, output):
+        """turns the raw model output for the loaded image into unprocessed bounding boxes and scores
+        """
+        # fill in with specifics
+        pass
 
     def infer(self, image):
-        self._load_image(image)
         # input is image
-        pass
-        # output are unprocessed bounding boxes        
+        self._load_image(image)
+        # output are unprocessed bounding boxes
+        self._set_model_output(self._forward([self])[0])
+
+    def infer_batch(self, images: List[Union[str, ImageType]]) -> List["PatchifyModel"]:
+        """runs inference for many images, in batches of at most MARQO_PATCH_MODEL_BATCH_SIZE images.
+        the model is only loaded once, by this patcher.
+
+        Args:
+            images (List[Union[str, ImageType]]): the images to infer on
+
+        Returns:
+            List[PatchifyModel]: a patcher per image, in the same order as the images, ready for process()
+        """
+        patchers = []
+        for image in images:
+            patcher = copy.copy(self)
+            patcher.scores = []
+            patcher._load_image(image)
+            patchers.append(patcher)
+
+        batch_size = get_patch_model_batch_size()
+        for start in range(0, len(patchers), batch_size):
+            batch = patchers[start:start + batch_size]
+            for patcher, output in zip(batch, self._forward(batch)):
+                patcher._set_model_output(output)
+
+        return patchers
 
     def _filter_bb(self):
         """filters bounding boxes based on size and aspect ratio
@@ -302,6 +384,54 @@ class PatchifyModel:
         self._nms_bb()
         self._keep_top_k()
 
+        self._set_patches()
+
+    @staticmethod
+    def process_batch(patchers: List["PatchifyModel"]):
+        """process() for many patchers (e.g. from infer_batch). the nms for all of them is done with
+        a single batched nms call, which gives the same boxes as doing it for each patcher
+
+        Args:
+            patchers (List[PatchifyModel]): patchers that have run inference
+        """
+        for patcher in patchers:
+            patcher._filter_bb()
+            patcher._replace_small_bb()
+
+        PatchifyModel._nms_bb_batch(patchers)
+
+        for patcher in patchers:
+            patcher._keep_top_k()
+            patcher._set_patches()
+
+    @staticmethod
+    def _nms_bb_batch(patchers: List["PatchifyModel"]):
+        """performs class agnostic nms over the bounding boxes of each patcher. the boxes of different
+        patchers never suppress each other
+        """
+        patchers = [patcher for patcher in patchers if patcher.nms and len(patcher.boxes_xyxy) > 1]
+        if len(patchers) == 0:
+            return
+
+        boxes = torch.cat([torch.tensor(np.array(patcher.boxes_xyxy), dtype=torch.float32).reshape(-1, 4)
+                           for patcher in patchers])
+        scores = torch.cat([torch.tensor(np.array(patcher.scores), dtype=torch.float32).reshape(-1)
+                            for patcher in patchers])
+        counts = [len(patcher.boxes_xyxy) for patcher in patchers]
+        image_inds = torch.repeat_interleave(torch.arange(len(patchers)), torch.tensor(counts))
+
+        # all the patchers come from the same one, so they share the iou threshold
+        keep = torchvision.ops.batched_nms(boxes, scores, image_inds, patchers[0].iou_thresh)
+
+        # keep is sorted by decreasing score, so each patcher's boxes stay in the order nms gives them
+        kept_image_inds = image_inds[keep]
+        offsets = np.cumsum([0] + counts[:-1])
+        for ind, patcher in enumerate(patchers):
+            patcher.inds = (keep[kept_image_inds == ind] - int(offsets[ind])).tolist()
+            patcher.boxes_xyxy = [patcher.boxes_xyxy[i] for i in patcher.inds]
+            patcher.scores = [patcher.scores[i] for i in patcher.inds]
+
+    def _set_patches(self):
         # we add the original unchanged so that it is always in the index
         # the bb of the original also provides the size which is required for later processing
         self.bboxes = [(0,0,self.size[0],self.size[1])] + self.boxes_xyxy
@@ -321,18 +451,20 @@ class PatchifyViT(PatchifyModel):
      
         # fill in with specifics
         self.model_name = 'vit_small'
+        self.model_size = constants.PATCH_MODEL_SIZES[self.model_name]
         self.patch_size = 16
         self.attention_method = self.kwargs.get('attention_method', 'pos')
 
         self.model_load_function = partial(_load_DINO_model, patch_size=self.patch_size)
         self.allowed_model_types = ('vit_small', 'vit_base')
 
-    def infer(self, image):
-        self._load_image(image)
-
-        self.attentions = DINO_inference(self.model, self.preprocess, self.image, 
+    def _forward(self, patchers: List["PatchifyViT"]) -> List[ndarray]:
+        return DINO_inference_batch(self.model, self.preprocess, [patcher.image for patcher in patchers],
                             self.patch_size, device=self.device)
 
+    def _set_model_output(self, attentions: ndarray):
+        self.attentions = attentions
+
         self.attentions_processed = self._process_attention(self.attentions, method=self.attention_method)
         
         self.boxes_xyxy = []
@@ -387,6 +519,7 @@ class PatchifyPytorch(PatchifyModel):
      
         # fill in with specifics
         self.model_name = 'faster_rcnn'
+        self.model_size = constants.PATCH_MODEL_SIZES[self.model_name]
 
         self.model_load_function = load_pytorch
         
@@ -395,11 +528,13 @@ class PatchifyPytorch(PatchifyModel):
         self.inds = []
         self.iou_thresh = 0.6
 
-    def infer(self, image):
-        self._load_image(image)
-        self.batch = [self.preprocess(self.image_pt.to(self.device))]
+    def _forward(self, patchers: List["PatchifyPytorch"]) -> List[Dict]:
+        batch = [self.preprocess(patcher.image_pt.to(self.device)) for patcher in patchers]
         with torch.no_grad():
-            self.results = self.model(self.batch)[0]
+            return self.model(batch)
+
+    def _set_model_output(self, results: Dict):
+        self.results = results
 
         self.boxes_xyxy = self.results['boxes'].detach().cpu().numpy()
         self.scores = self.results['scores'].detach().cpu().numpy()
@@ -423,22 +558,28 @@ class PatchifyYolox(PatchifyModel):
         # fill in with specifics
         self.yolox_default = get_default_yolox_model()
         self.model_name = _download_yolox(**self.yolox_default)
-       
+        self.model_size = constants.PATCH_MODEL_SIZES['yolox']
+
         self.model_load_function = load_yolox_onnx
         self.allowed_model_types = (self.model_name)
         self.input_shape = (384, 384)
         self.inds = []
         self.iou_thresh = 0.6
 
-    def infer(self, image):
-        self._load_image(image)
+    def _load_image(self, image):
+        super()._load_image(image)
 
         # make cv2 format
         self.image_cv = _PIL_to_opencv(self.image)
-        
-        self.results, self.ratio = _infer_yolox(session=self.model, 
-                            preprocess=self.preprocess, opencv_image=self.image_cv, 
+
+    def _forward(self, patchers: List["PatchifyYolox"]) -> List[Tuple[List[ndarray], float]]:
+        results, ratios = _infer_yolox_batch(session=self.model,
+                            preprocess=self.preprocess, opencv_images=[patcher.image_cv for patcher in patchers],
                             input_shape=self.input_shape)
+        return list(zip(results, ratios))
+
+    def _set_model_output(self, output: Tuple[List[ndarray], float]):
+        self.results, self.ratio = output
 
         self.boxes_xyxy, self.scores =  _process_yolox(output=self.results, ratio=self.ratio, size=self.input_shape)
         if isinstance(self.scores, (np.ndarray, np.generic)):
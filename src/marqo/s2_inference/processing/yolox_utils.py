@@ -1,3 +1,5 @@
+import functools
+
 import cv2
 import numpy as np
 import onnxruntime
@@ -6,6 +8,7 @@ import huggingface_hub
 from marqo.s2_inference.s2_inference import get_logger
 from marqo.s2_inference.types import Dict, List, Union, ImageType, Tuple, FloatTensor, ndarray, Callable
 from marqo.s2_inference.processing.image_utils import _get_onnx_provider
+from marqo.s2_inference.inference_executor import get_onnx_session_options
 
 logger = get_logger(__name__)
 
@@ -21,6 +24,7 @@ def get_default_yolox_model() -> Dict:
         "filename": 'yolox_s.onnx',
     }
 
+@functools.lru_cache
 def _download_yolox(repo_id : str, filename: str) -> str:
     """ downloads the model artefacts from hf
 
@@ -74,7 +78,7 @@ def load_yolox_onnx(model_name: str, device: str) -> Tuple[onnxruntime.Inference
     """
     fast_onnxprovider = _get_onnx_provider(device)
 
-    sess_options = onnxruntime.SessionOptions()
+    sess_options = get_onnx_session_options()
 
     session = onnxruntime.InferenceSession(model_name, sess_options=sess_options, providers=[fast_onnxprovider])
     session.disable_fallback()
@@ -140,6 +144,37 @@ def _infer_yolox(session: onnxruntime.InferenceSession, preprocess: preprocess_y
 
     return output, ratio
 
+def _infer_yolox_batch(session: onnxruntime.InferenceSession, preprocess: preprocess_yolox,
+                       opencv_images: List[ndarray], input_shape: Tuple[int, int]) -> Tuple[List[List[ndarray]], List[float]]:
+    """batched inference for onnx yolox. the images are letterboxed to input_shape by the preprocess
+    function, so they can be stacked into a single batch
+
+    Args:
+        session (onnxruntime.InferenceSession): the onnx session of the model
+        preprocess (preprocess_yolox): the preprocess function for the input images
+        opencv_images (List[ndarray]): the opencv formatted input images
+        input_shape (Tuple[int, int]): the shape the images are letterboxed to
+
+    Returns:
+        Tuple[List[List[ndarray]], List[float]]: for each image, the outputs in the format _infer_yolox returns
+            them (a batch of 1) and the ratio between original and inferred sizes
+    """
+    preprocessed = [preprocess(opencv_image, input_shape) for opencv_image in opencv_images]
+    images = np.stack([img for img, _ in preprocessed])
+    ratios = [ratio for _, ratio in preprocessed]
+
+    model_input = session.get_inputs()[0]
+    # models exported with a fixed batch size of 1 have to be run one image at a time
+    batch_size = model_input.shape[0] if isinstance(model_input.shape[0], int) else len(images)
+
+    outputs = []
+    for start in range(0, len(images), batch_size):
+        batch_output = session.run(None, {model_input.name: images[start:start + batch_size]})
+        for i in range(len(images[start:start + batch_size])):
+            outputs.append([output[i:i + 1] for output in batch_output])
+
+    return outputs, ratios
+
 def _process_yolox(output: ndarray, ratio: float, size: Tuple = (384, 384)) -> Tuple[ndarray, ndarray]:
     """takes the outputs and processes them 
 
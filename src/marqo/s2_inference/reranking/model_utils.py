@@ -17,7 +17,8 @@ import torch
 from marqo.tensor_search.enums import AvailableModelsKey
 from marqo.s2_inference.types import *
 from marqo.s2_inference.s2_inference import (_create_model_cache_key, _float_tensor_to_list,
-                                             _nd_array_to_list, get_available_models)
+                                             _nd_array_to_list, get_available_models, get_model_size,
+                                             get_or_load_cached_model)
 from marqo.s2_inference.configs import ModelCache
 
 from marqo.s2_inference.logger import get_logger
@@ -250,29 +251,46 @@ def load_sbert_cross_encoder_model(model_name: str, device: str, max_length: int
     Returns:
         Any: _description_
     """
-    model_cache_key = _create_model_cache_key(model_name, device)
-
-    if model_cache_key in get_available_models():
-        model = get_available_models()[model_cache_key][AvailableModelsKey.model]
-    else:
-        logger.info(f"loading {model_name} on device {device} and adding to cache...")
+    def load_model():
         if model_name == '_testing':
-            model = DummyModel()
             logger.warning('using the test model - << TESTING PURPOSES ONLY >>')
-        elif model_name.startswith('onnx/'):
-            model = HFClassificationOnnx(model_name.replace('onnx/', ''), device=device)
-        else:
-            model = CrossEncoder(model_name, max_length=max_length, device=device, default_activation_function=torch.nn.Sigmoid())
-            if hasattr(model.tokenizer, 'model_max_length'):
-                model_max_len = model.tokenizer.model_max_length
-                if max_length > model_max_len:
-                    model.max_length = model_max_len
-                    logger.warning(f"specified max_length of {max_length} is greater than model max length of {model_max_len}, setting to model max length")
-        get_available_models()[model_cache_key] ={AvailableModelsKey.model: model, AvailableModelsKey.most_recently_used_time : datetime.datetime.now()}
+            return DummyModel()
+        if model_name.startswith('onnx/'):
+            return HFClassificationOnnx(model_name.replace('onnx/', ''), device=device)
+        model = CrossEncoder(model_name, max_length=max_length, device=device, default_activation_function=torch.nn.Sigmoid())
+        if hasattr(model.tokenizer, 'model_max_length'):
+            model_max_len = model.tokenizer.model_max_length
+            if max_length > model_max_len:
+                model.max_length = model_max_len
+                logger.warning(f"specified max_length of {max_length} is greater than model max length of {model_max_len}, setting to model max length")
+        return model
+
+    # the cache checks the memory threshold of the device, ejects other models if needed and loads the model
+    # once when concurrent requests ask for it
+    model = get_or_load_cached_model(_create_model_cache_key(model_name, device), model_name, device,
+                                     get_model_size(model_name, {}), load_model)
 
     return {'model':model}
 
 
+def predict_cross_encoder(model: Any, pairs: List[List[str]]) -> List[float]:
+    """scores a batch of (query, passage) pairs with a model from load_sbert_cross_encoder_model
+
+    Args:
+        model (Any): a CrossEncoder, HFClassificationOnnx or DummyModel
+        pairs (List[List[str]]): the (query, passage) pairs
+
+    Returns:
+        List[float]: one score per pair
+    """
+    if isinstance(model, CrossEncoder):
+        # the caller has already batched the pairs, so stop the CrossEncoder from splitting them again
+        scores = model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+    else:
+        scores = model.predict(pairs)
+    return [float(score) for score in np.asarray(scores).reshape(-1)]
+
+
 def load_hf_cross_encoder_model(model_name: str, device: str) -> Dict:
     """    
     
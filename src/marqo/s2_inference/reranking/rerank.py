@@ -3,8 +3,9 @@ from PIL import UnidentifiedImageError
 
 from marqo.s2_inference.errors import RerankerError, RerankerNameError
 from marqo.s2_inference.logger import get_logger
-from marqo.s2_inference.reranking.cross_encoders import ReRankerText, ReRankerOwl
+from marqo.s2_inference.reranking.cross_encoders import ReRankerOwl
 from marqo.s2_inference.reranking.enums import ResultsFields
+from marqo.s2_inference.reranking.text_reranker import get_text_reranker
 from marqo.s2_inference.types import Dict, List, Optional
 
 logger = get_logger(__name__)
@@ -46,8 +47,9 @@ def rerank_search_results(search_result: Dict, query: str, model_name: str, devi
 
     else:
         try:
-            reranker = ReRankerText(model_name=model_name, device=device, num_highlights=num_highlights)
-            reranker.rerank(query=query, results=search_result, searchable_attributes=searchable_attributes)
+            reranker = get_text_reranker(model_name=model_name, device=device)
+            reranker.rerank(query=query, results=search_result, searchable_attributes=searchable_attributes,
+                            num_highlights=num_highlights)
         except Exception as e:
             raise RerankerError(message=str(e)) from e
 
@@ -0,0 +1,185 @@
+"""Cross-encoder reranking of text search results.
+
+`ReRankerText` builds a new reranker for every search and moves the hits through several pandas DataFrames
+(results to frame, one frame per field, explode the split text, group by document) before scoring them. For the
+few dozen hits of a search, that bookkeeping and the per-request setup cost about as much as the model itself.
+
+`TextReranker` produces the same fields on the hits (`_reranked_score`, `_reranked_highlights` and `_rerank_id`,
+which `cleanup_final_reranked_results` then folds into `_score` and `_highlights`) from plain lists. There is one
+`TextReranker` per model name and device, kept by `get_text_reranker`. It does not hold on to the model itself.
+The model is looked up in the model cache (`_available_models`) on every call, so the reranker model is renewed
+and ejected like any other model. The (query, passage) pairs are scored in batches of at most
+MARQO_RERANKER_BATCH_SIZE, ordered longest passage first so that each batch pads to similar lengths.
+"""
+import threading
+import uuid
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from marqo.s2_inference.batching import get_length_bucketed_order
+from marqo.s2_inference.processing import text as text_processor
+from marqo.s2_inference.reranking.configs import get_default_text_processing_parameters
+from marqo.s2_inference.reranking.enums import ResultsFields
+from marqo.s2_inference.reranking.model_utils import load_sbert_cross_encoder_model, predict_cross_encoder
+from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.utils import read_env_vars_and_defaults_ints
+
+_rerankers: Dict[Tuple[str, str], "TextReranker"] = {}
+_rerankers_lock = threading.Lock()
+
+
+class RerankCandidate(NamedTuple):
+    """A passage of one hit to be scored against the query."""
+    hit_index: int
+    field_name: str
+    passage: str
+
+
+def get_reranker_batch_size() -> int:
+    """Returns MARQO_RERANKER_BATCH_SIZE, the maximum number of (query, passage) pairs scored at once."""
+    return max(read_env_vars_and_defaults_ints(EnvVars.MARQO_RERANKER_BATCH_SIZE) or 1, 1)
+
+
+def get_searchable_fields(hits: List[Dict[str, Any]]) -> List[str]:
+    """Returns the non-Marqo fields (those not starting with '_') of the hits, in the order they first appear."""
+    fields = {}
+    for hit in hits:
+        for field in hit:
+            if not field.startswith('_'):
+                fields[field] = None
+    return list(fields)
+
+
+def build_rerank_candidates(hits: List[Dict[str, Any]], searchable_attributes: List[str],
+                            split_params: Optional[Dict] = None) -> List[RerankCandidate]:
+    """Returns the passages to score, one per field of each hit, or one per chunk if split_params is given.
+
+    Fields that a hit does not have, or that are None, are skipped.
+
+    Args:
+        hits: The search hits
+        searchable_attributes: The fields to rerank over
+        split_params: The split_length, split_overlap and split_method used to chunk the field content, as in
+            `get_default_text_processing_parameters`. None scores each field as a whole
+    """
+    candidates = []
+    for field_name in searchable_attributes:
+        for hit_index, hit in enumerate(hits):
+            content = hit.get(field_name)
+            if content is None:
+                continue
+            if split_params is None:
+                candidates.append(RerankCandidate(hit_index, field_name, content))
+                continue
+            for chunk in text_processor.split_text(content, split_by=split_params['split_method'],
+                                                   split_length=split_params['split_length'],
+                                                   split_overlap=split_params['split_overlap']):
+                candidates.append(RerankCandidate(hit_index, field_name, chunk))
+    return candidates
+
+
+class TextReranker:
+    """Reranks search hits with a cross-encoder model.
+
+    Args:
+        model_name: The name of the cross-encoder, as accepted by `load_sbert_cross_encoder_model`
+        device: The device to run the model on
+        max_length: The maximum number of tokens of a (query, passage) pair
+    """
+
+    def __init__(self, model_name: str, device: str, max_length: int = 512):
+        self.model_name = model_name
+        self.device = device
+        self.max_length = max_length
+
+    def score(self, query: str, passages: List[str], batch_size: Optional[int] = None) -> List[float]:
+        """Scores each passage against the query.
+
+        Args:
+            query: The search query
+            passages: The passages to score
+            batch_size: The maximum number of pairs scored at once. Defaults to MARQO_RERANKER_BATCH_SIZE
+
+        Returns:
+            The score of each passage, in the order of the passages
+        """
+        if len(passages) == 0:
+            return []
+        if batch_size is None:
+            batch_size = get_reranker_batch_size()
+
+        model = load_sbert_cross_encoder_model(model_name=self.model_name, device=self.device,
+                                               max_length=self.max_length)['model']
+
+        # Bucketing only matters when the pairs do not fit in a single batch
+        order = get_length_bucketed_order(passages) if len(passages) > batch_size else None
+        if order is None:
+            order = list(range(len(passages)))
+
+        scores = [0.0] * len(passages)
+        for start in range(0, len(order), batch_size):
+            batch_order = order[start:start + batch_size]
+            batch_scores = predict_cross_encoder(model, [[query, passages[i]] for i in batch_order])
+            for position, score in zip(batch_order, batch_scores):
+                scores[position] = score
+        return scores
+
+    def rerank(self, query: str, results: Dict, searchable_attributes: Optional[List[str]] = None,
+               num_highlights: int = 1,
+               split_params: Optional[Dict] = get_default_text_processing_parameters()) -> None:
+        """Scores the hits of the results against the query and sorts them by score. The results are modified in place.
+
+        Each hit gets a `_rerank_id`, a `_reranked_score` (a list of the top scores if num_highlights > 1) and
+        `_reranked_highlights` with its best scoring passages. Hits that have none of the searchable attributes are
+        not scored and are moved after the scored hits, keeping their order.
+
+        Args:
+            query: The search query
+            results: The search results
+            searchable_attributes: The fields to rerank over. Defaults to all non-Marqo fields of the hits
+            num_highlights: The number of best scoring passages kept as highlights of each hit
+            split_params: How field content is chunked before it is scored. None scores each field as a whole
+        """
+        if not isinstance(results, dict):
+            raise TypeError(f"expected a dict or defaultdict, received {type(results)}")
+
+        hits = results[ResultsFields.hits]
+        if len(hits) == 0:
+            return
+
+        if searchable_attributes is None:
+            searchable_attributes = get_searchable_fields(hits)
+
+        for hit in hits:
+            hit[ResultsFields.reranked_id] = hit[ResultsFields.id] if ResultsFields.id in hit else str(uuid.uuid4())
+
+        candidates = build_rerank_candidates(hits, searchable_attributes, split_params)
+        scores = self.score(query, [str(candidate.passage) for candidate in candidates])
+
+        # for each hit, its candidates sorted by score. sorted is stable, so ties keep the field order
+        scored_by_hit: Dict[int, List[Tuple[float, RerankCandidate]]] = {}
+        for candidate, score in sorted(zip(candidates, scores), key=lambda pair: pair[0].hit_index):
+            scored_by_hit.setdefault(candidate.hit_index, []).append((score, candidate))
+
+        scored_hits, unscored_hits = [], []
+        for hit_index, hit in enumerate(hits):
+            if hit_index not in scored_by_hit:
+                unscored_hits.append(hit)
+                continue
+            top = sorted(scored_by_hit[hit_index], key=lambda pair: pair[0], reverse=True)[:num_highlights]
+            hit[ResultsFields.reranker_score] = top[0][0] if num_highlights == 1 else [score for score, _ in top]
+            hit[ResultsFields.highlights_reranked] = [{candidate.field_name: candidate.passage}
+                                                      for _, candidate in top]
+            scored_hits.append(hit)
+
+        scored_hits.sort(key=lambda hit: hit[ResultsFields.reranker_score], reverse=True)
+        results[ResultsFields.hits] = scored_hits + unscored_hits
+
+
+def get_text_reranker(model_name: str, device: str) -> TextReranker:
+    """Returns the TextReranker for the model and device, creating it on first use."""
+    key = (model_name, device)
+    reranker = _rerankers.get(key)
+    if reranker is None:
+        with _rerankers_lock:
+            reranker = _rerankers.setdefault(key, TextReranker(model_name=model_name, device=device))
+    return reranker
@@ -15,15 +15,21 @@ from typing import List, Dict, Any, Optional
 from marqo import marqo_docs
 from marqo.api.exceptions import ModelCacheManagementError, ConfigurationError, InternalError
 from marqo.s2_inference import constants
+from marqo.s2_inference.batching import (
+    is_length_bucketed_batching_enabled, get_length_bucketed_order, restore_original_order)
 from marqo.s2_inference.clip_utils import CLIP, OPEN_CLIP
 from marqo.s2_inference.configs import get_default_normalization, get_default_seq_length
 from marqo.s2_inference.errors import (
     VectoriseError, InvalidModelPropertiesError, ModelLoadError,
     UnknownModelError, ModelNotInCacheError, ModelDownloadError)
+from marqo.s2_inference.inference_executor import run_inference
+from marqo.s2_inference.inference_process_pool import get_inference_process_pool
 from marqo.inference.inference_cache.marqo_inference_cache import MarqoInferenceCache
 from marqo.s2_inference.logger import get_logger
 from marqo.s2_inference.model_registry import load_model_properties
 from marqo.s2_inference.models.model_type import ModelType
+from marqo.s2_inference.models.model_runtime import ModelRuntime
+from marqo.s2_inference.onnx_runtime_utils import get_model_runtime
 from marqo.s2_inference.types import *
 from marqo.s2_inference.multimodal_model_load import *
 from marqo.api.configs import EnvVars
@@ -38,6 +44,16 @@ logger = get_logger(__name__)
 _available_models = dict()
 # A lock to protect the model loading process
 lock = threading.Lock()
+# Per model cache key locks, so that concurrent requests for a model that is loading wait for it rather than
+# loading it again. See get_or_load_cached_model
+_model_loading_locks: Dict[str, threading.Lock] = dict()
+_model_loading_locks_lock = threading.Lock()
+# The sizes of the models being loaded by get_or_load_cached_model, by model cache key. They count towards the memory
+# threshold of their device until the model is cached, so that models loaded concurrently cannot exceed it
+_reserved_model_sizes: Dict[str, Union[int, float]] = dict()
+# The preprocessors of the models loaded by the inference processes, by model cache key, so that they are only
+# fetched from an inference process once. See load_multimodal_model_and_get_preprocessors
+_inference_process_preprocessors: Dict[str, Dict[str, Any]] = dict()
 MODEL_PROPERTIES = load_model_properties()
 _marqo_inference_cache = MarqoInferenceCache(cache_size=read_env_vars_and_defaults_ints(EnvVars.MARQO_INFERENCE_CACHE_SIZE),
                                              cache_type=read_env_vars_and_defaults(EnvVars.MARQO_INFERENCE_CACHE_TYPE))
@@ -51,6 +67,33 @@ def vectorise(model_name: str, content: Union[str, List[str], List[Image], List[
     if not device:
         raise InternalError(message=f"vectorise (internal function) cannot be called without setting device!")
 
+    inference_process_pool = get_inference_process_pool()
+    if inference_process_pool is not None:
+        return inference_process_pool.vectorise(
+            model_name=model_name, content=content, model_properties=model_properties, device=device,
+            normalize_embeddings=normalize_embeddings, model_auth=model_auth, enable_cache=enable_cache,
+            modality=modality, **kwargs)
+
+    model_cache_key = load_model_into_cache(model_name, model_properties, device, normalize_embeddings,
+                                            model_auth=model_auth)
+
+    model = _available_models[model_cache_key][AvailableModelsKey.model]
+
+    if _marqo_inference_cache.is_enabled() and enable_cache:
+        return run_inference(_vectorise_with_cache, model, model_cache_key, content, normalize_embeddings,
+                             modality, **kwargs)
+    else:
+        return run_inference(_vectorise_without_cache, model_cache_key, content, normalize_embeddings,
+                             modality, **kwargs)
+
+def load_model_into_cache(model_name: str, model_properties: dict = None, device: str = None,
+                          normalize_embeddings: bool = get_default_normalization(),
+                          model_auth: ModelAuth = None) -> str:
+    """Loads a model into the model cache if it is not cached, as `vectorise` does before vectorising.
+
+    Returns:
+        The model cache key of the model
+    """
     validated_model_properties = validate_model_properties(model_name, model_properties)
     model_cache_key = _create_model_cache_key(model_name, device, validated_model_properties)
 
@@ -58,13 +101,7 @@ def vectorise(model_name: str, content: Union[str, List[str], List[Image], List[
         model_cache_key, model_name, validated_model_properties, device, normalize_embeddings,
         model_auth=model_auth
     )
-
-    model = _available_models[model_cache_key][AvailableModelsKey.model]
-
-    if _marqo_inference_cache.is_enabled() and enable_cache:
-        return _vectorise_with_cache(model, model_cache_key, content, normalize_embeddings, modality, **kwargs)
-    else:
-        return _vectorise_without_cache(model_cache_key, content, normalize_embeddings, modality, **kwargs)
+    return model_cache_key
 
 def _vectorise_with_cache(model, model_cache_key, content, normalize_embeddings, modality, **kwargs):
     if isinstance(content, str):
@@ -126,7 +163,13 @@ def _encode_without_cache(model_cache_key: str, content: Union[str, List[str], L
         else:
             vector_batches = []
             batch_size = _get_max_vectorise_batch_size()
-            
+
+            bucketed_order = None
+            if modality == Modality.TEXT and is_length_bucketed_batching_enabled():
+                bucketed_order = get_length_bucketed_order(content)
+                if bucketed_order is not None:
+                    content = [content[i] for i in bucketed_order]
+
             for batch in generate_batches(content, batch_size=batch_size):
                 if modality is None:
                     modality = infer_modality(batch[0] if isinstance(batch[0], (str, bytes)) else batch)
@@ -142,6 +185,8 @@ def _encode_without_cache(model_cache_key: str, content: Union[str, List[str], L
                 raise RuntimeError(f"Vectorise created an empty list of batches! Content: {content}")
             else:
                 vectorised = np.concatenate(vector_batches, axis=0)
+                if bucketed_order is not None:
+                    vectorised = restore_original_order(vectorised, bucketed_order)
 
                 # Clear CUDA cache
                 if torch.cuda.is_available():
@@ -202,6 +247,7 @@ def load_multimodal_model_and_get_preprocessors(model_name: str, model_propertie
 
     Returns:
         Tuple[Any, Dict[str, Optional[Compose]]]: The loaded model and a dictionary of preprocessors for different modalities.
+            The model is None when inference runs on the inference processes, which load it instead of this process.
 
     Raises:
         InternalError: If the device is not set.
@@ -214,6 +260,16 @@ def load_multimodal_model_and_get_preprocessors(model_name: str, model_propertie
 
     model_cache_key = _create_model_cache_key(model_name, device, model_properties)
 
+    inference_process_pool = get_inference_process_pool()
+    if inference_process_pool is not None:
+        preprocessors = _inference_process_preprocessors.get(model_cache_key)
+        if preprocessors is None:
+            preprocessors = inference_process_pool.get_preprocessors(
+                model_name=model_name, model_properties=model_properties, device=device, model_auth=model_auth,
+                normalize_embeddings=normalize_embeddings)
+            _inference_process_preprocessors[model_cache_key] = preprocessors
+        return None, dict(preprocessors)
+
     _update_available_models(
         model_cache_key, model_name, model_properties, device, normalize_embeddings,
         model_auth=model_auth
@@ -273,8 +329,14 @@ def _create_model_cache_key(model_name: str, device: str, model_properties: dict
                        model_properties.get('name', '') + "||" +
                        str(model_properties.get('dimensions', '')) + "||" +
                        model_properties.get('type', '') + "||" +
-                       str(model_properties.get('tokens', '')) + "||" +
-                       device)
+                       str(model_properties.get('tokens', '')) + "||")
+
+    # Only non-default runtimes are added, so the keys of torch models are unchanged
+    runtime = get_model_runtime(model_properties)
+    if runtime != ModelRuntime.Torch:
+        model_cache_key += runtime.value + "||"
+
+    model_cache_key += device
 
     return model_cache_key
 
@@ -331,6 +393,70 @@ def _update_available_models(model_cache_key: str, model_name: str, validated_mo
                                        f"Please wait for 10 seconds and send the request again.\n") from e
 
 
+def get_or_load_cached_model(model_cache_key: str, model_name: str, device: str, model_size: Union[int, float],
+                             load_function: Callable[[], Any]) -> Any:
+    """Returns a model from the model cache, loading it with load_function if it is not cached.
+
+    This is for models that are not loaded through `_load_model`, such as the image patch models and rerankers,
+    so that they are managed like the embedding models: the model counts towards the memory threshold of the
+    device with model_size, other models on the device are ejected (least recently used first) if there is not
+    enough space for it, and its most recently used time is renewed on every call.
+
+    Loading is single-flight: concurrent calls for the same model wait for the first call to load it, instead of
+    loading it again or being rejected. Calls for other models are not blocked.
+
+    Args:
+        model_cache_key: The key of the model in the model cache
+        model_name: The name of the model, used for logging
+        device: The device the model is loaded onto
+        model_size: The size of the model, in the units of MARQO_MAX_CPU_MODEL_MEMORY/MARQO_MAX_CUDA_MODEL_MEMORY
+        load_function: Loads and returns the model
+
+    Returns:
+        The cached model, i.e. what load_function returned
+    """
+    model = _get_cached_model_and_renew(model_cache_key)
+    if model is not None:
+        return model
+
+    with _model_loading_locks_lock:
+        model_loading_lock = _model_loading_locks.setdefault(model_cache_key, threading.Lock())
+
+    with model_loading_lock:
+        # Another request may have loaded the model while this one was waiting
+        model = _get_cached_model_and_renew(model_cache_key)
+        if model is not None:
+            return model
+
+        with lock:
+            _validate_model_into_device(model_name, {"model_size": model_size}, device,
+                                        calling_func=get_or_load_cached_model.__name__)
+            _reserved_model_sizes[model_cache_key] = model_size
+        logger.info(f"loading {model_name} on device {device} and adding to cache...")
+        try:
+            model = load_function()
+        except Exception:
+            with lock:
+                del _reserved_model_sizes[model_cache_key]
+            raise
+        with lock:
+            del _reserved_model_sizes[model_cache_key]
+            _available_models[model_cache_key] = {
+                AvailableModelsKey.model: model,
+                AvailableModelsKey.most_recently_used_time: datetime.datetime.now(),
+                AvailableModelsKey.model_size: model_size
+            }
+        return model
+
+
+def _get_cached_model_and_renew(model_cache_key: str) -> Optional[Any]:
+    model_entry = _available_models.get(model_cache_key)
+    if model_entry is None:
+        return None
+    model_entry[AvailableModelsKey.most_recently_used_time] = datetime.datetime.now()
+    return model_entry[AvailableModelsKey.model]
+
+
 def validate_model_properties(model_name: str, model_properties: dict) -> dict:
     """validate model_properties, if not given then return model_registry properties.
 
@@ -382,6 +508,12 @@ def validate_model_properties(model_name: str, model_properties: dict) -> dict:
                                               f"'{ModelType.Test}', '{ModelType.Random}', '{ModelType.MultilingualClip}', "
                                               f"'{ModelType.FP16_CLIP}', '{ModelType.SBERT_ONNX}', '{ModelType.CLIP_ONNX}' ")
 
+        if get_model_runtime(model_properties) != ModelRuntime.Torch and \
+                model_type not in (ModelType.HF_MODEL, ModelType.OpenCLIP):
+            raise InvalidModelPropertiesError(f"The runtime '{model_properties['runtime']}' is only supported for "
+                                              f"model types '{ModelType.HF_MODEL}' and '{ModelType.OpenCLIP}', "
+                                              f"but received model type '{model_type}'.")
+
         for key in required_keys:
             if key not in model_properties:
                 raise InvalidModelPropertiesError(f"model_properties has missing key '{key}'. "
@@ -423,9 +555,9 @@ def _validate_model_into_device(model_name:str, model_properties: dict, device:
         True we have enough space for the model
         Raise an error and return False if we can't find enough space for the model.
     '''
-    if calling_func not in ["unit_test", "_update_available_models"]:
-        raise RuntimeError("This function should only be called by `update_available_models` or `unit_test` for "
-                           "thread safeness.")
+    if calling_func not in ["unit_test", "_update_available_models", "get_or_load_cached_model"]:
+        raise RuntimeError("This function should only be called by `update_available_models`, "
+                           "`get_or_load_cached_model` or `unit_test` for thread safeness.")
 
     model_size = get_model_size(model_name, model_properties)
     if _check_memory_threshold_for_model(device, model_size, calling_func = _validate_model_into_device.__name__):
@@ -472,10 +604,12 @@ def _check_memory_threshold_for_model(device: str, model_size: Union[float, int]
         torch.cuda.empty_cache()
         used_memory = sum([_available_models[key].get("model_size", constants.DEFAULT_MODEL_SIZE) for key, values in
                            _available_models.items() if key.endswith(device)])
+        used_memory += sum(size for key, size in _reserved_model_sizes.items() if key.endswith(device))
         threshold = float(read_env_vars_and_defaults(EnvVars.MARQO_MAX_CUDA_MODEL_MEMORY))
     elif device.startswith("cpu"):
         used_memory = sum([_available_models[key].get("model_size", constants.DEFAULT_MODEL_SIZE) for key, values in
                            _available_models.items() if key.endswith("cpu")])
+        used_memory += sum(size for key, size in _reserved_model_sizes.items() if key.endswith("cpu"))
         threshold = float(read_env_vars_and_defaults(EnvVars.MARQO_MAX_CPU_MODEL_MEMORY))
     else:
         raise ModelCacheManagementError(
@@ -571,6 +705,7 @@ def clear_loaded_models() -> None:
             expose cache related functions to the client
     """
     _available_models.clear()
+    _inference_process_preprocessors.clear()
     if torch.cuda.is_available():
         torch.cuda.synchronize()
         torch.cuda.empty_cache()
@@ -11,6 +11,7 @@ from pathlib import Path
 from marqo.s2_inference.types import *
 from marqo.s2_inference.logger import get_logger
 from marqo.s2_inference.configs import ModelCache
+from marqo.s2_inference.inference_executor import get_onnx_session_options
 
 logger = get_logger(__name__)
 
@@ -112,7 +113,7 @@ class SBERT_ONNX(object):
         https://github.com/microsoft/onnxruntime/blob/master/onnxruntime/python/tools/transformers/bert_perf_test.py
         """
 
-        sess_options = onnxruntime.SessionOptions()
+        sess_options = get_onnx_session_options()
         # sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
         self.session = onnxruntime.InferenceSession(
             self.export_model_name, sess_options, providers=[self.fast_onnxprovider])
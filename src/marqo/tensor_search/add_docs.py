@@ -5,7 +5,7 @@ import math
 import os
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import ContextManager
+from typing import ContextManager, Tuple
 import threading
 import torch
 import ffmpeg
@@ -20,7 +20,7 @@ from torchvision.transforms import Compose
 import marqo.exceptions as base_exceptions
 from marqo.core.models.add_docs_params import AddDocsParams
 from marqo.core.models.marqo_index import *
-from marqo.s2_inference import clip_utils
+from marqo.s2_inference import clip_utils, image_preprocessing
 from marqo.s2_inference.s2_inference import is_preprocess_image_model, load_multimodal_model_and_get_preprocessors, \
     infer_modality, Modality
 from marqo.s2_inference.errors import UnsupportedModalityError, S2InferenceError, MediaMismatchError, MediaDownloadError
@@ -86,6 +86,7 @@ def threaded_download_and_preprocess_content(allocated_docs: List[dict],
         metric_obj = RequestMetricsStore.for_request()
         RequestMetricsStore.set_in_request(metrics=metric_obj)
 
+    images_to_preprocess = []
     with metric_obj.time(f"{_id}.thread_time"):
         for doc in allocated_docs:
             for field in list(doc):
@@ -126,19 +127,12 @@ def threaded_download_and_preprocess_content(allocated_docs: List[dict],
                             media_repo[doc[field]] = e
                             metric_obj.increment_counter(f"{doc.get(field, '')}.UnidentifiedImageError")
                             continue
-                        # preprocess image to tensor
+                        # preprocess image to tensor. Images are preprocessed together once this thread has
+                        # downloaded all of them
                         if preprocessors is not None and preprocessors['image'] is not None:
                             if not device or not isinstance(device, str):
                                 raise ValueError("Device must be provided for preprocessing images")
-                            try:
-                                media_repo[doc[field]] = preprocessors['image'](media_repo[doc[field]]).to(device)
-                            except OSError as e:
-                                if "image file is truncated" in str(e):
-                                    media_repo[doc[field]] = e
-                                    metric_obj.increment_counter(f"{doc.get(field, '')}.OSError")
-                                    continue
-                                else:
-                                    raise e
+                            images_to_preprocess.append((doc[field], media_repo[doc[field]]))
 
                     elif (inferred_modality in [Modality.VIDEO, Modality.AUDIO] and is_unstructured_index) or (
                             is_structured_index and media_field_types_mapping[field] in [FieldType.AudioPointer, FieldType.VideoPointer] and inferred_modality in [Modality.AUDIO, Modality.VIDEO]):
@@ -197,6 +191,41 @@ def threaded_download_and_preprocess_content(allocated_docs: List[dict],
                                 metric_obj.increment_counter(f"{doc.get(field, '')}.UnidentifiedImageError")
                                 continue
 
+        if images_to_preprocess:
+            with metric_obj.time(f"{_id}.image_preprocessing"):
+                _preprocess_downloaded_images(images_to_preprocess, media_repo, preprocessors['image'], device,
+                                              metric_obj)
+
+
+def _preprocess_downloaded_images(images: List[Tuple[str, PIL.Image.Image]], media_repo: dict, preprocess: Compose,
+                                  device: str, metric_obj: RequestMetrics) -> None:
+    """Stores the (url, PIL image) pairs downloaded by a thread in media_repo as preprocessed tensors on the device.
+
+    The images are converted, normalised and moved to the device as one batch. Truncated images are replaced by
+    the OSError they raise, as for any other image that cannot be processed.
+    """
+    batch_preprocessor = image_preprocessing.BatchImagePreprocessor(preprocess)
+    batched = image_preprocessing.is_batched_image_preprocessing_enabled() and batch_preprocessor.supports_batching
+
+    prepared_urls, prepared = [], []
+    for url, image in images:
+        try:
+            if batched:
+                prepared.append(batch_preprocessor.prepare(image))
+                prepared_urls.append(url)
+            else:
+                media_repo[url] = preprocess(image).to(device)
+        except OSError as e:
+            if "image file is truncated" in str(e):
+                media_repo[url] = e
+                metric_obj.increment_counter(f"{url}.OSError")
+            else:
+                raise e
+
+    if prepared:
+        for url, tensor in zip(prepared_urls, batch_preprocessor.to_tensor(prepared, device)):
+            media_repo[url] = tensor
+
 
 def download_and_chunk_media(url: str, device: str, headers: dict, modality: Modality, marqo_index_type: IndexType, marqo_index_model: Model,
                              preprocessors: Preprocessors, audio_preprocessing: AudioPreProcessing = None,
@@ -377,44 +406,23 @@ def process_batch(docs: List[dict], thread_count: int, tensor_fields: List[str],
     # Fix up metric_obj to make it not mention thread-ids
     metric_obj = RequestMetricsStore.for_request()
     metric_obj = RequestMetrics.reduce_from_list([metric_obj] + m)
-    metric_obj.times = reduce_thread_metrics(metric_obj.times)
+    metric_obj.merge_keys(thread_independent_metric_key)
     return media_repo
 
 
-def reduce_thread_metrics(data):
-    """Reduce the metrics from each thread, as if they were run in a single thread.
-
-    e.g.
-    ```
-    {
-        "image_download.700.thread_time": 1373.271582997404,
-        "image_download.700.https://www.ai-nc.com/images/pages/heat-map.png": 52.985392,
-        "image_download.729.thread_time": 53.297404,
-        "image_download.729.https://www.ai-nc.com/images/pages/heat-map.png": 2052.617332985392,
-    }
-    ```
-    Becomes
-    ```
-    {
-        "image_download.thread_time": [1373.271582997404, 53.297404],
-        "image_download.https://www.ai-nc.com/images/pages/heat-map.png": [2052.617332985392, 52.985392],
-    }
-    ```
-    Only applies to times that start with `image_download`.
+def thread_independent_metric_key(key: str) -> str:
+    """Remove the thread ID from a metric key, so that the metrics of each thread are reduced as if they were run in a
+    single thread.
+
+    e.g. `image_download.700.thread_time` and `image_download.729.thread_time` both become
+    `image_download.thread_time`. Only applies to keys that start with `image_download`, other than
+    `image_download.full_time`.
     """
-    result = {}
-    for key, value in data.items():
-        if key.startswith("image_download."):
-            parts = key.split('.')
-            new_key = '.'.join(parts[0:1] + parts[2:]) if parts[1] != 'full_time' else key
-            if new_key in result:
-                if isinstance(result[new_key], list):
-                    result[new_key].append(value)
-                else:
-                    result[new_key] = [result[new_key], value]
-            else:
-                result[new_key] = value
-    return result
+    if key.startswith("image_download."):
+        parts = key.split('.')
+        if parts[1] != 'full_time':
+            return '.'.join(parts[0:1] + parts[2:])
+    return key
 
 
 def determine_document_dict_field_type(field_name: str, field_content, mappings: dict) -> FieldType:
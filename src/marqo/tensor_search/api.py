@@ -1,13 +1,17 @@
 """The API entrypoint for Tensor Search"""
+import asyncio
+import io
 import json
-from typing import List
+import tempfile
+from typing import BinaryIO, List, Optional
 
+import anyio
 import pydantic
 import uvicorn
 from fastapi import Depends, FastAPI, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
 
 from marqo import config, marqo_docs
@@ -15,6 +19,7 @@ from marqo import exceptions as base_exceptions
 from marqo import version
 from marqo.api import exceptions as api_exceptions
 from marqo.api.exceptions import InvalidArgError, UnprocessableEntityError
+from marqo.api.models.delete_documents_by_filter import DeleteDocumentsByFilterBodyParams
 from marqo.api.models.embed_request import EmbedRequest
 from marqo.api.models.health_response import HealthResponse
 from marqo.api.models.recommend_query import RecommendQuery
@@ -23,10 +28,11 @@ from marqo.api.models.update_documents import UpdateDocumentsBodyParams
 from marqo.api.route import MarqoCustomRoute
 from marqo.core import exceptions as core_exceptions
 from marqo.core.index_management.index_management import IndexManagement
-from marqo.core.monitoring import memory_profiler
+from marqo.core.monitoring import cpu_profiler, memory_profiler
+from marqo.s2_inference import inference_executor, inference_process_pool
 from marqo.logging import get_logger
-from marqo.tensor_search import tensor_search, utils
-from marqo.tensor_search.enums import RequestType, EnvVars
+from marqo.tensor_search import prometheus_exporter, tensor_search, utils
+from marqo.tensor_search.enums import ImportFormat, RequestType, EnvVars, VectorFormat
 from marqo.api.models.add_docs_objects import AddDocsBodyParams
 from marqo.tensor_search.models.api_models import SearchQuery
 from marqo.tensor_search.models.index_settings import IndexSettings, IndexSettingsWithName
@@ -41,6 +47,9 @@ from marqo.vespa.zookeeper_client import ZookeeperClient
 
 logger = get_logger(__name__)
 
+# Parquet bodies larger than this are spooled to disk while they are received
+_IMPORT_SPOOL_MAX_MEMORY_SIZE = 64 * 1024 * 1024
+
 
 def generate_config() -> config.Config:
     vespa_client = VespaClient(
@@ -231,10 +240,30 @@ def root():
             "version": version.get_version()}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Aggregated request timings and counters, and process gauges, in the Prometheus text format."""
+    # Async so that it runs on the event loop, where the request threadpool's limiter can be read
+    limiter_stats = anyio.to_thread.current_default_thread_limiter().statistics()
+    request_threadpool = {
+        'busy_threads': limiter_stats.borrowed_tokens,
+        'queue_depth': limiter_stats.tasks_waiting
+    }
+    return PlainTextResponse(prometheus_exporter.generate_latest(request_threadpool=request_threadpool),
+                             media_type=prometheus_exporter.CONTENT_TYPE)
+
+
 @app.get('/memory')
 @utils.enable_debug_apis()
-def memory():
-    return memory_profiler.get_memory_profile()
+def memory(diffSeconds: Optional[float] = None, limit: Optional[int] = None):
+    return memory_profiler.get_memory_profile(diff_seconds=diffSeconds, limit=limit)
+
+
+@app.get('/profile/cpu')
+@utils.enable_debug_apis()
+def cpu_profile(seconds: float = 10, interval: float = 0.01, includeIdle: bool = False):
+    """Sample the stacks of all threads for a number of seconds, in the collapsed stack (flame graph) format."""
+    return PlainTextResponse(cpu_profiler.get_cpu_profile(seconds, interval=interval, include_idle=includeIdle))
 
 
 @app.post('/validate/index/{index_name}')
@@ -282,7 +311,8 @@ def search(search_query: SearchQuery, index_name: str, device: str = Depends(api
             score_modifiers=search_query.scoreModifiers,
             model_auth=search_query.modelAuth,
             text_query_prefix=search_query.textQueryPrefix,
-            hybrid_parameters=search_query.hybridParameters
+            hybrid_parameters=search_query.hybridParameters,
+            rerank_depth=search_query.rerankDepth
         )
 
 
@@ -354,6 +384,43 @@ def update_documents(
     return JSONResponse(content=res.dict(exclude_none=True, by_alias=True), headers=res.get_header_dict())
 
 
+@app.get("/indexes/{index_name}/documents/export")
+def export_documents(index_name: str, includeVectors: bool = False, vectorFormat: VectorFormat = VectorFormat.Json,
+                     filter: Optional[str] = None, marqo_config: config.Config = Depends(get_config)):
+    """Stream the documents of an index as newline-delimited JSON, one document per line"""
+    pages = marqo_config.document.export_documents_by_index_name(
+        index_name=index_name, include_vectors=includeVectors, vector_format=vectorFormat, filter_string=filter
+    )
+    return StreamingResponse(
+        (''.join(json.dumps(document) + '\n' for document in page) for page in pages),
+        media_type='application/x-ndjson'
+    )
+
+
+@app.post("/indexes/{index_name}/documents/import")
+async def import_documents(index_name: str, request: Request, format: ImportFormat = ImportFormat.Ndjson,
+                           marqo_config: config.Config = Depends(get_config)):
+    """Import documents with precomputed vectors from a newline-delimited JSON, Parquet or Arrow IPC stream body"""
+    if format == ImportFormat.Parquet:
+        # Parquet files are read from their footer, so the body is received in full first
+        file = tempfile.SpooledTemporaryFile(max_size=_IMPORT_SPOOL_MAX_MEMORY_SIZE)
+        async for chunk in request.stream():
+            await anyio.to_thread.run_sync(file.write, chunk)
+        file.seek(0)
+    else:
+        file = io.BufferedReader(api_utils.RequestBodyReader(request, asyncio.get_running_loop()))
+
+    with file:
+        res = await anyio.to_thread.run_sync(_import_documents, marqo_config, index_name, file, format)
+    return JSONResponse(content=res.dict(exclude_none=True, by_alias=True))
+
+
+@throttle(RequestType.INDEX)
+def _import_documents(marqo_config: config.Config, index_name: str, file: BinaryIO, import_format: ImportFormat):
+    with RequestMetricsStore.for_request().time(f"POST /indexes/{index_name}/documents/import"):
+        return marqo_config.document.import_documents_by_index_name(index_name, file, import_format)
+
+
 @app.get("/indexes/{index_name}/documents/{document_id}")
 def get_document_by_id(index_name: str, document_id: str,
                        marqo_config: config.Config = Depends(get_config),
@@ -377,15 +444,16 @@ def get_documents_by_ids(
 
 
 @app.get("/indexes/{index_name}/stats")
-def get_index_stats(index_name: str, marqo_config: config.Config = Depends(get_config)):
-    stats = marqo_config.monitoring.get_index_stats_by_name(index_name)
+def get_index_stats(index_name: str, refresh: bool = False, marqo_config: config.Config = Depends(get_config)):
+    stats, as_of = marqo_config.monitoring_cache.get_index_stats_by_name(index_name, force_refresh=refresh)
     return {
         'numberOfDocuments': stats.number_of_documents,
         'numberOfVectors': stats.number_of_vectors,
         'backend': {
             'memoryUsedPercentage': stats.backend.memory_used_percentage,
             'storageUsedPercentage': stats.backend.storage_used_percentage
-        }
+        },
+        'asOf': api_utils.format_timestamp(as_of)
     }
 
 
@@ -403,16 +471,26 @@ def delete_docs(index_name: str, documentIds: List[str],
     )
 
 
+@app.post("/indexes/{index_name}/documents/delete-by-filter")
+def delete_docs_by_filter(index_name: str, body: DeleteDocumentsByFilterBodyParams,
+                          marqo_config: config.Config = Depends(get_config)):
+    res = marqo_config.document.delete_documents_by_filter_by_index_name(
+        index_name=index_name, filter_string=body.filter, continuation=body.continuation
+    )
+    return JSONResponse(content=res.dict(exclude_none=True, by_alias=True))
+
+
 @app.get("/health")
-def check_health(marqo_config: config.Config = Depends(get_config)):
-    health_status = marqo_config.monitoring.get_health()
-    return HealthResponse.from_marqo_health_status(health_status)
+def check_health(refresh: bool = False, marqo_config: config.Config = Depends(get_config)):
+    health_status, as_of = marqo_config.monitoring_cache.get_health(force_refresh=refresh)
+    return HealthResponse.from_marqo_health_status(health_status, as_of=api_utils.format_timestamp(as_of))
 
 
 @app.get("/indexes/{index_name}/health")
-def check_index_health(index_name: str, marqo_config: config.Config = Depends(get_config)):
-    health_status = marqo_config.monitoring.get_health(index_name=index_name)
-    return HealthResponse.from_marqo_health_status(health_status)
+def check_index_health(index_name: str, refresh: bool = False, marqo_config: config.Config = Depends(get_config)):
+    # Health is not index specific yet, see Monitoring.get_health
+    health_status, as_of = marqo_config.monitoring_cache.get_health(force_refresh=refresh)
+    return HealthResponse.from_marqo_health_status(health_status, as_of=api_utils.format_timestamp(as_of))
 
 
 @app.get("/indexes")
@@ -446,6 +524,18 @@ def get_cpu_info():
     return tensor_search.get_cpu_info()
 
 
+@app.get("/device/cpu/inference-workers")
+def get_inference_workers_info():
+    """Per-worker utilisation of the inference workers enabled by MARQO_INFERENCE_WORKER_COUNT."""
+    return inference_executor.get_inference_executor_stats()
+
+
+@app.get("/device/cpu/inference-processes")
+def get_inference_processes_info():
+    """Status of the inference worker processes enabled by MARQO_INFERENCE_PROCESS_COUNT."""
+    return inference_process_pool.get_inference_process_pool_stats()
+
+
 @app.get("/device/cuda")
 def get_cuda_info(marqo_config: config.Config = Depends(get_config)):
     return marqo_config.monitoring.get_cuda_info()
@@ -596,6 +686,16 @@ curl -XDELETE http://localhost:8882/indexes/my-irst-ix
 curl -XGET http://localhost:8882/device/cpu
 """
 
+# check inference worker utilisation
+"""
+curl -XGET http://localhost:8882/device/cpu/inference-workers
+"""
+
+# check the inference worker processes
+"""
+curl -XGET http://localhost:8882/device/cpu/inference-processes
+"""
+
 # check cuda info
 """
 curl -XGET http://localhost:8882/device/cuda
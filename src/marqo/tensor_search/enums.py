@@ -25,6 +25,18 @@ class TensorField:
     tensor_facets = "_tensor_facets"
     embedding = "_embedding"
     found = "_found"
+    tensors = "_tensors"
+
+
+class VectorFormat(str, Enum):
+    Json = "json"
+    Binary = "binary"
+
+
+class ImportFormat(str, Enum):
+    Ndjson = "ndjson"
+    Parquet = "parquet"
+    Arrow = "arrow"
 
 
 class Device(str, Enum):
@@ -59,6 +71,8 @@ class EnvVars:
     MARQO_MAX_CONCURRENT_PARTIAL_UPDATE = "MARQO_MAX_CONCURRENT_PARTIAL_UPDATE"
     MARQO_THREAD_EXPIRY_TIME = "MARQO_THREAD_EXPIRY_TIME"
     MARQO_ENABLE_THROTTLING = "MARQO_ENABLE_THROTTLING"
+    MARQO_THROTTLING_QUEUE_TIMEOUT_MS = "MARQO_THROTTLING_QUEUE_TIMEOUT_MS"
+    MARQO_THROTTLING_TARGET_LATENCY_MS = "MARQO_THROTTLING_TARGET_LATENCY_MS"
     MARQO_LOG_LEVEL = "MARQO_LOG_LEVEL"
     MARQO_MEDIA_DOWNLOAD_THREAD_COUNT_PER_REQUEST = "MARQO_MEDIA_DOWNLOAD_THREAD_COUNT_PER_REQUEST"
     MARQO_IMAGE_DOWNLOAD_THREAD_COUNT_PER_REQUEST = "MARQO_IMAGE_DOWNLOAD_THREAD_COUNT_PER_REQUEST"
@@ -67,8 +81,35 @@ class EnvVars:
     MARQO_MAX_CUDA_MODEL_MEMORY = "MARQO_MAX_CUDA_MODEL_MEMORY"
     MARQO_EF_CONSTRUCTION_MAX_VALUE = "MARQO_EF_CONSTRUCTION_MAX_VALUE"
     MARQO_MAX_VECTORISE_BATCH_SIZE = "MARQO_MAX_VECTORISE_BATCH_SIZE"
+    MARQO_ENABLE_LENGTH_BUCKETED_BATCHING = "MARQO_ENABLE_LENGTH_BUCKETED_BATCHING"
+    MARQO_INFERENCE_WORKER_COUNT = "MARQO_INFERENCE_WORKER_COUNT"
+    MARQO_INFERENCE_INTRA_OP_THREADS = "MARQO_INFERENCE_INTRA_OP_THREADS"
+    MARQO_INFERENCE_BULK_MIN_SHARE = "MARQO_INFERENCE_BULK_MIN_SHARE"
+    MARQO_INFERENCE_INTERACTIVE_QUEUE_SLO_MS = "MARQO_INFERENCE_INTERACTIVE_QUEUE_SLO_MS"
+    MARQO_INFERENCE_PROCESS_COUNT = "MARQO_INFERENCE_PROCESS_COUNT"
+    MARQO_INFERENCE_PROCESS_HEALTH_CHECK_INTERVAL = "MARQO_INFERENCE_PROCESS_HEALTH_CHECK_INTERVAL"
+    MARQO_INFERENCE_PROCESS_TIMEOUT = "MARQO_INFERENCE_PROCESS_TIMEOUT"
+    MARQO_INFERENCE_PROCESS_MODEL_LOAD_TIMEOUT = "MARQO_INFERENCE_PROCESS_MODEL_LOAD_TIMEOUT"
+    MARQO_ENABLE_BATCHED_IMAGE_PREPROCESSING = "MARQO_ENABLE_BATCHED_IMAGE_PREPROCESSING"
+    MARQO_ENABLE_IMAGE_DRAFT_DECODE = "MARQO_ENABLE_IMAGE_DRAFT_DECODE"
+    MARQO_IMAGE_PREPROCESSING_THREAD_COUNT = "MARQO_IMAGE_PREPROCESSING_THREAD_COUNT"
+    MARQO_RERANKER_BATCH_SIZE = "MARQO_RERANKER_BATCH_SIZE"
+    MARQO_RERANK_CACHE_TTL = "MARQO_RERANK_CACHE_TTL"
+    MARQO_RERANK_CACHE_SIZE = "MARQO_RERANK_CACHE_SIZE"
+    MARQO_PATCH_MODEL_BATCH_SIZE = "MARQO_PATCH_MODEL_BATCH_SIZE"
+    MARQO_MONITORING_CACHE_MAX_STALENESS = "MARQO_MONITORING_CACHE_MAX_STALENESS"
+    MARQO_MONITORING_CACHE_REFRESH_INTERVAL = "MARQO_MONITORING_CACHE_REFRESH_INTERVAL"
+    MARQO_ENABLE_SPECULATIVE_HYBRID_SEARCH = "MARQO_ENABLE_SPECULATIVE_HYBRID_SEARCH"
+    MARQO_SCHEMA_UPDATE_BATCH_WINDOW_MS = "MARQO_SCHEMA_UPDATE_BATCH_WINDOW_MS"
+    MARQO_INDEX_OPERATION_BATCH_WINDOW_MS = "MARQO_INDEX_OPERATION_BATCH_WINDOW_MS"
     MARQO_MAX_SEARCHABLE_TENSOR_ATTRIBUTES = "MARQO_MAX_SEARCHABLE_TENSOR_ATTRIBUTES"
     MARQO_MAX_DELETE_DOCS_COUNT = "MARQO_MAX_DELETE_DOCS_COUNT"
+    MARQO_DELETE_BY_FILTER_SLICES = "MARQO_DELETE_BY_FILTER_SLICES"
+    MARQO_DELETE_BY_FILTER_TIME_BUDGET_MS = "MARQO_DELETE_BY_FILTER_TIME_BUDGET_MS"
+    MARQO_EXPORT_SLICES = "MARQO_EXPORT_SLICES"
+    MARQO_EXPORT_PAGE_SIZE = "MARQO_EXPORT_PAGE_SIZE"
+    MARQO_IMPORT_BATCH_SIZE = "MARQO_IMPORT_BATCH_SIZE"
+    MARQO_IMPORT_FEED_CONCURRENCY = "MARQO_IMPORT_FEED_CONCURRENCY"
     MARQO_MAX_NUMBER_OF_REPLICAS = "MARQO_MAX_NUMBER_OF_REPLICAS"
     MARQO_DEFAULT_EF_SEARCH = "MARQO_DEFAULT_EF_SEARCH"
     MARQO_BEST_AVAILABLE_DEVICE = "MARQO_BEST_AVAILABLE_DEVICE"
@@ -85,6 +126,19 @@ class EnvVars:
     ZOOKEEPER_CONNECTION_TIMEOUT = "ZOOKEEPER_CONNECTION_TIMEOUT"
 
 
+class ThrottlingMode:
+    """Values of MARQO_ENABLE_THROTTLING"""
+    Redis = "TRUE"
+    Local = "LOCAL"
+    Disabled = "FALSE"
+
+
+class WorkloadClass(str, Enum):
+    """How model calls are prioritised by the inference workers"""
+    Interactive = "interactive"  # search, recommend and embed
+    Bulk = "bulk"  # adding and updating documents
+
+
 class RequestType:
     INDEX = "INDEX"
     SEARCH = "SEARCH"
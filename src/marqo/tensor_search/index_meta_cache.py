@@ -5,7 +5,7 @@ index in the search DB via a plugin.
 """
 import threading
 import time
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 from marqo import marqo_docs
 from marqo.api import exceptions
@@ -20,6 +20,12 @@ logger = get_logger(__name__)
 
 index_info_cache = dict()
 
+# ETags of the settings the cache was populated from. Settings are only fetched and parsed again if Vespa returns
+# different ETags. A per-index ETag is kept with the index it was returned with, and is only used while that index is
+# the one in the cache, as the refresh thread can replace it.
+all_indexes_etag: Optional[str] = None
+index_etags: Dict[str, Tuple[str, MarqoIndex]] = dict()
+
 # the following is a non thread safe dict. Its purpose to be used by request
 # threads to calculate whether to refresh an index's cached index_info.
 # Because it is non thread safe, there is a chance multiple threads push out
@@ -33,8 +39,10 @@ refresh_lock = threading.Lock()  # to ensure only one thread is operating on ref
 
 
 def empty_cache():
-    global index_info_cache
+    global index_info_cache, all_indexes_etag, index_etags
     index_info_cache = dict()
+    all_indexes_etag = None
+    index_etags = dict()
 
 
 def get_cache() -> Dict[str, MarqoIndex]:
@@ -49,7 +57,7 @@ def get_index(index_management: IndexManagement, index_name: str, force_refresh=
         index_management: IndexManagement object to load the index if not found in cache
         index_name (str): Name of the index to retrieve.
         force_refresh: Get index from Vespa even if already in cache. If False, Vespa is called only if index is not
-        found in cache.
+        found in cache. The index settings are only sent and parsed again if they have changed.
 
     Returns:
         The latest index if the index is not found in cache or force_refresh flag is True. Otherwise, the cached index
@@ -61,7 +69,7 @@ def get_index(index_management: IndexManagement, index_name: str, force_refresh=
     _check_refresh_thread(index_management)
 
     if force_refresh or index_name not in index_info_cache:
-        _refresh_index(index_management, index_name)
+        return _refresh_index(index_management, index_name)
 
     if index_name in index_info_cache:
         return index_info_cache[index_name]
@@ -70,17 +78,35 @@ def get_index(index_management: IndexManagement, index_name: str, force_refresh=
     raise exceptions.IndexNotFoundError(f"Index {index_name} not found")
 
 
-def _refresh_index(index_management: IndexManagement, index_name: str) -> None:
+def _refresh_index(index_management: IndexManagement, index_name: str) -> MarqoIndex:
     """
-    Refresh cache for a specific index
+    Refresh cache for a specific index, and return the latest index
     """
+    cached_index = index_info_cache.get(index_name)
+    etag, etag_index = index_etags.get(index_name, (None, None))
+    if cached_index is None or etag_index is not cached_index:
+        etag = None
+
     try:
-        index = index_management.get_index(index_name)
+        index, etag = index_management.get_index_if_modified(index_name, etag)
     except IndexNotFoundError as e:
+        index_etags.pop(index_name, None)
         raise exceptions.IndexNotFoundError(f"Index {index_name} not found") from e
 
+    if index is None:
+        # Not modified. Return a copy, since callers can modify the index, e.g. to add fields, and the cached index
+        # is shared
+        if etag is not None:
+            index_etags[index_name] = (etag, cached_index)
+        index_info_cache[index_name] = cached_index
+        return cached_index.copy(deep=True)
+
+    if etag is not None:
+        index_etags[index_name] = (etag, index)
     index_info_cache[index_name] = index
 
+    return index
+
 
 def _check_refresh_thread(index_management: IndexManagement):
     if refresh_lock.locked():
@@ -135,10 +161,14 @@ def start_refresh_thread(config: Config):
 
 def populate_cache(index_management: IndexManagement):
     """
-    Refresh cache for all indexes
+    Refresh cache for all indexes. Nothing is done if no index settings have changed since the last refresh, and
+    indexes whose settings have not changed are kept rather than parsed again.
     """
-    global index_info_cache
-    indexes = index_management.get_all_indexes()
+    global index_info_cache, all_indexes_etag
+    indexes, etag = index_management.get_all_indexes_if_modified(all_indexes_etag, index_info_cache)
+
+    if indexes is None:
+        return
 
     # Enable caching and reset any existing model caches
     # Create a map for one-pass cache update
@@ -147,3 +177,4 @@ def populate_cache(index_management: IndexManagement):
         index_map[index.name] = index
 
     index_info_cache = index_map
+    all_indexes_etag = etag
@@ -44,6 +44,7 @@ class SearchQuery(BaseMarqoModel):
     approximate: Optional[bool] = None
     showHighlights: bool = True
     reRanker: str = None
+    rerankDepth: Optional[int] = None
     filter: str = None
     attributesToRetrieve: Union[None, List[str]] = None
     boost: Optional[Dict] = None
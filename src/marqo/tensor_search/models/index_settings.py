@@ -45,6 +45,8 @@ class IndexSettings(StrictBaseModel):
         splitOverlap=3,
     )
     vectorNumericType: core.VectorNumericType = core.VectorNumericType.Float
+    # Only returned by get_settings for indexes that store centroids, so the settings of other indexes are unchanged
+    storeCentroids: Optional[bool] = None
     annParameters: AnnParameters = AnnParameters(
         spaceType=core.DistanceMetric.PrenormalizedAngular,
         parameters=core.HnswConfig(
@@ -137,6 +139,7 @@ class IndexSettings(StrictBaseModel):
                 distance_metric=self.annParameters.spaceType,
                 vector_numeric_type=self.vectorNumericType,
                 hnsw_config=self.annParameters.parameters,
+                store_centroids=bool(self.storeCentroids),
                 fields=marqo_fields,
                 tensor_fields=self.tensorFields,
                 marqo_version=version.get_version(),
@@ -188,6 +191,7 @@ class IndexSettings(StrictBaseModel):
                 distance_metric=self.annParameters.spaceType,
                 vector_numeric_type=self.vectorNumericType,
                 hnsw_config=self.annParameters.parameters,
+                store_centroids=bool(self.storeCentroids),
                 treat_urls_and_pointers_as_images=self.treatUrlsAndPointersAsImages,
                 treat_urls_and_pointers_as_media=self.treatUrlsAndPointersAsMedia,
                 filter_string_max_length=self.filterStringMaxLength,
@@ -217,6 +221,7 @@ class IndexSettings(StrictBaseModel):
                 videoPreprocessing=marqo_index.video_preprocessing,
                 audioPreprocessing=marqo_index.audio_preprocessing,
                 vectorNumericType=marqo_index.vector_numeric_type,
+                storeCentroids=marqo_index.store_centroids or None,
                 annParameters=AnnParameters(
                     spaceType=marqo_index.distance_metric,
                     parameters=marqo_index.hnsw_config
@@ -242,6 +247,7 @@ class IndexSettings(StrictBaseModel):
                 videoPreprocessing=marqo_index.video_preprocessing,
                 audioPreprocessing=marqo_index.audio_preprocessing,
                 vectorNumericType=marqo_index.vector_numeric_type,
+                storeCentroids=marqo_index.store_centroids or None,
                 annParameters=AnnParameters(
                     spaceType=marqo_index.distance_metric,
                     parameters=marqo_index.hnsw_config
@@ -10,6 +10,7 @@ from PIL import Image
 from marqo import config, marqo_docs, version
 from marqo.api import exceptions
 from marqo.connections import redis_driver
+from marqo.s2_inference import inference_executor, inference_process_pool
 from marqo.s2_inference.s2_inference import vectorise
 from marqo.s2_inference.processing.image import chunk_image
 from marqo.s2_inference.constants import PATCH_MODELS
@@ -32,6 +33,8 @@ def on_start(config: config.Config):
         DownloadStartText(),
         CUDAAvailable(),
         SetBestAvailableDevice(),
+        ConfigureInferenceThreads(),
+        StartInferenceProcesses(),
         CacheModels(),
         InitializeRedis("localhost", 6379),
         CachePatchModels(),
@@ -121,6 +124,31 @@ class SetBestAvailableDevice:
         self.logger.info(f"Best available device set to: {os.environ[EnvVars.MARQO_BEST_AVAILABLE_DEVICE]}")
 
 
+class ConfigureInferenceThreads:
+    """applies the intra-op thread count and starts the inference workers, before any model is loaded
+    """
+    logger = get_logger('ConfigureInferenceThreads')
+
+    def run(self):
+        intra_op_threads = inference_executor.configure_intra_op_threads()
+        executor = inference_executor.get_inference_executor()
+        if executor is not None:
+            self.logger.info(f"Running inference on {executor.num_workers} inference workers")
+        elif intra_op_threads is not None:
+            self.logger.info(f"Running inference on request threads with {intra_op_threads} intra-op threads")
+
+
+class StartInferenceProcesses:
+    """starts the inference worker processes, so models preloaded by CacheModels are loaded by a worker
+    """
+    logger = get_logger('StartInferenceProcesses')
+
+    def run(self):
+        pool = inference_process_pool.get_inference_process_pool()
+        if pool is not None:
+            self.logger.info(f"Running inference on {pool.stats()['num_processes']} inference processes")
+
+
 class CacheModels:
     """warms the in-memory model cache by preloading good defaults
     """
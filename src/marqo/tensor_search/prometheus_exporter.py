@@ -0,0 +1,292 @@
+"""Aggregates the RequestMetrics of all requests and exports them, with a few process gauges, for Prometheus.
+
+Every request's RequestMetrics are recorded by the TelemetryMiddleware once the request completes. Timers become
+histograms and counters become counters, labelled by their metric key, and GET /metrics renders them in the
+Prometheus text exposition format.
+
+Recording is lock-free: each thread records into its own shard, which only that thread ever writes to, and a scrape
+merges the shards. Copying a shard's dict or list is a single operation under the GIL, so a scrape sees a consistent
+value for each key even while the owning thread records.
+"""
+import bisect
+import re
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from marqo.s2_inference import constants as s2_inference_constants
+from marqo.s2_inference import inference_executor
+from marqo.s2_inference import s2_inference
+from marqo.tensor_search.enums import AvailableModelsKey
+from marqo.tensor_search.telemetry import RequestMetrics
+from marqo.tensor_search.throttling import local_throttle
+
+CONTENT_TYPE = 'text/plain; version=0.0.4'  # the response adds the charset
+
+DURATION_BUCKETS_SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Some metric keys embed an index name, a document ID or a URL. They are mapped to a fixed key so that the number
+# of exported series stays bounded
+_KEY_NORMALISATIONS = [
+    (re.compile(r'^([A-Z]+) /indexes/[^/]+/'), r'\1 /indexes/{index_name}/'),
+    (re.compile(r'^image_download\.(?!full_time$).*$', re.DOTALL), 'image_download.image'),
+    (re.compile(r'^.*\.(thread_time|image_preprocessing|UnidentifiedImageError|OSError)$', re.DOTALL),
+     r'add_documents.\1'),
+]
+
+
+@lru_cache(maxsize=1024)
+def normalise_metric_key(key: str) -> str:
+    """Returns the key a RequestMetrics timer or counter is exported under."""
+    for pattern, replacement in _KEY_NORMALISATIONS:
+        if pattern.match(key):
+            return pattern.sub(replacement, key, count=1)
+    return key
+
+
+class _Shard:
+    __slots__ = ('counters', 'histograms')
+
+    def __init__(self):
+        self.counters: Dict[str, int] = defaultdict(int)
+        # Per key: the count of each bucket (not cumulative), the +Inf bucket count, then the sum of the observations
+        self.histograms: Dict[str, List[float]] = dict()
+
+
+class RequestMetricsAggregator:
+    """Aggregates the timers and counters of RequestMetrics across requests."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DURATION_BUCKETS_SECONDS):
+        self.buckets = tuple(sorted(buckets))
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        # Only taken the first time a thread records
+        self._shards_lock = threading.Lock()
+
+    def _get_shard(self) -> _Shard:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def record(self, metrics: RequestMetrics) -> None:
+        """Adds the counters and timers of a request to the aggregates."""
+        shard = self._get_shard()
+        for key, count in list(metrics.counter.items()):
+            shard.counters[normalise_metric_key(key)] += count
+
+        for key, stats in list(metrics.timings.items()):
+            if stats.count == 0:
+                continue
+            key = normalise_metric_key(key)
+            histogram = shard.histograms.get(key)
+            if histogram is None:
+                histogram = [0] * (len(self.buckets) + 1) + [0.0]
+                shard.histograms[key] = histogram
+            # When a key was timed more often than the size of its reservoir, the buckets are estimated from the
+            # sampled times, each standing for count / len(samples) times. The total count and sum are exact
+            weight = stats.count / len(stats.samples) if stats.samples else 0
+            for time_ms in stats.samples:
+                histogram[bisect.bisect_left(self.buckets, time_ms / 1000)] += weight
+            if not stats.samples:
+                histogram[-2] += stats.count
+            histogram[-1] += stats.total / 1000
+
+    def snapshot(self) -> Tuple[Dict[str, int], Dict[str, List[float]]]:
+        """
+        Returns the aggregated counters, and the histograms as the cumulative count of each bucket, the +Inf bucket
+        (the total count) and the sum of the observations.
+        """
+        with self._shards_lock:
+            shards = list(self._shards)
+
+        counters: Dict[str, int] = defaultdict(int)
+        histograms: Dict[str, List[float]] = dict()
+        for shard in shards:
+            for key, count in dict(shard.counters).items():
+                counters[key] += count
+            for key, histogram in dict(shard.histograms).items():
+                histogram = list(histogram)
+                merged = histograms.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+                for i, value in enumerate(histogram):
+                    merged[i] += value
+
+        for histogram in histograms.values():
+            for i in range(1, len(self.buckets) + 1):
+                histogram[i] += histogram[i - 1]
+
+        return dict(counters), histograms
+
+    def clear(self) -> None:
+        with self._shards_lock:
+            self._shards = []
+            self._local = threading.local()
+
+
+_aggregator = RequestMetricsAggregator()
+
+
+def get_request_metrics_aggregator() -> RequestMetricsAggregator:
+    return _aggregator
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(str(value))}"' for name, value in labels.items()) + '}'
+
+
+def _metric_family(name: str, metric_type: str, description: str,
+                   samples: Iterable[Tuple[str, Dict[str, str], float]]) -> List[str]:
+    lines = [f'# HELP {name} {description}', f'# TYPE {name} {metric_type}']
+    for sample_name, labels, value in samples:
+        lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+    return lines
+
+
+def _request_metrics_lines(aggregator: RequestMetricsAggregator) -> List[str]:
+    counters, histograms = aggregator.snapshot()
+    name = 'marqo_request_operation_duration_seconds'
+    histogram_samples = []
+    for key in sorted(histograms):
+        histogram = histograms[key]
+        for bound, count in zip(aggregator.buckets, histogram):
+            histogram_samples.append((f'{name}_bucket', {'key': key, 'le': _format_value(float(bound))}, count))
+        histogram_samples.append((f'{name}_bucket', {'key': key, 'le': '+Inf'}, histogram[-2]))
+        histogram_samples.append((f'{name}_sum', {'key': key}, histogram[-1]))
+        histogram_samples.append((f'{name}_count', {'key': key}, histogram[-2]))
+
+    return (
+            _metric_family(name, 'histogram', 'Duration of the operations timed while serving requests.',
+                           histogram_samples) +
+            _metric_family('marqo_request_operation', 'counter',
+                           'Number of the events counted while serving requests.',
+                           [('marqo_request_operation_total', {'key': key}, counters[key])
+                            for key in sorted(counters)])
+    )
+
+
+def _inference_cache_lines() -> List[str]:
+    cache = s2_inference.get_marqo_inference_cache()
+    if not cache.is_enabled():
+        return []
+    hits, misses = cache.hits, cache.misses
+    lookups = hits + misses
+    return (
+            _metric_family('marqo_inference_cache_hits', 'counter', 'Inference cache lookups that found an embedding.',
+                           [('marqo_inference_cache_hits_total', {}, hits)]) +
+            _metric_family('marqo_inference_cache_misses', 'counter',
+                           'Inference cache lookups that did not find an embedding.',
+                           [('marqo_inference_cache_misses_total', {}, misses)]) +
+            _metric_family('marqo_inference_cache_hit_ratio', 'gauge',
+                           'Ratio of inference cache lookups that found an embedding, since startup.',
+                           [('marqo_inference_cache_hit_ratio', {}, hits / lookups if lookups else 0.0)]) +
+            _metric_family('marqo_inference_cache_entries', 'gauge', 'Number of embeddings in the inference cache.',
+                           [('marqo_inference_cache_entries', {}, cache.currsize)])
+    )
+
+
+def _loaded_models_lines() -> List[str]:
+    memory_by_device: Dict[str, float] = defaultdict(float)
+    models_by_device: Dict[str, int] = defaultdict(int)
+    # list() takes a copy in one operation, as models can be loaded and ejected concurrently
+    for model_cache_key, model in list(s2_inference.get_available_models().items()):
+        device = model_cache_key.split('||')[-1]
+        memory_by_device[device] += model.get(AvailableModelsKey.model_size, s2_inference_constants.DEFAULT_MODEL_SIZE)
+        models_by_device[device] += 1
+
+    return (
+            _metric_family('marqo_loaded_models', 'gauge', 'Number of models loaded, per device.',
+                           [('marqo_loaded_models', {'device': device}, models_by_device[device])
+                            for device in sorted(models_by_device)]) +
+            _metric_family('marqo_loaded_models_memory_gigabytes', 'gauge',
+                           'Estimated memory of the models loaded, per device, as counted towards '
+                           'MARQO_MAX_CPU_MODEL_MEMORY and MARQO_MAX_CUDA_MODEL_MEMORY.',
+                           [('marqo_loaded_models_memory_gigabytes', {'device': device}, memory_by_device[device])
+                            for device in sorted(memory_by_device)])
+    )
+
+
+def _threadpool_lines(request_threadpool: Optional[Dict[str, int]]) -> List[str]:
+    lines = []
+    if request_threadpool is not None:
+        lines += _metric_family('marqo_request_threadpool_busy_threads', 'gauge',
+                                'Request threadpool threads running a request.',
+                                [('marqo_request_threadpool_busy_threads', {}, request_threadpool['busy_threads'])])
+        lines += _metric_family('marqo_request_threadpool_queue_depth', 'gauge',
+                                'Requests waiting for a request threadpool thread.',
+                                [('marqo_request_threadpool_queue_depth', {}, request_threadpool['queue_depth'])])
+
+    executor = inference_executor.get_inference_executor()
+    if executor is not None:
+        stats = executor.stats()
+        lines += _metric_family('marqo_inference_workers_busy', 'gauge', 'Inference workers running a model call.',
+                                [('marqo_inference_workers_busy', {},
+                                  sum(1 for worker in stats['workers'] if worker['busy']))])
+        lines += _metric_family('marqo_inference_queue_depth', 'gauge',
+                                'Model calls waiting for an inference worker.',
+                                [('marqo_inference_queue_depth', {}, stats['queue_depth'])])
+        lines += _metric_family('marqo_inference_queue_depth_by_workload', 'gauge',
+                                'Model calls waiting for an inference worker, per workload class.',
+                                [('marqo_inference_queue_depth_by_workload', {'workload': 'interactive'},
+                                  stats['interactive_queue_depth']),
+                                 ('marqo_inference_queue_depth_by_workload', {'workload': 'bulk'},
+                                  stats['bulk_queue_depth'])])
+        lines += _metric_family('marqo_inference_bulk_worker_limit', 'gauge',
+                                'Number of inference workers that bulk model calls may occupy at once.',
+                                [('marqo_inference_bulk_worker_limit', {}, stats['bulk_worker_limit'])])
+    return lines
+
+
+def _throttling_lines() -> List[str]:
+    limiter_stats = local_throttle.get_limiter_stats()
+    if not limiter_stats:
+        return []
+    request_types = sorted(limiter_stats)
+    return (
+            _metric_family('marqo_throttling_concurrency_limit', 'gauge',
+                           'Concurrency limit of local throttling, per request type.',
+                           [('marqo_throttling_concurrency_limit', {'request_type': request_type},
+                             limiter_stats[request_type]['limit']) for request_type in request_types]) +
+            _metric_family('marqo_throttling_in_flight', 'gauge',
+                           'Requests admitted by local throttling and running, per request type.',
+                           [('marqo_throttling_in_flight', {'request_type': request_type},
+                             limiter_stats[request_type]['in_flight']) for request_type in request_types]) +
+            _metric_family('marqo_throttling_queued', 'gauge',
+                           'Requests waiting to be admitted by local throttling, per request type.',
+                           [('marqo_throttling_queued', {'request_type': request_type},
+                             limiter_stats[request_type]['queued']) for request_type in request_types])
+    )
+
+
+def generate_latest(request_threadpool: Optional[Dict[str, int]] = None,
+                    aggregator: Optional[RequestMetricsAggregator] = None) -> str:
+    """
+    Renders the aggregated request metrics and the process gauges in the Prometheus text exposition format.
+
+    Args:
+        request_threadpool: 'busy_threads' and 'queue_depth' of the threadpool that runs the requests, if known
+        aggregator: The aggregator to render. Defaults to the process-wide one
+    """
+    lines = (
+            _request_metrics_lines(aggregator if aggregator is not None else _aggregator) +
+            _inference_cache_lines() +
+            _loaded_models_lines() +
+            _threadpool_lines(request_threadpool) +
+            _throttling_lines()
+    )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,85 @@
+"""A short-lived cache of reranked search results, used when a search sets rerankDepth.
+
+With rerankDepth, a search retrieves the top rerankDepth candidates, reranks all of them and returns the requested
+limit/offset window of the reranked list. The full reranked list is cached for MARQO_RERANK_CACHE_TTL seconds,
+keyed by everything that affects retrieval and reranking (but not by limit and offset), so the following pages of
+the same search are sliced from the cache instead of querying Vespa and running the reranker again. This also keeps
+the ordering stable across pages.
+
+Documents added, updated or deleted while an entry is cached are not reflected in it until it expires.
+"""
+import copy
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+
+from marqo.tensor_search import utils
+from marqo.tensor_search.enums import EnvVars
+
+_cache: Optional["RerankedResultsCache"] = None
+_cache_lock = threading.Lock()
+
+
+class RerankedResultsCache:
+    """A thread-safe, size-bounded cache of reranked search results whose entries expire after ttl seconds.
+
+    Results are deep copied on the way in and out, so callers can modify what they receive.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # TTLCache expires entries on reads as well as writes, so reads need the lock too
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._cache.get(key)
+        return copy.deepcopy(result) if result is not None else None
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._cache[key] = result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+
+def _to_jsonable(value: Any) -> Any:
+    if hasattr(value, "dict"):
+        return value.dict()
+    return str(value)
+
+
+def create_cache_key(**search_parameters) -> str:
+    """Returns a cache key for the search parameters. The parameters must not include limit and offset."""
+    return json.dumps(search_parameters, sort_keys=True, default=_to_jsonable)
+
+
+def get_rerank_cache() -> Optional[RerankedResultsCache]:
+    """Returns the process-wide RerankedResultsCache, or None if MARQO_RERANK_CACHE_TTL is 0."""
+    global _cache
+    if _cache is not None:
+        return _cache
+    ttl = utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_RERANK_CACHE_TTL)
+    if not ttl or ttl <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            maxsize = utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_RERANK_CACHE_SIZE)
+            _cache = RerankedResultsCache(maxsize=maxsize, ttl=ttl)
+    return _cache
+
+
+def clear_rerank_cache() -> None:
+    """Drops the process-wide cache. A new one is created, with the current settings, on next use."""
+    global _cache
+    with _cache_lock:
+        _cache = None
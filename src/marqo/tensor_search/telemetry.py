@@ -1,6 +1,9 @@
 import json
+import math
+import random
 import time
 from collections import defaultdict
+from collections.abc import MutableMapping
 from contextlib import contextmanager
 from contextvars import ContextVar
 from typing import Any, Callable, Dict, List, Optional, Union
@@ -20,6 +23,8 @@ class TimerError(Exception):
 
 
 class Timer:
+    __slots__ = ('start_time',)
+
     def __init__(self):
         self.start_time = None
 
@@ -45,31 +50,139 @@ class Timer:
             return 1000 * elapsed_time
 
 
+class TimingStats:
+    """
+    Accumulates the times recorded for one key: their count, sum, min and max, and a uniform random sample (a
+    reservoir) of at most reservoir_size of them. Until the reservoir is full, the sample holds every time, in the order
+    they were recorded.
+
+    Recording a time is O(1) and does not allocate, apart from the reservoir growing to reservoir_size.
+    """
+    __slots__ = ('count', 'total', 'min', 'max', 'samples', 'reservoir_size')
+
+    def __init__(self, reservoir_size: int):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.samples: List[float] = []
+        self.reservoir_size = reservoir_size
+
+    @classmethod
+    def from_json(cls, value: Union[float, List[float]], reservoir_size: int) -> "TimingStats":
+        stats = cls(reservoir_size)
+        for v in (value if isinstance(value, list) else [value]):
+            stats.add(v)
+        return stats
+
+    def add(self, v: float) -> None:
+        self.count += 1
+        self.total += v
+        if v < self.min:
+            self.min = v
+        if v > self.max:
+            self.max = v
+
+        if len(self.samples) < self.reservoir_size:
+            self.samples.append(v)
+        elif self.reservoir_size > 0:
+            i = random.randrange(self.count)
+            if i < self.reservoir_size:
+                self.samples[i] = v
+
+    def merge(self, other: "TimingStats") -> None:
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        if len(self.samples) + len(other.samples) <= self.reservoir_size:
+            self.samples.extend(other.samples)
+        else:
+            # Sample from each reservoir in proportion to the number of times it stands for
+            from_other = min(round(self.reservoir_size * other.count / count), len(other.samples))
+            from_self = min(self.reservoir_size - from_other, len(self.samples))
+            self.samples = random.sample(self.samples, from_self) + random.sample(other.samples, from_other)
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def json(self) -> Union[float, List[float], Dict[str, Any]]:
+        """
+        A single time as a float and up to reservoir_size times as a list of every time. More times are summarised
+        as their count, total, min, max and a sample of them.
+        """
+        if self.count == 1 and self.samples:
+            return self.samples[0]
+        if self.count == len(self.samples):
+            return list(self.samples)
+        return {
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "samples": list(self.samples)
+        }
+
+
+class _TimesView(MutableMapping):
+    """The times of a RequestMetrics, as key to TimingStats.json() (a float, a list of floats or a summary)."""
+    __slots__ = ('_metrics',)
+
+    def __init__(self, metrics: "RequestMetrics"):
+        self._metrics = metrics
+
+    def __getitem__(self, k: str):
+        return self._metrics.timings[k].json()
+
+    def __setitem__(self, k: str, v: Union[float, List[float]]) -> None:
+        self._metrics.timings[k] = TimingStats.from_json(v, self._metrics.reservoir_size)
+
+    def __delitem__(self, k: str) -> None:
+        del self._metrics.timings[k]
+
+    def __iter__(self):
+        return iter(self._metrics.timings)
+
+    def __len__(self) -> int:
+        return len(self._metrics.timings)
+
+
 class RequestMetrics:
+    """
+    The counters and times recorded while serving a request.
+
+    Times are accumulated per key in TimingStats, so recording the same key many times (e.g. once per document of a
+    large batch) costs the same for every call.
+    """
+    __slots__ = ('counter', 'timings', 'timers', 'reservoir_size')
+
+    DEFAULT_RESERVOIR_SIZE = 100
+
     @classmethod
     def reduce_from_list(cls, metrics: List["RequestMetrics"]) -> "RequestMetrics":
         assert len(metrics) > 0, "Cannot create RequestMetrics from []"
-        m = metrics.pop(0)
-        for mm in metrics:
-            for k, count in mm.counter.items():
-                m.increment_counter(k, count)
-
-            for k, timer in mm.timers.items():
-                m.timers[k] = timer
-
-            for k, time in mm.times.items():
-                m.add_time(k, time)
+        m = metrics[0]
+        for mm in metrics[1:]:
+            m.merge(mm)
         return m
 
-    def __init__(self):
+    def __init__(self, reservoir_size: int = DEFAULT_RESERVOIR_SIZE):
         self.counter: Dict[str, int] = defaultdict(int)
-
-        # Note: We default to float, but on multiple times for the same key, it gets converted to a List.
-        self.times: Dict[str, Union[float, List[float]]] = defaultdict(float)
+        self.timings: Dict[str, TimingStats] = dict()
         self.timers: Dict[str, Timer] = defaultdict(Timer)
+        self.reservoir_size = reservoir_size
+
+    @property
+    def times(self) -> MutableMapping:
+        """Key to the recorded time (a float), the recorded times (a list) or, for many times, their summary."""
+        return _TimesView(self)
 
-    def increment_counter(self, k: str):
-        self.counter[k] += 1
+    @times.setter
+    def times(self, times: Dict[str, Union[float, List[float]]]) -> None:
+        self.timings = {k: TimingStats.from_json(v, self.reservoir_size) for k, v in times.items()}
+
+    def increment_counter(self, k: str, v: int = 1):
+        self.counter[k] += v
 
     @contextmanager
     def time(self, k: str, callback: Optional[Callable[[float], None]] = None):
@@ -90,12 +203,10 @@ class RequestMetrics:
         return self.timers[k].stop()
 
     def add_time(self, k: str, v: float):
-        if self.times.get(k, None) is None:
-            self.times[k] = v
-        elif isinstance(self.times.get(k), list):
-            self.times[k] = self.times[k] + [v]
-        else:
-            self.times[k] = [self.times[k], v]
+        stats = self.timings.get(k)
+        if stats is None:
+            stats = self.timings[k] = TimingStats(self.reservoir_size)
+        stats.add(v)
 
     def stop(self, k: str) -> float:
         """Stop the timer for the given key, and report the elapsed time"""
@@ -106,13 +217,35 @@ class RequestMetrics:
         except TimerError:
             logger.warn(f"timer {k} stopped incorrectly. Time not recorded.")
 
-    def increment_counter(self, k: str, v: int = 1):
-        self.counter[k] += v
+    def merge(self, other: "RequestMetrics") -> None:
+        """Add the counters and times of other to these metrics."""
+        for k, count in other.counter.items():
+            self.increment_counter(k, count)
+
+        for k, timer in other.timers.items():
+            self.timers[k] = timer
+
+        for k, stats in other.timings.items():
+            self._merge_timing(k, stats)
+
+    def merge_keys(self, key_function: Callable[[str], str]) -> None:
+        """Rename every timing key k to key_function(k), merging the times of keys that are renamed to the same key."""
+        timings, self.timings = self.timings, dict()
+        for k, stats in timings.items():
+            self._merge_timing(key_function(k), stats)
+
+    def _merge_timing(self, k: str, stats: TimingStats) -> None:
+        existing = self.timings.get(k)
+        if existing is None:
+            copied = self.timings[k] = TimingStats(self.reservoir_size)
+            copied.merge(stats)
+        else:
+            existing.merge(stats)
 
     def json(self):
         return {
             "counter": dict(self.counter),
-            "timesMs": dict(self.times)
+            "timesMs": {k: stats.json() for k, stats in self.timings.items()}
         }
 
 
@@ -169,6 +302,15 @@ class TelemetryMiddleware(BaseHTTPMiddleware):
         """Returns True if the given request should have metric telemetry recorded and returned in the response."""
         return request.query_params.get(self.telemetry_flag, "false").lower() == "true"
 
+    def _record_aggregates(self, request: Request) -> None:
+        """Adds the metrics of the request to the aggregates exported by GET /metrics."""
+        # Imported here as the exporter depends on this module
+        from marqo.tensor_search import prometheus_exporter
+        try:
+            prometheus_exporter.get_request_metrics_aggregator().record(RequestMetricsStore.for_request(request))
+        except Exception as e:
+            logger.warning(f'Failed to record request metrics: {e}')
+
     async def get_response_json(self, response: Response) -> Union[List, Dict]:
         body = b""
         async for chunk in response.body_iterator:
@@ -210,6 +352,7 @@ class TelemetryMiddleware(BaseHTTPMiddleware):
                     f"Telemetry data={json.dumps(RequestMetricsStore.for_request(request).json(), indent=2)}")
 
         finally:
+            self._record_aggregates(request)
             logger.debug('Clearing metrics for request')
             RequestMetricsStore.clear_metrics_for(request)
 
@@ -79,6 +79,7 @@ from marqo.s2_inference.reranking import rerank
 from marqo.tensor_search import delete_docs
 from marqo.tensor_search import enums
 from marqo.tensor_search import index_meta_cache
+from marqo.tensor_search import rerank_cache
 from marqo.tensor_search import utils, validation, add_docs
 from marqo.tensor_search.enums import (
     Device, TensorField, SearchMethod
@@ -1321,32 +1322,24 @@ def get_documents_by_ids(
     if len(document_ids) <= 0:
         raise api_exceptions.InvalidArgError("Can't get empty collection of IDs!")
 
-    max_docs_limit = utils.read_env_vars_and_defaults(EnvVars.MARQO_MAX_RETRIEVABLE_DOCS)
-    if max_docs_limit is not None and len(document_ids) > int(max_docs_limit):
-        raise api_exceptions.IllegalRequestedDocCount(
-            f"{len(document_ids)} documents were requested, which is more than the allowed limit of [{max_docs_limit}], "
-            f"set by the environment variable `{EnvVars.MARQO_MAX_RETRIEVABLE_DOCS}`")
+    validated_ids, invalid_ids = validation.validate_ids_to_get(document_ids)
 
     unsuccessful_docs: List[Tuple[int, MarqoGetDocumentsByIdsItem]] = []
 
-    validated_ids = []
-    for loc, doc_id in enumerate(document_ids):
-        try:
-            validated_ids.append(validation.validate_id(doc_id))
-        except api_exceptions.InvalidDocumentIdError as e:
-            if not ignore_invalid_ids:
-                unsuccessful_docs.append(
-                    (
-                        loc, MarqoGetDocumentsByIdsItem(
-                            # Invalid IDs are not returned in the response
-                            id=doc_id,
-                            message=e.message,
-                            status=int(e.status_code)
-                        )
+    for loc, doc_id, e in invalid_ids:
+        if not ignore_invalid_ids:
+            unsuccessful_docs.append(
+                (
+                    loc, MarqoGetDocumentsByIdsItem(
+                        # Invalid IDs are not returned in the response
+                        id=doc_id,
+                        message=e.message,
+                        status=int(e.status_code)
                     )
                 )
-            else:
-                logger.debug(f'Invalid document ID {doc_id} ignored')
+            )
+        else:
+            logger.debug(f'Invalid document ID {doc_id} ignored')
 
     if len(validated_ids) == 0:  # Can only happen when ignore_invalid_ids is True
         return MarqoGetDocumentsByIdsResponse(errors=True, results=[i[1] for i in unsuccessful_docs])
@@ -1400,14 +1393,16 @@ def get_documents_by_ids(
 
 def _get_latest_index(config: Config, index_name: str) -> MarqoIndex:
     """
-    Get index from the cache first. If index is semi-structured, get the latest setting bypassing the cache
+    Get index from the cache first. If index is semi-structured, refresh it in the cache, which checks with Vespa
+    whether its settings have changed and only fetches them if they have.
     This approach makes sure we don't add extra latency to structured indexes or legacy unstructured indexes since they
     never change. It also makes sure we always get the latest version of semi-structured index to guarantee the strong
     consistency.
     """
     marqo_index = index_meta_cache.get_index(index_management=config.index_management, index_name=index_name)
     if marqo_index.type == IndexType.SemiStructured:
-        return config.index_management.get_index(index_name=index_name)
+        return index_meta_cache.get_index(index_management=config.index_management, index_name=index_name,
+                                          force_refresh=True)
     return marqo_index
 
 
@@ -1471,7 +1466,8 @@ def search(config: Config, index_name: str, text: Optional[Union[str, dict, Cust
            model_auth: Optional[ModelAuth] = None,
            processing_start: float = None,
            text_query_prefix: Optional[str] = None,
-           hybrid_parameters: Optional[HybridParameters] = None) -> Dict:
+           hybrid_parameters: Optional[HybridParameters] = None,
+           rerank_depth: Optional[int] = None) -> Dict:
     """The root search method. Calls the specific search method
 
     Validation should go here. Validations include:
@@ -1499,6 +1495,9 @@ def search(config: Config, index_name: str, text: Optional[Union[str, dict, Cust
         model_auth: Authorisation details for downloading a model (if required)
         text_query_prefix: The prefix to be used for chunking text fields or search queries.
         hybrid_parameters: Parameters for hybrid search
+        rerank_depth: If set, the top rerank_depth results are retrieved and reranked, and the result_count results
+            at offset are returned from the reranked list. The reranked list is cached briefly so following pages
+            are served from it
     Returns:
 
     """
@@ -1545,6 +1544,17 @@ def search(config: Config, index_name: str, text: Optional[Union[str, dict, Cust
     else:
         t0 = processing_start
 
+    if rerank_depth is not None:
+        return _search_with_rerank_depth(
+            config=config, index_name=index_name, text=text, result_count=result_count, offset=offset,
+            rerank_depth=rerank_depth, processing_start=t0,
+            highlights=highlights, ef_search=ef_search, approximate=approximate, search_method=search_method,
+            searchable_attributes=searchable_attributes, verbose=verbose, reranker=reranker, filter=filter,
+            attributes_to_retrieve=attributes_to_retrieve, device=device, boost=boost,
+            image_download_headers=image_download_headers, context=context, score_modifiers=score_modifiers,
+            model_auth=model_auth, text_query_prefix=text_query_prefix, hybrid_parameters=hybrid_parameters
+        )
+
     validation.validate_context(context=context, query=text, search_method=search_method)
     validation.validate_boost(boost=boost, search_method=search_method)
     validation.validate_searchable_attributes(searchable_attributes=searchable_attributes, search_method=search_method)
@@ -1647,6 +1657,51 @@ def search(config: Config, index_name: str, text: Optional[Union[str, dict, Cust
     return search_result
 
 
+def _search_with_rerank_depth(config: Config, index_name: str, text: Optional[Union[str, dict, CustomVectorQuery]],
+                              result_count: int, offset: int, rerank_depth: int, processing_start: float,
+                              reranker: Union[str, Dict] = None, **search_kwargs) -> Dict:
+    """Retrieves and reranks the top rerank_depth results once, then returns the result_count results at offset.
+
+    The reranked results are cached per search (everything but result_count and offset) for
+    MARQO_RERANK_CACHE_TTL seconds, so paging through them does not retrieve and rerank them again. Pages beyond
+    rerank_depth are empty.
+    """
+    if reranker is None:
+        raise api_exceptions.InvalidArgError("rerankDepth can only be used together with reRanker")
+    if not isinstance(rerank_depth, int) or rerank_depth <= 0:
+        raise api_exceptions.InvalidArgError(f"rerankDepth must be an integer greater than 0. "
+                                             f"Received {rerank_depth}")
+    max_search_limit = utils.read_env_vars_and_defaults(EnvVars.MARQO_MAX_SEARCH_LIMIT)
+    if max_search_limit is not None and rerank_depth > int(max_search_limit):
+        raise api_exceptions.IllegalRequestedDocCount(
+            f"rerankDepth must be less than or equal to the MARQO_MAX_SEARCH_LIMIT limit of [{max_search_limit}]. "
+            f"Marqo received rerankDepth of `{rerank_depth}`.")
+
+    # device and model_auth only affect how the results are computed, not what they are
+    cache_key = rerank_cache.create_cache_key(
+        index_name=index_name, text=text, rerank_depth=rerank_depth, reranker=reranker,
+        **{key: value for key, value in search_kwargs.items() if key not in ("device", "model_auth", "verbose")}
+    )
+    cache = rerank_cache.get_rerank_cache()
+    reranked_result = cache.get(cache_key) if cache is not None else None
+
+    if reranked_result is None:
+        with RequestMetricsStore.for_request().time("search.rerank_depth.retrieve_and_rerank"):
+            reranked_result = search(config=config, index_name=index_name, text=text, result_count=rerank_depth,
+                                     offset=0, reranker=reranker, processing_start=processing_start,
+                                     **search_kwargs)
+        if cache is not None:
+            cache.set(cache_key, reranked_result)
+    else:
+        logger.debug(f"serving offset={offset} limit={result_count} from cached reranked results")
+
+    reranked_result["hits"] = reranked_result["hits"][offset:offset + result_count]
+    reranked_result["limit"] = result_count
+    reranked_result["offset"] = offset
+    reranked_result["processingTimeMs"] = round((timer() - processing_start) * 1000)
+    return reranked_result
+
+
 def _lexical_search(
         config: Config, index_name: str, text: str, result_count: int = 3, offset: int = 0,
         searchable_attributes: Sequence[str] = None, verbose: int = 0, filter_string: str = None,
@@ -0,0 +1,145 @@
+"""In-process throttling, selected with MARQO_ENABLE_THROTTLING='LOCAL'.
+
+Each request type has a ConcurrencyLimiter that admits at most its concurrency limit of requests at a time. Unlike the
+Redis throttle, admitting and releasing a request takes no network round-trip, but the limits only apply to the requests
+served by this process, so it suits single-instance deployments or deployments that route a client to one instance.
+
+A request that arrives when the limit is reached waits up to MARQO_THROTTLING_QUEUE_TIMEOUT_MS for a slot, and is
+rejected with a 429 if none frees up. If MARQO_THROTTLING_TARGET_LATENCY_MS is set, the limit adapts to the observed
+latency (AIMD): it grows by one every `limit` requests that complete within the target, and shrinks by
+`DECREASE_FACTOR` when one does not, never going above the configured maximum or below `MIN_CONCURRENCY`.
+"""
+import math
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from marqo.api.exceptions import TooManyRequestsError
+from marqo.tensor_search import utils
+from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.telemetry import RequestMetricsStore
+
+
+class ConcurrencyLimiter:
+    """Limits the number of requests of one type running concurrently in this process."""
+
+    DECREASE_FACTOR = 0.9
+    MIN_CONCURRENCY = 1
+
+    def __init__(self, max_concurrency: int, target_latency_seconds: Optional[float] = None):
+        """
+        Args:
+            max_concurrency: The maximum number of requests running at a time
+            target_latency_seconds: If set, the limit is adapted so that requests complete within this latency
+        """
+        self._condition = threading.Condition()
+        self._max_concurrency = max_concurrency
+        self._limit = float(max_concurrency)
+        self.target_latency_seconds = target_latency_seconds
+        self._in_flight = 0
+        self._queued = 0
+        self._last_decrease = 0.0
+
+    @property
+    def limit(self) -> int:
+        return max(self.MIN_CONCURRENCY, math.floor(self._limit))
+
+    def set_max_concurrency(self, max_concurrency: int) -> None:
+        with self._condition:
+            if max_concurrency != self._max_concurrency:
+                self._max_concurrency = max_concurrency
+                self._limit = min(self._limit, max_concurrency) if self.target_latency_seconds else max_concurrency
+                self._condition.notify_all()
+
+    def acquire(self, timeout: float) -> bool:
+        """
+        Wait up to `timeout` seconds for the number of requests running to be under the limit, and admit this one.
+
+        Returns:
+            Whether the request was admitted
+        """
+        with self._condition:
+            if self._in_flight >= self.limit and timeout > 0:
+                self._queued += 1
+                try:
+                    self._condition.wait_for(lambda: self._in_flight < self.limit, timeout)
+                finally:
+                    self._queued -= 1
+            if self._in_flight >= self.limit:
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self, started_at: float) -> None:
+        """
+        Release the slot of a request admitted at `started_at` (a time.monotonic() value), and adapt the limit to its
+        latency.
+        """
+        now = time.monotonic()
+        with self._condition:
+            self._in_flight -= 1
+            if self.target_latency_seconds:
+                if now - started_at <= self.target_latency_seconds:
+                    self._limit = min(self._max_concurrency, self._limit + 1 / self.limit)
+                elif started_at >= self._last_decrease:
+                    # Only requests admitted after the last decrease can cause another one, so that the requests
+                    # already running when the latency went up shrink the limit once rather than each in turn
+                    self._limit = max(self.MIN_CONCURRENCY, self._limit * self.DECREASE_FACTOR)
+                    self._last_decrease = now
+            self._condition.notify()
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {'limit': self.limit, 'in_flight': self._in_flight, 'queued': self._queued}
+
+
+_limiters: Dict[str, ConcurrencyLimiter] = dict()
+_limiters_lock = threading.Lock()
+
+
+def _get_target_latency_seconds() -> Optional[float]:
+    target_latency_ms = utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_THROTTLING_TARGET_LATENCY_MS)
+    return target_latency_ms / 1000 if target_latency_ms else None
+
+
+def get_limiter(request_type: str, max_concurrency: int) -> ConcurrencyLimiter:
+    """Returns the limiter of a request type, updated to the configured maximum concurrency."""
+    limiter = _limiters.get(request_type)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(request_type)
+            if limiter is None:
+                limiter = _limiters[request_type] = ConcurrencyLimiter(max_concurrency, _get_target_latency_seconds())
+    limiter.set_max_concurrency(max_concurrency)
+    return limiter
+
+
+def get_limiter_stats() -> Dict[str, Dict[str, int]]:
+    """Returns the limit, running and queued requests of each request type that has been throttled locally."""
+    return {request_type: limiter.stats() for request_type, limiter in list(_limiters.items())}
+
+
+def call_throttled(request_type: str, max_concurrency: int, function: Callable, *args, **kwargs):
+    """
+    Call `function` once the limiter of `request_type` admits it.
+
+    Raises:
+        TooManyRequestsError: If the request is not admitted within MARQO_THROTTLING_QUEUE_TIMEOUT_MS
+    """
+    limiter = get_limiter(request_type, max_concurrency)
+    queue_timeout_ms = utils.read_env_vars_and_defaults_ints(EnvVars.MARQO_THROTTLING_QUEUE_TIMEOUT_MS) or 0
+
+    metrics = RequestMetricsStore.for_request()
+    with metrics.time(f"throttling.{request_type}.queue_wait"):
+        admitted = limiter.acquire(queue_timeout_ms / 1000)
+    if not admitted:
+        metrics.increment_counter(f"throttling.{request_type}.rejected")
+        raise TooManyRequestsError(
+            message=f"Throttled because maximum thread count ({limiter.limit}) for request type '{request_type}' "
+                    f"has been exceeded. Try your request again later.")
+
+    started_at = time.monotonic()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        limiter.release(started_at)
@@ -1,5 +1,7 @@
 from marqo.connections import redis_driver, generate_redis_warning
-from marqo.tensor_search.enums import RequestType, EnvVars
+from marqo.s2_inference import inference_executor
+from marqo.tensor_search.enums import RequestType, EnvVars, ThrottlingMode, WorkloadClass
+from marqo.tensor_search.throttling import local_throttle
 from marqo.tensor_search import utils
 from marqo.tensor_search.tensor_search_logging import get_logger
 from marqo.api.exceptions import TooManyRequestsError
@@ -15,6 +17,12 @@ import logging
 
 logger = get_logger(__name__)
 
+_WORKLOAD_CLASSES = {
+    RequestType.SEARCH: WorkloadClass.Interactive,
+    RequestType.INDEX: WorkloadClass.Bulk,
+    RequestType.PARTIAL_UPDATE: WorkloadClass.Bulk,
+}
+
 def throttle(request_type: str):
     """
     Decorator that checks if a user has exceeded their throttling limits.
@@ -24,18 +32,22 @@ def throttle(request_type: str):
 
     Implemented in a failsafe manner. If redis cannot be connected to or causes an error for any reason, this function is escaped and marqo operation will proceed as normal.
     Can be manually turned off with env var: $MARQO_ENABLE_THROTTLING='FALSE'
+    With $MARQO_ENABLE_THROTTLING='LOCAL', thread counts are limited in this process instead, see local_throttle.
+    Whether or not throttling is enabled, the request's model calls are scheduled as the workload class of its type.
     """
     def decorator(function):
         
         @wraps(function)        # needed to preserve function metadata, or else FastAPI throws a 422.
         def wrapper(*args, **kwargs):
+            # Model calls made by the request are prioritised by the inference workers according to its type
+            with inference_executor.workload_class(_WORKLOAD_CLASSES.get(request_type, WorkloadClass.Interactive)):
+                return throttled(*args, **kwargs)
 
-            if utils.read_env_vars_and_defaults(EnvVars.MARQO_ENABLE_THROTTLING) != "TRUE":
+        def throttled(*args, **kwargs):
+            throttling_mode = utils.read_env_vars_and_defaults(EnvVars.MARQO_ENABLE_THROTTLING)
+            if throttling_mode not in (ThrottlingMode.Redis, ThrottlingMode.Local):
                 return function(*args, **kwargs)
 
-            redis = redis_driver.get_db()  # redis instance
-            lua_shas = redis_driver.get_lua_shas()
-
             # Define maximum thread counts
             throttling_max_threads = {
                 RequestType.INDEX: utils.read_env_vars_and_defaults(EnvVars.MARQO_MAX_CONCURRENT_INDEX),
@@ -43,6 +55,13 @@ def throttle(request_type: str):
                 RequestType.PARTIAL_UPDATE: utils.read_env_vars_and_defaults(EnvVars.MARQO_MAX_CONCURRENT_PARTIAL_UPDATE)
             }
             
+            if throttling_mode == ThrottlingMode.Local:
+                return local_throttle.call_throttled(request_type, int(throttling_max_threads[request_type]),
+                                                     function, *args, **kwargs)
+
+            redis = redis_driver.get_db()  # redis instance
+            lua_shas = redis_driver.get_lua_shas()
+
             set_key = f"set:{request_type}"
             thread_name = f"thread:{uuid.uuid4()}"
 
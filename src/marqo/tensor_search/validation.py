@@ -1,12 +1,12 @@
 import json
-from typing import Type, Sequence
+from typing import Type, Sequence, Collection, Tuple
 
 import jsonschema
 
 import marqo.core.models.marqo_index as marqo_index
 from marqo import marqo_docs
 from marqo.api.exceptions import (
-    InvalidFieldNameError, InvalidArgError, InvalidDocumentIdError, DocTooLargeError)
+    InvalidFieldNameError, InvalidArgError, InvalidDocumentIdError, DocTooLargeError, IllegalRequestedDocCount)
 from marqo.core.models.marqo_index import *
 from marqo.tensor_search import constants as tensor_search_constants
 from marqo.tensor_search import enums, utils
@@ -362,6 +362,34 @@ def validate_id(_id: str):
     return _id
 
 
+def validate_ids_to_get(document_ids: Collection[str]) -> Tuple[List[str], List[Tuple[int, Any, InvalidDocumentIdError]]]:
+    """Validates the IDs of documents to get by ID
+
+    Args:
+        document_ids: the IDs to be validated
+
+    Returns:
+        The valid IDs, and the position, ID and error of each invalid ID
+
+    Raises:
+        IllegalRequestedDocCount: if more IDs are requested than MARQO_MAX_RETRIEVABLE_DOCS allows
+    """
+    max_docs_limit = utils.read_env_vars_and_defaults(enums.EnvVars.MARQO_MAX_RETRIEVABLE_DOCS)
+    if max_docs_limit is not None and len(document_ids) > int(max_docs_limit):
+        raise IllegalRequestedDocCount(
+            f"{len(document_ids)} documents were requested, which is more than the allowed limit of [{max_docs_limit}], "
+            f"set by the environment variable `{enums.EnvVars.MARQO_MAX_RETRIEVABLE_DOCS}`")
+
+    validated_ids = []
+    invalid_ids = []
+    for loc, doc_id in enumerate(document_ids):
+        try:
+            validated_ids.append(validate_id(doc_id))
+        except InvalidDocumentIdError as e:
+            invalid_ids.append((loc, doc_id, e))
+    return validated_ids, invalid_ids
+
+
 def validate_dict(field: str, field_content: Dict, is_non_tensor_field: bool, mappings: Dict,
                   index_model_dimensions: int = None, structured_field_type: FieldType = None,
                   marqo_index_version: semver.VersionInfo = None):
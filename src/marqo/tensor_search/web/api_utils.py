@@ -1,7 +1,12 @@
+import asyncio
+import io
 import json
 import urllib.parse
+from datetime import datetime, timezone
 from typing import Union, List, Optional, Dict
 
+from starlette.requests import Request
+
 from marqo.api.exceptions import InvalidArgError
 from marqo.tensor_search import enums
 from marqo.core.models.add_docs_params import AddDocsParams
@@ -50,6 +55,11 @@ def translate_api_device(device: Optional[str]) -> Optional[str]:
                               f"Acceptable device types: {acceptable_devices}")
 
 
+def format_timestamp(timestamp: float) -> str:
+    """Formats seconds since the epoch as an ISO 8601 UTC timestamp, e.g. '2024-05-01T10:20:30.123456+00:00'."""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
 def decode_image_download_headers(image_download_headers: Optional[str] = None) -> dict:
     """Decodes an image download header string into a Python dict
 
@@ -142,3 +152,38 @@ def add_docs_params_orchestrator(index_name: str, body: Union[AddDocsBodyParams,
         mappings=mappings, model_auth=model_auth, text_chunk_prefix=text_chunk_prefix,
         batch_vectorisation_mode=body.batchVectorisationMode,
     )
+
+
+class RequestBodyReader(io.RawIOBase):
+    """
+    A readable file over the body of a request as it is received, for a synchronous function running in another
+    thread than the event loop receiving the request. Reads block until the next chunk of the body arrives.
+    """
+
+    def __init__(self, request: Request, loop: asyncio.AbstractEventLoop):
+        self._chunks = request.stream().__aiter__()
+        self._loop = loop
+        self._chunk = memoryview(b'')
+        self._done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._chunk and not self._done:
+            chunk = asyncio.run_coroutine_threadsafe(self._next_chunk(), self._loop).result()
+            if chunk is None:
+                self._done = True
+            else:
+                self._chunk = memoryview(chunk)
+
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+    async def _next_chunk(self) -> Optional[bytes]:
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return None
@@ -1,4 +1,7 @@
+from typing import Dict, Optional
+
 from marqo.exceptions import MarqoError
+from marqo.vespa.models.delete_document_response import DeleteDocumentsBySelectionResponse
 
 
 class VespaError(MarqoError):
@@ -43,4 +46,15 @@ class VespaActivationConflictError(VespaError):
     pass
 
 
+class VespaDeleteBySelectionError(VespaError):
+    """
+    Raised when deleting documents by selection fails for some slices. Has the responses of the slices that did not
+    fail, so that their progress is not lost.
+    """
 
+    def __init__(self, message: Optional[str] = None, cause: Optional[Exception] = None,
+                 responses: Optional[Dict[int, DeleteDocumentsBySelectionResponse]] = None,
+                 errors: Optional[Dict[int, Exception]] = None):
+        super().__init__(message, cause)
+        self.responses = responses or dict()
+        self.errors = errors or dict()
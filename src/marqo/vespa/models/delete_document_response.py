@@ -22,4 +22,10 @@ class DeleteBatchResponse(BaseModel):
 
 class DeleteAllDocumentsResponse(BaseModel):
     path_id: str = Field(alias='pathId')
-    document_count: int = Field(alias='documentCount')
\ No newline at end of file
+    document_count: int = Field(alias='documentCount')
+
+
+class DeleteDocumentsBySelectionResponse(BaseModel):
+    path_id: str = Field(alias='pathId')
+    document_count: int = Field(alias='documentCount', default=0)
+    continuation: Optional[str] = None
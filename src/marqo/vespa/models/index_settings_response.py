@@ -0,0 +1,15 @@
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+
+class IndexSettingsResponse(BaseModel):
+    """
+    Index settings JSON returned by the Vespa index settings handler.
+
+    `settings` is None if the settings did not change since the ETag sent with the request (`not_modified` is True)
+    or if the index does not exist. `etag` is None if the Vespa application does not return ETags.
+    """
+    settings: Optional[Any] = None
+    etag: Optional[str] = None
+    not_modified: bool = False
@@ -1,4 +1,5 @@
 import asyncio
+import contextvars
 import io
 import os
 import tarfile
@@ -6,7 +7,7 @@ import tempfile
 import time
 from concurrent.futures import ThreadPoolExecutor
 from json import JSONDecodeError
-from typing import Dict, Any, List, Optional, Union, Tuple
+from typing import Callable, Dict, Any, Iterable, List, Optional, Union, Tuple
 from urllib.parse import urlparse
 
 import httpx
@@ -15,14 +16,16 @@ import marqo.logging
 import marqo.vespa.concurrency as conc
 from marqo.core.models import MarqoIndex
 from marqo.vespa.exceptions import (VespaStatusError, VespaError, InvalidVespaApplicationError,
-                                    VespaTimeoutError, VespaNotConvergedError, VespaActivationConflictError)
+                                    VespaTimeoutError, VespaNotConvergedError, VespaActivationConflictError,
+                                    VespaDeleteBySelectionError)
 from marqo.vespa.models import VespaDocument, QueryResult, FeedBatchDocumentResponse, FeedBatchResponse, \
     FeedDocumentResponse, UpdateDocumentsBatchResponse, UpdateDocumentResponse, FeedBatchDocumentResponse
 from marqo.vespa.models.application_metrics import ApplicationMetrics
 from marqo.vespa.models.delete_document_response import DeleteDocumentResponse, DeleteBatchDocumentResponse, \
-    DeleteBatchResponse, DeleteAllDocumentsResponse
+    DeleteBatchResponse, DeleteAllDocumentsResponse, DeleteDocumentsBySelectionResponse
 from marqo.vespa.models.get_document_response import GetDocumentResponse, VisitDocumentsResponse, GetBatchResponse, \
     GetBatchDocumentResponse
+from marqo.vespa.models.index_settings_response import IndexSettingsResponse
 
 logger = marqo.logging.get_logger(__name__)
 
@@ -106,11 +109,22 @@ class VespaClient:
         via Zookeeper. Following requests should use content_base_url and prepare_url to make sure it can hit the right
         config server that this session is created on.
         """
+        _, content_base_url, prepare_url = self.create_deployment_session_with_id()
+        return content_base_url, prepare_url
+
+    def create_deployment_session_with_id(self) -> Tuple[int, str, str]:
+        """
+        Create a Vespa deployment session, see `create_deployment_session`.
+
+        Returns:
+            Tuple[int, str, str]:
+             - session_id is the id of the session, which becomes the application generation once it is activated
+             - content_base_url is the base url for contents in this session
+             - prepare_url is the url for prepare this session
+        """
         self.check_for_application_convergence()
         res = self._create_deploy_session(self.http_client)
-        content_base_url = res['content']
-        prepare_url = res['prepared']
-        return content_base_url, prepare_url
+        return int(res['session-id']), res['content'], res['prepared']
 
     def download_application(self, check_for_application_convergence: bool = False) -> str:
         """
@@ -161,6 +175,15 @@ class VespaClient:
         """
         return self._get_convergence_status().current_generation
 
+    def get_application_wanted_generation(self) -> int:
+        """
+        Get the generation of the active application, which services may not have converged to yet.
+
+        Returns:
+            Wanted application generation
+        """
+        return self._get_convergence_status().wanted_generation
+
     def get_application_has_converged(self) -> bool:
         """
         Get the current application convergence status.
@@ -290,6 +313,40 @@ class VespaClient:
 
         return batch_response
 
+    def feed_batches_pipelined(self,
+                               batches: Iterable[List[VespaDocument]],
+                               schema: str,
+                               on_response: Callable[[VespaDocument, FeedBatchDocumentResponse], None],
+                               concurrency: Optional[int] = None,
+                               timeout: int = 60) -> None:
+        """
+        Feed a stream of document batches to Vespa through one pool of `concurrency` connections.
+
+        Unlike calling `feed_batch` for each batch, the connections are kept open across batches, and documents of the
+        next batch are sent as soon as a connection frees up rather than when the whole previous batch is done. The next
+        batch is read from `batches` in a worker thread while the current one is fed. A document is only taken from a
+        batch when a connection is free, so at most `concurrency` documents are in flight and at most one batch is read
+        ahead, however long the stream is.
+
+        Args:
+            batches: Batches of documents to feed, e.g. a generator reading and converting them
+            schema: Schema to feed to
+            on_response: Called with each document and its response, on the thread feeding the documents
+            concurrency: Number of concurrent feed requests
+            timeout: Timeout in seconds per request
+
+        Raises:
+            VespaError: If a response from Vespa can not be parsed. Documents already in flight are not awaited
+        """
+        if concurrency is None:
+            concurrency = self.feed_pool_size
+
+        # Batches are read in worker threads, which must see the context of the caller, e.g. its request metrics
+        conc.run_coroutine(
+            self._feed_batches_pipelined_async(iter(batches), schema, on_response, concurrency, timeout,
+                                               contextvars.copy_context())
+        )
+
     def feed_batch_sync(self, batch: List[VespaDocument], schema: str) -> FeedBatchResponse:
         """
         Feed a batch of documents to Vespa sequentially.
@@ -397,11 +454,63 @@ class VespaClient:
 
         return VisitDocumentsResponse(**resp.json())
 
+    def visit_documents(self,
+                        schema: str,
+                        continuation: Optional[str] = None,
+                        wanted_document_count: Optional[int] = None,
+                        field_set: Optional[str] = None,
+                        selection: Optional[str] = None,
+                        slices: Optional[int] = None,
+                        slice_id: Optional[int] = None,
+                        time_chunk: Optional[float] = None,
+                        timeout: int = 60) -> VisitDocumentsResponse:
+        """
+        Get a page of the documents in a schema by visiting it.
+
+        The response has a continuation to get the next page until all documents are visited. A page can be empty
+        while the visit is not done. See https://docs.vespa.ai/en/reference/document-v1-api-reference.html#visit
+
+        Args:
+            schema: Schema to visit
+            continuation: Continuation of the previous page, or None to start the visit
+            wanted_document_count: The number of documents Vespa tries to return in the page
+            field_set: Vespa field set restricting the fields returned, e.g. `schema:field1,field2`. All fields are
+                returned if None
+            selection: Document selection restricting the documents visited
+            slices: The number of slices the corpus is split into, to visit them concurrently
+            slice_id: The slice to visit, between 0 and `slices` - 1
+            time_chunk: Target time in seconds Vespa spends on the page, or None for Vespa's default
+            timeout: Timeout in seconds
+
+        Returns:
+            VisitDocumentsResponse object
+        """
+        params = {
+            'cluster': self.content_cluster_name,
+            'continuation': continuation,
+            'wantedDocumentCount': wanted_document_count,
+            'fieldSet': field_set,
+            'selection': selection,
+            'slices': slices,
+            'sliceId': slice_id,
+            'timeChunk': f'{max(int(time_chunk * 1000), 1)}ms' if time_chunk is not None else None,
+        }
+        try:
+            resp = self.http_client.get(f'{self.document_url}/document/v1/{schema}/{schema}/docid',
+                                        params={k: v for k, v in params.items() if v is not None}, timeout=timeout)
+        except httpx.HTTPError as e:
+            raise VespaError(e) from e
+
+        self._raise_for_status(resp)
+
+        return VisitDocumentsResponse(**resp.json())
+
     def get_batch(self,
                   ids: List[str],
                   schema: str,
                   concurrency: Optional[int] = None,
-                  timeout: int = 60) -> GetBatchResponse:
+                  timeout: int = 60,
+                  field_set: Optional[str] = None) -> GetBatchResponse:
         """
         Get a batch of documents by ID concurrently.
 
@@ -414,6 +523,8 @@ class VespaClient:
             schema: Schema to get from
             concurrency: Number of concurrent get requests
             timeout: Timeout in seconds per request
+            field_set: Vespa field set restricting the fields returned, e.g. `schema:field1,field2`. All fields are
+                returned if not set
 
         Returns:
             List of GetDocumentResponse objects containing the documents fetched and any missing documents (404)
@@ -425,7 +536,7 @@ class VespaClient:
             concurrency = self.get_pool_size
 
         batch_response = conc.run_coroutine(
-            self._get_batch_async(ids, schema, concurrency, timeout)
+            self._get_batch_async(ids, schema, concurrency, timeout, field_set)
         )
 
         return batch_response
@@ -460,6 +571,42 @@ class VespaClient:
         self._raise_for_status(resp)
         return DeleteAllDocumentsResponse(**resp.json())
 
+    def delete_documents_by_selection(self,
+                                      schema: str,
+                                      selection: str,
+                                      continuations: Dict[int, Optional[str]],
+                                      slices: int = 1,
+                                      time_chunk: Optional[float] = None,
+                                      timeout: int = 60) -> Dict[int, DeleteDocumentsBySelectionResponse]:
+        """
+        Delete the documents matching a document selection, visiting slices of the corpus concurrently.
+
+        Vespa visits the documents of each slice and deletes those matching the selection, for up to `time_chunk`
+        seconds per request. A slice that is not done yet has a continuation in its response, which is passed back in
+        `continuations` to resume it. See https://docs.vespa.ai/en/reference/document-v1-api-reference.html#delete
+
+        Args:
+            schema: Schema to delete from
+            selection: Document selection, e.g. `my_schema.my_field == "value"`
+            continuations: The slices to visit, by slice ID, with the continuation to resume each from. A None
+                continuation starts the slice from the beginning
+            slices: The number of slices the corpus is split into
+            time_chunk: Target time in seconds Vespa spends on a slice per request, or None for Vespa's default
+            timeout: Timeout in seconds per request
+
+        Returns:
+            The response of each slice visited, by slice ID
+
+        Raises:
+            VespaDeleteBySelectionError: If any slice fails. Has the responses of the other slices
+        """
+        if not continuations:
+            return dict()
+
+        return conc.run_coroutine(
+            self._delete_documents_by_selection_async(schema, selection, continuations, slices, time_chunk, timeout)
+        )
+
     def delete_batch(self,
                      ids: List[str],
                      schema: str,
@@ -545,31 +692,75 @@ class VespaClient:
         return ApplicationMetrics(**resp.json())
 
     def get_index_setting_by_name(self, index_name: str) -> Optional[MarqoIndex]:
-        try:
-            resp = self.http_client.get(f'{self.document_url}/index-settings/{index_name}')
-        except httpx.HTTPError as e:
-            raise VespaError(e) from e
+        response = self.get_index_setting_json_by_name(index_name)
 
-        if resp.status_code == 404:
+        if response.settings is None:
             return None
 
-        self._raise_for_status(resp)
-
-        return MarqoIndex.parse_obj(resp.json())
+        return MarqoIndex.parse_obj(response.settings)
 
     def get_all_index_settings(self) -> List[MarqoIndex]:
+        index_list = self.get_all_index_settings_json().settings
+
+        return [MarqoIndex.parse_obj(item) for item in index_list]
+
+    def get_index_setting_json_by_name(self, index_name: str, etag: Optional[str] = None) -> IndexSettingsResponse:
+        """
+        Get the settings of an index as JSON, without parsing them into a MarqoIndex.
+
+        Args:
+            index_name: Name of the index
+            etag: ETag of the settings the caller already has. If given and the settings have not changed, they are
+                not returned
+
+        Returns:
+            The settings and their ETag. Settings are None if the index does not exist or if they have not changed
+        """
+        response = self._get_index_settings_json(f'{self.document_url}/index-settings/{index_name}', etag,
+                                                 allow_not_found=True)
+
+        if response.settings is not None and not isinstance(response.settings, dict):
+            raise VespaError(f'Get index setting returns invalid response: {response.settings}')
+
+        return response
+
+    def get_all_index_settings_json(self, etag: Optional[str] = None) -> IndexSettingsResponse:
+        """
+        Get the settings of all indexes as a JSON list, without parsing them into MarqoIndex objects.
+
+        Args:
+            etag: ETag of the settings the caller already has. If given and no index settings have changed, they
+                are not returned
+
+        Returns:
+            The settings and their ETag. Settings are None if they have not changed
+        """
+        response = self._get_index_settings_json(f'{self.document_url}/index-settings', etag)
+
+        if not response.not_modified and not isinstance(response.settings, list):
+            raise VespaError(f'Get all index settings returns invalid response: {response.settings}')
+
+        return response
+
+    def _get_index_settings_json(self, url: str, etag: Optional[str],
+                                 allow_not_found: bool = False) -> IndexSettingsResponse:
+        headers = {'If-None-Match': etag} if etag is not None else None
         try:
-            resp = self.http_client.get(f'{self.document_url}/index-settings')
+            resp = self.http_client.get(url, headers=headers)
         except httpx.HTTPError as e:
             raise VespaError(e) from e
 
-        self._raise_for_status(resp)
+        etag = resp.headers.get('ETag')
 
-        index_list = resp.json()
-        if isinstance(index_list, list):
-            return [MarqoIndex.parse_obj(item) for item in index_list]
+        if resp.status_code == 304:
+            return IndexSettingsResponse(etag=etag, not_modified=True)
+
+        if allow_not_found and resp.status_code == 404:
+            return IndexSettingsResponse()
+
+        self._raise_for_status(resp)
 
-        raise VespaError(f'Get all index settings returns invalid response: {index_list}')
+        return IndexSettingsResponse(settings=resp.json(), etag=etag)
 
     def translate_vespa_document_response(self, status: int, message: Optional[str]=None) -> Tuple[int, Optional[str]]:
         """A helper function to translate Vespa document response into the expected status, message that
@@ -787,6 +978,54 @@ class VespaClient:
 
         return FeedBatchResponse(responses=responses, errors=errors)
 
+    async def _feed_batches_pipelined_async(self, batches, schema: str,
+                                            on_response: Callable[[VespaDocument, FeedBatchDocumentResponse], None],
+                                            connections: int, timeout: int,
+                                            context: contextvars.Context) -> None:
+        loop = asyncio.get_running_loop()
+        async with httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=connections,
+                                                         max_connections=connections)) as async_client:
+            # Free connections. Acquired before a document is taken from its batch, and released once it is fed
+            slots = asyncio.Semaphore(connections)
+            # Never waited on since `slots` limits the requests in flight, but required by _feed_document_async
+            semaphore = asyncio.Semaphore(connections)
+            tasks = set()
+            errors = []
+
+            async def feed(document: VespaDocument):
+                try:
+                    response = await self._feed_document_async(semaphore, async_client, document, schema, timeout)
+                    on_response(document, response)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    slots.release()
+
+            next_batch = loop.run_in_executor(None, context.run, next, batches, None)
+            try:
+                while True:
+                    batch = await next_batch
+                    if batch is None:
+                        break
+                    next_batch = loop.run_in_executor(None, context.run, next, batches, None)
+                    for document in batch:
+                        await slots.acquire()
+                        if errors:
+                            raise errors[0]
+                        task = asyncio.create_task(feed(document))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+
+                if tasks:
+                    await asyncio.wait(tasks)
+                if errors:
+                    raise errors[0]
+            finally:
+                for task in tasks:
+                    task.cancel()
+                # Let the batch being read finish, so that the caller can close the stream
+                await asyncio.wait([next_batch])
+
     async def _update_documents_batch_async(self, batch: List[VespaDocument],
                                             schema: str,
                                             connections: int, timeout: int,
@@ -909,13 +1148,14 @@ class VespaClient:
     async def _get_batch_async(self,
                                ids: List[str],
                                schema: str,
-                               connections: int, timeout: int) -> GetBatchResponse:
+                               connections: int, timeout: int,
+                               field_set: Optional[str] = None) -> GetBatchResponse:
         async with httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=connections,
                                                          max_connections=connections)) as async_client:
             semaphore = asyncio.Semaphore(connections)
             tasks = [
                 asyncio.create_task(
-                    self._get_document_async(semaphore, async_client, id, schema, timeout)
+                    self._get_document_async(semaphore, async_client, id, schema, timeout, field_set)
                 )
                 for id in ids
             ]
@@ -936,11 +1176,13 @@ class VespaClient:
                                   async_client: httpx.AsyncClient,
                                   id: str,
                                   schema: str,
-                                  timeout: int) -> GetBatchDocumentResponse:
+                                  timeout: int,
+                                  field_set: Optional[str] = None) -> GetBatchDocumentResponse:
         async with semaphore:
             try:
                 resp = await async_client.get(
-                    f'{self.document_url}/document/v1/{schema}/{schema}/docid/{id}', timeout=timeout
+                    f'{self.document_url}/document/v1/{schema}/{schema}/docid/{id}', timeout=timeout,
+                    params={'fieldSet': field_set} if field_set else None
                 )
             except httpx.HTTPError as e:
                 raise VespaError(e) from e
@@ -975,6 +1217,63 @@ class VespaClient:
 
         return DeleteBatchResponse(responses=responses, errors=errors)
 
+    async def _delete_documents_by_selection_async(self, schema: str, selection: str,
+                                                   continuations: Dict[int, Optional[str]], slices: int,
+                                                   time_chunk: Optional[float],
+                                                   timeout: int) -> Dict[int, DeleteDocumentsBySelectionResponse]:
+        connections = len(continuations)
+        async with httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=connections,
+                                                         max_connections=connections)) as async_client:
+            tasks = {
+                slice_id: asyncio.create_task(
+                    self._delete_slice_by_selection_async(async_client, schema, selection, continuation, slices,
+                                                          slice_id, time_chunk, timeout)
+                )
+                for slice_id, continuation in continuations.items()
+            }
+            await asyncio.wait(tasks.values(), return_when=asyncio.ALL_COMPLETED)
+
+        responses = dict()
+        errors = dict()
+        for slice_id, task in tasks.items():
+            if task.exception() is not None:
+                errors[slice_id] = task.exception()
+            else:
+                responses[slice_id] = task.result()
+
+        if errors:
+            error = next(iter(errors.values()))
+            raise VespaDeleteBySelectionError(
+                f'Failed to delete documents in {len(errors)} of {len(tasks)} slices: {error}',
+                cause=error, responses=responses, errors=errors
+            )
+
+        return responses
+
+    async def _delete_slice_by_selection_async(self, async_client: httpx.AsyncClient, schema: str, selection: str,
+                                               continuation: Optional[str], slices: int, slice_id: int,
+                                               time_chunk: Optional[float],
+                                               timeout: int) -> DeleteDocumentsBySelectionResponse:
+        params = {
+            'cluster': self.content_cluster_name,
+            'selection': selection,
+            'slices': slices,
+            'sliceId': slice_id,
+        }
+        if continuation is not None:
+            params['continuation'] = continuation
+        if time_chunk is not None:
+            params['timeChunk'] = f'{max(int(time_chunk * 1000), 1)}ms'
+
+        try:
+            resp = await async_client.delete(f'{self.document_url}/document/v1/{schema}/{schema}/docid',
+                                             params=params, timeout=timeout)
+        except httpx.HTTPError as e:
+            raise VespaError(e) from e
+
+        self._raise_for_status(resp)
+        return DeleteDocumentsBySelectionResponse(**resp.json())
+
     async def _delete_document_async(self,
                                      semaphore: asyncio.Semaphore,
                                      async_client: httpx.AsyncClient,
@@ -0,0 +1,119 @@
+from unittest import mock
+
+from marqo.core.document.document import Document
+from marqo.core.exceptions import InvalidArgumentError
+from marqo.vespa.exceptions import VespaDeleteBySelectionError, VespaError
+from marqo.vespa.models.delete_document_response import DeleteDocumentsBySelectionResponse
+from tests.marqo_test import MarqoTestCase
+
+
+def _response(count, continuation=None):
+    return DeleteDocumentsBySelectionResponse(pathId='/document/v1/my_index/my_index/docid', documentCount=count,
+                                              continuation=continuation)
+
+
+class TestDeleteDocumentsByFilter(MarqoTestCase):
+
+    def setUp(self):
+        self.vespa_client = mock.Mock()
+        self.marqo_index = self.unstructured_marqo_index(name='my_index', schema_name='my_index')
+        self.document = Document(self.vespa_client, mock.Mock(), delete_by_filter_slices=2,
+                                 delete_by_filter_time_budget_seconds=30)
+
+    def test_delete_documents_by_filter_slicesResumedUntilDone(self):
+        self.vespa_client.delete_documents_by_selection.side_effect = [
+            {0: _response(5, 'c0'), 1: _response(3)},
+            {0: _response(2)},
+        ]
+
+        res = self.document.delete_documents_by_filter(self.marqo_index, '_id:doc1')
+
+        self.assertEqual(10, res.deleted_count)
+        self.assertTrue(res.done)
+        self.assertIsNone(res.continuation)
+        calls = self.vespa_client.delete_documents_by_selection.call_args_list
+        self.assertEqual(('my_index', 'my_index.marqo__id == "doc1"', {0: None, 1: None}), calls[0].args)
+        self.assertEqual({0: 'c0'}, calls[1].args[2])
+        self.assertEqual(2, calls[1].kwargs['slices'])
+
+    def test_delete_documents_by_filter_timeBudgetSpent_continuationResumes(self):
+        self.document.delete_by_filter_time_budget_seconds = 0.01
+
+        def delete(*args, **kwargs):
+            return {slice_id: _response(1, f'c{slice_id}') for slice_id in args[2]}
+
+        self.vespa_client.delete_documents_by_selection.side_effect = delete
+        with mock.patch('marqo.core.document.document.timer', side_effect=[0, 0, 1]):
+            res = self.document.delete_documents_by_filter(self.marqo_index, 'a:b')
+
+        self.assertFalse(res.done)
+        self.assertEqual(2, res.deleted_count)
+        self.assertIsNotNone(res.continuation)
+
+        # The continuation resumes the same slices, even if the configured slice count changed
+        self.document.delete_by_filter_slices = 8
+        self.document.delete_by_filter_time_budget_seconds = 30
+        self.vespa_client.delete_documents_by_selection.side_effect = [{0: _response(4), 1: _response(0)}]
+        res = self.document.delete_documents_by_filter(self.marqo_index, 'a:b', res.continuation)
+
+        self.assertTrue(res.done)
+        self.assertEqual(4, res.deleted_count)
+        last_call = self.vespa_client.delete_documents_by_selection.call_args
+        self.assertEqual({0: 'c0', 1: 'c1'}, last_call.args[2])
+        self.assertEqual(2, last_call.kwargs['slices'])
+
+    def test_delete_documents_by_filter_sliceFails_partialProgressReturned(self):
+        self.vespa_client.delete_documents_by_selection.side_effect = [
+            {0: _response(5, 'c0'), 1: _response(3, 'c1')},
+            VespaDeleteBySelectionError('slice 1 failed', cause=VespaError('slice 1 failed'),
+                                        responses={0: _response(2)}, errors={1: VespaError('slice 1 failed')}),
+        ]
+
+        res = self.document.delete_documents_by_filter(self.marqo_index, 'a:b')
+
+        self.assertEqual(10, res.deleted_count)
+        self.assertFalse(res.done)
+
+        # The continuation resumes the failed slice from where it was before it failed
+        self.vespa_client.delete_documents_by_selection.side_effect = [{1: _response(1)}]
+        res = self.document.delete_documents_by_filter(self.marqo_index, 'a:b', res.continuation)
+
+        self.assertTrue(res.done)
+        self.assertEqual({1: 'c1'}, self.vespa_client.delete_documents_by_selection.call_args.args[2])
+
+    def test_delete_documents_by_filter_allSlicesFail_raises(self):
+        error = VespaError('failed')
+        self.vespa_client.delete_documents_by_selection.side_effect = VespaDeleteBySelectionError(
+            'failed', cause=error, errors={0: error, 1: error}
+        )
+
+        with self.assertRaises(VespaError) as cm:
+            self.document.delete_documents_by_filter(self.marqo_index, 'a:b')
+        self.assertIs(error, cm.exception)
+
+    def test_delete_documents_by_filter_invalidContinuation_fails(self):
+        self.vespa_client.delete_documents_by_selection.return_value = {0: _response(0, 'c0'), 1: _response(0)}
+        with mock.patch('marqo.core.document.document.timer', side_effect=[0, 0, 100]):
+            continuation = self.document.delete_documents_by_filter(self.marqo_index, 'a:b').continuation
+
+        for filter_string, token in [('a:c', continuation), ('a:b', 'not a continuation'), ('a:b', 'e30=')]:
+            with self.subTest(token):
+                with self.assertRaises(InvalidArgumentError):
+                    self.document.delete_documents_by_filter(self.marqo_index, filter_string, token)
+
+    def test_delete_documents_by_filter_invalidFilter_fails(self):
+        with self.assertRaises(InvalidArgumentError):
+            self.document.delete_documents_by_filter(self.marqo_index, 'a:b AND')
+
+        self.vespa_client.delete_documents_by_selection.assert_not_called()
+
+    def test_delete_all_docs_continuationsFollowed(self):
+        self.vespa_client.delete_documents_by_selection.side_effect = [
+            {0: _response(10, 'c0')},
+            {0: _response(5)},
+        ]
+
+        self.assertEqual(15, self.document.delete_all_docs(self.marqo_index))
+        calls = self.vespa_client.delete_documents_by_selection.call_args_list
+        self.assertEqual([('my_index', 'true', {0: None}), ('my_index', 'true', {0: 'c0'})],
+                         [call.args for call in calls])
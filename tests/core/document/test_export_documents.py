@@ -0,0 +1,105 @@
+import base64
+import threading
+from unittest import mock
+
+import numpy as np
+
+from marqo.core.document.document import Document
+from marqo.core.exceptions import InvalidArgumentError
+from marqo.core.unstructured_vespa_index import common as unstructured_common
+from marqo.tensor_search.enums import VectorFormat
+from marqo.vespa.models.get_document_response import VisitDocumentsResponse
+from tests.marqo_test import MarqoTestCase
+
+
+def _vespa_document(doc_id, embeddings=None):
+    fields = {
+        unstructured_common.VESPA_FIELD_ID: doc_id,
+        unstructured_common.SHORT_STRINGS_FIELDS: {'title': f'title {doc_id}'},
+    }
+    if embeddings is not None:
+        fields[unstructured_common.VESPA_DOC_CHUNKS] = [f'title::chunk{i}' for i in range(len(embeddings))]
+        fields[unstructured_common.VESPA_DOC_EMBEDDINGS] = {
+            'blocks': {str(i): embedding for i, embedding in enumerate(embeddings)}
+        }
+    return {'id': f'id:my_index:my_index::{doc_id}', 'fields': fields}
+
+
+def _page(documents, continuation=None):
+    return VisitDocumentsResponse(pathId='/document/v1/my_index/my_index/docid', documents=documents,
+                                  documentCount=len(documents), continuation=continuation)
+
+
+class TestExportDocuments(MarqoTestCase):
+
+    def setUp(self):
+        self.vespa_client = mock.Mock()
+        self.marqo_index = self.unstructured_marqo_index(name='my_index', schema_name='my_index')
+        self.document = Document(self.vespa_client, mock.Mock(), export_slices=2, export_page_size=10)
+
+    def _export(self, **kwargs):
+        return [doc for page in self.document.export_documents(self.marqo_index, **kwargs) for doc in page]
+
+    def test_export_documents_allSlicesAndPagesVisited(self):
+        pages = {
+            (0, None): _page([_vespa_document('a')], 'c0'),
+            (0, 'c0'): _page([_vespa_document('b')]),
+            (1, None): _page([], 'c1'),
+            (1, 'c1'): _page([_vespa_document('c')]),
+        }
+        self.vespa_client.visit_documents.side_effect = \
+            lambda schema, continuation, slice_id, **kwargs: pages[(slice_id, continuation)]
+
+        documents = self._export()
+
+        self.assertEqual({'a', 'b', 'c'}, {doc['_id'] for doc in documents})
+        self.assertEqual('title a', [doc for doc in documents if doc['_id'] == 'a'][0]['title'])
+        self.assertNotIn('_tensors', documents[0])
+        self.assertEqual(4, self.vespa_client.visit_documents.call_count)
+        kwargs = self.vespa_client.visit_documents.call_args.kwargs
+        self.assertEqual((2, 10, None), (kwargs['slices'], kwargs['wanted_document_count'], kwargs['selection']))
+
+    def test_export_documents_slowConsumer_nextPageNotPrefetched(self):
+        calls = []
+        lock = threading.Lock()
+
+        def visit(schema, continuation, slice_id, **kwargs):
+            with lock:
+                calls.append((slice_id, continuation))
+            page = int(continuation or 0)
+            return _page([_vespa_document(f'{slice_id}-{page}')], str(page + 1) if page < 100 else None)
+
+        self.vespa_client.visit_documents.side_effect = visit
+
+        pages = self.document.export_documents(self.marqo_index)
+        next(pages)
+        next(pages)
+        pages.close()
+
+        # Each slice has at most one page handed to the consumer and one request in flight
+        self.assertLessEqual(len(calls), 2 * 2 + 2)
+
+    def test_export_documents_includeVectors(self):
+        self.vespa_client.visit_documents.return_value = _page([_vespa_document('a', [[1.0, 2.0], [3.0, 4.5]])])
+        self.document.export_slices = 1
+
+        json_document, = self._export(include_vectors=True)
+        binary_document, = self._export(include_vectors=True, vector_format=VectorFormat.Binary)
+
+        self.assertEqual({'title': {'chunks': ['chunk0', 'chunk1'], 'embeddings': [[1.0, 2.0], [3.0, 4.5]]}},
+                         json_document['_tensors'])
+        embeddings = np.frombuffer(base64.b64decode(binary_document['_tensors']['title']['embeddings']), dtype='<f4')
+        self.assertEqual([1.0, 2.0, 3.0, 4.5], embeddings.tolist())
+
+    def test_export_documents_filter_visitsSelection(self):
+        self.vespa_client.visit_documents.return_value = _page([])
+
+        self._export(filter_string='_id:a')
+
+        self.assertEqual('my_index.marqo__id == "a"', self.vespa_client.visit_documents.call_args.kwargs['selection'])
+
+    def test_export_documents_invalidFilter_failsBeforeVisiting(self):
+        with self.assertRaises(InvalidArgumentError):
+            self.document.export_documents(self.marqo_index, filter_string='a:b AND')
+
+        self.vespa_client.visit_documents.assert_not_called()
@@ -0,0 +1,244 @@
+import base64
+import io
+import json
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from marqo.core.document.document import Document
+from marqo.core.models.marqo_index import IndexType, SemiStructuredMarqoIndex
+from marqo.core.semi_structured_vespa_index import common as semi_structured_common
+from marqo.core.semi_structured_vespa_index.schema_evolution import SchemaEvolutionCoordinator
+from marqo.core.semi_structured_vespa_index.semi_structured_add_document_handler import \
+    SemiStructuredFieldCountConfig
+from marqo.core.unstructured_vespa_index import common as unstructured_common
+from marqo.tensor_search.enums import ImportFormat
+from marqo.tensor_search.telemetry import RequestMetrics, RequestMetricsStore
+from marqo.vespa.models.feed_response import FeedBatchDocumentResponse
+from marqo.vespa.vespa_client import VespaClient
+from tests.marqo_test import MarqoTestCase
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class TestImportDocuments(MarqoTestCase):
+
+    def setUp(self):
+        self.fed_batches = []
+        self.feed_statuses = {}
+        vespa_client = VespaClient('http://localhost:19071', 'http://localhost:8080', 'http://localhost:8080',
+                                   'content_default')
+        self.vespa_client = mock.Mock()
+        self.vespa_client.translate_vespa_document_response.side_effect = \
+            vespa_client.translate_vespa_document_response
+        self.vespa_client.feed_batches_pipelined.side_effect = self._feed_batches_pipelined
+        self.index_management = mock.Mock()
+        self.document = Document(self.vespa_client, self.index_management, import_batch_size=2)
+        self.marqo_index = self.unstructured_marqo_index(name='my_index', schema_name='my_index')
+        self.dimension = self.marqo_index.model.get_dimension()
+
+    def _feed_batches_pipelined(self, batches, schema, on_response, concurrency=None, timeout=60):
+        for batch in batches:
+            self.fed_batches.append(batch)
+            for document in batch:
+                on_response(document, FeedBatchDocumentResponse(status=self.feed_statuses.get(document.id, 200),
+                                                                 id=f'id:{schema}:{schema}::{document.id}',
+                                                                 message=None))
+
+    def _import(self, records, marqo_index=None, **kwargs):
+        file = io.BytesIO(b''.join(
+            (record if isinstance(record, bytes) else json.dumps(record).encode()) + b'\n' for record in records
+        ))
+        return self.document.import_documents(marqo_index or self.marqo_index, file, ImportFormat.Ndjson, **kwargs)
+
+    def _fed_documents(self):
+        return {document.id: document.fields for batch in self.fed_batches for document in batch}
+
+    def _vectors(self, count, seed=0):
+        return np.random.default_rng(seed).random((count, self.dimension), dtype=np.float32)
+
+    def test_import_documents_unstructured_fedWithNormalisedVectors(self):
+        vectors = self._vectors(2)
+        records = [
+            {'_id': '1', 'title': 'A title', 'count': 3,
+             '_tensors': {'title': {'chunks': ['A', 'title'], 'embeddings': vectors.tolist()}}},
+            {'_id': '2', 'title': 'No vectors'},
+            {'_id': '3', 'tags': ['a', 'b']},
+        ]
+
+        response = self._import(records)
+
+        self.assertEqual((False, 3, 3, 0), (response.errors, response.received_count, response.imported_count,
+                                            response.failed_count))
+        self.assertEqual([2, 1], [len(batch) for batch in self.fed_batches])
+        fields = self._fed_documents()['1']
+        self.assertEqual(['title::A', 'title::title'], fields[unstructured_common.VESPA_DOC_CHUNKS])
+        self.assertEqual({'count': 3}, fields[unstructured_common.INT_FIELDS])
+        embeddings = np.array(list(fields[unstructured_common.VESPA_DOC_EMBEDDINGS].values()))
+        np.testing.assert_allclose(vectors / np.linalg.norm(vectors, axis=1, keepdims=True), embeddings, rtol=1e-6)
+        self.assertNotIn(unstructured_common.VESPA_DOC_EMBEDDINGS, self._fed_documents()['2'])
+
+    def test_import_documents_binaryEmbeddings_sameAsJson(self):
+        marqo_index = self.unstructured_marqo_index(name='my_index', schema_name='my_index',
+                                                    normalize_embeddings=False)
+        vectors = self._vectors(2)
+        records = [
+            {'_id': 'json', '_tensors': {'title': {'chunks': ['a', 'b'], 'embeddings': vectors.tolist()}}},
+            {'_id': 'binary', '_tensors': {'title': {
+                'chunks': ['a', 'b'], 'embeddings': base64.b64encode(vectors.astype('<f4').tobytes()).decode()}}},
+            {'_id': 'flat', '_tensors': {'title': {'chunks': ['a', 'b'], 'embeddings': vectors.ravel().tolist()}}},
+        ]
+
+        response = self._import(records, marqo_index=marqo_index)
+
+        self.assertEqual(3, response.imported_count)
+        documents = self._fed_documents()
+        embeddings = documents['json'][unstructured_common.VESPA_DOC_EMBEDDINGS]
+        self.assertEqual(vectors.tolist(), list(embeddings.values()))
+        self.assertEqual(embeddings, documents['binary'][unstructured_common.VESPA_DOC_EMBEDDINGS])
+        self.assertEqual(embeddings, documents['flat'][unstructured_common.VESPA_DOC_EMBEDDINGS])
+
+    def test_import_documents_invalidRecords_reportedAndSkipped(self):
+        records = [
+            {'title': 'no id'},
+            b'{"_id": "bad json"',
+            {'_id': 'wrong dimension', '_tensors': {'title': {'chunks': ['a'], 'embeddings': [[0.1, 0.2]]}}},
+            {'_id': 'not finite', '_tensors': {'title': {'chunks': ['a'],
+                                                         'embeddings': [[float('nan')] * self.dimension]}}},
+            {'_id': 'zero vector', '_tensors': {'title': {'chunks': ['a'], 'embeddings': [[0.0] * self.dimension]}}},
+            {'_id': 'valid', '_tensors': {'title': {'chunks': 'a', 'embeddings': self._vectors(1).tolist()}}},
+        ]
+
+        response = self._import(records)
+
+        self.assertEqual((True, 6, 1, 5), (response.errors, response.received_count, response.imported_count,
+                                           response.failed_count))
+        self.assertEqual([1, 2, 3, 4, 5], [failure.record for failure in response.failures])
+        self.assertEqual(['', '', 'wrong dimension', 'not finite', 'zero vector'],
+                         [failure.id for failure in response.failures])
+        self.assertTrue(all(failure.status == 400 for failure in response.failures))
+        self.assertIn('must be 1 vectors of', response.failures[2].message)
+        self.assertEqual(['valid'], list(self._fed_documents()))
+
+    def test_import_documents_feedFails_reportedWithRecord(self):
+        self.feed_statuses['2'] = 507
+
+        response = self._import([{'_id': '1', 'a': 'b'}, {'_id': '2', 'a': 'b'}])
+
+        self.assertEqual((1, 1), (response.imported_count, response.failed_count))
+        failure = response.failures[0]
+        self.assertEqual((2, '2', 400, 'vespa_error'), (failure.record, failure.id, failure.status, failure.code))
+
+    def test_import_documents_feedFails_duplicateAndUnencodedIds_reportedWithRecord(self):
+        self.feed_statuses['a b/c'] = 507
+
+        response = self._import([{'_id': 'a b/c', 'a': 'b'}, {'_id': 'a b/c', 'a': 'c'}, {'_id': '3', 'a': 'b'}])
+
+        self.assertEqual((1, 2), (response.imported_count, response.failed_count))
+        self.assertEqual([(1, 'a b/c'), (2, 'a b/c')], [(failure.record, failure.id) for failure in response.failures])
+
+    def test_import_documents_manyFailures_failuresCapped(self):
+        response = self._import([{'title': 'no id'}] * 150)
+
+        self.assertEqual(150, response.failed_count)
+        self.assertEqual(100, len(response.failures))
+
+    def test_import_documents_semiStructured_newFieldsAddedBeforeFeed(self):
+        marqo_index = SemiStructuredMarqoIndex(**{
+            **self.marqo_index.dict(), 'type': IndexType.SemiStructured, 'version': 1,
+            'lexical_fields': [], 'tensor_fields': [], 'store_centroids': True
+        })
+        self.index_management.add_fields_to_index.side_effect = lambda *args: self.assertEqual([], self.fed_batches)
+        records = [
+            {'_id': '1', 'title': 'A title', '_tensors': {'title': {'chunks': ['A title'],
+                                                                    'embeddings': self._vectors(1).tolist()}}},
+            {'_id': '2', 'description': 'Too many fields'},
+        ]
+
+        with mock.patch('marqo.tensor_search.index_meta_cache.get_index') as mock_get_index:
+            response = self._import(records, marqo_index=marqo_index,
+                                    field_count_config=SemiStructuredFieldCountConfig(max_lexical_field_count=1,
+                                                                                      max_tensor_field_count=1))
+
+        self.assertEqual((1, 1), (response.imported_count, response.failed_count))
+        self.assertEqual('2', response.failures[0].id)
+        name, lexical_fields, tensor_fields, _, _ = self.index_management.add_fields_to_index.call_args.args
+        self.assertEqual(['title'], [field.name for field in lexical_fields])
+        self.assertEqual(['title'], [field.name for field in tensor_fields])
+        mock_get_index.assert_called_once()
+        fields = self._fed_documents()['1']
+        self.assertEqual(['A title'], fields[marqo_index.tensor_field_map['title'].chunk_field_name])
+        self.assertIn('title', fields[semi_structured_common.FIELD_CENTROIDS])
+
+    def test_import_documents_semiStructuredPipelinedFeed_newFieldsAddedInRequestContext(self):
+        """
+        Runs the real pipelined feed, which reads the batches, and so adds the new fields, in a worker thread. The index
+        update must still count towards the metrics of the request.
+        """
+        marqo_index = SemiStructuredMarqoIndex(**{
+            **self.marqo_index.dict(), 'type': IndexType.SemiStructured, 'version': 1,
+            'lexical_fields': [], 'tensor_fields': [],
+        })
+        settings = [marqo_index.json()]
+        updates = []
+
+        def update_index(updated_index):
+            updates.append(updated_index)
+            settings.append(updated_index.json())
+
+        coordinator = SchemaEvolutionCoordinator(lambda name: SemiStructuredMarqoIndex.parse_raw(settings[-1]),
+                                                 update_index)
+        self.index_management.add_fields_to_index.side_effect = coordinator.add_fields
+        vespa_client = VespaClient('http://localhost:19071', 'http://localhost:8080', 'http://localhost:8080',
+                                   'content_default')
+        document = Document(vespa_client, self.index_management, import_batch_size=2)
+
+        async def feed_document(semaphore, async_client, vespa_document, schema, timeout):
+            return FeedBatchDocumentResponse(status=200, id=f'id:{schema}:{schema}::{vespa_document.id}', message=None)
+
+        # Look the request up in the context, rather than through the class-wide mock of MarqoTestCase, so that a
+        # thread without the request's context has no metrics
+        request = mock.Mock()
+        metrics = RequestMetrics()
+        with mock.patch.object(RequestMetricsStore, '_get_request', RequestMetricsStore.current_request.get), \
+                mock.patch.object(VespaClient, '_feed_document_async', side_effect=feed_document), \
+                mock.patch('marqo.tensor_search.index_meta_cache.get_index'):
+            RequestMetricsStore.set_in_request(request, metrics)
+            self.addCleanup(RequestMetricsStore.clear_metrics_for, request)
+            file = io.BytesIO(b''.join(json.dumps(record).encode() + b'\n' for record in [
+                {'_id': '1', 'title': 'A title'}, {'_id': '2', 'title': 'Another'}, {'_id': '3', 'tags': 'new'}
+            ]))
+            response = document.import_documents(marqo_index, file, ImportFormat.Ndjson)
+
+        self.assertEqual((3, 0), (response.imported_count, response.failed_count))
+        self.assertEqual([['title'], ['title', 'tags']],
+                         [[field.name for field in updated.lexical_fields] for updated in updates])
+        self.assertEqual(2, metrics.counter['add_documents.update_index.deployments'])
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_import_documents_parquet_nullColumnsDropped(self):
+        vectors = self._vectors(2)
+        table = pyarrow.table({
+            '_id': ['1', '2'],
+            'title': ['A title', None],
+            '_tensors': [
+                {'title': {'chunks': 'A title', 'embeddings': vectors[0].tobytes()}},
+                {'title': None},
+            ],
+        })
+        file = io.BytesIO()
+        pyarrow.parquet.write_table(table, file)
+        file.seek(0)
+
+        response = self.document.import_documents(self.marqo_index, file, ImportFormat.Parquet)
+
+        self.assertEqual((2, 0), (response.imported_count, response.failed_count))
+        documents = self._fed_documents()
+        self.assertEqual(['title::A title'], documents['1'][unstructured_common.VESPA_DOC_CHUNKS])
+        self.assertNotIn('title', documents['2'].get(unstructured_common.SHORT_STRINGS_FIELDS, {}))
+        self.assertNotIn(unstructured_common.VESPA_DOC_CHUNKS, documents['2'])
@@ -0,0 +1,173 @@
+import unittest
+from unittest import mock
+
+from marqo.core.index_management.vespa_application_package import ApplicationContentCache, \
+    ApplicationPackageDeploymentSessionStore, VespaAppBackup
+from marqo.vespa.exceptions import VespaError
+
+
+class FakeVespaClient:
+    """An in-memory config server, holding the files of the active application and of each deployment session."""
+
+    def __init__(self, files):
+        self.active_files = dict(files)
+        self.generation = 1
+        self.sessions = dict()
+        self.requests = []
+
+    def _session(self, content_base_url):
+        return self.sessions[int(content_base_url.split('/')[-3])]
+
+    def get_application_wanted_generation(self):
+        return self.generation
+
+    def create_deployment_session_with_id(self):
+        session_id = max([self.generation, *self.sessions.keys()]) + 1
+        self.sessions[session_id] = dict(self.active_files)
+        base = f'http://config:19071/application/v2/tenant/default/session/{session_id}/content/'
+        return session_id, base, f'http://config:19071/session/{session_id}/prepared'
+
+    def list_contents(self, content_base_url):
+        self.requests.append(('list', None))
+        return [content_base_url + path for path in self._session(content_base_url)]
+
+    def get_content_url(self, content_base_url, *paths):
+        return f'{content_base_url}{"/".join(paths)}'
+
+    def get_binary_content(self, content_base_url, *paths):
+        self.requests.append(('get', '/'.join(paths)))
+        return self._session(content_base_url)['/'.join(paths)]
+
+    def put_content(self, content_base_url, content, *paths):
+        self.requests.append(('put', '/'.join(paths)))
+        self._session(content_base_url)['/'.join(paths)] = content.encode() if isinstance(content, str) else content
+
+    def delete_content(self, content_base_url, *paths):
+        self.requests.append(('delete', '/'.join(paths)))
+        del self._session(content_base_url)['/'.join(paths)]
+
+    def prepare(self, prepare_url, timeout):
+        return {'activate': prepare_url.replace('prepared', 'active')}
+
+    def activate(self, activate_url, timeout):
+        session_id = int(activate_url.split('/')[-2])
+        self.active_files = self.sessions[session_id]
+        self.generation = session_id
+
+    def wait_for_application_convergence(self, timeout):
+        pass
+
+
+class TestApplicationPackageDeploymentSessionStoreCache(unittest.TestCase):
+
+    def setUp(self):
+        self.vespa_client = FakeVespaClient({
+            'services.xml': b'<services/>',
+            'marqo_index_settings.json': b'{}',
+            'components/marqo.jar': b'jar',
+        })
+        self.cache = ApplicationContentCache()
+
+    def _store(self):
+        return ApplicationPackageDeploymentSessionStore(self.vespa_client, 10, 10, content_cache=self.cache)
+
+    def _deploy(self, settings):
+        store = self._store()
+        self.assertIsNotNone(store.read_text_file('marqo_index_settings.json'))
+        store.read_text_file('services.xml')
+        store.save_file(settings, 'marqo_index_settings.json')
+        store.save_file(b'jar', 'components', 'marqo.jar')
+        store.deploy_application()
+
+    def test_deploy_sameGeneration_readsFromCache(self):
+        self._deploy('{"a": 1}')
+        self.vespa_client.requests.clear()
+
+        self._deploy('{"a": 2}')
+
+        self.assertEqual([('put', 'marqo_index_settings.json')], self.vespa_client.requests)
+        self.assertEqual(b'{"a": 2}', self.vespa_client.active_files['marqo_index_settings.json'])
+        self.assertEqual(b'jar', self.vespa_client.active_files['components/marqo.jar'])
+
+    def test_save_file_unchangedContent_notUploaded(self):
+        store = self._store()
+        store.read_text_file('services.xml')
+        self.vespa_client.requests.clear()
+
+        store.save_file('<services/>', 'services.xml')
+
+        self.assertEqual([], self.vespa_client.requests)
+
+    def test_save_file_unchangedContentWithBackup_notUploaded(self):
+        store = self._store()
+        backup = VespaAppBackup()
+
+        store.save_file('<services/>', 'services.xml', backup=backup)
+
+        self.assertNotIn(('put', 'services.xml'), self.vespa_client.requests)
+        self.assertEqual('<services/>', backup.read_text_file('services.xml'))
+
+    def test_deploy_generationChangedElsewhere_readsFromSession(self):
+        self._deploy('{"a": 1}')
+        # Another Marqo instance deploys a change
+        self.vespa_client.active_files = {**self.vespa_client.active_files, 'marqo_index_settings.json': b'{"b": 1}'}
+        self.vespa_client.generation += 10
+        self.vespa_client.requests.clear()
+
+        store = self._store()
+
+        self.assertEqual('{"b": 1}', store.read_text_file('marqo_index_settings.json'))
+        self.assertEqual([('list', None), ('get', 'marqo_index_settings.json')], self.vespa_client.requests)
+
+    def test_deploy_generationChangesDuringSessionCreation_readsFromSession(self):
+        self._deploy('{"a": 1}')
+        generations = iter([self.vespa_client.generation, self.vespa_client.generation + 1])
+        self.vespa_client.requests.clear()
+
+        with mock.patch.object(self.vespa_client, 'get_application_wanted_generation',
+                               side_effect=lambda: next(generations)):
+            store = self._store()
+        store.read_text_file('marqo_index_settings.json')
+
+        self.assertEqual([('list', None), ('get', 'marqo_index_settings.json')], self.vespa_client.requests)
+
+    def test_deploy_removedFile_removedFromCache(self):
+        store = self._store()
+        store.remove_file('services.xml')
+        store.deploy_application()
+
+        store = self._store()
+
+        self.assertFalse(store.file_exists('services.xml'))
+        self.assertIsNone(store.read_text_file('services.xml'))
+
+    def test_deploy_activationFails_cacheInvalidated(self):
+        self._deploy('{"a": 1}')
+        store = self._store()
+        store.save_file('{"a": 2}', 'marqo_index_settings.json')
+
+        with mock.patch.object(self.vespa_client, 'activate', side_effect=VespaError('conflict')):
+            with self.assertRaises(VespaError):
+                store.deploy_application()
+
+        self.vespa_client.requests.clear()
+        self.assertEqual('{"a": 1}', self._store().read_text_file('marqo_index_settings.json'))
+        self.assertIn(('list', None), self.vespa_client.requests)
+
+    def test_cache_largeFiles_trackedByDigestOnly(self):
+        self.cache = ApplicationContentCache(max_file_size=5)
+        self._deploy('{"a": 1}')
+        self.vespa_client.requests.clear()
+
+        store = self._store()
+        store.save_file(b'jar', 'components', 'marqo.jar')
+        self.assertEqual('{"a": 1}', store.read_text_file('marqo_index_settings.json'))
+
+        self.assertEqual([('get', 'marqo_index_settings.json')], self.vespa_client.requests)
+
+    def test_store_withoutCache_readsFromSession(self):
+        store = ApplicationPackageDeploymentSessionStore(self.vespa_client, 10, 10)
+
+        self.assertEqual('<services/>', store.read_text_file('services.xml'))
+        self.assertFalse(store.file_exists('missing.xml'))
+        self.assertEqual([('list', None), ('get', 'services.xml')], self.vespa_client.requests)
@@ -208,4 +208,17 @@ class TestGetSettings(MarqoTestCase):
             retrieved_index = self.config.index_management.get_index(self.structured_custom_index.name)
             retrieved_settings = IndexSettings.from_marqo_index(retrieved_index).dict(exclude_none=True, by_alias=True)
             self.assertEqual(retrieved_settings, expected_structured_custom_settings)
-            
\ No newline at end of file
+            
+
+class TestGetSettingsStoreCentroids(MarqoTestCase):
+
+    def test_get_settings_storeCentroids_onlyReturnedWhenSet(self):
+        index = self.unstructured_marqo_index(name='my_index', schema_name='my_index')
+
+        settings = IndexSettings.from_marqo_index(index).dict(exclude_none=True, by_alias=True)
+        self.assertNotIn('storeCentroids', settings)
+
+        settings = IndexSettings.from_marqo_index(
+            index.copy(update={'store_centroids': True})
+        ).dict(exclude_none=True, by_alias=True)
+        self.assertEqual(settings['storeCentroids'], True)
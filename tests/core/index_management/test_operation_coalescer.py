@@ -0,0 +1,226 @@
+import threading
+import unittest
+from unittest import mock
+
+from marqo.core.exceptions import IndexExistsError, IndexNotFoundError
+from marqo.core.index_management.index_management import IndexManagement
+from marqo.core.index_management.operation_coalescer import OperationCoalescer
+from marqo.vespa.exceptions import VespaError
+from tests.marqo_test import MarqoTestCase
+from tests.utils.coalescing import run_in_thread, wait_for_pending
+
+
+class TestOperationCoalescer(unittest.TestCase):
+
+    def setUp(self):
+        self.batches = []
+        self.processing = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+        def process(batch):
+            self.processing.set()
+            self.release.wait(5)
+            self.batches.append([p.operation for p in batch])
+            for p in batch:
+                if p.operation == 'bad':
+                    p.future.set_exception(ValueError('bad operation'))
+                else:
+                    p.future.set_result(p.operation.upper())
+
+        self.coalescer = OperationCoalescer(process)
+
+    def test_submit_single_processedAlone(self):
+        self.assertEqual('A', self.coalescer.submit('a'))
+        self.assertEqual([['a']], self.batches)
+
+    def test_submit_duringProcessing_nextBatch(self):
+        self.release.clear()
+        first = run_in_thread(self.coalescer.submit, 'a')
+        self.assertTrue(self.processing.wait(5))
+
+        others = [run_in_thread(self.coalescer.submit, op) for op in ['b', 'bad', 'c']]
+        wait_for_pending(self, self.coalescer, 3)
+        self.release.set()
+        for thread, _ in [first] + others:
+            thread.join(5)
+
+        self.assertEqual([['a'], ['b', 'bad', 'c']], self.batches)
+        self.assertEqual(['A', 'B', None, 'C'], [result.get('value') for _, result in [first] + others])
+        self.assertIsInstance(others[1][1]['error'], ValueError)
+
+    def test_submit_batchWindow_concurrentOperationsBatched(self):
+        self.coalescer.batch_window_seconds = 0.5
+        threads = [run_in_thread(self.coalescer.submit, op) for op in ['a', 'b']]
+        for thread, _ in threads:
+            thread.join(5)
+
+        self.assertEqual(1, len(self.batches))
+        self.assertEqual({'a', 'b'}, set(self.batches[0]))
+
+    def test_submit_processFails_unresolvedOperationsFail(self):
+        def process(batch):
+            for p in batch:
+                if p.operation == 'a':
+                    p.future.set_result('done')
+            raise RuntimeError('failed')
+
+        coalescer = OperationCoalescer(process, batch_window_seconds=0.5)
+        a = run_in_thread(coalescer.submit, 'a')
+        b = run_in_thread(coalescer.submit, 'b')
+        for thread, _ in [a, b]:
+            thread.join(5)
+
+        self.assertEqual('done', a[1]['value'])
+        self.assertIsInstance(b[1]['error'], RuntimeError)
+
+    def test_submit_differentKeys_processedIndependently(self):
+        release = threading.Event()
+
+        def process(batch):
+            if batch[0].operation == 'a':
+                self.processing.set()
+                release.wait(5)
+            self.batches.append([p.operation for p in batch])
+            for p in batch:
+                p.future.set_result(p.operation.upper())
+
+        coalescer = OperationCoalescer(process)
+        first = run_in_thread(coalescer.submit, 'a', 'index1')
+        self.assertTrue(self.processing.wait(5))
+
+        # A batch of another key is not held up by the batch being processed
+        self.assertEqual('B', coalescer.submit('b', 'index2'))
+        release.set()
+        first[0].join(5)
+
+        self.assertEqual([['b'], ['a']], self.batches)
+        self.assertEqual('A', first[1]['value'])
+
+    def test_submit_processed_keyStateDropped(self):
+        self.release.clear()
+        first = run_in_thread(self.coalescer.submit, 'a', 'index1')
+        self.assertTrue(self.processing.wait(5))
+        second = run_in_thread(self.coalescer.submit, 'b', 'index1')
+        wait_for_pending(self, self.coalescer, 1, 'index1')
+        self.release.set()
+        for thread, _ in [first, second]:
+            thread.join(5)
+        self.coalescer.submit('c', 'index2')
+
+        self.assertEqual({}, self.coalescer._batches)
+
+    def test_submit_coalesced_onCoalescedCalledForJoiningOperations(self):
+        on_coalesced = mock.Mock()
+        self.coalescer._on_coalesced = on_coalesced
+        self.release.clear()
+        first = run_in_thread(self.coalescer.submit, 'a')
+        self.assertTrue(self.processing.wait(5))
+        others = [run_in_thread(self.coalescer.submit, op) for op in ['b', 'c']]
+        wait_for_pending(self, self.coalescer, 2)
+        self.release.set()
+        for thread, _ in [first] + others:
+            thread.join(5)
+
+        # 'b' starts the second batch, and 'c' joins it
+        self.assertEqual(1, on_coalesced.call_count)
+
+
+class TestIndexManagementCoalescedOperations(MarqoTestCase):
+
+    def setUp(self):
+        self.index_management = IndexManagement(mock.Mock(), enable_index_operations=True)
+        self.vespa_app = mock.Mock()
+        self.existing = {'existing'}
+
+        def add_index(schema, marqo_index):
+            if marqo_index.name in self.existing:
+                raise IndexExistsError(f'Index {marqo_index.name} already exists')
+            self.existing.add(marqo_index.name)
+
+        def delete_index(name):
+            if name not in self.existing:
+                raise IndexNotFoundError(f'Index {name} not found')
+            self.existing.remove(name)
+
+        self.vespa_app.add_index_setting_and_schema.side_effect = add_index
+        self.vespa_app.delete_index_setting_and_schema.side_effect = delete_index
+        self.deploying = threading.Event()
+        self.release_deploy = threading.Event()
+        self.release_deploy.set()
+
+        def deploy(has_deletions):
+            self.deploying.set()
+            self.release_deploy.wait(5)
+
+        self.vespa_app.deploy_index_changes.side_effect = deploy
+        patcher = mock.patch.object(self.index_management, '_get_vespa_application', return_value=self.vespa_app)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _create_in_thread(self, name):
+        return run_in_thread(self.index_management.create_index,
+                                 self.unstructured_marqo_index_request(name=name))
+
+    def test_create_index_single(self):
+        marqo_index = self.index_management.create_index(self.unstructured_marqo_index_request(name='index1'))
+
+        self.assertEqual('index1', marqo_index.name)
+        self.vespa_app.deploy_index_changes.assert_called_once_with(has_deletions=False)
+
+    def test_create_and_delete_concurrent_oneDeployment(self):
+        self.release_deploy.clear()
+        first = self._create_in_thread('index1')
+        self.assertTrue(self.deploying.wait(5))
+
+        others = [self._create_in_thread('index2'), self._create_in_thread('existing'),
+                  run_in_thread(self.index_management.delete_index_by_name, 'index1'),
+                  run_in_thread(self.index_management.delete_index_by_name, 'missing')]
+        wait_for_pending(self, self.index_management._index_operations, 4)
+        self.release_deploy.set()
+        for thread, _ in [first] + others:
+            thread.join(5)
+
+        self.assertEqual('index1', first[1]['value'].name)
+        self.assertEqual('index2', others[0][1]['value'].name)
+        self.assertIsInstance(others[1][1]['error'], IndexExistsError)
+        self.assertNotIn('error', others[2][1])
+        self.assertIsInstance(others[3][1]['error'], IndexNotFoundError)
+        self.assertEqual([mock.call(has_deletions=False), mock.call(has_deletions=True)],
+                         self.vespa_app.deploy_index_changes.call_args_list)
+        self.assertEqual({'existing', 'index2'}, self.existing)
+
+    def test_delete_index_notFound_noDeployment(self):
+        with self.assertRaises(IndexNotFoundError):
+            self.index_management.delete_index_by_name('missing')
+
+        self.vespa_app.deploy_index_changes.assert_not_called()
+
+    def test_create_index_deploymentFails_raises(self):
+        self.vespa_app.deploy_index_changes.side_effect = VespaError('deployment failed')
+
+        with self.assertRaises(VespaError):
+            self.index_management.create_index(self.unstructured_marqo_index_request(name='index1'))
+
+    def test_delete_and_create_sameName_createDeployedAfterDelete(self):
+        self.release_deploy.clear()
+        first = self._create_in_thread('index1')
+        self.assertTrue(self.deploying.wait(5))
+
+        deployed_indexes = []
+        self.vespa_app.deploy_index_changes.side_effect = lambda has_deletions: deployed_indexes.append(
+            set(self.existing))
+        others = [run_in_thread(self.index_management.delete_index_by_name, 'existing'),
+                  self._create_in_thread('existing'), self._create_in_thread('index2')]
+        wait_for_pending(self, self.index_management._index_operations, 3)
+        self.release_deploy.set()
+        for thread, _ in [first] + others:
+            thread.join(5)
+
+        self.assertNotIn('error', others[0][1])
+        self.assertEqual('existing', others[1][1]['value'].name)
+        self.assertEqual('index2', others[2][1]['value'].name)
+        # The re-created index is not in the deployment that deletes it
+        self.assertEqual([{'index1'}, {'index1', 'existing', 'index2'}], deployed_indexes)
+        self.assertEqual([mock.call(has_deletions=True), mock.call(has_deletions=False)],
+                         self.vespa_app.deploy_index_changes.call_args_list[1:])
@@ -81,6 +81,39 @@ class TestTensorFieldChunkers(unittest.TestCase):
 
         self.assertEquals('BOOM!', err_context.exception.error_message)
 
+    @patch('marqo.core.inference.tensor_fields_container.image_processor.chunk_image')
+    @patch('marqo.core.inference.tensor_fields_container.image_processor.chunk_images')
+    def test_image_chunker_should_chunk_images_to_chunk_in_one_batch(self, mock_chunk_images, mock_chunk_image):
+        media_repo = {'url1': 'image1', 'url2': 'image2', 'url3': s2_inference_errors.S2InferenceError('BOOM!')}
+        mock_chunk_images.return_value = [(['patch1'], [[0, 0, 1, 1]]), (['patch2'], [[0, 0, 2, 2]])]
+
+        image_chunker = ImageChunker(media_repo=media_repo, device='cpu',
+                                     image_preprocessing=ImagePreProcessing(patch_method=PatchMethod.Frcnn),
+                                     urls_to_chunk=['url1', 'url2', 'url1', 'url3'])
+
+        self.assertEqual(([[0, 0, 2, 2]], ['patch2']), image_chunker.chunk('url2'))
+        self.assertEqual(([[0, 0, 1, 1]], ['patch1']), image_chunker.chunk('url1'))
+        mock_chunk_images.assert_called_once_with(['image1', 'image2'], device='cpu', method='frcnn')
+        mock_chunk_image.assert_not_called()
+
+    @patch('marqo.core.inference.tensor_fields_container.image_processor.chunk_image')
+    @patch('marqo.core.inference.tensor_fields_container.image_processor.chunk_images')
+    def test_image_chunker_should_chunk_images_one_at_a_time_when_batch_fails(self, mock_chunk_images,
+                                                                              mock_chunk_image):
+        media_repo = {'url1': 'image1', 'url2': 'image2'}
+        mock_chunk_images.side_effect = [s2_inference_errors.S2InferenceError('BOOM!')]
+        mock_chunk_image.side_effect = [(['patch1'], [[0, 0, 1, 1]]), s2_inference_errors.S2InferenceError('BOOM!')]
+
+        image_chunker = ImageChunker(media_repo=media_repo, device='cpu',
+                                     image_preprocessing=ImagePreProcessing(patch_method=PatchMethod.Frcnn),
+                                     urls_to_chunk=['url1', 'url2'])
+
+        self.assertEqual(([[0, 0, 1, 1]], ['patch1']), image_chunker.chunk('url1'))
+        with self.assertRaises(AddDocumentsError) as err_context:
+            image_chunker.chunk('url2')
+        self.assertEqual('BOOM!', err_context.exception.error_message)
+        mock_chunk_images.assert_called_once()
+
     def test_audio_video_chunker_should_chunk_audio_and_video(self):
         media_repo = {'url': [
             {'start_time': 5, 'end_time': 15, 'tensor': tensor([1.0, 2.0])},
@@ -0,0 +1,174 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from marqo.core.models.marqo_index_health import HealthStatus
+from marqo.core.monitoring.monitoring import Monitoring
+from marqo.core.monitoring.monitoring_cache import MonitoringCache
+from marqo.vespa.exceptions import VespaError
+from marqo.vespa.models.application_metrics import ApplicationMetrics
+from tests.marqo_test import MarqoTestCase
+
+
+def _metrics(memory_utilization=0.5, disk_utilization=0.25, nodes_above_limit=0):
+    def service(name, metrics):
+        return {'name': name, 'timestamp': 0, 'status': {'code': 'up', 'description': ''},
+                'metrics': [{'dimensions': {}, 'values': metrics}]}
+
+    return ApplicationMetrics(nodes=[{
+        'hostname': 'vespa',
+        'role': 'hosts/vespa',
+        'services': [
+            service('vespa.searchnode', {}),
+            service('vespa.container-clustercontroller', {
+                'cluster-controller.resource_usage.max_memory_utilization.max': memory_utilization,
+                'cluster-controller.resource_usage.max_disk_utilization.max': disk_utilization,
+                'cluster-controller.resource_usage.nodes_above_limit.max': nodes_above_limit
+            })
+        ]
+    }])
+
+
+class TestMonitoringCache(MarqoTestCase):
+
+    def setUp(self):
+        self.marqo_index = self.structured_marqo_index(name='my_index', schema_name='my_index', fields=[],
+                                                      tensor_fields=[])
+        self.vespa_client = mock.Mock()
+        self.vespa_client.get_metrics.return_value = _metrics()
+        self.index_management = mock.Mock()
+        self.index_management.get_index.return_value = self.marqo_index
+        self.monitoring = Monitoring(self.vespa_client, self.index_management)
+        self.monitoring.get_index_counts = mock.Mock(return_value=(10, 20))
+        self.cache = self._cache(max_staleness=60, refresh_interval=60)
+
+    def tearDown(self):
+        self.cache.stop()
+
+    def _cache(self, **kwargs):
+        cache = MonitoringCache(self.monitoring, **kwargs)
+        self.addCleanup(cache.stop)
+        return cache
+
+    def test_get_index_stats_cached(self):
+        before = time.time()
+        stats, as_of = self.cache.get_index_stats_by_name('my_index')
+        cached_stats, cached_as_of = self.cache.get_index_stats_by_name('my_index')
+
+        self.assertEqual(10, stats.number_of_documents)
+        self.assertEqual(20, stats.number_of_vectors)
+        self.assertEqual(50, stats.backend.memory_used_percentage)
+        self.assertEqual(25, stats.backend.storage_used_percentage)
+        self.assertEqual(stats, cached_stats)
+        self.assertEqual(as_of, cached_as_of)
+        self.assertGreaterEqual(as_of, before)
+        self.monitoring.get_index_counts.assert_called_once_with(self.marqo_index)
+        self.vespa_client.get_metrics.assert_called_once()
+
+    def test_get_index_stats_forceRefresh(self):
+        self.cache.get_index_stats(self.marqo_index)
+        self.monitoring.get_index_counts.return_value = (11, 22)
+
+        stats, _ = self.cache.get_index_stats(self.marqo_index, force_refresh=True)
+
+        self.assertEqual(11, stats.number_of_documents)
+        self.assertEqual(2, self.monitoring.get_index_counts.call_count)
+        self.assertEqual(2, self.vespa_client.get_metrics.call_count)
+
+    def test_get_index_stats_staleValueNotReturned(self):
+        cache = self._cache(max_staleness=0.05, refresh_interval=60)
+        cache.get_index_stats(self.marqo_index)
+        time.sleep(0.1)
+        cache.get_index_stats(self.marqo_index)
+
+        self.assertEqual(2, self.monitoring.get_index_counts.call_count)
+        self.assertEqual(2, self.vespa_client.get_metrics.call_count)
+
+    def test_get_index_stats_changedIndexNotServedPreviousCounts(self):
+        self.cache.get_index_stats(self.marqo_index)
+        self.monitoring.get_index_counts.return_value = (0, 0)
+        recreated_index = self.marqo_index.copy(update={'version': 2})
+
+        stats, _ = self.cache.get_index_stats(recreated_index)
+
+        self.assertEqual(0, stats.number_of_documents)
+        self.monitoring.get_index_counts.assert_called_with(recreated_index)
+
+    def test_get_index_stats_cachingDisabled(self):
+        cache = self._cache(max_staleness=0, refresh_interval=60)
+        for _ in range(3):
+            cache.get_index_stats(self.marqo_index)
+
+        self.assertEqual(3, self.monitoring.get_index_counts.call_count)
+        self.assertEqual(3, self.vespa_client.get_metrics.call_count)
+        self.assertIsNone(cache._refresh_thread)
+
+    def test_backgroundRefresh(self):
+        cache = self._cache(max_staleness=60, refresh_interval=0.05)
+        _, first_as_of = cache.get_index_stats(self.marqo_index)
+        self.monitoring.get_index_counts.return_value = (11, 22)
+        time.sleep(0.3)
+
+        stats, as_of = cache.get_index_stats(self.marqo_index)
+
+        self.assertEqual(11, stats.number_of_documents)
+        self.assertGreater(as_of, first_as_of)
+        self.assertGreater(self.monitoring.get_index_counts.call_count, 2)
+
+    def test_backgroundRefresh_idleIndexesNotRefreshed(self):
+        cache = self._cache(max_staleness=60, refresh_interval=0.05, idle_timeout=0.1)
+        cache.get_index_stats(self.marqo_index)
+        time.sleep(0.4)
+        call_count = self.monitoring.get_index_counts.call_count
+        time.sleep(0.2)
+
+        self.assertEqual(call_count, self.monitoring.get_index_counts.call_count)
+        self.assertEqual({}, cache._index_counts)
+
+    def test_backgroundRefresh_failedIndexDropped(self):
+        cache = self._cache(max_staleness=60, refresh_interval=0.05)
+        cache.get_index_stats(self.marqo_index)
+        self.monitoring.get_index_counts.side_effect = VespaError('schema not found')
+        time.sleep(0.2)
+
+        self.assertEqual({}, cache._index_counts)
+
+    def test_get_health_cached(self):
+        health, as_of = self.cache.get_health()
+        self.cache.get_health()
+
+        self.assertEqual(HealthStatus.Green, health.status)
+        self.assertTrue(health.backend.memory_is_available)
+        self.vespa_client.get_metrics.assert_called_once()
+
+    def test_get_health_metricsUnavailable(self):
+        self.vespa_client.get_metrics.side_effect = VespaError('connection refused')
+        health, as_of = self.cache.get_health()
+
+        self.assertEqual(HealthStatus.Red, health.status)
+        self.assertIsNone(self.cache._metrics)
+
+    def test_get_health_concurrentCallsStartOneRefreshThread(self):
+        threads = [threading.Thread(target=self.cache.get_health) for _ in range(8)]
+        with mock.patch('marqo.core.monitoring.monitoring_cache.threading.Thread', wraps=threading.Thread) as spy:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        spy.assert_called_once()
+        self.assertTrue(self.cache._refresh_thread.is_alive())
+
+
+class TestMonitoringHealthFromMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.monitoring = Monitoring(mock.Mock(), mock.Mock())
+
+    def test_get_health_from_metrics_feedBlocked(self):
+        metrics = _metrics(nodes_above_limit=1)
+        self.assertEqual(HealthStatus.Yellow, self.monitoring.get_health_from_metrics(metrics).status)
+
+    def test_get_health_from_metrics_noMetrics(self):
+        self.assertEqual(HealthStatus.Red, self.monitoring.get_health_from_metrics(None).status)
@@ -0,0 +1,108 @@
+import threading
+import time
+import tracemalloc
+import unittest
+
+from marqo.core.exceptions import OperationConflictError
+from marqo.core.monitoring import cpu_profiler, memory_profiler
+from marqo.exceptions import InvalidArgumentError
+
+
+def _busy_loop(stop_event: threading.Event):
+    while not stop_event.is_set():
+        sum(range(1000))
+
+
+def _idle_wait(stop_event: threading.Event):
+    stop_event.wait()
+
+
+class TestCpuProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.stop_event = threading.Event()
+        self.addCleanup(self.stop_event.set)
+
+    def _start_thread(self, target, name):
+        thread = threading.Thread(target=target, args=(self.stop_event,), name=name, daemon=True)
+        thread.start()
+        return thread
+
+    def test_sample_stacks_busyThreadSampled(self):
+        self._start_thread(_busy_loop, 'busy-thread')
+
+        stacks = cpu_profiler.sample_stacks(0.2, interval=0.005)
+
+        busy_stacks = [stack for stack in stacks if stack.startswith('busy-thread;')]
+        self.assertTrue(busy_stacks)
+        self.assertTrue(all('_busy_loop (test_profilers.py:' in stack for stack in busy_stacks))
+        self.assertGreater(sum(stacks[stack] for stack in busy_stacks), 5)
+        # The sampling thread does not profile itself
+        self.assertFalse(any('sample_stacks' in stack for stack in stacks))
+
+    def test_sample_stacks_idleThreadsExcluded(self):
+        self._start_thread(_idle_wait, 'idle-thread')
+
+        stacks = cpu_profiler.sample_stacks(0.05, interval=0.005)
+        self.assertFalse(any(stack.startswith('idle-thread;') for stack in stacks))
+
+        stacks = cpu_profiler.sample_stacks(0.05, interval=0.005, include_idle=True)
+        self.assertTrue(any(stack.startswith('idle-thread;') for stack in stacks))
+
+    def test_get_cpu_profile_collapsedFormat(self):
+        self._start_thread(_busy_loop, 'busy-thread')
+
+        profile = cpu_profiler.get_cpu_profile(0.05, interval=0.005)
+
+        lines = profile.splitlines()
+        self.assertTrue(lines)
+        counts = []
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            self.assertIn(';', stack)
+            counts.append(int(count))
+        self.assertEqual(sorted(counts, reverse=True), counts)
+
+    def test_sample_stacks_invalidArguments_fails(self):
+        for duration, interval in [(0, 0.01), (cpu_profiler.MAX_DURATION_SECONDS + 1, 0.01), (1, 0), (0.1, 0.2)]:
+            with self.subTest(duration=duration, interval=interval):
+                with self.assertRaises(InvalidArgumentError):
+                    cpu_profiler.sample_stacks(duration, interval=interval)
+
+    def test_sample_stacks_concurrentProfile_fails(self):
+        profile_thread = threading.Thread(target=cpu_profiler.sample_stacks, args=(0.3,))
+        profile_thread.start()
+        time.sleep(0.05)
+        try:
+            with self.assertRaises(OperationConflictError):
+                cpu_profiler.sample_stacks(0.05)
+        finally:
+            profile_thread.join()
+
+        cpu_profiler.sample_stacks(0.01, interval=0.005)
+
+
+class TestMemoryProfilerDiff(unittest.TestCase):
+
+    def test_get_memory_profile_diff(self):
+        retained = []
+
+        def allocate():
+            time.sleep(0.05)
+            retained.append([bytearray(1024) for _ in range(1000)])
+
+        thread = threading.Thread(target=allocate)
+        thread.start()
+        profile = memory_profiler.get_memory_profile(diff_seconds=0.2, limit=5)
+        thread.join()
+
+        self.assertLessEqual(len(profile.stats), 5)
+        self.assertIn('test_profilers.py', profile.stats[0])
+        self.assertIn('size=', profile.stats[0])
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_get_memory_profile_diff_invalidWindow_fails(self):
+        for diff_seconds in [0, memory_profiler.MAX_DIFF_SECONDS + 1]:
+            with self.subTest(diff_seconds=diff_seconds):
+                with self.assertRaises(InvalidArgumentError):
+                    memory_profiler.get_memory_profile(diff_seconds=diff_seconds)
@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+from unittest import mock
+
+from marqo.core.models.hybrid_parameters import HybridParameters, RetrievalMethod, RankingMethod
+from marqo.core.models.marqo_index import Field, FieldFeature, FieldType, TensorField
+from marqo.core.models.marqo_query import MarqoHybridQuery
+from marqo.core.search import hybrid_fusion
+from marqo.core.search.hybrid_search import HybridSearch
+from marqo.core.structured_vespa_index import common
+from marqo.core.structured_vespa_index.structured_vespa_index import StructuredVespaIndex
+from marqo.tensor_search.enums import EnvVars
+from marqo.vespa.models import QueryResult
+from tests.marqo_test import MarqoTestCase
+
+
+def _query_result(hits, coverage=100, degraded=None):
+    return QueryResult(**{
+        'root': {
+            'id': 'toplevel',
+            'relevance': 1.0,
+            'fields': {'totalCount': len(hits)},
+            'coverage': {'coverage': coverage, 'documents': 10, 'full': coverage == 100, 'nodes': 1, 'results': 1,
+                         'resultsFull': 1, 'degraded': degraded},
+            'children': [{'id': f'index:content_default/{node}/{doc_id}', 'relevance': score,
+                          'fields': {common.FIELD_ID: doc_id}}
+                         for doc_id, score, node in hits]
+        }
+    })
+
+
+class TestHybridFusion(MarqoTestCase):
+
+    def setUp(self):
+        self.marqo_index = self.structured_marqo_index(
+            name='my_index',
+            schema_name='my_index',
+            fields=[
+                Field(name='title', type=FieldType.Text, features=[FieldFeature.LexicalSearch],
+                      lexical_field_name='lexical_title'),
+            ],
+            tensor_fields=[
+                TensorField(name='title', embeddings_field_name='embeddings_title', chunk_field_name='chunks_title')
+            ]
+        )
+        self.vespa_index = StructuredVespaIndex(self.marqo_index)
+
+    def _hybrid_query(self, vector_query, hybrid_parameters=None):
+        return self.vespa_index.to_vespa_query(MarqoHybridQuery(
+            index_name='my_index', vector_query=vector_query, limit=10, offset=0, or_phrases=['hello'],
+            and_phrases=[], hybrid_parameters=hybrid_parameters or HybridParameters()
+        ))
+
+    def test_to_vespa_sub_query_lexical(self):
+        hybrid_query = self._hybrid_query([])
+
+        sub_query = hybrid_fusion.to_vespa_sub_query(hybrid_query, RetrievalMethod.Lexical, RankingMethod.Lexical)
+
+        self.assertEqual(hybrid_query['marqo__yql.lexical'], sub_query['yql'])
+        self.assertEqual(common.RANK_PROFILE_BM25, sub_query['ranking'])
+        self.assertNotIn('searchChain', sub_query)
+        self.assertFalse([k for k in sub_query if k.startswith('marqo__')])
+        self.assertNotIn(common.QUERY_INPUT_EMBEDDING, sub_query['query_features'])
+        self.assertEqual(1, sub_query['query_features']['lexical_title'])
+        self.assertNotIn('embeddings_title', sub_query['query_features'])
+        self.assertEqual((10, 0), (sub_query['hits'], sub_query['offset']))
+
+    def test_to_vespa_sub_query_tensor(self):
+        hybrid_query = self._hybrid_query([1.0, 2.0])
+
+        sub_query = hybrid_fusion.to_vespa_sub_query(hybrid_query, RetrievalMethod.Tensor, RankingMethod.Tensor)
+
+        self.assertEqual(hybrid_query['marqo__yql.tensor'], sub_query['yql'])
+        self.assertEqual(common.RANK_PROFILE_EMBEDDING_SIMILARITY, sub_query['ranking'])
+        self.assertEqual([1.0, 2.0], sub_query['query_features'][common.QUERY_INPUT_EMBEDDING])
+        self.assertEqual(1, sub_query['query_features']['embeddings_title'])
+        self.assertNotIn('lexical_title', sub_query['query_features'])
+        # The hybrid query is not changed
+        self.assertEqual('marqo', hybrid_query['searchChain'])
+
+    def test_rrf(self):
+        tensor_result = _query_result([('a', 0.9, 0), ('b', 0.8, 0)])
+        lexical_result = _query_result([('b', 12.0, 1), ('c', 10.0, 1), ('d', 5.0, 1)], coverage=50)
+
+        fused = hybrid_fusion.rrf(tensor_result, lexical_result, k=60, alpha=0.5)
+
+        self.assertEqual(['b', 'a', 'c'], [hit.fields[common.FIELD_ID] for hit in fused.hits])
+        self.assertAlmostEqual(0.5 / 62 + 0.5 / 61, fused.hits[0].relevance)
+        self.assertAlmostEqual(0.5 / 61, fused.hits[1].relevance)
+        self.assertEqual(0.8, fused.hits[0].fields[common.VESPA_DOC_HYBRID_RAW_TENSOR_SCORE])
+        self.assertEqual(12.0, fused.hits[0].fields[common.VESPA_DOC_HYBRID_RAW_LEXICAL_SCORE])
+        self.assertNotIn(common.VESPA_DOC_HYBRID_RAW_LEXICAL_SCORE, fused.hits[1].fields)
+        self.assertEqual(50, fused.root.coverage.coverage)
+
+    def test_rrf_alphaOne_tensorOnly(self):
+        fused = hybrid_fusion.rrf(_query_result([('a', 0.9, 0)]), _query_result([('b', 12.0, 0)]), k=0, alpha=1.0)
+        self.assertEqual(['a'], [hit.fields[common.FIELD_ID] for hit in fused.hits])
+        self.assertEqual(1.0, fused.hits[0].relevance)
+
+    def test_lexical_leg_is_independent(self):
+        cases = [
+            (HybridParameters(), True),
+            (HybridParameters(retrievalMethod='lexical', rankingMethod='lexical'), True),
+            (HybridParameters(retrievalMethod='lexical', rankingMethod='tensor'), False),
+            (HybridParameters(retrievalMethod='tensor', rankingMethod='lexical'), False),
+            (HybridParameters(retrievalMethod='tensor', rankingMethod='tensor'), False),
+        ]
+        for hybrid_parameters, expected in cases:
+            with self.subTest(hybrid_parameters=hybrid_parameters):
+                self.assertEqual(expected, hybrid_fusion.lexical_leg_is_independent(hybrid_parameters))
+
+
+class TestSpeculativeHybridSearch(MarqoTestCase):
+
+    def setUp(self):
+        self.marqo_index = self.structured_marqo_index(
+            name='my_index',
+            schema_name='my_index',
+            fields=[
+                Field(name='title', type=FieldType.Text, features=[FieldFeature.LexicalSearch],
+                      lexical_field_name='lexical_title'),
+            ],
+            tensor_fields=[
+                TensorField(name='title', embeddings_field_name='embeddings_title', chunk_field_name='chunks_title')
+            ]
+        )
+        self.config = mock.Mock()
+        self.events = []
+        self.lexical_sent = threading.Event()
+
+        def query(**kwargs):
+            self.events.append(('query', kwargs.get('ranking')))
+            if kwargs.get('ranking') == common.RANK_PROFILE_BM25:
+                self.lexical_sent.set()
+                return _query_result([('b', 12.0, 0), ('c', 10.0, 0)])
+            if kwargs.get('ranking') == common.RANK_PROFILE_EMBEDDING_SIMILARITY:
+                return _query_result([('a', 0.9, 0), ('b', 0.8, 0)])
+            return _query_result([('a', 0.1, 0)])
+
+        def vectorise(config, queries, device):
+            # The lexical query is sent before vectorisation completes
+            self.lexical_sent.wait(1)
+            self.events.append(('vectorise', None))
+            return {0: [1.0, 2.0]}
+
+        self.config.vespa_client.query.side_effect = query
+        patches = [
+            mock.patch('marqo.core.search.hybrid_search.index_meta_cache.get_index', return_value=self.marqo_index),
+            mock.patch('marqo.core.search.hybrid_search.run_vectorise_pipeline', side_effect=vectorise),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def _search(self, hybrid_parameters=None):
+        return HybridSearch().search(self.config, 'my_index', 'hello', result_count=10, device='cpu',
+                                     hybrid_parameters=hybrid_parameters)
+
+    def test_search_disjunction(self):
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_ENABLE_SPECULATIVE_HYBRID_SEARCH: 'TRUE'}):
+            results = self._search()
+
+        self.assertEqual([('query', common.RANK_PROFILE_BM25), ('vectorise', None),
+                          ('query', common.RANK_PROFILE_EMBEDDING_SIMILARITY)], self.events)
+        # As many hits as the larger sub-query result
+        self.assertEqual(['b', 'a'], [hit['_id'] for hit in results['hits']])
+        self.assertEqual(12.0, results['hits'][0]['_lexical_score'])
+        self.assertEqual(0.8, results['hits'][0]['_tensor_score'])
+
+    def test_search_lexical(self):
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_ENABLE_SPECULATIVE_HYBRID_SEARCH: 'TRUE'}):
+            results = self._search(HybridParameters(retrievalMethod='lexical', rankingMethod='lexical'))
+
+        self.assertEqual([('query', common.RANK_PROFILE_BM25), ('vectorise', None)], self.events)
+        self.assertEqual(['b', 'c'], [hit['_id'] for hit in results['hits']])
+
+    def test_search_lexicalThenTensor_notSpeculative(self):
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_ENABLE_SPECULATIVE_HYBRID_SEARCH: 'TRUE'}):
+            self._search(HybridParameters(retrievalMethod='lexical', rankingMethod='tensor'))
+
+        self.assertEqual([('vectorise', None), ('query', common.RANK_PROFILE_HYBRID_CUSTOM_SEARCHER)], self.events)
+
+    def test_search_disabledByDefault(self):
+        results = self._search()
+
+        self.assertEqual([('vectorise', None), ('query', common.RANK_PROFILE_HYBRID_CUSTOM_SEARCHER)], self.events)
+        self.assertEqual('marqo', self.config.vespa_client.query.call_args.kwargs['searchChain'])
+        self.assertEqual(['a'], [hit['_id'] for hit in results['hits']])
+
+    def test_search_vectoriseFails_lexicalResultDiscarded(self):
+        with mock.patch('marqo.core.search.hybrid_search.run_vectorise_pipeline',
+                        side_effect=RuntimeError('model error')), \
+                mock.patch.dict(os.environ, {EnvVars.MARQO_ENABLE_SPECULATIVE_HYBRID_SEARCH: 'TRUE'}):
+            with self.assertRaises(RuntimeError):
+                self._search()
+
+        time.sleep(0.05)
+        self.assertNotIn(('query', common.RANK_PROFILE_EMBEDDING_SIMILARITY), self.events)
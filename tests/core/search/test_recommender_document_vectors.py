@@ -0,0 +1,112 @@
+import os
+from unittest import mock
+
+from marqo.api.exceptions import IllegalRequestedDocCount
+from marqo.core.models.marqo_index import Field, FieldFeature, FieldType, TensorField
+from marqo.core.search.recommender import Recommender
+from marqo.core.structured_vespa_index import common as structured_common
+from marqo.core.unstructured_vespa_index import common as unstructured_common
+from marqo.exceptions import InvalidArgumentError
+from marqo.tensor_search.enums import EnvVars
+from marqo.vespa.models.get_document_response import GetBatchResponse, GetBatchDocumentResponse
+from tests.marqo_test import MarqoTestCase
+
+
+def _found(document_id, chunks, embeddings):
+    return GetBatchDocumentResponse(**{
+        'status': 200,
+        'pathId': f'/document/v1/my_index/my_index/docid/{document_id}',
+        'id': f'id:my_index:my_index::{document_id}',
+        'fields': {
+            unstructured_common.VESPA_FIELD_ID: document_id,
+            unstructured_common.VESPA_DOC_CHUNKS: chunks,
+            unstructured_common.VESPA_DOC_EMBEDDINGS: {'blocks': {str(i): e for i, e in enumerate(embeddings)}}
+        }
+    })
+
+
+def _not_found(document_id):
+    return GetBatchDocumentResponse(**{
+        'status': 404,
+        'pathId': f'/document/v1/my_index/my_index/docid/{document_id}',
+        'id': f'id:my_index:my_index::{document_id}'
+    })
+
+
+class TestRecommenderDocumentVectors(MarqoTestCase):
+
+    def setUp(self):
+        self.marqo_index = self.unstructured_marqo_index(name='my_index', schema_name='my_index')
+        self.vespa_client = mock.Mock()
+        self.recommender = Recommender(self.vespa_client, mock.Mock())
+
+    def _get_document_vectors(self, responses, document_ids, tensor_fields=None):
+        self.vespa_client.get_batch.return_value = GetBatchResponse(responses=responses, errors=False)
+        return self.recommender._get_document_vectors('my_index', self.marqo_index, document_ids, tensor_fields)
+
+    def test_get_document_vectors_retrievesVectorFieldsOnly(self):
+        doc_vectors = self._get_document_vectors(
+            [_found('doc1', ['title::a', 'content::b'], [[1.0, 0.0], [0.0, 1.0]]),
+             _found('doc2', ['title::c'], [[0.5, 0.5]])],
+            ['doc1', 'doc2']
+        )
+
+        self.vespa_client.get_batch.assert_called_once_with(
+            ['doc1', 'doc2'], 'my_index', field_set='my_index:marqo__id,marqo__chunks,marqo__embeddings'
+        )
+        self.assertEqual({'doc1': [[1.0, 0.0], [0.0, 1.0]], 'doc2': [[0.5, 0.5]]}, doc_vectors)
+
+    def test_get_document_vectors_tensorFields(self):
+        doc_vectors = self._get_document_vectors(
+            [_found('doc1', ['title::a', 'content::b'], [[1.0, 0.0], [0.0, 1.0]]),
+             _found('doc2', ['title::c'], [[0.5, 0.5]])],
+            ['doc1', 'doc2'],
+            tensor_fields=['content']
+        )
+        self.assertEqual({'doc1': [[0.0, 1.0]], 'doc2': []}, doc_vectors)
+
+    def test_get_document_vectors_notFound_fails(self):
+        with self.assertRaises(InvalidArgumentError) as ex:
+            self._get_document_vectors([_found('doc1', ['title::a'], [[1.0]]), _not_found('doc2')],
+                                       ['doc1', 'doc2', ''])
+        self.assertIn('The following document IDs were not found: , doc2', str(ex.exception))
+        # The invalid ID is never requested
+        self.vespa_client.get_batch.assert_called_once_with(['doc1', 'doc2'], 'my_index', field_set=mock.ANY)
+
+    def test_get_document_vectors_tooManyDocuments_fails(self):
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_MAX_RETRIEVABLE_DOCS: '2'}):
+            with self.assertRaises(IllegalRequestedDocCount):
+                self._get_document_vectors([], ['doc1', 'doc2', 'doc3'])
+        self.vespa_client.get_batch.assert_not_called()
+
+    def test_get_document_vectors_storedCentroids(self):
+        self.marqo_index = self.structured_marqo_index(
+            name='my_index', schema_name='my_index',
+            fields=[
+                Field(name='title', type=FieldType.Text, features=[FieldFeature.LexicalSearch],
+                      lexical_field_name='lexical_title'),
+                Field(name='content', type=FieldType.Text, features=[FieldFeature.LexicalSearch],
+                      lexical_field_name='lexical_content')
+            ],
+            tensor_fields=[
+                TensorField(name='title', chunk_field_name='chunks_title', embeddings_field_name='embeddings_title'),
+                TensorField(name='content', chunk_field_name='chunks_content',
+                            embeddings_field_name='embeddings_content')
+            ]
+        ).copy(update={'store_centroids': True})
+        response = GetBatchDocumentResponse(**{
+            'status': 200,
+            'pathId': '/document/v1/my_index/my_index/docid/doc1',
+            'id': 'id:my_index:my_index::doc1',
+            'fields': {
+                structured_common.FIELD_ID: 'doc1',
+                structured_common.FIELD_CENTROIDS: {'blocks': {'title': [0.6, 0.8], 'content': [0.0, 1.0]}}
+            }
+        })
+
+        doc_vectors = self._get_document_vectors([response], ['doc1'], tensor_fields=['content'])
+
+        self.vespa_client.get_batch.assert_called_once_with(
+            ['doc1'], 'my_index', field_set='my_index:marqo__id,marqo__centroids'
+        )
+        self.assertEqual({'doc1': [[0.0, 1.0]]}, doc_vectors)
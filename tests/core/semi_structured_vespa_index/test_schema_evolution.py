@@ -0,0 +1,125 @@
+import threading
+from unittest import mock
+
+from marqo.core.exceptions import TooManyFieldsError, OperationConflictError
+from marqo.core.models.marqo_index import SemiStructuredMarqoIndex, Field, FieldType, FieldFeature, TensorField, \
+    IndexType
+from marqo.core.semi_structured_vespa_index.schema_evolution import SchemaEvolutionCoordinator
+from marqo.tensor_search.telemetry import RequestMetricsStore
+from tests.marqo_test import MarqoTestCase
+from tests.utils.coalescing import run_in_thread, wait_for_pending
+
+
+def _lexical_field(name: str) -> Field:
+    return Field(name=name, type=FieldType.Text, features=[FieldFeature.LexicalSearch],
+                 lexical_field_name=f'marqo__lexical_{name}')
+
+
+def _tensor_field(name: str) -> TensorField:
+    return TensorField(name=name, chunk_field_name=f'marqo__chunks_{name}',
+                       embeddings_field_name=f'marqo__embeddings_{name}')
+
+
+class TestSchemaEvolutionCoordinator(MarqoTestCase):
+
+    def setUp(self):
+        unstructured_index = self.unstructured_marqo_index(name='my_index', schema_name='my_index')
+        self.settings = SemiStructuredMarqoIndex(**{
+            **unstructured_index.dict(), 'type': IndexType.SemiStructured, 'version': 1,
+            'lexical_fields': [_lexical_field('existing')], 'tensor_fields': [],
+        }).json()
+        self.updates = []
+        self.update_started = threading.Event()
+        self.release_update = threading.Event()
+        self.release_update.set()
+        self.update_error = None
+
+        self.coordinator = SchemaEvolutionCoordinator(self._get_index, self._update_index)
+
+    def _get_index(self, index_name):
+        return SemiStructuredMarqoIndex.parse_raw(self.settings)
+
+    def _update_index(self, marqo_index):
+        self.update_started.set()
+        self.release_update.wait(5)
+        if self.update_error:
+            raise self.update_error
+        self.updates.append(([f.name for f in marqo_index.lexical_fields], [f.name for f in marqo_index.tensor_fields]))
+        self.settings = marqo_index.copy(update={'version': marqo_index.version + 1}).json()
+
+    def _add_fields_in_thread(self, lexical_fields, tensor_fields=(), max_lexical_field_count=10):
+        return run_in_thread(self.coordinator.add_fields, 'my_index', [_lexical_field(f) for f in lexical_fields],
+                             [_tensor_field(f) for f in tensor_fields], max_lexical_field_count, 10)
+
+    def _wait_for_queue(self, size):
+        wait_for_pending(self, self.coordinator._coalescer, size, 'my_index')
+
+    def test_add_fields_duringUpdate_coalescedIntoOneUpdate(self):
+        deployments_before = RequestMetricsStore.for_request().counter['add_documents.update_index.deployments']
+        self.release_update.clear()
+        first, first_result = self._add_fields_in_thread(['a'])
+        self.assertTrue(self.update_started.wait(5))
+
+        queued = [self._add_fields_in_thread(['b']), self._add_fields_in_thread(['c'], ['c']),
+                  self._add_fields_in_thread(['b'])]
+        self._wait_for_queue(3)
+        self.release_update.set()
+
+        for thread, result in [(first, first_result)] + queued:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+            self.assertNotIn('error', result)
+
+        self.assertEqual([(['existing', 'a'], []), (['existing', 'a', 'b', 'c'], ['c'])], self.updates)
+        self.assertEqual(3, SemiStructuredMarqoIndex.parse_raw(self.settings).version)
+        self.assertEqual(2, RequestMetricsStore.for_request().counter['add_documents.update_index.deployments']
+                         - deployments_before)
+
+    def test_add_fields_noRequestContext_indexUpdated(self):
+        with mock.patch.object(RequestMetricsStore, '_get_request', RequestMetricsStore.current_request.get):
+            thread, result = run_in_thread(self.coordinator.add_fields, 'my_index', [_lexical_field('a')], [], 10, 10)
+            thread.join(5)
+
+        self.assertNotIn('error', result)
+        self.assertEqual([(['existing', 'a'], [])], self.updates)
+
+    def test_add_fields_existingFields_noUpdate(self):
+        self.coordinator.add_fields('my_index', [_lexical_field('existing')], [], 10, 10)
+
+        self.assertEqual([], self.updates)
+
+    def test_add_fields_tooManyFields_onlyThatRequestRejected(self):
+        self.release_update.clear()
+        first, _ = self._add_fields_in_thread(['a'])
+        self.assertTrue(self.update_started.wait(5))
+
+        rejected, rejected_result = self._add_fields_in_thread(['b', 'c'], max_lexical_field_count=3)
+        accepted, accepted_result = self._add_fields_in_thread(['d'], max_lexical_field_count=3)
+        self._wait_for_queue(2)
+        self.release_update.set()
+        for thread in [first, rejected, accepted]:
+            thread.join(5)
+
+        self.assertIsInstance(rejected_result['error'], TooManyFieldsError)
+        self.assertIn('b, c', str(rejected_result['error']))
+        self.assertNotIn('error', accepted_result)
+        self.assertEqual(['existing', 'a', 'd'], self.updates[-1][0])
+
+    def test_add_fields_updateFails_allRequestsFail(self):
+        self.release_update.clear()
+        self.update_error = OperationConflictError('conflict')
+        first, first_result = self._add_fields_in_thread(['a'])
+        self.assertTrue(self.update_started.wait(5))
+
+        second, second_result = self._add_fields_in_thread(['b'])
+        self._wait_for_queue(1)
+        self.release_update.set()
+        for thread in [first, second]:
+            thread.join(5)
+
+        self.assertIsInstance(first_result['error'], OperationConflictError)
+        self.assertIsInstance(second_result['error'], OperationConflictError)
+        # The next request starts a new update
+        self.update_error = None
+        self.coordinator.add_fields('my_index', [_lexical_field('c')], [], 10, 10)
+        self.assertEqual([(['existing', 'c'], [])], self.updates)
@@ -65,3 +65,23 @@ class TestSemiStructuredVespaSchema(MarqoTestCase):
                     self._remove_empty_lines_in_schema(generated_schema)
                 )
 
+    def test_semi_structured_index_schema_storeCentroids(self):
+        test_marqo_index_request = self.unstructured_marqo_index_request(
+            name="test_semi_structured_schema",
+        )
+
+        default_schema, default_index = SemiStructuredVespaSchema(test_marqo_index_request).generate_schema()
+        centroids_schema, centroids_index = SemiStructuredVespaSchema(
+            test_marqo_index_request.copy(update={'store_centroids': True})
+        ).generate_schema()
+
+        self.assertFalse(default_index.store_centroids)
+        self.assertNotIn('marqo__centroids', default_schema)
+        self.assertTrue(centroids_index.store_centroids)
+        dimension = centroids_index.model.get_dimension()
+        self.assertIn(
+            f'field marqo__centroids type tensor<float>(p{{}}, x[{dimension}]) {{\n'
+            f'            indexing: summary\n'
+            f'        }}',
+            centroids_schema
+        )
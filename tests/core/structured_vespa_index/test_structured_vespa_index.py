@@ -1,6 +1,7 @@
 import unittest
 
 from marqo.core.models.marqo_index import *
+from marqo.core.search.search_filter import MarqoFilterStringParser
 from marqo.core.structured_vespa_index import common
 from marqo.core.structured_vespa_index.structured_vespa_index import StructuredVespaIndex
 from marqo.core import exceptions as core_exceptions
@@ -251,3 +252,95 @@ class TestStructuredVespaIndex(MarqoTestCase):
                 }
             )
         
+
+    def test_get_vector_field_set(self):
+        self.assertEqual('my_index:marqo__id,embeddings_title', self.vespa_index.get_vector_field_set())
+
+    def test_to_tensor_field_vectors_successful(self):
+        vespa_document = {
+            'id': 'id:my_index:my_index::my_id',
+            'fields': {
+                common.FIELD_ID: 'my_id',
+                'embeddings_title': {'blocks': {'0': [1.0, 2.0], '1': [3.0, 4.0]}}
+            }
+        }
+        self.assertEqual({'title': [[1.0, 2.0], [3.0, 4.0]]}, self.vespa_index.to_tensor_field_vectors(vespa_document))
+
+    def test_to_tensor_field_vectors_noVectors(self):
+        self.assertEqual({}, self.vespa_index.to_tensor_field_vectors({'fields': {common.FIELD_ID: 'my_id'}}))
+
+    def test_to_tensor_field_vectors_invalidEmbeddings_fails(self):
+        with self.assertRaises(core_exceptions.VespaDocumentParsingError):
+            self.vespa_index.to_tensor_field_vectors({'fields': {'embeddings_title': [[1.0, 2.0]]}})
+
+    def test_to_vespa_document_centroids(self):
+        marqo_doc = {
+            '_id': 'my_id',
+            'title': 'my title',
+            constants.MARQO_DOC_TENSORS: {
+                'title': {
+                    constants.MARQO_DOC_CHUNKS: ['my', 'title'],
+                    constants.MARQO_DOC_EMBEDDINGS: [[1.0, 0.0], [0.0, 1.0]],
+                    constants.MARQO_DOC_CENTROID: [0.6, 0.8]
+                }
+            }
+        }
+        vespa_doc = self.vespa_index.to_vespa_document(marqo_doc)
+        self.assertEqual({'title': [0.6, 0.8]}, vespa_doc['fields'][common.FIELD_CENTROIDS])
+
+        # The centroids field is not returned in Marqo documents. Mixed tensors are returned by Vespa as blocks
+        vespa_doc['fields']['embeddings_title'] = {'blocks': vespa_doc['fields']['embeddings_title']}
+        vespa_doc['fields'][common.FIELD_CENTROIDS] = {'blocks': {'title': [0.6, 0.8]}}
+        marqo_doc = self.vespa_index.to_marqo_document(vespa_doc)
+        self.assertNotIn(common.FIELD_CENTROIDS, marqo_doc)
+        self.assertEqual('my title', marqo_doc['title'])
+
+    def test_to_vespa_document_noCentroids(self):
+        vespa_doc = self.vespa_index.to_vespa_document({
+            '_id': 'my_id',
+            constants.MARQO_DOC_TENSORS: {
+                'title': {constants.MARQO_DOC_CHUNKS: ['title'], constants.MARQO_DOC_EMBEDDINGS: [[1.0, 0.0]]}
+            }
+        })
+        self.assertNotIn(common.FIELD_CENTROIDS, vespa_doc['fields'])
+
+    def test_to_tensor_field_vectors_centroids(self):
+        self.assertEqual('my_index:marqo__id,marqo__centroids', self.vespa_index.get_vector_field_set(centroids=True))
+        vespa_document = {
+            'fields': {
+                common.FIELD_ID: 'my_id',
+                common.FIELD_CENTROIDS: {'blocks': {'title': [0.6, 0.8]}},
+                'embeddings_title': {'blocks': {'0': [1.0, 0.0], '1': [0.0, 1.0]}}
+            }
+        }
+        self.assertEqual({'title': [[0.6, 0.8]]},
+                         self.vespa_index.to_tensor_field_vectors(vespa_document, centroids=True))
+        self.assertEqual({}, self.vespa_index.to_tensor_field_vectors({'fields': {}}, centroids=True))
+
+    def test_to_vespa_document_selection_successful(self):
+        cases = [
+            ('category:(my category)', 'my_index.filter_category == "my category"'),
+            ('category:a\\"b', 'my_index.filter_category == "a\\"b"'),
+            ('is_active:true', 'my_index.filter_is_active == 1'),
+            ('click_per_day:[1 TO 5]', '(my_index.filter_click_per_day >= 1 and my_index.filter_click_per_day <= 5)'),
+            ('_id:doc1 OR tags:(tag1)', '(my_index.marqo__id == "doc1" or my_index.filter_tags == "tag1")'),
+            ('NOT click_per_day IN (1, 2)',
+             '(not (my_index.filter_click_per_day == 1 or my_index.filter_click_per_day == 2))'),
+        ]
+        for filter_string, expected in cases:
+            with self.subTest(filter_string):
+                self.assertEqual(
+                    expected,
+                    self.vespa_index.to_vespa_document_selection(MarqoFilterStringParser().parse(filter_string))
+                )
+
+    def test_to_vespa_document_selection_invalidFilter_fails(self):
+        cases = [
+            ('description:a', core_exceptions.InvalidFieldNameError),
+            ('click_per_day:abc', core_exceptions.InvalidDataTypeError),
+            ('is_active IN (true)', core_exceptions.InvalidDataTypeError),
+        ]
+        for filter_string, error in cases:
+            with self.subTest(filter_string):
+                with self.assertRaises(error):
+                    self.vespa_index.to_vespa_document_selection(MarqoFilterStringParser().parse(filter_string))
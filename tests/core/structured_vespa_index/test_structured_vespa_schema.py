@@ -213,6 +213,33 @@ class TestStructuredVespaSchema(MarqoTestCase):
                     self._remove_whitespace_in_schema(actual_schema)
                 )
 
+    def test_generate_schema_storeCentroids_successful(self):
+        """
+        Test that an index that stores centroids has a centroids field with the model dimension, which is not indexed.
+        """
+        marqo_index_request = self.structured_marqo_index_request(
+            name='my_index',
+            model=Model(name='ViT-B/32'),
+            fields=[
+                FieldRequest(name='title', type=FieldType.Text, features=[FieldFeature.LexicalSearch]),
+                FieldRequest(name='description', type=FieldType.Text),
+            ],
+            tensor_fields=['title', 'description']
+        )
+
+        default_schema, default_index = StructuredVespaSchema(marqo_index_request).generate_schema()
+        centroids_schema, centroids_index = StructuredVespaSchema(
+            marqo_index_request.copy(update={'store_centroids': True})
+        ).generate_schema()
+
+        self.assertFalse(default_index.store_centroids)
+        self.assertNotIn('marqo__centroids', default_schema)
+        self.assertTrue(centroids_index.store_centroids)
+        self.assertIn(
+            'field marqo__centroids type tensor<float>(p{},x[512]){indexing:summary}',
+            self._remove_whitespace_in_schema(centroids_schema)
+        )
+
     def _read_schema_from_file(self, path: str) -> str:
         currentdir = os.path.dirname(os.path.abspath(__file__))
         abspath = os.path.join(currentdir, path)
@@ -0,0 +1,78 @@
+from marqo.core import exceptions as core_exceptions
+from marqo.core.search.search_filter import MarqoFilterStringParser
+from marqo.core.unstructured_vespa_index import common as unstructured_common
+from marqo.core.unstructured_vespa_index.unstructured_vespa_index import UnstructuredVespaIndex
+from tests.marqo_test import MarqoTestCase
+
+
+class TestUnstructuredVespaIndex(MarqoTestCase):
+    def setUp(self) -> None:
+        self.vespa_index = UnstructuredVespaIndex(
+            self.unstructured_marqo_index(name='my_index', schema_name='my_index')
+        )
+
+    def test_get_vector_field_set(self):
+        self.assertEqual('my_index:marqo__id,marqo__chunks,marqo__embeddings', self.vespa_index.get_vector_field_set())
+
+    def test_to_tensor_field_vectors_successful(self):
+        vespa_document = {
+            'id': 'id:my_index:my_index::my_id',
+            'fields': {
+                unstructured_common.VESPA_FIELD_ID: 'my_id',
+                unstructured_common.VESPA_DOC_CHUNKS: ['title::my', 'description::a::b', 'title::title'],
+                unstructured_common.VESPA_DOC_EMBEDDINGS: {
+                    'blocks': {'0': [1.0, 2.0], '1': [3.0, 4.0], '2': [5.0, 6.0]}
+                }
+            }
+        }
+        self.assertEqual(
+            {'title': [[1.0, 2.0], [5.0, 6.0]], 'description': [[3.0, 4.0]]},
+            self.vespa_index.to_tensor_field_vectors(vespa_document)
+        )
+
+    def test_to_tensor_field_vectors_noVectors(self):
+        self.assertEqual(
+            {}, self.vespa_index.to_tensor_field_vectors({'fields': {unstructured_common.VESPA_FIELD_ID: 'my_id'}})
+        )
+
+    def test_to_tensor_field_vectors_invalidDocument_fails(self):
+        cases = [
+            ({unstructured_common.VESPA_DOC_CHUNKS: ['title::my'],
+              unstructured_common.VESPA_DOC_EMBEDDINGS: {'blocks': {'0': [1.0], '1': [2.0]}}},
+             'chunk and embedding counts differ'),
+            ({unstructured_common.VESPA_DOC_CHUNKS: ['title::my'],
+              unstructured_common.VESPA_DOC_EMBEDDINGS: {'cells': []}},
+             'embeddings without blocks'),
+            ({unstructured_common.VESPA_DOC_CHUNKS: ['my'],
+              unstructured_common.VESPA_DOC_EMBEDDINGS: {'blocks': {'0': [1.0]}}},
+             'chunk without a field name'),
+        ]
+        for fields, msg in cases:
+            with self.subTest(msg):
+                with self.assertRaises(core_exceptions.VespaDocumentParsingError):
+                    self.vespa_index.to_tensor_field_vectors({'fields': fields})
+
+    def test_to_vespa_document_selection_successful(self):
+        cases = [
+            ('_id:doc1', 'my_index.marqo__id == "doc1"'),
+            ('a:b', '(my_index.marqo__short_string_fields{"a"} == "b" or my_index.marqo__string_array == "a::b")'),
+            ('a:true', '(my_index.marqo__bool_fields{"a"} == 1 or my_index.marqo__short_string_fields{"a"} == "true"'
+                       ' or my_index.marqo__string_array == "a::true")'),
+            ('a:1.5', '(my_index.marqo__short_string_fields{"a"} == "1.5" or my_index.marqo__string_array == "a::1.5"'
+                      ' or my_index.marqo__float_fields{"a"} == 1.5)'),
+            ('a:[* TO 5]', '((my_index.marqo__float_fields{"a"} <= 5) or (my_index.marqo__int_fields{"a"} <= 5))'),
+            ('NOT a:b AND c:[1 TO 2]',
+             '((not (my_index.marqo__short_string_fields{"a"} == "b" or my_index.marqo__string_array == "a::b")) and '
+             '((my_index.marqo__float_fields{"c"} >= 1 and my_index.marqo__float_fields{"c"} <= 2) or '
+             '(my_index.marqo__int_fields{"c"} >= 1 and my_index.marqo__int_fields{"c"} <= 2)))'),
+        ]
+        for filter_string, expected in cases:
+            with self.subTest(filter_string):
+                self.assertEqual(
+                    expected,
+                    self.vespa_index.to_vespa_document_selection(MarqoFilterStringParser().parse(filter_string))
+                )
+
+    def test_to_vespa_document_selection_inTerm_fails(self):
+        with self.assertRaises(core_exceptions.InvalidArgumentError):
+            self.vespa_index.to_vespa_document_selection(MarqoFilterStringParser().parse('a IN (b, c)'))
@@ -665,6 +665,47 @@ class TestSlerp(MarqoTestCase):
                     slerp.interpolate(vectors, weights)
                 self.assertIn('must have the same length', str(ex.exception))
 
+    def test_interpolate_hierarchical_matchesPairwiseSlerp(self):
+        """
+        The vectorised hierarchical SLERP gives the same result as interpolating each pair of a level in turn.
+        """
+        def pairwise_hierarchical(vectors, weights):
+            slerp = Slerp()
+            while len(vectors) > 1:
+                next_vectors, next_weights = [], []
+                for i in range(0, len(vectors) - 1, 2):
+                    weight_sum = weights[i] + weights[i + 1]
+                    next_vectors.append(slerp._slerp(vectors[i], vectors[i + 1], weights[i + 1] / weight_sum))
+                    next_weights.append(weight_sum / 2)
+                if len(vectors) % 2 == 1:
+                    next_vectors.append(vectors[-1])
+                    next_weights.append(weights[-1])
+                vectors, weights = next_vectors, next_weights
+            return vectors[0]
+
+        rng = np.random.default_rng(42)
+        for count in [1, 2, 3, 7, 16, 33]:
+            with self.subTest(count=count):
+                vectors = rng.normal(size=(count, 384)).tolist()
+                # include a co-linear pair
+                if count > 1:
+                    vectors[1] = [2 * x for x in vectors[0]]
+                weights = rng.uniform(0.1, 2, size=count).tolist()
+                np.testing.assert_array_almost_equal(
+                    pairwise_hierarchical(vectors, weights),
+                    Slerp(Slerp.Method.Hierarchical).interpolate(vectors, weights),
+                    decimal=10
+                )
+
+    def test_interpolate_hierarchical_firstFailingPairRaises(self):
+        vectors = [[1, 0], [0, 1], [0, 0], [1, 1], [1, 0], [0, 1]]
+        with self.assertRaises(ValueError) as ex:
+            Slerp(Slerp.Method.Hierarchical).interpolate(vectors, [1, 1, 1, 1, 1, -1])
+        self.assertIn('zero length', str(ex.exception))
+
+        with self.assertRaises(ZeroSumWeightsError):
+            Slerp(Slerp.Method.Hierarchical).interpolate(vectors, [1, -1, 1, 1, 1, 1])
+
     def test_interpolate_wrongInterpolationMethod_failure(self):
         slerp = Slerp("non_existing_method")
         with self.assertRaises(InternalError):  # Changed to AttributeError
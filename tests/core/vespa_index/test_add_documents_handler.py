@@ -2,13 +2,16 @@ import unittest
 from typing import Dict, Any, List
 from unittest.mock import patch
 
+import numpy as np
 import pytest
 
 from marqo.core.constants import MARQO_DOC_ID
 from marqo.core.models.marqo_index import FieldType
-from marqo.core.vespa_index.add_documents_handler import AddDocumentsResponseCollector, AddDocumentsHandler
+from marqo.core import constants
+from marqo.core.vespa_index.add_documents_handler import AddDocumentsResponseCollector, AddDocumentsHandler, \
+    get_centroid
 from marqo.core.models.add_docs_params import AddDocsParams, BatchVectorisationMode
-from marqo.core.inference.tensor_fields_container import TensorFieldsContainer
+from marqo.core.inference.tensor_fields_container import TensorFieldsContainer, TensorFieldContent
 from marqo.core.exceptions import DuplicateDocumentError, AddDocumentsError, MarqoDocumentParsingError, InternalError
 from marqo.core.models.marqo_add_documents_response import MarqoAddDocumentsItem
 from marqo.s2_inference import s2_inference
@@ -322,6 +325,36 @@ class TestAddDocumentHandler(MarqoTestCase):
                           str(context.exception))
 
 
+    def test_to_marqo_tensor_should_add_centroid_if_index_stores_centroids(self):
+        tensor_field_content = TensorFieldContent(field_content='a. b.', field_type=FieldType.Text,
+                                                  is_tensor_field=True)
+        tensor_field_content.populate_chunks_and_embeddings(['a.', 'b.'], [[3.0, 0.0], [0.0, 4.0]])
+
+        for store_centroids, expected in [
+            (False, {constants.MARQO_DOC_CHUNKS: ['a.', 'b.'],
+                     constants.MARQO_DOC_EMBEDDINGS: [[3.0, 0.0], [0.0, 4.0]]}),
+            (True, {constants.MARQO_DOC_CHUNKS: ['a.', 'b.'],
+                    constants.MARQO_DOC_EMBEDDINGS: [[3.0, 0.0], [0.0, 4.0]],
+                    constants.MARQO_DOC_CENTROID: [0.6, 0.8]}),
+        ]:
+            with self.subTest(store_centroids=store_centroids):
+                marqo_index = self.unstructured_marqo_index('index1', 'index1').copy(
+                    update={'store_centroids': store_centroids})
+                handler = self.DummyAddDocumentsHandler(
+                    vespa_client=self.vespa_client, marqo_index=marqo_index,
+                    add_docs_params=AddDocsParams(index_name='index1', tensor_fields=[], docs=[])
+                )
+                marqo_tensor = handler._to_marqo_tensor(tensor_field_content)
+                self.assertEqual(expected.keys(), marqo_tensor.keys())
+                for key in expected:
+                    self.assertTrue(np.allclose(expected[key], marqo_tensor[key]))
+
+    def test_get_centroid(self):
+        self.assertTrue(np.allclose([0.6, 0.8], get_centroid([[0.6, 0.8]])))
+        self.assertTrue(np.allclose([1.0, 0.0], get_centroid([[2.0, 1.0], [2.0, -1.0]])))
+        self.assertEqual([0.0, 0.0], get_centroid([[1.0, 1.0], [-1.0, -1.0]]))
+
+
 @pytest.mark.unittest
 class TestAddDocumentsResponseCollector(unittest.TestCase):
 
@@ -0,0 +1,314 @@
+import os
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import torch
+from PIL import Image
+
+from marqo.s2_inference import s2_inference
+from marqo.s2_inference.processing import image as image_processor
+from marqo.s2_inference.processing.DINO_utils import DINO_inference, DINO_inference_batch, _get_DINO_transform
+from marqo.s2_inference.processing.image import PatchifyPytorch, chunk_image, chunk_images
+from marqo.s2_inference.processing.yolox_utils import _infer_yolox, _infer_yolox_batch, preprocess_yolox
+from marqo.s2_inference.s2_inference import clear_loaded_models, get_available_models, get_or_load_cached_model
+from marqo.tensor_search.enums import AvailableModelsKey, EnvVars
+
+
+class FakeDetector:
+    """Returns boxes and scores derived from the pixels of each image, so that different images get different,
+    but reproducible, detections."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, batch):
+        self.batch_sizes.append(len(batch))
+        results = []
+        for image in batch:
+            rng = np.random.default_rng(int(image.sum().item() * 1000) % 2 ** 32)
+            xy = rng.uniform(0, 150, size=(30, 2))
+            wh = rng.uniform(20, 100, size=(30, 2))
+            results.append({'boxes': torch.tensor(np.concatenate([xy, xy + wh], axis=1), dtype=torch.float32),
+                            'scores': torch.tensor(rng.uniform(0, 1, size=30), dtype=torch.float32)})
+        return results
+
+
+class FakePatchifyPytorch(PatchifyPytorch):
+    load_calls = 0
+
+    def _get_model_specific_parameters(self):
+        super()._get_model_specific_parameters()
+        self.model_name = 'fake_rcnn'
+        self.allowed_model_types = ('fake_rcnn',)
+        self.model_load_function = self._load_fake_model
+
+    @classmethod
+    def _load_fake_model(cls, model_name, device):
+        cls.load_calls += 1
+        time.sleep(0.2)
+        return FakeDetector(), lambda image: image
+
+
+def _images(n):
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 255, size=(200 + 10 * i, 300, 3)).astype(np.uint8)) for i in range(n)]
+
+
+class TestPatchModelCache(unittest.TestCase):
+
+    def setUp(self):
+        clear_loaded_models()
+        FakePatchifyPytorch.load_calls = 0
+
+    def tearDown(self):
+        clear_loaded_models()
+
+    def test_concurrentPatchersLoadModelOnce(self):
+        patchers, errors = [], []
+
+        def create_patcher():
+            try:
+                patchers.append(FakePatchifyPytorch(device='cpu', size=(240, 240)))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=create_patcher) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual(8, len(patchers))
+        self.assertEqual(1, FakePatchifyPytorch.load_calls)
+        self.assertTrue(all(patcher.model is patchers[0].model for patcher in patchers))
+
+    def test_patchModelCountsTowardsMemory(self):
+        FakePatchifyPytorch(device='cpu')
+        entry = get_available_models()['fake_rcnn||||||||||cpu']
+        self.assertEqual(0.5, entry[AvailableModelsKey.model_size])
+
+    def test_patchModelEjectsLeastRecentlyUsed(self):
+        load_function = lambda: object()
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_MAX_CPU_MODEL_MEMORY: "1"}):
+            get_or_load_cached_model('first||cpu', 'first', 'cpu', 0.4, load_function)
+            get_or_load_cached_model('second||cpu', 'second', 'cpu', 0.4, load_function)
+            # renews first, so second is the least recently used
+            get_or_load_cached_model('first||cpu', 'first', 'cpu', 0.4, load_function)
+            FakePatchifyPytorch(device='cpu')
+
+        self.assertEqual({'first||cpu', 'fake_rcnn||||||||||cpu'}, set(get_available_models()))
+
+    def test_get_or_load_cached_model_differentModelsNotBlocked(self):
+        slow_loading = threading.Event()
+        release = threading.Event()
+
+        def slow_load():
+            slow_loading.set()
+            release.wait(5)
+            return 'slow'
+
+        thread = threading.Thread(target=get_or_load_cached_model, args=('slow||cpu', 'slow', 'cpu', 0.1, slow_load))
+        thread.start()
+        try:
+            slow_loading.wait(5)
+            self.assertEqual('fast', get_or_load_cached_model('fast||cpu', 'fast', 'cpu', 0.1, lambda: 'fast'))
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual('slow', get_or_load_cached_model('slow||cpu', 'slow', 'cpu', 0.1, lambda: 'reloaded'))
+
+    def test_get_or_load_cached_model_concurrentLoadsCannotExceedThreshold(self):
+        slow_loading = threading.Event()
+        release = threading.Event()
+
+        def slow_load():
+            slow_loading.set()
+            release.wait(5)
+            return 'slow'
+
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_MAX_CPU_MODEL_MEMORY: "1"}):
+            thread = threading.Thread(target=get_or_load_cached_model,
+                                      args=('slow||cpu', 'slow', 'cpu', 0.6, slow_load))
+            thread.start()
+            try:
+                slow_loading.wait(5)
+                # The size of the model being loaded is reserved, so there is no space for another one
+                with self.assertRaises(s2_inference.ModelCacheManagementError):
+                    get_or_load_cached_model('other||cpu', 'other', 'cpu', 0.6, lambda: 'other')
+            finally:
+                release.set()
+                thread.join()
+
+        self.assertEqual({'slow||cpu'}, set(get_available_models()))
+        self.assertEqual({}, s2_inference._reserved_model_sizes)
+
+    def test_get_or_load_cached_model_loadErrorNotCached(self):
+        def failing_load():
+            raise RuntimeError("download failed")
+
+        with self.assertRaises(RuntimeError):
+            get_or_load_cached_model('model||cpu', 'model', 'cpu', 0.1, failing_load)
+        self.assertNotIn('model||cpu', get_available_models())
+        self.assertEqual({}, s2_inference._reserved_model_sizes)
+        self.assertEqual('model', get_or_load_cached_model('model||cpu', 'model', 'cpu', 0.1, lambda: 'model'))
+
+
+class TestPatchModelBatchInference(unittest.TestCase):
+
+    def setUp(self):
+        clear_loaded_models()
+
+    def tearDown(self):
+        clear_loaded_models()
+
+    def test_infer_batch_matchesInfer(self):
+        images = _images(5)
+        expected = []
+        for image in images:
+            patcher = FakePatchifyPytorch(device='cpu', size=(240, 240))
+            patcher.infer(image)
+            patcher.process()
+            expected.append(patcher)
+
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_PATCH_MODEL_BATCH_SIZE: "2"}):
+            patcher = FakePatchifyPytorch(device='cpu', size=(240, 240))
+            actual = patcher.infer_batch(images)
+
+        self.assertEqual([2, 2, 1], patcher.model.batch_sizes[-3:])
+        self.assertEqual(len(images), len(actual))
+        for expected_patcher, actual_patcher in zip(expected, actual):
+            actual_patcher.process()
+            np.testing.assert_allclose(np.array(expected_patcher.bboxes_orig), np.array(actual_patcher.bboxes_orig))
+            self.assertEqual(len(expected_patcher.patches), len(actual_patcher.patches))
+
+    def test_infer_batch_empty(self):
+        self.assertEqual([], FakePatchifyPytorch(device='cpu').infer_batch([]))
+
+
+class FakeYoloxSession:
+    """A yolox onnx session whose output for an image only depends on that image."""
+
+    def __init__(self, batch_dim):
+        self.batch_dim = batch_dim
+        self.batch_sizes = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name='images', shape=[self.batch_dim, 3, 64, 64])]
+
+    def run(self, output_names, inputs):
+        images = inputs['images']
+        if isinstance(self.batch_dim, int):
+            assert len(images) == self.batch_dim
+        self.batch_sizes.append(len(images))
+        return [images.reshape(len(images), -1, 6)[:, :50, :] * 0.5]
+
+
+class FakeDINO:
+    """Attention maps where each item only depends on its image."""
+
+    def __init__(self, patch_size=16):
+        self.patch_size = patch_size
+
+    def get_last_selfattention(self, images):
+        # (batch, heads, 1 + patches, 1 + patches)
+        patches = torch.nn.functional.avg_pool2d(images, self.patch_size).mean(1).flatten(1)
+        tokens = torch.cat([torch.zeros(len(images), 1), patches - patches.mean(1, keepdim=True)], dim=1)
+        attention = tokens[:, None, :, None] * tokens[:, None, None, :]
+        return attention.repeat(1, 2, 1, 1)
+
+
+class FakeYoloxModel:
+    """A yolox onnx session with a dynamic batch size, returning random predictions seeded by each image."""
+    n_anchors = sum((384 // stride) ** 2 for stride in [8, 16, 32])
+
+    def get_inputs(self):
+        return [SimpleNamespace(name='images', shape=['batch', 3, 384, 384])]
+
+    def run(self, output_names, inputs):
+        outputs = []
+        for image in inputs['images']:
+            rng = np.random.default_rng(int(image.sum()) % 2 ** 32)
+            outputs.append(np.concatenate([rng.uniform(0, 1, size=(self.n_anchors, 2)),
+                                           rng.uniform(1, 3, size=(self.n_anchors, 2)),
+                                           rng.uniform(0, 1, size=(self.n_anchors, 81))], axis=1))
+        return [np.stack(outputs).astype(np.float32)]
+
+
+class TestChunkImages(unittest.TestCase):
+
+    def setUp(self):
+        clear_loaded_models()
+        self.patches = [
+            mock.patch.object(image_processor, 'load_pytorch', side_effect=lambda *_: (FakeDetector(), lambda x: x)),
+            mock.patch.object(image_processor, '_load_DINO_model',
+                              side_effect=lambda *_, **__: (FakeDINO(), _get_DINO_transform())),
+            mock.patch.object(image_processor, '_download_yolox', return_value='yolox_s.onnx'),
+            mock.patch.object(image_processor, 'load_yolox_onnx',
+                              side_effect=lambda *_: (FakeYoloxModel(), preprocess_yolox)),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        clear_loaded_models()
+
+    def test_chunk_images_matchesChunkImage(self):
+        images = _images(5)
+        for method in ['frcnn', 'yolox', 'dino-v1', 'dino-v2', 'simple', 'overlap', None]:
+            for batch_size in ['2', '16']:
+                with self.subTest(method=method, batch_size=batch_size):
+                    expected = [chunk_image(image, device='cpu', method=method) for image in images]
+                    with mock.patch.dict(os.environ, {EnvVars.MARQO_PATCH_MODEL_BATCH_SIZE: batch_size}):
+                        actual = chunk_images(images, device='cpu', method=method)
+
+                    self.assertEqual(len(expected), len(actual))
+                    for (expected_patches, expected_bboxes), (actual_patches, actual_bboxes) in zip(expected, actual):
+                        self.assertEqual(len(expected_bboxes), len(actual_bboxes))
+                        np.testing.assert_array_equal(np.array(expected_bboxes), np.array(actual_bboxes))
+                        for expected_patch, actual_patch in zip(expected_patches, actual_patches):
+                            np.testing.assert_array_equal(np.array(expected_patch), np.array(actual_patch))
+
+    def test_chunk_images_patchesFound(self):
+        # the boxes of different images must not suppress each other
+        for method in ['frcnn', 'yolox']:
+            with self.subTest(method=method):
+                for patches, bboxes in chunk_images(_images(3), device='cpu', method=method):
+                    self.assertGreater(len(bboxes), 1)
+                    self.assertEqual(len(patches), len(bboxes))
+
+    def test_chunk_images_empty(self):
+        self.assertEqual([], chunk_images([], device='cpu', method='frcnn'))
+
+
+class TestBatchedPatchModelUtils(unittest.TestCase):
+
+    def test_infer_yolox_batch_matchesInferYolox(self):
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 255, size=(40 + 10 * i, 70, 3)).astype(np.uint8) for i in range(3)]
+
+        for batch_dim in ['batch', 1]:
+            with self.subTest(batch_dim=batch_dim):
+                session = FakeYoloxSession(batch_dim)
+                outputs, ratios = _infer_yolox_batch(session, preprocess_yolox, images, (64, 64))
+                self.assertEqual([3] if batch_dim == 'batch' else [1, 1, 1], session.batch_sizes)
+                for image, output, ratio in zip(images, outputs, ratios):
+                    expected_output, expected_ratio = _infer_yolox(FakeYoloxSession(1), preprocess_yolox, image,
+                                                                   (64, 64))
+                    self.assertEqual(expected_ratio, ratio)
+                    np.testing.assert_array_equal(expected_output[0], output[0])
+
+    def test_DINO_inference_batch_matchesDINO_inference(self):
+        patch_size = 16
+        transform = _get_DINO_transform()
+        images = _images(3)
+        actual = DINO_inference_batch(FakeDINO(), transform, images, patch_size=patch_size, device='cpu')
+        for image, attention in zip(images, actual):
+            expected = DINO_inference(FakeDINO(), transform, image, patch_size=patch_size, device='cpu')
+            np.testing.assert_allclose(expected, attention, rtol=1e-6)
@@ -0,0 +1,51 @@
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from marqo.s2_inference.batching import (
+    is_length_bucketed_batching_enabled, get_length_bucketed_order, restore_original_order)
+from marqo.tensor_search.enums import EnvVars
+
+
+class TestLengthBucketedBatching(unittest.TestCase):
+
+    def test_is_length_bucketed_batching_enabled(self):
+        for value, expected in [("TRUE", True), ("true", True), ("FALSE", False), ("", False), ("yes", False)]:
+            with self.subTest(value=value):
+                with mock.patch.dict(os.environ, {EnvVars.MARQO_ENABLE_LENGTH_BUCKETED_BATCHING: value}):
+                    self.assertEqual(expected, is_length_bucketed_batching_enabled())
+
+    def test_is_length_bucketed_batching_disabled_by_default(self):
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertFalse(is_length_bucketed_batching_enabled())
+
+    def test_get_length_bucketed_order_longestFirst(self):
+        content = ['aa', 'aaaa', 'a', 'aaa']
+        self.assertEqual([1, 3, 0, 2], get_length_bucketed_order(content))
+
+    def test_get_length_bucketed_order_stableForEqualLengths(self):
+        content = ['ab', 'abcd', 'cd', 'efgh', 'ef']
+        self.assertEqual([1, 3, 0, 2, 4], get_length_bucketed_order(content))
+
+    def test_get_length_bucketed_order_noReorderNeeded(self):
+        for content in [[], ['single'], ['ccc', 'bb', 'a'], ['same', 'size']]:
+            with self.subTest(content=content):
+                self.assertIsNone(get_length_bucketed_order(content))
+
+    def test_get_length_bucketed_order_nonTextContent(self):
+        self.assertIsNone(get_length_bucketed_order(['a', b'bytes content']))
+
+    def test_restore_original_order(self):
+        content = ['aa', 'aaaa', 'a', 'aaa']
+        order = get_length_bucketed_order(content)
+        encoded_in_order = np.array([[len(content[i])] for i in order], dtype=np.float32)
+
+        restored = restore_original_order(encoded_in_order, order)
+
+        self.assertEqual([[2], [4], [1], [3]], restored.tolist())
+
+    def test_restore_original_order_lengthMismatch(self):
+        with self.assertRaises(ValueError):
+            restore_original_order(np.zeros((2, 4)), [2, 0, 1])
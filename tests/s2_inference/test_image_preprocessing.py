@@ -0,0 +1,113 @@
+import io
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+import torch
+from PIL import Image
+from open_clip.transform import image_transform_v2, PreprocessCfg
+from torchvision.transforms import Compose, Resize, ToTensor
+
+from marqo.s2_inference.clip_utils import _get_transform
+from marqo.s2_inference.image_preprocessing import (
+    BatchImagePreprocessor, preprocess_images, is_batched_image_preprocessing_enabled)
+from marqo.tensor_search.enums import EnvVars
+
+
+def _random_image(width: int, height: int, mode: str = "RGB", seed: int = 0) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    channels = {"RGB": 3, "RGBA": 4, "L": 1}[mode]
+    array = rng.integers(0, 256, size=(height, width, channels), dtype=np.uint8)
+    return Image.fromarray(array.squeeze(-1) if channels == 1 else array, mode)
+
+
+def _jpeg(image: Image.Image) -> Image.Image:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG")
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+class TestBatchImagePreprocessor(unittest.TestCase):
+
+    def setUp(self):
+        self.images = [_random_image(320, 240, seed=1), _random_image(200, 410, "RGBA", seed=2),
+                       _random_image(224, 224, "L", seed=3), _random_image(1000, 90, seed=4)]
+
+    def _assert_matches_per_image(self, preprocess, images):
+        expected = torch.stack([preprocess(image) for image in images])
+        actual = BatchImagePreprocessor(preprocess)(images, "cpu")
+        self.assertEqual(expected.shape, actual.shape)
+        self.assertTrue(torch.equal(expected, actual))
+
+    def test_clip_transform_matchesPerImage(self):
+        self._assert_matches_per_image(_get_transform(224), self.images)
+
+    def test_open_clip_preprocess_cfg_matchesPerImage(self):
+        for resize_mode in ["shortest", "squash", "longest"]:
+            for size in [224, (256, 192)]:
+                with self.subTest(resize_mode=resize_mode, size=size):
+                    preprocess = image_transform_v2(
+                        PreprocessCfg(size=size, resize_mode=resize_mode, interpolation="bilinear",
+                                      mean=(0.5, 0.5, 0.5), std=(0.5, 0.5, 0.5)), is_train=False)
+                    self._assert_matches_per_image(preprocess, self.images)
+
+    def test_singleThread(self):
+        preprocess = _get_transform(224)
+        expected = torch.stack([preprocess(image) for image in self.images])
+        self.assertTrue(torch.equal(expected, BatchImagePreprocessor(preprocess)(self.images, "cpu", thread_count=1)))
+
+    def test_tensorInputsPassedThrough(self):
+        preprocess = _get_transform(224)
+        tensor = preprocess(self.images[0])
+        output = BatchImagePreprocessor(preprocess)([tensor, self.images[1]], "cpu")
+        self.assertTrue(torch.equal(tensor, output[0]))
+        self.assertTrue(torch.equal(preprocess(self.images[1]), output[1]))
+
+    def test_withoutNormalize(self):
+        self._assert_matches_per_image(Compose([Resize((64, 64)), ToTensor()]),
+                                       [image.convert("RGB") for image in self.images])
+
+    def test_unsupportedPreprocessorFallsBack(self):
+        preprocess = mock.Mock(return_value=torch.ones(3, 8, 8))
+        batch_preprocessor = BatchImagePreprocessor(preprocess)
+        self.assertFalse(batch_preprocessor.supports_batching)
+        output = batch_preprocessor(self.images[:2], "cpu")
+        self.assertEqual((2, 3, 8, 8), output.shape)
+        self.assertEqual(2, preprocess.call_count)
+
+    def test_draftDecode(self):
+        preprocess = _get_transform(224)
+        image = _random_image(1600, 1200, seed=5)
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_ENABLE_IMAGE_DRAFT_DECODE: "TRUE"}):
+            batch_preprocessor = BatchImagePreprocessor(preprocess)
+        self.assertEqual((224, 224), batch_preprocessor._draft_size)
+
+        jpeg = _jpeg(image)
+        output = batch_preprocessor([jpeg], "cpu")
+        # The decoder downscaled the image but no further than the size the first resize needs
+        self.assertLess(jpeg.size[0], 1600)
+        self.assertGreaterEqual(min(jpeg.size), 224)
+        self.assertEqual((1, 3, 224, 224), output.shape)
+
+    def test_draftDecode_disabledByDefault(self):
+        jpeg = _jpeg(_random_image(1600, 1200, seed=5))
+        BatchImagePreprocessor(_get_transform(224))([jpeg], "cpu")
+        self.assertEqual((1600, 1200), jpeg.size)
+
+
+class TestPreprocessImages(unittest.TestCase):
+
+    def test_batched_enabledByDefault(self):
+        self.assertTrue(is_batched_image_preprocessing_enabled())
+
+    def test_preprocess_images_batchedAndUnbatchedMatch(self):
+        preprocess = _get_transform(224)
+        images = [_random_image(300, 200, seed=i) for i in range(3)]
+        batched = preprocess_images(images, preprocess, "cpu")
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_ENABLE_BATCHED_IMAGE_PREPROCESSING: "FALSE"}), \
+                mock.patch("marqo.s2_inference.image_preprocessing.BatchImagePreprocessor") as mock_batch:
+            unbatched = preprocess_images(images, preprocess, "cpu")
+            mock_batch.assert_not_called()
+        self.assertTrue(torch.equal(batched, unbatched))
@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+import unittest
+from contextvars import ContextVar
+from unittest import mock
+
+import onnxruntime
+
+from marqo.s2_inference import inference_executor
+from marqo.s2_inference.inference_executor import (
+    InferenceExecutor, get_intra_op_threads, get_onnx_session_options, get_inference_executor, run_inference,
+    get_inference_executor_stats, shutdown_inference_executor, workload_class)
+from marqo.tensor_search.enums import EnvVars, WorkloadClass
+
+
+class TestInferenceExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = InferenceExecutor(num_workers=2, intra_op_threads=4)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_run_returnsResultFromWorkerThread(self):
+        thread_name = self.executor.run(lambda: threading.current_thread().name)
+        self.assertTrue(thread_name.startswith("inference-worker-"))
+        self.assertEqual(6, self.executor.run(lambda a, b=0: a + b, 2, b=4))
+
+    def test_run_reraisesException(self):
+        def fail():
+            raise ValueError("bad input")
+
+        with self.assertRaises(ValueError):
+            self.executor.run(fail)
+        self.assertEqual(1, sum(worker["tasks_failed"] for worker in self.executor.stats()["workers"]))
+
+    def test_run_boundsConcurrencyToWorkerCount(self):
+        running = 0
+        max_running = 0
+        lock = threading.Lock()
+        release = threading.Event()
+
+        def model_call():
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            release.wait(5)
+            with lock:
+                running -= 1
+
+        futures = [self.executor.submit(model_call) for _ in range(6)]
+        threading.Timer(0.2, release.set).start()
+        for future in futures:
+            future.result(timeout=10)
+        self.assertEqual(2, max_running)
+
+    def test_run_propagatesContextVars(self):
+        request_id: ContextVar[str] = ContextVar("request_id")
+        request_id.set("request-1")
+        self.assertEqual("request-1", self.executor.run(request_id.get))
+
+    def test_stats(self):
+        for _ in range(4):
+            self.executor.run(sum, [1, 2])
+        stats = self.executor.stats()
+        self.assertEqual(2, stats["num_workers"])
+        self.assertEqual(4, stats["intra_op_threads"])
+        self.assertEqual(0, stats["queue_depth"])
+        self.assertEqual(2, len(stats["workers"]))
+        self.assertEqual(4, sum(worker["tasks_completed"] for worker in stats["workers"]))
+        for worker in stats["workers"]:
+            self.assertFalse(worker["busy"])
+            self.assertTrue(0 <= worker["utilisation"] <= 1)
+
+    def test_submit_afterShutdown(self):
+        self.executor.shutdown()
+        with self.assertRaises(RuntimeError):
+            self.executor.submit(sum, [1])
+
+    def test_init_invalidWorkerCount(self):
+        with self.assertRaises(ValueError):
+            InferenceExecutor(num_workers=0)
+
+
+class TestInferenceExecutorScheduling(unittest.TestCase):
+
+    def _executor(self, **kwargs) -> InferenceExecutor:
+        executor = InferenceExecutor(num_workers=1, **kwargs)
+        self.addCleanup(executor.shutdown)
+        return executor
+
+    def _submit(self, executor, workload, func, *args):
+        with workload_class(workload):
+            return executor.submit(func, *args)
+
+    def _block_worker(self, executor):
+        """Occupies the only worker until the returned event is set, so that the calls submitted next queue up."""
+        running = threading.Event()
+        release = threading.Event()
+
+        def blocker():
+            running.set()
+            release.wait(5)
+
+        future = executor.submit(blocker)
+        self.assertTrue(running.wait(5))
+        return release, future
+
+    def test_submit_interactivePrioritisedOverQueuedBulk(self):
+        executor = self._executor()
+        order = []
+        release, blocker = self._block_worker(executor)
+        futures = [self._submit(executor, workload, order.append, name) for workload, name in [
+            (WorkloadClass.Bulk, 'bulk1'), (WorkloadClass.Bulk, 'bulk2'), (WorkloadClass.Interactive, 'search')]]
+        self.assertEqual(2, executor.stats()['bulk_queue_depth'])
+        release.set()
+        for future in [blocker] + futures:
+            future.result(timeout=5)
+
+        self.assertEqual(['search', 'bulk1', 'bulk2'], order)
+
+    def test_submit_bulkMinShare_bulkNotStarved(self):
+        executor = self._executor(bulk_min_share=0.25)
+        order = []
+        release, blocker = self._block_worker(executor)
+        futures = [self._submit(executor, WorkloadClass.Bulk, order.append, 'bulk')]
+        futures += [self._submit(executor, WorkloadClass.Interactive, order.append, f'search{i}') for i in range(5)]
+        release.set()
+        for future in [blocker] + futures:
+            future.result(timeout=5)
+
+        # The blocker is the first of the three interactive calls dispatched before the bulk one
+        self.assertEqual(['search0', 'search1', 'bulk', 'search2', 'search3', 'search4'], order)
+
+    def test_scheduler_interactiveQueueSloExceeded_bulkWorkersLimited(self):
+        scheduler = inference_executor._WorkloadScheduler(num_workers=2, interactive_queue_slo_seconds=0.05)
+        scheduler.put(WorkloadClass.Bulk, 'bulk1')
+        scheduler.put(WorkloadClass.Bulk, 'bulk2')
+        self.assertEqual([(WorkloadClass.Bulk, 'bulk1'), (WorkloadClass.Bulk, 'bulk2')],
+                         [scheduler.get(), scheduler.get()])
+
+        scheduler.put(WorkloadClass.Interactive, 'search')
+        time.sleep(0.1)
+        self.assertEqual((WorkloadClass.Interactive, 'search'), scheduler.get())
+        self.assertEqual(1, scheduler.bulk_worker_limit)
+
+        # A bulk call completing while no interactive call waits lets the limit grow back
+        scheduler.put(WorkloadClass.Bulk, 'bulk3')
+        scheduler.task_done(WorkloadClass.Interactive)
+        scheduler.task_done(WorkloadClass.Bulk)
+        self.assertEqual(1, scheduler.stats()['bulk_running'])
+        self.assertEqual(2, scheduler.bulk_worker_limit)
+        self.assertEqual((WorkloadClass.Bulk, 'bulk3'), scheduler.get())
+
+    def test_workload_class_defaultInteractive(self):
+        self.assertEqual(WorkloadClass.Interactive, inference_executor.get_workload_class())
+        with workload_class(WorkloadClass.Bulk):
+            self.assertEqual(WorkloadClass.Bulk, inference_executor.get_workload_class())
+        self.assertEqual(WorkloadClass.Interactive, inference_executor.get_workload_class())
+
+
+class TestInferenceExecutorConfiguration(unittest.TestCase):
+
+    def tearDown(self):
+        shutdown_inference_executor()
+
+    def test_get_intra_op_threads(self):
+        cases = [
+            ({}, None),
+            ({EnvVars.MARQO_INFERENCE_INTRA_OP_THREADS: "3"}, 3),
+            ({EnvVars.MARQO_INFERENCE_WORKER_COUNT: "4"}, 8),
+            ({EnvVars.MARQO_INFERENCE_WORKER_COUNT: "64"}, 1),
+            ({EnvVars.MARQO_INFERENCE_WORKER_COUNT: "4", EnvVars.MARQO_INFERENCE_INTRA_OP_THREADS: "2"}, 2),
+        ]
+        for env, expected in cases:
+            with self.subTest(env=env):
+                with mock.patch.dict(os.environ, env, clear=True), mock.patch("os.cpu_count", return_value=32):
+                    self.assertEqual(expected, get_intra_op_threads())
+
+    def test_get_onnx_session_options(self):
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_INFERENCE_INTRA_OP_THREADS: "3"}):
+            session_options = get_onnx_session_options()
+        self.assertEqual(3, session_options.intra_op_num_threads)
+        self.assertEqual(1, session_options.inter_op_num_threads)
+
+    def test_get_onnx_session_options_notConfigured(self):
+        default_options = onnxruntime.SessionOptions()
+        session_options = get_onnx_session_options()
+        self.assertEqual(default_options.intra_op_num_threads, session_options.intra_op_num_threads)
+
+    def test_run_inference_disabledByDefault(self):
+        self.assertIsNone(get_inference_executor())
+        self.assertEqual(threading.current_thread().name, run_inference(lambda: threading.current_thread().name))
+        self.assertEqual({"enabled": False, "intra_op_threads": None}, get_inference_executor_stats())
+
+    def test_run_inference_onWorkers(self):
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_INFERENCE_WORKER_COUNT: "2",
+                                          EnvVars.MARQO_INFERENCE_INTRA_OP_THREADS: "1"}), \
+                mock.patch("torch.get_num_threads", return_value=8), \
+                mock.patch("torch.set_num_threads") as mock_set_num_threads:
+            thread_name = run_inference(lambda: threading.current_thread().name)
+            self.assertIs(get_inference_executor(), inference_executor._executor)
+
+        self.assertTrue(thread_name.startswith("inference-worker-"))
+        mock_set_num_threads.assert_called_once_with(1)
+        stats = get_inference_executor_stats()
+        self.assertTrue(stats["enabled"])
+        self.assertEqual(2, stats["num_workers"])
@@ -0,0 +1,192 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from marqo.s2_inference import inference_process_pool, s2_inference
+from marqo.s2_inference.errors import VectoriseError, InvalidModelPropertiesError
+from marqo.s2_inference.inference_executor import get_workload_class, workload_class
+from marqo.s2_inference.inference_process_pool import (
+    InferenceProcessPool, get_inference_process_pool, get_inference_process_pool_stats)
+from marqo.tensor_search.enums import EnvVars, WorkloadClass
+from marqo.tensor_search.telemetry import RequestMetricsStore
+
+
+def fake_vectorise(content, **kwargs):
+    """Runs in the worker processes, so it must be importable at module level."""
+    RequestMetricsStore.for_request().increment_counter("fake_vectorise")
+    if content == "workload":
+        return [[1.0 if get_workload_class() == WorkloadClass.Bulk else 0.0]]
+    if content == "crash":
+        os._exit(1)
+    if content == "invalid":
+        raise InvalidModelPropertiesError("invalid model properties")
+    if content == "pid":
+        return [[float(os.getpid())]]
+    if content == "hang":
+        time.sleep(3600)
+    content = [content] if isinstance(content, str) else content
+    return [[float(len(item)), 0.5, -1.25] for item in content]
+
+
+def fake_load(content, **kwargs):
+    if content == "slow-load":
+        time.sleep(2)
+    if content == "hang-load":
+        time.sleep(3600)
+
+
+def fake_preprocessors(model_name, **kwargs):
+    if model_name == "unpicklable":
+        return {"image": lambda image: image}
+    return {"image": model_name, "video": None}
+
+
+class TestInferenceProcessPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = InferenceProcessPool(num_processes=2, health_check_interval=0.2,
+                                        vectorise_function=fake_vectorise, preprocessors_function=fake_preprocessors)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def _wait_until(self, condition, timeout=60):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("Timed out waiting for the inference processes")
+            time.sleep(0.1)
+
+    def test_vectorise_returnsVectorsThroughSharedMemory(self):
+        vectors = self.pool.vectorise(content=["a", "abc"], model_name="my-model", device="cpu")
+        self.assertEqual([[1.0, 0.5, -1.25], [3.0, 0.5, -1.25]], vectors)
+
+    def test_vectorise_runsInWorkerProcess(self):
+        pid = int(self.pool.vectorise(content="pid")[0][0])
+        self.assertNotEqual(os.getpid(), pid)
+        self.assertIn(pid, [process["pid"] for process in self.pool.stats()["processes"]])
+
+    def test_vectorise_reraisesWorkerException(self):
+        with self.assertRaises(InvalidModelPropertiesError):
+            self.pool.vectorise(content="invalid")
+
+    def test_vectorise_restartsCrashedWorker(self):
+        restarts_before = sum(process["restarts"] for process in self.pool.stats()["processes"])
+        with self.assertRaises(VectoriseError):
+            self.pool.vectorise(content="crash")
+
+        self._wait_until(lambda: all(process["alive"] for process in self.pool.stats()["processes"]))
+        self.assertEqual(restarts_before + 1, sum(process["restarts"] for process in self.pool.stats()["processes"]))
+        self.assertEqual([[2.0, 0.5, -1.25]], self.pool.vectorise(content="ab"))
+
+    def test_health_check(self):
+        self._wait_until(lambda: all(process["seconds_since_healthy"] is not None
+                                     for process in self.pool.stats()["processes"]))
+
+    def test_vectorise_restartsHungWorker(self):
+        pool = InferenceProcessPool(num_processes=1, health_check_interval=0.2, vectorise_function=fake_vectorise,
+                                    request_timeout=1)
+        try:
+            # Start-up counts towards the timeout of requests queued behind it, so wait for the worker to be ready
+            self._wait_until(lambda: pool.stats()["processes"][0]["seconds_since_healthy"] is not None)
+            hung_pid = int(pool.vectorise(content="pid")[0][0])
+            with self.assertRaisesRegex(VectoriseError, "did not complete within 1s"):
+                pool.vectorise(content="hang")
+
+            self.assertEqual(1, pool.stats()["processes"][0]["restarts"])
+            self._wait_until(lambda: pool.stats()["processes"][0]["seconds_since_healthy"] is not None)
+            self.assertNotEqual(hung_pid, int(pool.vectorise(content="pid")[0][0]))
+        finally:
+            pool.shutdown()
+
+    def test_vectorise_modelLoadTimedSeparately(self):
+        pool = InferenceProcessPool(num_processes=1, health_check_interval=0.2, vectorise_function=fake_vectorise,
+                                    request_timeout=1, load_function=fake_load, model_load_timeout=4)
+        try:
+            self._wait_until(lambda: pool.stats()["processes"][0]["seconds_since_healthy"] is not None)
+            # Loading takes longer than the request timeout, but not than the model load timeout
+            self.assertEqual([[9.0, 0.5, -1.25]], pool.vectorise(content="slow-load"))
+            self.assertEqual(0, pool.stats()["processes"][0]["restarts"])
+
+            with self.assertRaisesRegex(VectoriseError, "did not load within 4s"):
+                pool.vectorise(content="hang-load")
+            self.assertEqual(1, pool.stats()["processes"][0]["restarts"])
+        finally:
+            pool.shutdown()
+
+    def test_vectorise_callerWorkloadClassAndTelemetryPropagated(self):
+        request = object()
+        RequestMetricsStore.set_in_request(request)
+        self.addCleanup(RequestMetricsStore.clear_metrics_for, request)
+
+        with workload_class(WorkloadClass.Bulk):
+            self.assertEqual([[1.0]], self.pool.vectorise(content="workload"))
+        self.assertEqual([[0.0]], self.pool.vectorise(content="workload"))
+
+        metrics = RequestMetricsStore.for_request(request)
+        self.assertEqual(2, metrics.counter["fake_vectorise"])
+        self.assertEqual(2, metrics.timings["inference_process.vectorise"].count)
+
+    def test_vectorise_noRequest_telemetryDropped(self):
+        self.assertEqual([[1.0, 0.5, -1.25]], self.pool.vectorise(content="a"))
+
+    def test_get_preprocessors_returnedFromWorker(self):
+        self.assertEqual({"image": "my-model", "video": None},
+                         self.pool.get_preprocessors(model_name="my-model", device="cpu"))
+        with self.assertRaises(VectoriseError):
+            self.pool.get_preprocessors(model_name="unpicklable", device="cpu")
+
+    def test_vectorise_afterShutdown(self):
+        pool = InferenceProcessPool(num_processes=1, health_check_interval=0.2, vectorise_function=fake_vectorise)
+        pool.shutdown()
+        with self.assertRaises(RuntimeError):
+            pool.vectorise(content="a")
+
+
+class TestInferenceProcessPoolConfiguration(unittest.TestCase):
+
+    def test_disabledByDefault(self):
+        self.assertIsNone(get_inference_process_pool())
+        self.assertEqual({"enabled": False}, get_inference_process_pool_stats())
+
+    def test_vectorise_forwardedToPool(self):
+        mock_pool = mock.MagicMock()
+        mock_pool.vectorise.return_value = [[1.0, 2.0]]
+        with mock.patch.object(inference_process_pool, "_pool", mock_pool):
+            from marqo.s2_inference.s2_inference import vectorise
+            self.assertEqual([[1.0, 2.0]], vectorise("my-model", ["hello"], device="cpu"))
+        self.assertEqual("my-model", mock_pool.vectorise.call_args.kwargs["model_name"])
+        self.assertEqual(["hello"], mock_pool.vectorise.call_args.kwargs["content"])
+
+    def test_load_multimodal_model_and_get_preprocessors_preprocessorsFromPool(self):
+        mock_pool = mock.MagicMock()
+        mock_pool.get_preprocessors.return_value = {"image": "preprocess", "video": None}
+        self.addCleanup(s2_inference._inference_process_preprocessors.clear)
+        with mock.patch.object(inference_process_pool, "_pool", mock_pool), \
+                mock.patch.object(s2_inference, "_update_available_models") as mock_update_available_models:
+            for _ in range(2):
+                model, preprocessors = s2_inference.load_multimodal_model_and_get_preprocessors(
+                    "my-model", {"type": "open_clip"}, device="cpu")
+                self.assertIsNone(model)
+                self.assertEqual({"image": "preprocess", "video": None}, preprocessors)
+                # Callers can change the preprocessors they get without changing the cached ones
+                preprocessors["image"] = None
+
+        # The model is only loaded by the inference processes, once
+        mock_update_available_models.assert_not_called()
+        mock_pool.get_preprocessors.assert_called_once()
+
+    def test_invalidProcessCount(self):
+        with self.assertRaises(ValueError):
+            InferenceProcessPool(num_processes=0)
+
+    def test_get_inference_process_count(self):
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_INFERENCE_PROCESS_COUNT: "3"}):
+            self.assertEqual(3, inference_process_pool.get_inference_process_count())
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_INFERENCE_PROCESS_COUNT: "-1"}):
+            self.assertEqual(0, inference_process_pool.get_inference_process_count())
@@ -0,0 +1,163 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import torch
+
+from marqo.s2_inference.configs import ModelCache
+from marqo.s2_inference.errors import InvalidModelPropertiesError
+from marqo.s2_inference.models.model_runtime import ModelRuntime
+from marqo.s2_inference.onnx_runtime_utils import (
+    ONNXExportedModule, get_model_runtime, validate_runtime_for_device, get_export_dir, check_embedding_parity)
+from marqo.s2_inference.s2_inference import (
+    _create_model_cache_key, validate_model_properties, vectorise, clear_loaded_models, get_available_models)
+from marqo.tensor_search.enums import AvailableModelsKey
+
+
+class _TinyEncoder(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.embedding = torch.nn.Embedding(100, 32)
+        self.linear = torch.nn.Linear(32, 16)
+
+    def forward(self, input_ids, attention_mask):
+        token_embeddings = self.linear(self.embedding(input_ids))
+        mask = attention_mask.unsqueeze(-1).float()
+        return (token_embeddings * mask).sum(1) / torch.clamp(mask.sum(1), min=1e-9)
+
+
+class TestOnnxRuntimeUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.sample_inputs = {
+            "input_ids": torch.tensor([[1, 2, 3, 4], [5, 6, 0, 0]]),
+            "attention_mask": torch.tensor([[1, 1, 1, 1], [1, 1, 0, 0]])
+        }
+        self.dynamic_axes = {name: {0: "batch_size", 1: "sequence_length"} for name in self.sample_inputs}
+
+    def test_get_model_runtime(self):
+        self.assertEqual(ModelRuntime.Torch, get_model_runtime(None))
+        self.assertEqual(ModelRuntime.Torch, get_model_runtime({"type": "hf"}))
+        self.assertEqual(ModelRuntime.ONNX, get_model_runtime({"runtime": "onnx"}))
+        self.assertEqual(ModelRuntime.ONNX_INT8, get_model_runtime({"runtime": "onnx-int8"}))
+        with self.assertRaises(InvalidModelPropertiesError):
+            get_model_runtime({"runtime": "tensorrt"})
+
+    def test_validate_runtime_for_device(self):
+        validate_runtime_for_device(ModelRuntime.ONNX_INT8, "cpu")
+        validate_runtime_for_device(ModelRuntime.ONNX, "cuda")
+        with self.assertRaises(InvalidModelPropertiesError):
+            validate_runtime_for_device(ModelRuntime.ONNX_INT8, "cuda:0")
+
+    def test_get_export_dir_independentOfRuntimeAndAuth(self):
+        properties = {"name": "hf/model", "dimensions": 384, "type": "hf"}
+        export_dir = get_export_dir("hf/model", properties)
+        self.assertEqual(export_dir, get_export_dir("hf/model", {**properties, "runtime": "onnx-int8"}))
+        self.assertEqual(export_dir, get_export_dir("hf/model", {**properties, "model_auth": {"hf": {}}}))
+        self.assertNotEqual(export_dir, get_export_dir("hf/model", {**properties, "dimensions": 768}))
+        self.assertTrue(export_dir.startswith(ModelCache.onnx_cache_path))
+
+    def test_check_embedding_parity(self):
+        embeddings = np.random.rand(3, 8)
+        self.assertAlmostEqual(1.0, check_embedding_parity(embeddings, embeddings * 2), places=6)
+        self.assertLess(check_embedding_parity(embeddings, -embeddings), 0)
+        with self.assertRaises(ValueError):
+            check_embedding_parity(embeddings, embeddings[:2])
+
+    def test_export_load_and_run(self):
+        for runtime in (ModelRuntime.ONNX, ModelRuntime.ONNX_INT8):
+            with self.subTest(runtime=runtime), tempfile.TemporaryDirectory() as export_dir:
+                module = _TinyEncoder().eval()
+                onnx_module = ONNXExportedModule(module, self.sample_inputs, self.dynamic_axes, export_dir, "text",
+                                                 runtime, "cpu")
+                self.assertTrue(onnx_module.load())
+                self.assertTrue(os.path.isfile(onnx_module.model_path))
+
+                # Batch size and sequence length differ from the export sample
+                inputs = {"input_ids": torch.tensor([[7, 8, 9, 10, 11]] * 3),
+                          "attention_mask": torch.ones(3, 5, dtype=torch.int64)}
+                with torch.no_grad():
+                    expected = module(**inputs).numpy()
+                actual = onnx_module.run({name: tensor.numpy() for name, tensor in inputs.items()})
+                self.assertEqual(expected.shape, actual.shape)
+                self.assertGreater(check_embedding_parity(expected, actual), 0.98)
+
+    def test_load_reusesCachedExport(self):
+        with tempfile.TemporaryDirectory() as export_dir:
+            ONNXExportedModule(_TinyEncoder().eval(), self.sample_inputs, self.dynamic_axes, export_dir, "text",
+                               ModelRuntime.ONNX, "cpu").load()
+            onnx_module = ONNXExportedModule(_TinyEncoder().eval(), self.sample_inputs, self.dynamic_axes,
+                                             export_dir, "text", ModelRuntime.ONNX, "cpu")
+            with mock.patch.object(ONNXExportedModule, "_export") as mock_export:
+                self.assertTrue(onnx_module.load())
+                mock_export.assert_not_called()
+
+    def test_load_parityFailureFallsBackToTorch(self):
+        with tempfile.TemporaryDirectory() as export_dir:
+            onnx_module = ONNXExportedModule(_TinyEncoder().eval(), self.sample_inputs, self.dynamic_axes,
+                                             export_dir, "text", ModelRuntime.ONNX, "cpu")
+            with mock.patch("marqo.s2_inference.onnx_runtime_utils.check_embedding_parity", return_value=0.5):
+                self.assertFalse(onnx_module.load())
+            self.assertIsNone(onnx_module.session)
+
+    def test_load_exportFailureFallsBackToTorch(self):
+        with tempfile.TemporaryDirectory() as export_dir:
+            onnx_module = ONNXExportedModule(_TinyEncoder().eval(), self.sample_inputs, self.dynamic_axes,
+                                             export_dir, "text", ModelRuntime.ONNX, "cpu")
+            with mock.patch("torch.onnx.export", side_effect=RuntimeError("unsupported operator")):
+                self.assertFalse(onnx_module.load())
+            self.assertFalse(os.path.exists(onnx_module.fp32_path))
+
+    def test_create_model_cache_key_runtime(self):
+        properties = {"name": "hf/model", "dimensions": 384, "type": "hf"}
+        torch_key = _create_model_cache_key("my-model", "cpu", properties)
+        self.assertEqual(torch_key, _create_model_cache_key("my-model", "cpu", {**properties, "runtime": "torch"}))
+
+        onnx_key = _create_model_cache_key("my-model", "cpu", {**properties, "runtime": "onnx-int8"})
+        self.assertNotEqual(torch_key, onnx_key)
+        self.assertTrue(onnx_key.startswith("my-model"))
+        self.assertTrue(onnx_key.endswith("cpu"))
+
+    def test_validate_model_properties_runtime(self):
+        validate_model_properties("my-model", {"name": "hf/model", "dimensions": 384, "type": "hf",
+                                               "runtime": "onnx-int8"})
+        with self.assertRaises(InvalidModelPropertiesError):
+            validate_model_properties("my-model", {"name": "hf/model", "dimensions": 384, "type": "hf",
+                                                   "runtime": "not-a-runtime"})
+        with self.assertRaises(InvalidModelPropertiesError):
+            validate_model_properties("my-model", {"name": "sentence-transformers/all-MiniLM-L6-v2",
+                                                   "dimensions": 384, "type": "sbert", "runtime": "onnx"})
+
+
+class TestOnnxRuntimeParity(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        clear_loaded_models()
+
+    def test_hf_model_onnx_runtime_parity(self):
+        # The inputs differ in batch size and sequence length from each other and from the export sample, so a graph
+        # that only works for the traced shapes fails the check
+        contents = [
+            ["a short query", "a considerably longer passage of text that will need more padding tokens"],
+            ["a single input whose sequence length is different from all of the inputs used to export the model, "
+             "which is long enough to need more tokens than any of them"],
+        ]
+        base_properties = {"name": "sentence-transformers/all-MiniLM-L6-v2", "dimensions": 384, "type": "hf"}
+
+        torch_vectors = [np.array(vectorise("test-hf-model", content, dict(base_properties), device="cpu"))
+                         for content in contents]
+        for runtime, min_similarity in [("onnx", 0.9999), ("onnx-int8", 0.98)]:
+            properties = {**base_properties, "runtime": runtime}
+            for content, expected in zip(contents, torch_vectors):
+                with self.subTest(runtime=runtime, batch_size=len(content)):
+                    onnx_vectors = np.array(vectorise("test-hf-model", content, dict(properties), device="cpu"))
+                    model_cache_key = _create_model_cache_key(
+                        "test-hf-model", "cpu", validate_model_properties("test-hf-model", properties))
+                    model = get_available_models()[model_cache_key][AvailableModelsKey.model]
+                    # Without an ONNX module the model falls back to torch, which would make the comparison vacuous
+                    self.assertIsNotNone(model.onnx_module)
+                    self.assertEqual(expected.shape, onnx_vectors.shape)
+                    self.assertGreater(check_embedding_parity(expected, onnx_vectors), min_similarity)
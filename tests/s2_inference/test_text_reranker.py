@@ -0,0 +1,180 @@
+import copy
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from marqo.s2_inference.reranking import rerank, text_reranker
+from marqo.s2_inference.reranking.cross_encoders import ReRankerText
+from marqo.s2_inference.reranking.model_utils import DummyModel
+from marqo.s2_inference.reranking.text_reranker import (
+    TextReranker, build_rerank_candidates, get_text_reranker, get_searchable_fields)
+from marqo.s2_inference.s2_inference import clear_loaded_models, get_available_models
+from marqo.tensor_search.enums import AvailableModelsKey, EnvVars
+
+
+class LengthModel:
+    """Scores a pair by the length of the passage, so every passage gets a distinct, known score."""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, inputs):
+        self.batches.append([pair[1] for pair in inputs])
+        return np.array([len(pair[1]) / 1000 for pair in inputs])
+
+
+def _results():
+    return {'hits': [
+        {'attributes': 'yello head. pruple shirt. black sweater.',
+         'location': 'images/1.png',
+         'other': 'some other text',
+         '_score': 1.4017934,
+         '_highlights': [],
+         },
+        {'attributes': 'face is viking. body is white turtleneck. background is pearl. a very long sentence here.',
+         'other': 'some more text',
+         '_id': 'QmRR6PBkgCdhiSYBM3AY3EWhn4ZbeR2X8Ygpy2veLkcPC5',
+         '_score': 0.2876821,
+         '_highlights': [],
+         },
+        {'attributes': 'face is bowlcut. body is blue . background is grey. head is tan',
+         'location': 'images/10.png',
+         '_id': 'QmTVYuULK1Qbzh21Y3hzeTFny5AGUSUGAXoGjLqNB2b1at',
+         '_score': 0.2876821,
+         '_highlights': [],
+         }],
+        'processingTimeMs': 49,
+        'query': 'yellow turtleneck',
+        'limit': 10}
+
+
+class TestTextReranker(unittest.TestCase):
+
+    def setUp(self):
+        self.model = LengthModel()
+        self.load_patch = mock.patch.object(text_reranker, "load_sbert_cross_encoder_model",
+                                            return_value={'model': self.model})
+        self.load_patch.start()
+
+    def tearDown(self):
+        self.load_patch.stop()
+
+    def _legacy_rerank(self, results, searchable_attributes=None, num_highlights=1):
+        reranker = ReRankerText('_testing', 'cpu', num_highlights=num_highlights)
+        reranker.model = LengthModel()
+        reranker.rerank('hello', results, searchable_attributes=searchable_attributes)
+
+    def test_rerank_matchesLegacyReranker(self):
+        for searchable_attributes in [None, ['attributes'], ['other', 'attributes']]:
+            for num_highlights in [1, 2]:
+                with self.subTest(searchable_attributes=searchable_attributes, num_highlights=num_highlights):
+                    expected, actual = _results(), _results()
+                    self._legacy_rerank(expected, searchable_attributes, num_highlights)
+                    TextReranker('_testing', 'cpu').rerank('hello', actual, searchable_attributes,
+                                                           num_highlights=num_highlights)
+
+                    # the hit without an _id gets a random _rerank_id, so the hits are compared by content
+                    self.assertEqual([hit['attributes'] for hit in expected['hits']],
+                                     [hit['attributes'] for hit in actual['hits']])
+                    for expected_hit, actual_hit in zip(expected['hits'], actual['hits']):
+                        self.assertEqual(expected_hit['_reranked_highlights'], actual_hit['_reranked_highlights'])
+                        np.testing.assert_allclose(expected_hit['_reranked_score'], actual_hit['_reranked_score'])
+
+    def test_rerank_sortsByScore(self):
+        results = _results()
+        TextReranker('_testing', 'cpu').rerank('hello', results, ['attributes'], split_params=None)
+        scores = [hit['_reranked_score'] for hit in results['hits']]
+        self.assertEqual(sorted(scores, reverse=True), scores)
+        self.assertEqual('QmRR6PBkgCdhiSYBM3AY3EWhn4ZbeR2X8Ygpy2veLkcPC5', results['hits'][0]['_id'])
+
+    def test_rerank_hitsWithoutFieldsRankedLast(self):
+        results = _results()
+        TextReranker('_testing', 'cpu').rerank('hello', results, ['location'])
+        self.assertEqual('QmRR6PBkgCdhiSYBM3AY3EWhn4ZbeR2X8Ygpy2veLkcPC5', results['hits'][-1]['_id'])
+        self.assertNotIn('_reranked_score', results['hits'][-1])
+        self.assertTrue(all('_reranked_score' in hit for hit in results['hits'][:-1]))
+
+    def test_rerank_emptyResults(self):
+        results = {'hits': []}
+        TextReranker('_testing', 'cpu').rerank('hello', results)
+        self.assertEqual({'hits': []}, results)
+        self.assertEqual([], self.model.batches)
+
+    def test_score_batchedLongestFirst(self):
+        passages = ['a' * n for n in [3, 10, 1, 7, 5]]
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_RERANKER_BATCH_SIZE: "2"}):
+            scores = TextReranker('_testing', 'cpu').score('q', passages)
+        self.assertEqual([len(p) / 1000 for p in passages], scores)
+        self.assertEqual([['a' * 10, 'a' * 7], ['a' * 5, 'a' * 3], ['a']], self.model.batches)
+
+    def test_score_singleBatchKeepsOrder(self):
+        passages = ['aaa', 'a', 'aa']
+        TextReranker('_testing', 'cpu').score('q', passages, batch_size=8)
+        self.assertEqual([passages], self.model.batches)
+
+
+class TestRerankCandidates(unittest.TestCase):
+
+    def test_get_searchable_fields(self):
+        self.assertEqual(['attributes', 'location', 'other'], get_searchable_fields(_results()['hits']))
+
+    def test_build_rerank_candidates_skipsMissingFields(self):
+        hits = [{'a': 'x', 'b': None}, {'b': 'y'}]
+        candidates = build_rerank_candidates(hits, ['a', 'b'])
+        self.assertEqual([(0, 'a', 'x'), (1, 'b', 'y')], [tuple(c) for c in candidates])
+
+    def test_build_rerank_candidates_splitsText(self):
+        hits = [{'a': 'one. two. three.'}]
+        candidates = build_rerank_candidates(
+            hits, ['a'], {"split_length": 1, "split_overlap": 0, "split_method": "sentence"})
+        self.assertEqual(['one.', 'two.', 'three.'], [c.passage for c in candidates])
+
+
+class TestTextRerankerService(unittest.TestCase):
+
+    def tearDown(self):
+        clear_loaded_models()
+
+    def test_get_text_reranker_cachedPerModelAndDevice(self):
+        self.assertIs(get_text_reranker('_testing', 'cpu'), get_text_reranker('_testing', 'cpu'))
+        self.assertIsNot(get_text_reranker('_testing', 'cpu'), get_text_reranker('_testing', 'cuda'))
+
+    def test_model_loadedIntoModelCache(self):
+        results = _results()
+        rerank.rerank_search_results(results, 'hello', '_testing', 'cpu')
+        entries = [entry for key, entry in get_available_models().items() if key.startswith('_testing')]
+        self.assertEqual(1, len(entries))
+        self.assertIsInstance(entries[0][AvailableModelsKey.model], DummyModel)
+        self.assertIn(AvailableModelsKey.model_size, entries[0])
+
+        first_used = entries[0][AvailableModelsKey.most_recently_used_time]
+        rerank.rerank_search_results(_results(), 'hello', '_testing', 'cpu')
+        self.assertGreater(entries[0][AvailableModelsKey.most_recently_used_time], first_used)
+
+    def test_model_loadedThroughModelCacheManagement(self):
+        with mock.patch('marqo.s2_inference.s2_inference._validate_model_into_device') as mock_validate:
+            rerank.rerank_search_results(_results(), 'hello', '_testing', 'cpu')
+            rerank.rerank_search_results(_results(), 'hello', '_testing', 'cpu')
+        mock_validate.assert_called_once()
+        self.assertEqual(('_testing', 'cpu'), (mock_validate.call_args.args[0], mock_validate.call_args.args[2]))
+
+    def test_model_reloadedAfterEjection(self):
+        rerank.rerank_search_results(_results(), 'hello', '_testing', 'cpu')
+        clear_loaded_models()
+        results = _results()
+        rerank.rerank_search_results(results, 'hello', '_testing', 'cpu')
+        self.assertTrue(all(isinstance(hit['_score'], float) for hit in results['hits']))
+        self.assertEqual(1, len([key for key in get_available_models() if key.startswith('_testing')]))
+
+    def test_rerank_search_results_cleansUp(self):
+        results = _results()
+        original = copy.deepcopy(results)
+        rerank.rerank_search_results(results, 'hello', '_testing', 'cpu', searchable_attributes=['attributes'])
+        self.assertEqual(len(original['hits']), len(results['hits']))
+        for hit in results['hits']:
+            self.assertNotIn('_reranked_score', hit)
+            self.assertNotIn('_rerank_id', hit)
+            self.assertEqual(1, len(hit['_highlights']))
+            self.assertIn('attributes', hit['_highlights'][0])
@@ -1,10 +1,13 @@
+import os
+
 import PIL
+import numpy as np
 from marqo.s2_inference import random_utils, s2_inference
 from marqo.s2_inference.s2_inference import get_available_models
 import unittest
 from unittest import mock
 from marqo.api.exceptions import ConfigurationError, InternalError
-from marqo.tensor_search.enums import AvailableModelsKey
+from marqo.tensor_search.enums import AvailableModelsKey, EnvVars
 from marqo.s2_inference.multimodal_model_load import Modality
 import datetime
 
@@ -301,6 +304,41 @@ class TestVectoriseBatching(unittest.TestCase):
             s2_inference.vectorise(model_name='mock_model', content=self.content_list,
                                    model_properties=self.mock_model_props, device="cpu")
 
+    @mock.patch('marqo.s2_inference.s2_inference._available_models', {})
+    @mock.patch('marqo.s2_inference.s2_inference._update_available_models', mock.MagicMock())
+    @mock.patch.dict(os.environ, {EnvVars.MARQO_MAX_VECTORISE_BATCH_SIZE: "2",
+                                  EnvVars.MARQO_ENABLE_LENGTH_BUCKETED_BATCHING: "TRUE"})
+    def test_vectorise_length_bucketed_batching(self):
+        get_available_models().update(self.mock_available_models)
+        # Each vector records the length of the content it was generated from
+        self.mock_model.encode.side_effect = lambda batch, **kwargs: np.array([[len(c), 1.0] for c in batch])
+
+        content = ['a' * 5, 'b' * 500, 'c' * 6, 'd' * 499, 'e' * 7]
+        result = s2_inference.vectorise(model_name='mock_model', content=content,
+                                        model_properties=self.mock_model_props, device="cpu",
+                                        normalize_embeddings=False)
+
+        call_args_list = self.mock_model.encode.call_args_list
+        self.assertEqual(['b' * 500, 'd' * 499], call_args_list[0][0][0])
+        self.assertEqual(['e' * 7, 'c' * 6], call_args_list[1][0][0])
+        self.assertEqual(['a' * 5], call_args_list[2][0][0])
+        # Results are returned in the original order
+        self.assertEqual([len(c) for c in content], [vector[0] for vector in result])
+
+    @mock.patch('marqo.s2_inference.s2_inference._available_models', {})
+    @mock.patch('marqo.s2_inference.s2_inference._update_available_models', mock.MagicMock())
+    @mock.patch.dict(os.environ, {EnvVars.MARQO_MAX_VECTORISE_BATCH_SIZE: "2",
+                                  EnvVars.MARQO_ENABLE_LENGTH_BUCKETED_BATCHING: "FALSE"})
+    def test_vectorise_length_bucketed_batching_disabled(self):
+        get_available_models().update(self.mock_available_models)
+        content = ['a' * 5, 'b' * 500, 'c' * 6]
+        s2_inference.vectorise(model_name='mock_model', content=content,
+                               model_properties=self.mock_model_props, device="cpu")
+
+        call_args_list = self.mock_model.encode.call_args_list
+        self.assertEqual(content[:2], call_args_list[0][0][0])
+        self.assertEqual(content[2:], call_args_list[1][0][0])
+
     @mock.patch('marqo.s2_inference.s2_inference.read_env_vars_and_defaults',
                 side_effect=[1, "1", "100", 10])
     def test__get_max_vectorise_batch_size(self, mock_read_env_vars_and_defaults):
@@ -9,10 +9,11 @@ from marqo import exceptions as base_exceptions
 from marqo.core import exceptions as core_exceptions
 from marqo.core.models.marqo_index import FieldType
 from marqo.core.models.marqo_index_request import FieldRequest
-from marqo.tensor_search.enums import EnvVars
+from marqo.tensor_search.enums import EnvVars, ImportFormat, VectorFormat
 from marqo.vespa import exceptions as vespa_exceptions
 from tests.marqo_test import MarqoTestCase
 from marqo.core.models.marqo_add_documents_response import MarqoAddDocumentsResponse, MarqoAddDocumentsItem
+from marqo.core.models.marqo_import_documents_response import MarqoImportDocumentsResponse
 import importlib
 import sys
 import os
@@ -50,6 +51,37 @@ class ApiTests(MarqoTestCase):
             self.assertEqual(response.status_code, 200)
             mock_add_documents.assert_called_once()
 
+    def test_export_documents_streamsNdjson(self):
+        with mock.patch('marqo.core.document.document.Document.export_documents_by_index_name') as mock_export:
+            mock_export.return_value = iter([[{'_id': '1'}, {'_id': '2'}], [{'_id': '3'}]])
+            response = self.client.get("/indexes/index1/documents/export?includeVectors=true&vectorFormat=binary")
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/x-ndjson', response.headers['content-type'])
+        self.assertEqual('{"_id": "1"}\n{"_id": "2"}\n{"_id": "3"}\n', response.text)
+        mock_export.assert_called_once_with(index_name='index1', include_vectors=True,
+                                            vector_format=VectorFormat.Binary, filter_string=None)
+
+    def test_import_documents_ndjsonBodyStreamedToImport(self):
+        received = {}
+
+        def import_documents(index_name, file, import_format):
+            received['lines'] = [line for line in file]
+            received['args'] = (index_name, import_format)
+            return MarqoImportDocumentsResponse(errors=False, received_count=2, imported_count=2, failed_count=0,
+                                                failures=[], processing_time_ms=1.0)
+
+        body = (chunk for chunk in [b'{"_id": "1"}\n{"_i', b'd": "2"}\n'])
+        with mock.patch('marqo.core.document.document.Document.import_documents_by_index_name',
+                        side_effect=import_documents):
+            response = self.client.post("/indexes/index1/documents/import?format=ndjson", data=body)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'errors': False, 'receivedCount': 2, 'importedCount': 2, 'failedCount': 0,
+                          'failures': [], 'processingTimeMs': 1.0}, response.json())
+        self.assertEqual([b'{"_id": "1"}\n', b'{"_id": "2"}\n'], received['lines'])
+        self.assertEqual(('index1', ImportFormat.Ndjson), received['args'])
+
     def test_memory(self):
         """
         Test that the memory endpoint returns the expected keys when debug API is enabled.
@@ -74,6 +106,26 @@ class ApiTests(MarqoTestCase):
             response = self.client.get("/memory")
             self.assertEqual(response.status_code, 403)
 
+    def test_memory_diff(self):
+        with patch.dict('os.environ', {EnvVars.MARQO_ENABLE_DEBUG_API: 'TRUE'}):
+            response = self.client.get("/memory?diffSeconds=0.1&limit=3")
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.json()["stats"]), 3)
+
+            response = self.client.get("/memory?diffSeconds=0")
+            self.assertEqual(response.status_code, 400)
+
+    def test_cpu_profile(self):
+        with patch.dict('os.environ', {EnvVars.MARQO_ENABLE_DEBUG_API: 'TRUE'}):
+            response = self.client.get("/profile/cpu?seconds=0.1&interval=0.01&includeIdle=true")
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+            self.assertTrue(response.text)
+
+    def test_cpu_profile_defaultDisabled(self):
+        response = self.client.get("/profile/cpu?seconds=0.1")
+        self.assertEqual(response.status_code, 403)
+
     def test_custom_search_limit(self):
         """
         Test that the search endpoint returns the expected search limit when MARQO_MAX_SEARCH_LIMIT is set.
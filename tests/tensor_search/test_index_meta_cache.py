@@ -1,11 +1,15 @@
 import copy
+import hashlib
+import json
 import os
 import datetime
 import threading
 import time
 import unittest
 
+import httpx
 import requests
+from marqo.core.index_management.index_management import IndexManagement
 from marqo.core.models.add_docs_params import AddDocsParams
 from marqo.tensor_search import tensor_search
 from marqo.tensor_search import index_meta_cache
@@ -16,6 +20,7 @@ from marqo.tensor_search.enums import TensorField, SearchMethod
 from tests.marqo_test import MarqoTestCase
 from unittest import mock
 from marqo.api import exceptions, configs
+from marqo.vespa.vespa_client import VespaClient
 
 
 @unittest.skip
@@ -688,3 +693,142 @@ class TestIndexMetaCache(MarqoTestCase):
             return True
 
         assert run()
+
+
+class TestVersionedIndexMetaCache(MarqoTestCase):
+    """Tests the cache against a fake Vespa index settings handler that supports ETags"""
+
+    def setUp(self) -> None:
+        self.settings = {
+            'index1': self._settings('index1', version=1),
+            'index2': self._settings('index2', version=1),
+        }
+        self.requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            path = request.url.path
+            settings = list(self.settings.values()) if path == '/index-settings' \
+                else self.settings.get(path.split('/')[-1])
+            status = 200 if settings is not None else 404
+            body = json.dumps(settings) if settings is not None else '{"error": "not found"}'
+            etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+            if settings is not None and request.headers.get('If-None-Match') == etag:
+                status, body = 304, ''
+            self.requests.append((path, status))
+            return httpx.Response(status, content=body.encode(), headers={'ETag': etag} if settings else None)
+
+        vespa_client = VespaClient('http://localhost:19071', 'http://localhost:8080', 'http://localhost:8080',
+                                   'content_default')
+        vespa_client.http_client = httpx.Client(transport=httpx.MockTransport(handler))
+        self.handler = handler
+        self.index_management = IndexManagement(vespa_client)
+
+        index_meta_cache.empty_cache()
+        self.addCleanup(index_meta_cache.empty_cache)
+        # Don't start the refresh thread
+        patcher = mock.patch.object(index_meta_cache, '_check_refresh_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _settings(self, name, version, created_at=1):
+        index = self.unstructured_marqo_index(name=name, schema_name=name)
+        return json.loads(index.copy(update={'version': version, 'created_at': created_at}).json())
+
+    def test_populate_cache_notModified_keepsIndexes(self):
+        index_meta_cache.populate_cache(self.index_management)
+        cache = index_meta_cache.get_cache()
+
+        index_meta_cache.populate_cache(self.index_management)
+
+        self.assertIs(cache, index_meta_cache.get_cache())
+        self.assertEqual([('/index-settings', 200), ('/index-settings', 304)], self.requests)
+
+    def test_populate_cache_modified_onlyParsesChangedIndexes(self):
+        index_meta_cache.populate_cache(self.index_management)
+        index1 = index_meta_cache.get_cache()['index1']
+        index2 = index_meta_cache.get_cache()['index2']
+
+        self.settings['index2'] = self._settings('index2', version=2)
+        self.settings['index3'] = self._settings('index3', version=1)
+        index_meta_cache.populate_cache(self.index_management)
+
+        cache = index_meta_cache.get_cache()
+        self.assertEqual({'index1', 'index2', 'index3'}, set(cache))
+        self.assertIs(index1, cache['index1'])
+        self.assertIsNot(index2, cache['index2'])
+        self.assertEqual(2, cache['index2'].version)
+
+    def test_populate_cache_recreatedIndex_parsed(self):
+        index_meta_cache.populate_cache(self.index_management)
+        index1 = index_meta_cache.get_cache()['index1']
+
+        self.settings['index1'] = self._settings('index1', version=1, created_at=2)
+        index_meta_cache.populate_cache(self.index_management)
+
+        self.assertIsNot(index1, index_meta_cache.get_cache()['index1'])
+        self.assertEqual(2, index_meta_cache.get_cache()['index1'].created_at)
+
+    def test_populate_cache_deletedIndex_removed(self):
+        index_meta_cache.populate_cache(self.index_management)
+
+        del self.settings['index2']
+        index_meta_cache.populate_cache(self.index_management)
+
+        self.assertEqual({'index1'}, set(index_meta_cache.get_cache()))
+
+    def test_get_index_forceRefresh_conditional(self):
+        index = index_meta_cache.get_index(self.index_management, 'index1', force_refresh=True)
+        not_modified_index = index_meta_cache.get_index(self.index_management, 'index1', force_refresh=True)
+        # A copy of the cached index, so that callers cannot modify it
+        self.assertEqual(index, not_modified_index)
+        self.assertIsNot(index, not_modified_index)
+        self.assertIs(index, index_meta_cache.get_cache()['index1'])
+
+        self.settings['index1'] = self._settings('index1', version=2)
+        updated_index = index_meta_cache.get_index(self.index_management, 'index1', force_refresh=True)
+
+        self.assertEqual(2, updated_index.version)
+        self.assertIs(updated_index, index_meta_cache.get_cache()['index1'])
+        self.assertEqual([('/index-settings/index1', 200), ('/index-settings/index1', 304),
+                          ('/index-settings/index1', 200)], self.requests)
+
+    def test_get_index_forceRefresh_cacheReplaced_unconditional(self):
+        index_meta_cache.get_index(self.index_management, 'index1', force_refresh=True)
+        # The refresh thread replaced the index the ETag was returned with
+        index_meta_cache.get_cache()['index1'] = self.unstructured_marqo_index(name='index1', schema_name='index1')
+
+        index = index_meta_cache.get_index(self.index_management, 'index1', force_refresh=True)
+
+        self.assertEqual(1, index.version)
+        self.assertEqual([('/index-settings/index1', 200), ('/index-settings/index1', 200)], self.requests)
+
+    def test_get_index_forceRefresh_deletedIndex_raises(self):
+        index_meta_cache.get_index(self.index_management, 'index1', force_refresh=True)
+        del self.settings['index1']
+
+        with self.assertRaises(IndexNotFoundError):
+            index_meta_cache.get_index(self.index_management, 'index1', force_refresh=True)
+
+    def test_empty_cache_resetsEtags(self):
+        index_meta_cache.populate_cache(self.index_management)
+        index_meta_cache.empty_cache()
+
+        index_meta_cache.populate_cache(self.index_management)
+
+        self.assertEqual({'index1', 'index2'}, set(index_meta_cache.get_cache()))
+        self.assertEqual([('/index-settings', 200), ('/index-settings', 200)], self.requests)
+
+    def test_populate_cache_noEtagSupport_alwaysFetches(self):
+        def handler_without_etag(request):
+            response = self.handler(request)
+            return httpx.Response(response.status_code, content=response.content)
+
+        self.index_management.vespa_client.http_client = httpx.Client(
+            transport=httpx.MockTransport(handler_without_etag))
+
+        index_meta_cache.populate_cache(self.index_management)
+        index1 = index_meta_cache.get_cache()['index1']
+        index_meta_cache.populate_cache(self.index_management)
+
+        self.assertIs(index1, index_meta_cache.get_cache()['index1'])
+        self.assertEqual([('/index-settings', 200), ('/index-settings', 200)], self.requests)
@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+from unittest import mock
+
+from marqo.api.exceptions import TooManyRequestsError
+from marqo.tensor_search import prometheus_exporter
+from marqo.tensor_search.enums import EnvVars, RequestType
+from marqo.tensor_search.telemetry import RequestMetricsStore
+from marqo.tensor_search.throttling import local_throttle
+from marqo.tensor_search.throttling.local_throttle import ConcurrencyLimiter
+from marqo.tensor_search.throttling.redis_throttle import throttle
+from tests.marqo_test import MarqoTestCase
+
+
+class TestConcurrencyLimiter(MarqoTestCase):
+
+    def test_acquire_underLimit_admitted(self):
+        limiter = ConcurrencyLimiter(2)
+
+        self.assertTrue(limiter.acquire(0))
+        self.assertTrue(limiter.acquire(0))
+        self.assertFalse(limiter.acquire(0))
+        self.assertEqual({'limit': 2, 'in_flight': 2, 'queued': 0}, limiter.stats())
+
+    def test_acquire_slotFreedWithinTimeout_admitted(self):
+        limiter = ConcurrencyLimiter(1)
+        limiter.acquire(0)
+        threading.Timer(0.1, limiter.release, args=[time.monotonic()]).start()
+
+        self.assertTrue(limiter.acquire(5))
+
+    def test_acquire_timeout_rejected(self):
+        limiter = ConcurrencyLimiter(1)
+        limiter.acquire(0)
+
+        start = time.monotonic()
+        self.assertFalse(limiter.acquire(0.1))
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertEqual(0, limiter.stats()['queued'])
+
+    def test_release_slowRequests_limitDecreasedOnce(self):
+        limiter = ConcurrencyLimiter(10, target_latency_seconds=0.01)
+        started_at = time.monotonic() - 1
+        for _ in range(5):
+            limiter.acquire(0)
+
+        for _ in range(5):
+            limiter.release(started_at)
+
+        self.assertEqual(9, limiter.limit)
+
+    def test_release_fastRequests_limitIncreasedUpToMax(self):
+        limiter = ConcurrencyLimiter(10, target_latency_seconds=0.01)
+        limiter.acquire(0)
+        limiter.release(time.monotonic() - 1)
+        self.assertEqual(9, limiter.limit)
+
+        for _ in range(100):
+            limiter.acquire(0)
+            limiter.release(time.monotonic())
+
+        self.assertEqual(10, limiter.limit)
+
+    def test_release_notAdaptive_limitFixed(self):
+        limiter = ConcurrencyLimiter(3)
+        limiter.acquire(0)
+        limiter.release(time.monotonic() - 100)
+
+        self.assertEqual(3, limiter.limit)
+
+    def test_set_max_concurrency_limitUpdated(self):
+        limiter = ConcurrencyLimiter(3)
+        limiter.set_max_concurrency(5)
+
+        self.assertEqual(5, limiter.limit)
+
+
+class TestLocalThrottle(MarqoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        local_throttle._limiters.clear()
+        self.addCleanup(local_throttle._limiters.clear)
+        env = mock.patch.dict(os.environ, {
+            EnvVars.MARQO_ENABLE_THROTTLING: 'LOCAL',
+            EnvVars.MARQO_MAX_CONCURRENT_SEARCH: '1',
+        })
+        env.start()
+        self.addCleanup(env.stop)
+
+    def test_throttle_local_noRedis(self):
+        @throttle(RequestType.SEARCH)
+        def search():
+            return 'result'
+
+        with mock.patch('marqo.tensor_search.throttling.redis_throttle.redis_driver') as mock_redis_driver:
+            self.assertEqual('result', search())
+
+        mock_redis_driver.get_db.assert_not_called()
+        self.assertEqual({'limit': 1, 'in_flight': 0, 'queued': 0},
+                         local_throttle.get_limiter_stats()[RequestType.SEARCH])
+
+    def test_throttle_local_limitExceeded_raisesTooManyRequests(self):
+        running = threading.Event()
+        release = threading.Event()
+
+        @throttle(RequestType.SEARCH)
+        def search():
+            running.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=search)
+        thread.start()
+        self.assertTrue(running.wait(5))
+        rejected_before = RequestMetricsStore.for_request().counter['throttling.SEARCH.rejected']
+        try:
+            with self.assertRaises(TooManyRequestsError):
+                search()
+        finally:
+            release.set()
+            thread.join(5)
+
+        self.assertEqual(1, RequestMetricsStore.for_request().counter['throttling.SEARCH.rejected']
+                         - rejected_before)
+
+    def test_throttle_local_queueTimeout_waitsForSlot(self):
+        running = threading.Event()
+
+        @throttle(RequestType.SEARCH)
+        def search(duration):
+            running.set()
+            time.sleep(duration)
+            return duration
+
+        thread = threading.Thread(target=search, args=(0.1,))
+        thread.start()
+        self.assertTrue(running.wait(5))
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_THROTTLING_QUEUE_TIMEOUT_MS: '5000'}):
+            self.assertEqual(0, search(0))
+        thread.join(5)
+
+        self.assertIn('throttling.SEARCH.queue_wait', RequestMetricsStore.for_request().timings)
+
+    def test_throttle_local_functionFails_slotReleased(self):
+        @throttle(RequestType.SEARCH)
+        def search():
+            raise ValueError('failed')
+
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                search()
+
+        self.assertEqual(0, local_throttle.get_limiter_stats()[RequestType.SEARCH]['in_flight'])
+
+    def test_generate_latest_localThrottling_gauges(self):
+        local_throttle.get_limiter(RequestType.SEARCH, 4)
+
+        output = prometheus_exporter.generate_latest(aggregator=prometheus_exporter.RequestMetricsAggregator())
+
+        self.assertIn('marqo_throttling_concurrency_limit{request_type="SEARCH"} 4', output)
+        self.assertIn('marqo_throttling_queued{request_type="SEARCH"} 0', output)
@@ -1,7 +1,9 @@
+import io
 import unittest
 from unittest.mock import Mock, patch, MagicMock
-from PIL import UnidentifiedImageError
+from PIL import Image, UnidentifiedImageError
 import torch
+from marqo.s2_inference.clip_utils import _get_transform
 from marqo.s2_inference.errors import UnsupportedModalityError, S2InferenceError
 from marqo.tensor_search.add_docs import threaded_download_and_preprocess_content
 from marqo.core.models.marqo_index import IndexType, MarqoIndex, FieldType
@@ -404,4 +406,30 @@ class TestThreadedDownloadAndPreprocess(unittest.TestCase):
                     str(media_repo[self.mock_audio_url]))
 
         # Verify that download_and_chunk_media was not called
-        mock_download_and_chunk.assert_not_called()
\ No newline at end of file
+        mock_download_and_chunk.assert_not_called()
+    @patch("marqo.tensor_search.add_docs.clip_utils.load_image_from_path")
+    @patch("marqo.tensor_search.add_docs.infer_modality")
+    def test_image_preprocessing_batched(self, mock_infer_modality, mock_load_image):
+        preprocess = _get_transform(32)
+        images = {f"https://example.com/image_{i}.png": Image.new("RGB", (40 + i * 10, 30), color=(i * 40, 0, 255))
+                  for i in range(3)}
+        jpeg = io.BytesIO()
+        Image.effect_noise((64, 64), 64).convert("RGB").save(jpeg, format="JPEG")
+        truncated_url = "https://example.com/truncated.jpg"
+        images[truncated_url] = Image.open(io.BytesIO(jpeg.getvalue()[:-500]))
+
+        mock_infer_modality.return_value = Modality.IMAGE
+        mock_load_image.side_effect = lambda url, *args, **kwargs: images[url]
+
+        docs = [{"field1": url} for url in images]
+        media_repo = {}
+        threaded_download_and_preprocess_content(
+            docs, media_repo, ["field1"], {}, device="cpu",
+            marqo_index_type=self.mock_marqo_index.type,
+            marqo_index_model=self.mock_marqo_index.model,
+            preprocessors={"image": preprocess}
+        )
+
+        for url in list(images)[:3]:
+            self.assertTrue(torch.equal(preprocess(images[url]), media_repo[url]))
+        self.assertIsInstance(media_repo[truncated_url], OSError)
@@ -0,0 +1,164 @@
+import threading
+import unittest
+from unittest import mock
+
+from marqo.inference.inference_cache.marqo_inference_cache import MarqoInferenceCache
+from marqo.s2_inference import s2_inference
+from marqo.tensor_search import prometheus_exporter
+from marqo.tensor_search.enums import AvailableModelsKey
+from marqo.tensor_search.prometheus_exporter import RequestMetricsAggregator, generate_latest, normalise_metric_key
+from marqo.tensor_search.telemetry import RequestMetrics
+
+
+def _request_metrics(times=None, counters=None) -> RequestMetrics:
+    metrics = RequestMetrics()
+    for key, value in (times or {}).items():
+        for time_ms in (value if isinstance(value, list) else [value]):
+            metrics.add_time(key, time_ms)
+    for key, count in (counters or {}).items():
+        metrics.increment_counter(key, count)
+    return metrics
+
+
+class TestRequestMetricsAggregator(unittest.TestCase):
+
+    def setUp(self):
+        self.aggregator = RequestMetricsAggregator(buckets=(0.01, 0.1, 1))
+
+    def test_record_timesAndCounters(self):
+        self.aggregator.record(_request_metrics(times={'search.vector.vespa': [5, 50]},
+                                                counters={'search.errors': 2}))
+        self.aggregator.record(_request_metrics(times={'search.vector.vespa': 5000}, counters={'search.errors': 1}))
+
+        counters, histograms = self.aggregator.snapshot()
+
+        self.assertEqual({'search.errors': 3}, counters)
+        # cumulative bucket counts, +Inf, sum
+        self.assertEqual([1, 2, 2, 3, 5.055], histograms['search.vector.vespa'])
+
+    def test_record_bucketsEstimatedBeyondReservoir(self):
+        metrics = RequestMetrics(reservoir_size=4)
+        for _ in range(100):
+            metrics.add_time('key', 5)
+        self.aggregator.record(metrics)
+
+        histogram = self.aggregator.snapshot()[1]['key']
+        self.assertEqual([100, 100, 100, 100], histogram[:-1])
+        self.assertAlmostEqual(0.5, histogram[-1])
+
+    def test_record_bucketBoundIsInclusive(self):
+        self.aggregator.record(_request_metrics(times={'key': 100}))
+        self.assertEqual([0, 1, 1, 1], self.aggregator.snapshot()[1]['key'][:-1])
+
+    def test_record_concurrentThreadsAllCounted(self):
+        def record():
+            for _ in range(1000):
+                self.aggregator.record(_request_metrics(times={'key': 1}, counters={'count': 1}))
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        counters, histograms = self.aggregator.snapshot()
+        self.assertEqual(8000, counters['count'])
+        self.assertEqual(8000, histograms['key'][-2])
+        self.assertEqual(8, len(self.aggregator._shards))
+
+    def test_clear(self):
+        self.aggregator.record(_request_metrics(counters={'count': 1}))
+        self.aggregator.clear()
+        self.assertEqual(({}, {}), self.aggregator.snapshot())
+
+        self.aggregator.record(_request_metrics(counters={'count': 1}))
+        self.assertEqual({'count': 1}, self.aggregator.snapshot()[0])
+
+    def test_normalise_metric_key(self):
+        cases = [
+            ('POST /indexes/my-index/search', 'POST /indexes/{index_name}/search'),
+            ('image_download.http://example.com/a.jpg', 'image_download.image'),
+            ('image_download.full_time', 'image_download.full_time'),
+            ('doc.1.thread_time', 'add_documents.thread_time'),
+            ('http://example.com/a.jpg.OSError', 'add_documents.OSError'),
+            ('search.vector_inference_full_pipeline', 'search.vector_inference_full_pipeline'),
+        ]
+        for key, expected in cases:
+            with self.subTest(key=key):
+                self.assertEqual(expected, normalise_metric_key(key))
+
+
+class TestGenerateLatest(unittest.TestCase):
+
+    def setUp(self):
+        self.aggregator = RequestMetricsAggregator(buckets=(0.1, 1))
+
+    def test_generate_latest_requestMetrics(self):
+        self.aggregator.record(_request_metrics(times={'POST /indexes/my-index/search': 50},
+                                                counters={'search.errors': 1}))
+
+        output = generate_latest(aggregator=self.aggregator)
+
+        self.assertIn('# TYPE marqo_request_operation_duration_seconds histogram', output)
+        self.assertIn('marqo_request_operation_duration_seconds_bucket'
+                      '{key="POST /indexes/{index_name}/search",le="0.1"} 1', output)
+        self.assertIn('marqo_request_operation_duration_seconds_bucket'
+                      '{key="POST /indexes/{index_name}/search",le="+Inf"} 1', output)
+        self.assertIn('marqo_request_operation_duration_seconds_sum{key="POST /indexes/{index_name}/search"} 0.05',
+                      output)
+        self.assertIn('marqo_request_operation_total{key="search.errors"} 1', output)
+        self.assertTrue(output.endswith('\n'))
+
+    def test_generate_latest_labelValuesEscaped(self):
+        self.aggregator.record(_request_metrics(counters={'a "quoted"\\key': 1}))
+        self.assertIn('marqo_request_operation_total{key="a \\"quoted\\"\\\\key"} 1',
+                      generate_latest(aggregator=self.aggregator))
+
+    def test_generate_latest_inferenceCache(self):
+        cache = MarqoInferenceCache(cache_size=10)
+        cache.set('model', 'hello', [1.0])
+        cache.get('model', 'hello')
+        cache.get('model', 'hello')
+        cache.get('model', 'world')
+
+        with mock.patch.object(s2_inference, 'get_marqo_inference_cache', return_value=cache):
+            output = generate_latest(aggregator=self.aggregator)
+
+        self.assertIn('marqo_inference_cache_hits_total 2', output)
+        self.assertIn('marqo_inference_cache_misses_total 1', output)
+        self.assertIn('marqo_inference_cache_hit_ratio 0.6666666666666666', output)
+        self.assertIn('marqo_inference_cache_entries 1', output)
+
+    def test_generate_latest_inferenceCacheDisabled(self):
+        with mock.patch.object(s2_inference, 'get_marqo_inference_cache',
+                               return_value=MarqoInferenceCache(cache_size=0)):
+            self.assertNotIn('marqo_inference_cache', generate_latest(aggregator=self.aggregator))
+
+    def test_generate_latest_loadedModels(self):
+        available_models = {
+            'model-a||cpu': {AvailableModelsKey.model_size: 1.5},
+            'model-b||cpu': {AvailableModelsKey.model_size: 0.5},
+            'model-c||cuda': {AvailableModelsKey.model_size: 2},
+        }
+        with mock.patch.object(s2_inference, 'get_available_models', return_value=available_models):
+            output = generate_latest(aggregator=self.aggregator)
+
+        self.assertIn('marqo_loaded_models{device="cpu"} 2', output)
+        self.assertIn('marqo_loaded_models_memory_gigabytes{device="cpu"} 2', output)
+        self.assertIn('marqo_loaded_models_memory_gigabytes{device="cuda"} 2', output)
+
+    def test_generate_latest_threadpools(self):
+        executor = mock.Mock()
+        executor.stats.return_value = {'queue_depth': 3, 'interactive_queue_depth': 1, 'bulk_queue_depth': 2,
+                                       'bulk_worker_limit': 1, 'workers': [{'busy': True}, {'busy': False}]}
+        with mock.patch.object(prometheus_exporter.inference_executor, 'get_inference_executor',
+                               return_value=executor):
+            output = generate_latest(request_threadpool={'busy_threads': 40, 'queue_depth': 7},
+                                     aggregator=self.aggregator)
+
+        self.assertIn('marqo_request_threadpool_busy_threads 40', output)
+        self.assertIn('marqo_request_threadpool_queue_depth 7', output)
+        self.assertIn('marqo_inference_workers_busy 1', output)
+        self.assertIn('marqo_inference_queue_depth 3', output)
+        self.assertIn('marqo_inference_queue_depth_by_workload{workload="bulk"} 2', output)
+        self.assertIn('marqo_inference_bulk_worker_limit 1', output)
@@ -0,0 +1,114 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+from marqo.api import exceptions as api_exceptions
+from marqo.s2_inference.s2_inference import clear_loaded_models
+from marqo.tensor_search import tensor_search, rerank_cache
+from marqo.tensor_search.enums import EnvVars, SearchMethod
+from marqo.tensor_search.rerank_cache import RerankedResultsCache, create_cache_key
+from marqo.tensor_search.telemetry import RequestMetricsStore
+
+
+def _lexical_search_results(result_count, offset, **kwargs):
+    return {"hits": [{"_id": f"doc-{i}", "_score": 1.0 / (i + 1), "_highlights": [],
+                      "title": f"title of document {i}. it has two sentences."}
+                     for i in range(offset, offset + result_count)]}
+
+
+class TestSearchWithRerankDepth(unittest.TestCase):
+
+    def setUp(self):
+        rerank_cache.clear_rerank_cache()
+        self.lexical_search = mock.patch.object(tensor_search, "_lexical_search",
+                                                side_effect=_lexical_search_results)
+        self.mock_lexical_search = self.lexical_search.start()
+
+        # there is no TelemetryMiddleware to set up the request metrics
+        self.request_patcher = mock.patch('marqo.tensor_search.telemetry.RequestMetricsStore._get_request')
+        mock_request = mock.Mock()
+        self.request_patcher.start().return_value = mock_request
+        RequestMetricsStore.set_in_request(mock_request)
+
+    def tearDown(self):
+        self.request_patcher.stop()
+        self.lexical_search.stop()
+        rerank_cache.clear_rerank_cache()
+        clear_loaded_models()
+
+    def _search(self, offset=0, limit=10, **kwargs):
+        search_kwargs = dict(config=mock.MagicMock(), index_name="my-index", text="title", result_count=limit,
+                             offset=offset, search_method=SearchMethod.LEXICAL, searchable_attributes=["title"],
+                             reranker="_testing", rerank_depth=50, device="cpu")
+        search_kwargs.update(kwargs)
+        return tensor_search.search(**search_kwargs)
+
+    def test_rerankDepth_retrievesDepthOnce(self):
+        pages = [self._search(offset=offset) for offset in range(0, 50, 10)]
+
+        self.mock_lexical_search.assert_called_once()
+        self.assertEqual(50, self.mock_lexical_search.call_args.kwargs["result_count"])
+        self.assertEqual(0, self.mock_lexical_search.call_args.kwargs["offset"])
+
+        # the pages partition the reranked candidates, in reranked order
+        ids = [hit["_id"] for page in pages for hit in page["hits"]]
+        self.assertEqual(sorted(f"doc-{i}" for i in range(50)), sorted(ids))
+        scores = [hit["_score"] for page in pages for hit in page["hits"]]
+        self.assertEqual(sorted(scores, reverse=True), scores)
+        self.assertEqual([10, 10], [pages[1]["offset"], pages[1]["limit"]])
+
+    def test_rerankDepth_pageBeyondDepthIsEmpty(self):
+        self.assertEqual([], self._search(offset=50)["hits"])
+        self.assertEqual(5, len(self._search(offset=45)["hits"]))
+
+    def test_rerankDepth_differentSearchesNotShared(self):
+        self._search()
+        self._search(filter="title:(x)")
+        self._search(rerank_depth=20)
+        self.assertEqual(3, self.mock_lexical_search.call_count)
+
+    def test_rerankDepth_cacheDisabled(self):
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_RERANK_CACHE_TTL: "0"}):
+            first = self._search()
+            self._search(offset=10)
+        self.assertEqual(2, self.mock_lexical_search.call_count)
+        self.assertEqual(10, len(first["hits"]))
+
+    def test_rerankDepth_cachedResultsNotModifiedByCaller(self):
+        self._search()["hits"].clear()
+        self.assertEqual(10, len(self._search()["hits"]))
+
+    def test_rerankDepth_requiresReranker(self):
+        with self.assertRaises(api_exceptions.InvalidArgError):
+            self._search(reranker=None)
+
+    def test_rerankDepth_invalid(self):
+        for rerank_depth in [0, -1, 1.5]:
+            with self.subTest(rerank_depth=rerank_depth):
+                with self.assertRaises(api_exceptions.InvalidArgError):
+                    self._search(rerank_depth=rerank_depth)
+
+    def test_rerankDepth_aboveMaxSearchLimit(self):
+        with mock.patch.dict(os.environ, {EnvVars.MARQO_MAX_SEARCH_LIMIT: "20"}):
+            with self.assertRaises(api_exceptions.IllegalRequestedDocCount):
+                self._search()
+
+    def test_noRerankDepth_retrievesWindow(self):
+        self._search(offset=10, rerank_depth=None)
+        self.assertEqual(10, self.mock_lexical_search.call_args.kwargs["offset"])
+        self.assertEqual(10, self.mock_lexical_search.call_args.kwargs["result_count"])
+
+
+class TestRerankedResultsCache(unittest.TestCase):
+
+    def test_entriesExpire(self):
+        cache = RerankedResultsCache(maxsize=10, ttl=0.05)
+        cache.set("key", {"hits": []})
+        self.assertEqual({"hits": []}, cache.get("key"))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("key"))
+
+    def test_create_cache_key_orderIndependent(self):
+        self.assertEqual(create_cache_key(a=1, b=["x"]), create_cache_key(b=["x"], a=1))
+        self.assertNotEqual(create_cache_key(a=1, b=["x"]), create_cache_key(a=1, b=["y"]))
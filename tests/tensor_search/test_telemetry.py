@@ -9,7 +9,10 @@ from starlette.responses import JSONResponse, StreamingResponse
 from starlette.responses import Response
 from starlette.testclient import TestClient
 
-from marqo.tensor_search.telemetry import RequestMetricsStore, TelemetryMiddleware, Timer, TimerError
+from marqo.tensor_search import prometheus_exporter
+from marqo.tensor_search.add_docs import thread_independent_metric_key
+from marqo.tensor_search.telemetry import RequestMetrics, RequestMetricsStore, TelemetryMiddleware, Timer, \
+    TimerError
 
 
 class TestTimer(unittest.TestCase):
@@ -200,6 +203,83 @@ class TestRequestMetricsStore(unittest.TestCase):
         self.assertEqual(expected_json, metric.json())
 
 
+class TestRequestMetrics(unittest.TestCase):
+
+    def test_add_time_repeatedKey(self):
+        metric = RequestMetrics()
+        for v in [3.0, 1.0, 2.0]:
+            metric.add_time("key", v)
+        self.assertEqual({"counter": {}, "timesMs": {"key": [3.0, 1.0, 2.0]}}, metric.json())
+
+        stats = metric.timings["key"]
+        self.assertEqual((3, 6.0, 1.0, 3.0), (stats.count, stats.total, stats.min, stats.max))
+
+    def test_add_time_beyondReservoirIsSummarised(self):
+        metric = RequestMetrics(reservoir_size=10)
+        for v in range(1000):
+            metric.add_time("key", float(v))
+
+        summary = metric.json()["timesMs"]["key"]
+        self.assertEqual(1000, summary["count"])
+        self.assertEqual(sum(range(1000)), summary["total"])
+        self.assertEqual((0.0, 999.0), (summary["min"], summary["max"]))
+        self.assertEqual(10, len(summary["samples"]))
+        self.assertTrue(set(summary["samples"]) <= set(float(v) for v in range(1000)))
+
+    def test_times_compatibleView(self):
+        metric = RequestMetrics()
+        metric.times["a"] = 1.0
+        metric.times["b"] = [1.0, 2.0]
+        self.assertEqual({"a": 1.0, "b": [1.0, 2.0]}, dict(metric.times))
+
+        metric.add_time("a", 3.0)
+        self.assertEqual([1.0, 3.0], metric.times["a"])
+
+        metric.times = {"c": 4.0}
+        self.assertEqual({"c": 4.0}, dict(metric.times))
+
+    def test_reduce_from_list(self):
+        first, second, third = RequestMetrics(), RequestMetrics(), RequestMetrics()
+        first.add_time("key", 1.0)
+        second.add_time("key", 2.0)
+        second.increment_counter("count", 2)
+        third.add_time("other", 3.0)
+        third.increment_counter("count")
+        metrics = [first, second, third]
+
+        reduced = RequestMetrics.reduce_from_list(metrics)
+
+        self.assertIs(first, reduced)
+        self.assertEqual(3, len(metrics))
+        self.assertEqual({"counter": {"count": 3}, "timesMs": {"key": [1.0, 2.0], "other": 3.0}}, reduced.json())
+        # The merged metrics are not changed
+        self.assertEqual({"counter": {"count": 2}, "timesMs": {"key": 2.0}}, second.json())
+
+    def test_merge_beyondReservoir(self):
+        first, second = RequestMetrics(reservoir_size=10), RequestMetrics(reservoir_size=10)
+        for v in range(30):
+            first.add_time("key", 1.0)
+        for v in range(30):
+            second.add_time("key", 2.0)
+
+        first.merge(second)
+
+        stats = first.timings["key"]
+        self.assertEqual((60, 90.0, 1.0, 2.0), (stats.count, stats.total, stats.min, stats.max))
+        self.assertEqual([1.0] * 5 + [2.0] * 5, sorted(stats.samples))
+
+    def test_merge_keys(self):
+        metric = RequestMetrics()
+        metric.add_time("image_download.700.thread_time", 1.0)
+        metric.add_time("image_download.729.thread_time", 2.0)
+        metric.add_time("image_download.full_time", 3.0)
+
+        metric.merge_keys(thread_independent_metric_key)
+
+        self.assertEqual({"image_download.thread_time": [1.0, 2.0], "image_download.full_time": 3.0},
+                         dict(metric.times))
+
+
 class TestTelemetryMiddleware(unittest.IsolatedAsyncioTestCase, unittest.TestCase):
 
     def setUp(self):
@@ -269,6 +349,24 @@ class TestTelemetryMiddleware(unittest.IsolatedAsyncioTestCase, unittest.TestCas
         self.assertIn("timesMs", response.json()["telemetry"])
         self.assertIn("key", response.json()["telemetry"]["timesMs"])
 
+    def test_metricsAggregatedWithoutTelemetryFlag(self):
+        @self.app.route("/test", methods=["GET"])
+        def test_endpoint(request):
+            m = RequestMetricsStore.for_request()
+            m.increment_counter("aggregated_key")
+            with m.time("aggregated_timer"):
+                pass
+            return JSONResponse({"data": "test"})
+
+        aggregator = prometheus_exporter.RequestMetricsAggregator()
+        with patch.object(prometheus_exporter, "get_request_metrics_aggregator", return_value=aggregator):
+            self.client.get("/test")
+            self.client.get("/test")
+
+        counters, histograms = aggregator.snapshot()
+        self.assertEqual(2, counters["aggregated_key"])
+        self.assertEqual(2, histograms["aggregated_timer"][-2])
+
     def test_custom_telemetry_flag(self):
         middleware = [
             Middleware(TelemetryMiddleware, telemetery_flag="custom_telemetry")
@@ -5,7 +5,7 @@ from unittest import mock
 from unittest.mock import patch
 
 from marqo.api.exceptions import (
-    InvalidFieldNameError, InvalidDocumentIdError, InvalidArgError, DocTooLargeError
+    InvalidFieldNameError, InvalidDocumentIdError, InvalidArgError, DocTooLargeError, IllegalRequestedDocCount
 )
 from marqo import exceptions as base_exceptions
 from marqo.tensor_search import enums
@@ -170,6 +170,18 @@ class TestValidation(unittest.TestCase):
         for good_content in good_ids:
             assert good_content == validation.validate_id(good_content)
 
+    def test_validate_ids_to_get(self):
+        valid_ids, invalid_ids = validation.validate_ids_to_get(["1", "", 2, "3"])
+
+        self.assertEqual(["1", "3"], valid_ids)
+        self.assertEqual([(1, ""), (2, 2)], [(loc, doc_id) for loc, doc_id, _ in invalid_ids])
+        self.assertTrue(all(isinstance(e, InvalidDocumentIdError) for _, _, e in invalid_ids))
+
+    def test_validate_ids_to_get_tooMany(self):
+        with mock.patch.dict(os.environ, {enums.EnvVars.MARQO_MAX_RETRIEVABLE_DOCS: "2"}):
+            with self.assertRaises(IllegalRequestedDocCount):
+                validation.validate_ids_to_get(["1", "2", "3"])
+
     def test_validate_doc_max_size(self):
         max_size = 1234567
         mock_environ = {enums.EnvVars.MARQO_MAX_DOC_BYTES: str(max_size)}
@@ -0,0 +1,34 @@
+"""
+Helpers for tests of code that coalesces concurrent operations with an OperationCoalescer
+"""
+import threading
+import time
+import unittest
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from marqo.core.index_management.operation_coalescer import OperationCoalescer
+
+
+def run_in_thread(function: Callable, *args) -> Tuple[threading.Thread, Dict[str, Any]]:
+    """Call function in a new thread. The returned dict gets the 'value' it returns or the 'error' it raises."""
+    result = {}
+
+    def run():
+        try:
+            result['value'] = function(*args)
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, result
+
+
+def wait_for_pending(test_case: unittest.TestCase, coalescer: OperationCoalescer, count: int,
+                     key: Hashable = None) -> None:
+    """Wait until count operations of a key are waiting for their batch to start processing."""
+    for _ in range(500):
+        if coalescer.pending_count(key) == count:
+            return
+        time.sleep(0.01)
+    test_case.fail(f'{count} operations were not pending')
@@ -1,3 +1,4 @@
+import asyncio
 import functools
 import os
 import unittest
@@ -7,8 +8,10 @@ import httpx
 import vespa.application as pyvespa
 
 from marqo.vespa import concurrency
-from marqo.vespa.exceptions import VespaError, VespaStatusError, VespaTimeoutError
+from marqo.vespa.exceptions import VespaDeleteBySelectionError, VespaError, VespaStatusError, VespaTimeoutError
 from marqo.vespa.models import VespaDocument, QueryResult
+from marqo.vespa.models.delete_document_response import DeleteDocumentsBySelectionResponse
+from marqo.vespa.models.feed_response import FeedBatchDocumentResponse
 from marqo.vespa.models.query_result import Error
 from marqo.vespa.vespa_client import VespaClient
 from tests.marqo_test import AsyncMarqoTestCase
@@ -458,4 +461,71 @@ class TestFeedDocumentAsync(AsyncMarqoTestCase):
         with patch("marqo.vespa.vespa_client.logger.error") as mock_log_error:
             status = 400
             self.client.translate_vespa_document_response(status, None)
-        mock_log_error.assert_called_once()
\ No newline at end of file
+        mock_log_error.assert_called_once()
+
+class TestFeedBatchesPipelined(unittest.TestCase):
+
+    def setUp(self):
+        self.client = VespaClient("http://localhost:19071", "http://localhost:8080",
+                                  "http://localhost:8080", "content_default")
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _feed_document(self, semaphore, async_client, document, schema, timeout):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if document.id == 'fail':
+            raise VespaError('Invalid response')
+        return FeedBatchDocumentResponse(status=200, id=f'id:{schema}:{schema}::{document.id}', message=None)
+
+    def test_feed_batches_pipelined_allDocumentsFedWithBoundedConcurrency(self):
+        batches = [[VespaDocument(id=f'{i}-{j}', fields={}) for j in range(5)] for i in range(4)]
+        responses = []
+
+        with patch.object(VespaClient, '_feed_document_async', side_effect=self._feed_document, autospec=False):
+            self.client.feed_batches_pipelined(iter(batches), 'my_schema',
+                                               lambda document, response: responses.append((document, response)),
+                                               concurrency=3)
+
+        self.assertEqual({doc.id for batch in batches for doc in batch}, {document.id for document, _ in responses})
+        for document, response in responses:
+            self.assertEqual(f'id:my_schema:my_schema::{document.id}', response.id)
+        self.assertEqual(3, self.max_in_flight)
+
+    def test_feed_batches_pipelined_feedError_raised(self):
+        batches = [[VespaDocument(id='fail', fields={})], [VespaDocument(id=f'{i}', fields={}) for i in range(10)]]
+
+        with patch.object(VespaClient, '_feed_document_async', side_effect=self._feed_document, autospec=False):
+            with self.assertRaises(VespaError):
+                self.client.feed_batches_pipelined(batches, 'my_schema', lambda document, response: None,
+                                                   concurrency=2)
+
+
+class TestDeleteDocumentsBySelection(unittest.TestCase):
+
+    def setUp(self):
+        self.client = VespaClient("http://localhost:19071", "http://localhost:8080",
+                                  "http://localhost:8080", "content_default")
+
+    async def _delete_slice(self, async_client, schema, selection, continuation, slices, slice_id, time_chunk,
+                            timeout):
+        if slice_id == 1:
+            raise VespaError('slice failed')
+        await asyncio.sleep(0.01)
+        return DeleteDocumentsBySelectionResponse(pathId=f'/document/v1/{schema}/{schema}/docid', documentCount=3,
+                                                  continuation=f'c{slice_id}')
+
+    def test_delete_documents_by_selection_sliceFails_otherSlicesReturnedWithError(self):
+        with patch.object(VespaClient, '_delete_slice_by_selection_async', side_effect=self._delete_slice,
+                          autospec=False):
+            with self.assertRaises(VespaDeleteBySelectionError) as cm:
+                self.client.delete_documents_by_selection('my_schema', 'true', {0: None, 1: None, 2: 'b2'},
+                                                          slices=3)
+
+        self.assertEqual({0: 'c0', 2: 'c2'},
+                         {slice_id: response.continuation for slice_id, response in cm.exception.responses.items()})
+        self.assertEqual([1], list(cm.exception.errors))
+        self.assertIsInstance(cm.exception.cause, VespaError)
+
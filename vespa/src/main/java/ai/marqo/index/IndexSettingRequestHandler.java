@@ -4,6 +4,7 @@ import static com.yahoo.jdisc.http.HttpRequest.Method.GET;
 
 import com.fasterxml.jackson.core.JsonProcessingException;
 import com.fasterxml.jackson.databind.ObjectMapper;
+import com.google.common.annotations.VisibleForTesting;
 import com.yahoo.container.jdisc.HttpRequest;
 import com.yahoo.container.jdisc.HttpResponse;
 import com.yahoo.container.jdisc.ThreadedHttpRequestHandler;
@@ -38,7 +39,10 @@ public class IndexSettingRequestHandler extends ThreadedHttpRequestHandler {
 
         String path = httpRequest.getUri().getPath();
         if (path.equals("/index-settings")) {
-            return JsonResponse.success(indexSettings.getAllIndexSettings());
+            return conditionalSuccess(
+                    httpRequest,
+                    indexSettings.getAllIndexSettings(),
+                    indexSettings.getAllIndexSettingsEtag());
         } else {
             Matcher matcher = INDEX_SETTINGS_PATH_PATTERN.matcher(path);
             if (!matcher.find()) {
@@ -53,7 +57,8 @@ public class IndexSettingRequestHandler extends ThreadedHttpRequestHandler {
                     return JsonResponse.error(
                             404, String.format("Index setting '%s' does not exist", indexName));
                 }
-                return JsonResponse.success(indexSetting);
+                return conditionalSuccess(
+                        httpRequest, indexSetting, indexSettings.getIndexSettingEtag(indexName));
             } catch (Exception e) {
                 logger.error("Failed to get index setting: {}", indexName, e);
                 return JsonResponse.error(
@@ -62,6 +67,38 @@ public class IndexSettingRequestHandler extends ThreadedHttpRequestHandler {
         }
     }
 
+    /**
+     * Returns the settings with their ETag, or an empty 304 response if the client already has
+     * them, i.e. it sent the same ETag in an If-None-Match header.
+     */
+    private static HttpResponse conditionalSuccess(
+            HttpRequest httpRequest, String data, String etag) {
+        JsonResponse response =
+                isNotModified(httpRequest.getHeader("If-None-Match"), etag)
+                        ? JsonResponse.notModified()
+                        : JsonResponse.success(data);
+        response.headers().add("ETag", etag);
+        return response;
+    }
+
+    @VisibleForTesting
+    static boolean isNotModified(String ifNoneMatch, String etag) {
+        if (ifNoneMatch == null) {
+            return false;
+        }
+        for (String tag : ifNoneMatch.split(",")) {
+            tag = tag.trim();
+            // Weak comparison, as required for If-None-Match
+            if (tag.startsWith("W/")) {
+                tag = tag.substring(2);
+            }
+            if (tag.equals("*") || tag.equals(etag)) {
+                return true;
+            }
+        }
+        return false;
+    }
+
     static class JsonResponse extends HttpResponse {
         private static final ObjectMapper mapper = new ObjectMapper();
         private final byte[] data;
@@ -83,6 +120,10 @@ public class IndexSettingRequestHandler extends ThreadedHttpRequestHandler {
             return new JsonResponse(200, data);
         }
 
+        public static JsonResponse notModified() {
+            return new JsonResponse(304, "");
+        }
+
         public String getContentType() {
             return "application/json";
         }
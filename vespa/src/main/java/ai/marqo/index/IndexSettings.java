@@ -6,10 +6,15 @@ import com.fasterxml.jackson.databind.node.ArrayNode;
 import com.fasterxml.jackson.databind.node.ObjectNode;
 import com.google.common.annotations.VisibleForTesting;
 import java.io.IOException;
+import java.nio.charset.StandardCharsets;
 import java.nio.file.Files;
 import java.nio.file.NoSuchFileException;
 import java.nio.file.Path;
+import java.security.MessageDigest;
+import java.security.NoSuchAlgorithmException;
+import java.util.Arrays;
 import java.util.HashMap;
+import java.util.HexFormat;
 import java.util.Map;
 import java.util.stream.Collectors;
 import org.slf4j.Logger;
@@ -23,12 +28,36 @@ public class IndexSettings {
     private final Map<String, String> indexSettingsHistory;
     private final String allIndexSettings;
     private final String allIndexSettingsHistory;
+    private final Map<String, String> indexSettingEtags;
+    private final String allIndexSettingsEtag;
 
     public IndexSettings(ai.marqo.index.IndexSettingsConfig config) {
         indexSettings = loadIndexSettingsFromFile(config.indexSettingsFile());
         indexSettingsHistory = loadIndexSettingsFromFile(config.indexSettingsHistoryFile());
         allIndexSettings = toJsonArray(indexSettings);
         allIndexSettingsHistory = toJsonArray(indexSettingsHistory);
+        // Settings only change with a deployment, which constructs a new instance, so ETags are
+        // computed once here
+        indexSettingEtags =
+                indexSettings.entrySet().stream()
+                        .collect(Collectors.toMap(Map.Entry::getKey, e -> etag(e.getValue())));
+        allIndexSettingsEtag = etag(allIndexSettings);
+    }
+
+    /**
+     * Returns a strong ETag for a settings JSON string. It is derived from the content only, so all
+     * container nodes serving the same settings return the same ETag.
+     */
+    @VisibleForTesting
+    static String etag(String json) {
+        try {
+            byte[] digest =
+                    MessageDigest.getInstance("SHA-256")
+                            .digest(json.getBytes(StandardCharsets.UTF_8));
+            return "\"" + HexFormat.of().formatHex(Arrays.copyOf(digest, 16)) + "\"";
+        } catch (NoSuchAlgorithmException e) {
+            throw new IllegalStateException("SHA-256 is not available", e);
+        }
     }
 
     private String toJsonArray(Map<String, String> jsonMap) {
@@ -80,6 +109,14 @@ public class IndexSettings {
         return allIndexSettings;
     }
 
+    public String getIndexSettingEtag(String name) {
+        return indexSettingEtags.get(name);
+    }
+
+    public String getAllIndexSettingsEtag() {
+        return allIndexSettingsEtag;
+    }
+
     public String getIndexSettingHistory(String name) {
         return indexSettingsHistory.get(name);
     }
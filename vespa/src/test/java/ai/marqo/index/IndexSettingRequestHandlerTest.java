@@ -0,0 +1,35 @@
+package ai.marqo.index;
+
+import static org.assertj.core.api.Assertions.assertThat;
+
+import org.junit.jupiter.api.Test;
+import org.junit.jupiter.params.ParameterizedTest;
+import org.junit.jupiter.params.provider.ValueSource;
+
+class IndexSettingRequestHandlerTest {
+
+    private static final String ETAG = "\"0123456789abcdef0123456789abcdef\"";
+
+    @ParameterizedTest
+    @ValueSource(
+            strings = {
+                ETAG,
+                "W/" + ETAG,
+                "*",
+                "\"other\", " + ETAG,
+            })
+    void shouldBeNotModifiedIfEtagMatches(String ifNoneMatch) {
+        assertThat(IndexSettingRequestHandler.isNotModified(ifNoneMatch, ETAG)).isTrue();
+    }
+
+    @ParameterizedTest
+    @ValueSource(strings = {"\"other\"", "", "0123456789abcdef0123456789abcdef"})
+    void shouldBeModifiedIfEtagDoesNotMatch(String ifNoneMatch) {
+        assertThat(IndexSettingRequestHandler.isNotModified(ifNoneMatch, ETAG)).isFalse();
+    }
+
+    @Test
+    void shouldBeModifiedWithoutIfNoneMatch() {
+        assertThat(IndexSettingRequestHandler.isNotModified(null, ETAG)).isFalse();
+    }
+}
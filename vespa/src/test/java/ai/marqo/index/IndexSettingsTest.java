@@ -106,5 +106,42 @@ class IndexSettingsTest {
             assertThat(indexSettings.getIndexSetting("index2")).isNull();
             assertThat(indexSettings.getIndexSettingHistory("index2")).isNull();
         }
+
+        @Test
+        void shouldReturnEtagsOfIndexSettings() {
+            IndexSettings indexSettings =
+                    new IndexSettings(
+                            new ai.marqo.index.IndexSettingsConfig.Builder()
+                                    .indexSettingsFile(
+                                            new FileReference(
+                                                    "src/test/resources/index-settings/index_settings.json"))
+                                    .indexSettingsHistoryFile(
+                                            new FileReference(
+                                                    "src/test/resources/index-settings/index_settings_history.json"))
+                                    .build());
+
+            assertThat(indexSettings.getIndexSettingEtag("index1"))
+                    .isEqualTo(IndexSettings.etag("{\"name\":\"index1\",\"version\":2}"));
+            assertThat(indexSettings.getAllIndexSettingsEtag())
+                    .isEqualTo(IndexSettings.etag("[{\"name\":\"index1\",\"version\":2}]"));
+            assertThat(indexSettings.getIndexSettingEtag("index2")).isNull();
+        }
+    }
+
+    @Nested
+    class TestEtag {
+
+        @Test
+        void shouldBeQuotedAndDeterministic() {
+            String etag = IndexSettings.etag("{\"name\":\"index1\",\"version\":2}");
+            assertThat(etag).matches("\"[0-9a-f]{32}\"");
+            assertThat(IndexSettings.etag("{\"name\":\"index1\",\"version\":2}")).isEqualTo(etag);
+        }
+
+        @Test
+        void shouldChangeWithContent() {
+            assertThat(IndexSettings.etag("{\"name\":\"index1\",\"version\":2}"))
+                    .isNotEqualTo(IndexSettings.etag("{\"name\":\"index1\",\"version\":3}"));
+        }
     }
 }